@@ -0,0 +1,111 @@
+import argparse
+import math
+import time
+from typing import Dict
+
+from common import parse_ints, write_report
+from fakes import build_policy, service_ids
+
+from domain.models.monitored_service import MonitoredService
+from infrastructure.incident_history_store import ACKNOWLEDGE, ALERT, RESOLVE, IncidentHistoryStore
+
+""" Incident history benchmark
+Fills an in-memory IncidentHistoryStore with --events events (incidents of --services services, each
+alerted, notified on 2 targets, acknowledged then resolved within minutes) and measures:
+- record: events recorded per second, as the pagers do
+- stats_rollup: MTTA/MTTR over the whole history and over a day, summed from the rollups
+- stats_scan: the same figures computed by scanning every event, as without rollups
+- events_by_target, incidents_by_time: indexed queries of the /incidents endpoints
+
+    python benchmarks/bench_history.py --events 1000000,5000000
+"""
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1_700_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+def fill(store: IncidentHistoryStore, clock: FakeClock, events: int, services: int) -> Dict:
+    monitored = [MonitoredService(service_id) for service_id in service_ids(services)]
+    policy = build_policy(1, 2)
+    for service in monitored:
+        service.attach_policy(policy)
+    started = time.perf_counter()
+    for i in range(events // 5):
+        service = monitored[i % services]
+        service.set_unhealthy('Down!')
+        store.record('alert', [service])
+        store.record_notifications(service)
+        clock.now += 30 + i % 7 * 30
+        service.set_acknowledged()
+        store.record('acknowledge', [service])
+        clock.now += 60 + i % 11 * 60
+        service.set_healthy()
+        store.record('healthy', [service])
+    elapsed = time.perf_counter() - started
+    return {'events': len(store), 'record_per_second': len(store) / elapsed}
+
+
+def scan(store: IncidentHistoryStore, since: float) -> Dict:
+    """ MTTA/MTTR of the incidents opened since a timestamp, from every event """
+    opened, acknowledged, resolved = {}, {}, {}
+    for position in range(len(store)):
+        incident = store._incident_refs[position]
+        kind = store._kinds[position]
+        at = store._times[position]
+        if kind == ALERT and at >= since:
+            opened[incident] = at
+        elif incident in opened and kind == ACKNOWLEDGE and incident not in acknowledged:
+            acknowledged[incident] = at - opened[incident]
+        elif incident in opened and kind == RESOLVE:
+            resolved[incident] = at - opened[incident]
+    return {
+        'incidents': len(opened),
+        'mtta_seconds': sum(acknowledged.values()) / len(acknowledged) if acknowledged else None,
+        'mttr_seconds': sum(resolved.values()) / len(resolved) if resolved else None,
+    }
+
+
+def timed_ms(function, *args, repeat: int = 5, **kwargs):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function(*args, **kwargs)
+        samples.append((time.perf_counter() - started) * 1e3)
+    return result, min(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--events', type=parse_ints, default=[1_000_000])
+    parser.add_argument('--services', type=int, default=1_000)
+    parser.add_argument('--output', help='JSON report path, printed when omitted')
+    args = parser.parse_args()
+
+    results = []
+    for events in args.events:
+        clock = FakeClock()
+        store = IncidentHistoryStore(clock=clock)
+        result = fill(store, clock, events, args.services)
+        # Day-aligned, the rollups are hourly
+        day = math.floor(clock.now / 86400) * 86400 - 86400
+
+        stats, result['stats_rollup_ms'] = timed_ms(store.stats)
+        _, result['stats_rollup_day_ms'] = timed_ms(store.stats, since=day, until=day + 86400)
+        _, result['stats_rollup_service_ms'] = timed_ms(store.stats, 'service-1')
+        scanned, result['stats_scan_ms'] = timed_ms(scan, store, 0.0, repeat=1)
+        # Same figures, up to float rounding
+        result['consistent'] = scanned['incidents'] == stats['incidents'] and math.isclose(
+            scanned['mttr_seconds'], stats['mttr_seconds'])
+        _, result['events_by_target_ms'] = timed_ms(store.events, target='+33600000001', since=day, limit=100)
+        _, result['incidents_by_time_ms'] = timed_ms(store.incidents, since=day, until=day + 86400, limit=100)
+        results.append(result)
+    write_report('history', results, args.output)
+
+
+if __name__ == '__main__':
+    main()
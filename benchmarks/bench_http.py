@@ -0,0 +1,148 @@
+import argparse
+import http.client
+import json
+import os
+import tempfile
+import threading
+import time
+from typing import Callable, Dict, List, Tuple
+from urllib.parse import urlparse
+
+from common import ROOT, parse_ints, summarize, write_report
+from fakes import InMemoryEscalationPolicyService, build_policy, service_ids
+
+from domain.models.monitored_service import MonitoredService
+
+""" HTTP layer benchmark
+Drives the server.py endpoints through a full incident cycle and reports per-request latency
+percentiles and throughput. By default the app runs in-process (FastAPI TestClient, seeded with
+in-memory policies); with --url it targets a running server whose services already exist.
+
+    python benchmarks/bench_http.py --services 1000 --concurrency 1,8 --output http.json
+"""
+
+Request = Tuple[str, dict]  # (path, JSON body)
+
+
+def incident_cycle(ids: List[str], batch: int) -> Dict[str, List[Request]]:
+    return {
+        'POST /alert': [('/alert', {'service_id': service_id, 'message': 'Down!'}) for service_id in ids],
+        'POST /timeout/{id}': [(f'/timeout/{service_id}', None) for service_id in ids],
+        'POST /acknowledge/{id}': [(f'/acknowledge/{service_id}', None) for service_id in ids],
+        'POST /health/{id}': [(f'/health/{service_id}', None) for service_id in ids],
+        'POST /alerts': [
+            ('/alerts', [{'service_id': service_id, 'message': 'Down!'} for service_id in ids[start:start + batch]])
+            for start in range(0, len(ids), batch)
+        ],
+    }
+
+
+def run_requests(send: Callable[[str, dict], int], requests: List[Request], concurrency: int) -> Dict:
+    samples: List[int] = []
+    errors = [0]
+    lock = threading.Lock()
+    cursor = iter(requests)
+
+    def worker():
+        while True:
+            with lock:
+                request = next(cursor, None)
+            if request is None:
+                return
+            before = time.perf_counter_ns()
+            status = send(*request)
+            elapsed = time.perf_counter_ns() - before
+            with lock:
+                samples.append(elapsed)
+                if status >= 400:
+                    errors[0] += 1
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    summary = summarize(samples, time.perf_counter() - started)
+    summary['errors'] = errors[0]
+    return summary
+
+
+def in_process_sender(ids: List[str], depth: int, targets: int, directory: str):
+    os.environ['PAGER_DB_PATH'] = os.path.join(directory, 'pager.db')
+    os.environ['PAGER_LOG_DIR'] = os.path.join(directory, 'pager-log')
+    import sys
+    sys.path.insert(0, ROOT)
+    import server
+    from fastapi.testclient import TestClient
+
+    server.pager_service.escalation_service.policy_service = InMemoryEscalationPolicyService(default=build_policy(depth, targets))
+    server.repository.save_many([MonitoredService(service_id) for service_id in ids])
+    client = TestClient(server.app)
+    client.__enter__()  # Runs the startup handlers (replay, engine, timer)
+
+    def send(path: str, body: dict) -> int:
+        return client.post(path, json=body).status_code
+
+    return send, lambda: client.__exit__(None, None, None)
+
+
+def remote_sender(url: str):
+    target = urlparse(url)
+    local = threading.local()
+
+    def send(path: str, body: dict) -> int:
+        connection = getattr(local, 'connection', None)
+        if connection is None:
+            connection = local.connection = http.client.HTTPConnection(target.hostname, target.port or 80)
+        payload = json.dumps(body) if body is not None else ''
+        connection.request('POST', path, body=payload, headers={'Content-Type': 'application/json'})
+        response = connection.getresponse()
+        response.read()
+        return response.status
+
+    return send, lambda: None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--services', type=int, default=1000)
+    parser.add_argument('--depth', type=int, default=3)
+    parser.add_argument('--targets', type=int, default=2)
+    parser.add_argument('--batch', type=int, default=100)
+    parser.add_argument('--concurrency', type=parse_ints, default=[1, 8])
+    parser.add_argument('--url', help='Base URL of a running server, e.g. http://localhost:8000')
+    parser.add_argument('--output', help='JSON report path, printed when omitted')
+    args = parser.parse_args()
+
+    ids = service_ids(args.services)
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        if args.url:
+            send, close = remote_sender(args.url)
+        else:
+            send, close = in_process_sender(ids, args.depth, args.targets, directory)
+        try:
+            for concurrency in args.concurrency:
+                endpoints = {
+                    endpoint: run_requests(send, requests, concurrency)
+                    for endpoint, requests in incident_cycle(ids, args.batch).items()
+                }
+                # Back to healthy for the next round
+                for path, body in incident_cycle(ids, args.batch)['POST /health/{id}']:
+                    send(path, body)
+                results.append({
+                    'target': args.url or 'in-process',
+                    'services': args.services,
+                    'policy_depth': args.depth,
+                    'targets_per_level': args.targets,
+                    'concurrency': concurrency,
+                    'endpoints': endpoints,
+                })
+        finally:
+            close()
+    write_report('http', results, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+import argparse
+import os
+import subprocess
+import sys
+from typing import Dict, Set, Tuple
+
+from common import ROOT, write_report
+
+""" Import time benchmark
+Imports each entry point in a fresh interpreter with `-X importtime` and reports its cumulative import
+time (median of --repeat runs) and the modules it loads. Fails when an entry point exceeds its budget,
+or when the domain loads anything but the standard library, so short-lived CLI and worker processes
+keep starting quickly:
+
+    python benchmarks/bench_import.py --repeat 7
+    python benchmarks/bench_import.py --budget-ms 20 --modules domain.services.pager_service
+"""
+
+# Entry point -> budget in milliseconds
+BUDGETS = {
+    'domain.services.pager_service': 60,
+    'domain.services.async_pager_service': 120,
+    'domain.services.tenant_host': 90,
+    'infrastructure.event_log': 80,
+    'infrastructure.state_snapshot': 80,
+}
+# Top-level packages of this repository
+LOCAL_PACKAGES = {'domain', 'application', 'infrastructure'}
+
+
+# Prints the loaded modules once the statement ran
+_LIST_MODULES = "import sys; print('\\n'.join(sys.modules))"
+
+
+def _python(*args: str) -> subprocess.CompletedProcess:
+    env = dict(os.environ, PYTHONPATH=os.path.join(ROOT, 'src'))
+    return subprocess.run([sys.executable, *args], env=env, capture_output=True, text=True, check=True)
+
+
+def import_once(module: str) -> Tuple[float, Set[str]]:
+    """
+    :return: Cumulative import time of the module in milliseconds, and the modules loaded by the import
+    """
+    completed = _python('-X', 'importtime', '-c', f'import {module}; {_LIST_MODULES}')
+    cumulative = 0.0
+    for line in completed.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, _, cumulative_us, name = (part.strip() for part in line.replace('import time:', '|', 1).split('|'))
+        if name == module:
+            cumulative = int(cumulative_us) / 1000
+    return cumulative, set(completed.stdout.split())
+
+
+def foreign_modules(loaded: Set[str], baseline: Set[str]) -> Set[str]:
+    """ Top-level modules loaded by the import that are neither from the standard library nor from this repository """
+    stdlib = set(sys.stdlib_module_names)
+    return {name.split('.')[0] for name in loaded - baseline} - stdlib - LOCAL_PACKAGES
+
+
+def run_module(module: str, repeat: int, budget_ms: float, baseline: Set[str]) -> Dict:
+    runs = sorted((import_once(module) for _ in range(repeat)), key=lambda run: run[0])
+    median, loaded = runs[len(runs) // 2]
+    foreign = sorted(foreign_modules(loaded, baseline))
+    return {
+        'module': module,
+        'budget_ms': budget_ms,
+        'median_ms': median,
+        'min_ms': runs[0][0],
+        'modules': len(loaded - baseline),
+        'foreign_modules': foreign,
+        'within_budget': median <= budget_ms and not (module.startswith('domain.') and foreign),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--modules', default=','.join(BUDGETS))
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--budget-ms', type=float, help='Budget of every module, instead of the per-module defaults')
+    parser.add_argument('--output', help='JSON report path, printed when omitted')
+    args = parser.parse_args()
+
+    # Loaded by the interpreter startup (site, .pth hooks) whatever the module
+    baseline = set(_python('-c', _LIST_MODULES).stdout.split())
+    results = [
+        run_module(module, args.repeat, args.budget_ms if args.budget_ms is not None else BUDGETS.get(module, 100), baseline)
+        for module in args.modules.split(',') if module
+    ]
+    write_report('import', results, args.output)
+    over = [result['module'] for result in results if not result['within_budget']]
+    if over:
+        print(f"Over budget: {', '.join(over)}", file=sys.stderr)
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
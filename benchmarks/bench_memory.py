@@ -0,0 +1,91 @@
+import argparse
+import gc
+import tracemalloc
+from typing import Callable, Dict, List
+
+from common import parse_ints, write_report
+from fakes import build_policy, service_ids
+
+from domain.models.monitored_service import MonitoredService
+from infrastructure.compact_monitored_service_repository import CompactMonitoredServiceRepository
+from infrastructure.in_memory_monitored_service_repository import InMemoryMonitoredServiceRepository
+
+""" Monitored services memory footprint benchmark
+Measures the memory held per service (tracemalloc) by each way of keeping a fleet in memory, half of it
+alerting with a loaded policy:
+- dict_objects: services as plain objects with a per-instance __dict__ (the model before __slots__)
+- slotted_objects: MonitoredService instances in a dict
+- in_memory_repository: InMemoryMonitoredServiceRepository (row tuples)
+- compact_repository: CompactMonitoredServiceRepository (typed arrays, interned IDs, messages and policies)
+
+    python benchmarks/bench_memory.py --services 100000,1000000 --output memory.json
+"""
+
+
+class DictMonitoredService:
+    """ MonitoredService layout before __slots__ """
+    def __init__(self, id: str):
+        self.id = id
+        self.status = 'healthy'
+        self.alert_msg = ''
+        self.acknowledged = False
+        self.current_level = 0
+        self.version = 0
+        self.policy = None
+
+
+def build_services(cls, ids: List[str], policy) -> List:
+    services = []
+    for index, service_id in enumerate(ids):
+        service = cls(service_id)
+        if index % 2:
+            service.status = 'unhealthy'
+            service.alert_msg = 'Down!'
+            service.current_level = 1
+            service.policy = policy
+        services.append(service)
+    return services
+
+
+def footprint(build: Callable[[], object]) -> int:
+    """ Bytes still allocated once build returned, the built object kept alive """
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    kept = build()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del kept
+    return after - before
+
+
+def run_scenario(services: int) -> Dict:
+    policy = build_policy(3, 2)
+    # Service IDs are shared by every layout: they are allocated before measuring
+    ids = service_ids(services)
+
+    layouts = {
+        'dict_objects': lambda: {service.id: service for service in build_services(DictMonitoredService, ids, policy)},
+        'slotted_objects': lambda: {service.id: service for service in build_services(MonitoredService, ids, policy)},
+        'in_memory_repository': lambda: InMemoryMonitoredServiceRepository(build_services(MonitoredService, ids, policy)),
+        'compact_repository': lambda: CompactMonitoredServiceRepository(build_services(MonitoredService, ids, policy)),
+    }
+
+    results = {}
+    for name, build in layouts.items():
+        total = footprint(build)
+        results[name] = {'bytes': total, 'bytes_per_service': total / services}
+    return {'services': services, 'layouts': results}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--services', type=parse_ints, default=[100000])
+    parser.add_argument('--output', help='JSON report path, printed when omitted')
+    args = parser.parse_args()
+
+    write_report('memory', [run_scenario(services) for services in args.services], args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+import argparse
+import os
+import tempfile
+import time
+from typing import Dict, List
+
+from common import measure, parse_ints, summarize, write_report
+from fakes import CountingNotificationService, InMemoryEscalationPolicyService, NullTimerService, build_policy, service_ids
+
+from domain.models.monitored_service import MonitoredService
+from domain.services.instrumentation import (
+    InstrumentedEscalationPolicyService, InstrumentedMonitoredServiceRepository, InstrumentedNotificationService,
+    InstrumentedTimerService, instrument_handlers
+)
+from domain.services.pager_service import ServicePager
+from infrastructure.in_memory_monitored_service_repository import InMemoryMonitoredServiceRepository
+from infrastructure.prometheus_metrics import PrometheusMetrics
+from infrastructure.sqlite_monitored_service_repository import SQLiteMonitoredServiceRepository
+
+""" ServicePager hot paths benchmark
+Runs a full incident cycle (alert, timeout, acknowledge, healthy) over every service of each scenario
+and reports per-event latency percentiles and throughput of each handler.
+
+    python benchmarks/bench_pager.py --services 1000,10000 --depths 1,3 --targets 1,4 --output bench.json
+"""
+
+
+def build_repository(kind: str, ids: List[str], directory: str):
+    services = [MonitoredService(service_id) for service_id in ids]
+    if kind == 'sqlite':
+        repository = SQLiteMonitoredServiceRepository(os.path.join(directory, f'bench-{len(ids)}-{time.time_ns()}.db'))
+        repository.save_many(services)
+        return repository
+    return InMemoryMonitoredServiceRepository(services)
+
+
+def build_pager(repository, policy_service, notifications, instrumented: bool) -> ServicePager:
+    timer = NullTimerService()
+    if not instrumented:
+        return ServicePager(timer, policy_service, notifications, notifications, repository)
+    metrics = PrometheusMetrics()
+    pager = ServicePager(
+        timer_system=InstrumentedTimerService(timer, metrics),
+        escalation_system=InstrumentedEscalationPolicyService(policy_service, metrics),
+        mail_system=InstrumentedNotificationService(notifications, metrics, 'mail'),
+        sms_system=InstrumentedNotificationService(notifications, metrics, 'sms'),
+        repository=InstrumentedMonitoredServiceRepository(repository, metrics),
+        metrics=metrics
+    )
+    return instrument_handlers(pager, metrics)
+
+
+def run_scenario(repository_kind: str, services: int, depth: int, targets: int, batch: int, directory: str,
+                 instrumented: bool = False) -> Dict:
+    ids = service_ids(services)
+    notifications = CountingNotificationService()
+    pager = build_pager(
+        build_repository(repository_kind, ids, directory),
+        InMemoryEscalationPolicyService(default=build_policy(depth, targets)),
+        notifications,
+        instrumented
+    )
+
+    handlers = {
+        'handle_alert': measure(pager.handle_alert, [(service_id, 'Down!') for service_id in ids]),
+        'handle_timeout': measure(pager.handle_timeout, [(service_id,) for service_id in ids]),
+        'handle_acknowledge': measure(pager.handle_acknowledge, [(service_id,) for service_id in ids]),
+        'handle_healthy': measure(pager.handle_healthy, [(service_id,) for service_id in ids]),
+    }
+
+    # Batched ingestion: latency is per batch, throughput per alert
+    batches = [([(service_id, 'Down!') for service_id in ids[start:start + batch]],) for start in range(0, services, batch)]
+    started = time.perf_counter()
+    batched = measure(pager.handle_alerts, batches)
+    batched['throughput'] = services / (time.perf_counter() - started)
+    handlers['handle_alerts'] = batched
+
+    return {
+        'repository': repository_kind,
+        'services': services,
+        'policy_depth': depth,
+        'targets_per_level': targets,
+        'batch_size': batch,
+        'instrumented': instrumented,
+        'notifications': notifications.sent,
+        'handlers': handlers,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--services', type=parse_ints, default=[1000, 10000])
+    parser.add_argument('--depths', type=parse_ints, default=[1, 3])
+    parser.add_argument('--targets', type=parse_ints, default=[1, 4])
+    parser.add_argument('--batch', type=int, default=100, help='Alerts per handle_alerts batch')
+    parser.add_argument('--repository', choices=['memory', 'sqlite'], default='memory')
+    parser.add_argument('--metrics', action='store_true', help='Run with every stage instrumented')
+    parser.add_argument('--output', help='JSON report path, printed when omitted')
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for services in args.services:
+            for depth in args.depths:
+                for targets in args.targets:
+                    results.append(run_scenario(args.repository, services, depth, targets, args.batch, directory, args.metrics))
+    write_report('pager', results, args.output)
+
+
+if __name__ == '__main__':
+    main()
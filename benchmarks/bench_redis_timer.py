@@ -0,0 +1,86 @@
+import argparse
+import threading
+import time
+from typing import Dict, List
+
+from common import parse_ints, write_report
+
+from infrastructure.fake_resp_server import FakeRespServer
+from infrastructure.redis_timer_service import SCRIPTS, RedisTimerService
+from infrastructure.resp_client import RespClient
+
+""" Redis timer claim throughput benchmark
+Arms a backlog of due timeouts on the in-process RESP server, then lets competing nodes (one
+RedisTimerService and connection each, polling from its own thread) claim them in batches.
+Reports the claim throughput and checks every timeout was handled exactly once.
+
+    python benchmarks/bench_redis_timer.py --timeouts 20000 --workers 1,2,4,8 --batch-sizes 10,100
+"""
+
+
+def run_scenario(server: FakeRespServer, timeouts: int, workers: int, batch_size: int) -> Dict:
+    server.execute('FLUSHALL')
+    handled: List[List[str]] = [[] for _ in range(workers)]
+    nodes = [
+        RedisTimerService(RespClient(*server.address), on_expire=handled[index].extend, batch_size=batch_size)
+        for index in range(workers)
+    ]
+    # Armed in pipelined chunks, already due
+    due = time.time() - 1
+    client = nodes[0].client
+    for start in range(0, timeouts, 1000):
+        client.pipeline([('ZADD', nodes[0].key, due, f'service-{i}') for i in range(start, min(timeouts, start + 1000))])
+
+    commands = server.commands
+    barrier = threading.Barrier(workers + 1)
+
+    def work(node: RedisTimerService):
+        barrier.wait()
+        node.poll()
+
+    threads = [threading.Thread(target=work, args=(node,)) for node in nodes]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    started = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    claimed = [service_id for node_handled in handled for service_id in node_handled]
+    for node in nodes:
+        node.client.close()
+    return {
+        'timeouts': timeouts,
+        'workers': workers,
+        'batch_size': batch_size,
+        'seconds': elapsed,
+        'claims_per_second': len(claimed) / elapsed if elapsed > 0 else 0.0,
+        'commands_per_claim': (server.commands - commands) / max(1, len(claimed)),
+        'per_worker': [len(node_handled) for node_handled in handled],
+        'exactly_once': len(claimed) == timeouts and len(set(claimed)) == timeouts,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--timeouts', type=int, default=20000)
+    parser.add_argument('--workers', type=parse_ints, default=[1, 2, 4, 8])
+    parser.add_argument('--batch-sizes', type=parse_ints, default=[10, 100])
+    parser.add_argument('--output', help='JSON report path, printed when omitted')
+    args = parser.parse_args()
+
+    server = FakeRespServer(scripts=SCRIPTS).start()
+    try:
+        results = [
+            run_scenario(server, args.timeouts, workers, batch_size)
+            for batch_size in args.batch_sizes
+            for workers in args.workers
+        ]
+    finally:
+        server.stop()
+    write_report('redis_timer', results, args.output)
+
+
+if __name__ == '__main__':
+    main()
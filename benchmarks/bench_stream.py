@@ -0,0 +1,109 @@
+import argparse
+import asyncio
+import json
+import time
+from typing import Dict, List
+
+from common import parse_ints, write_report
+from fakes import CountingNotificationService, InMemoryEscalationPolicyService, NullTimerService, build_policy, service_ids
+
+from domain.models.monitored_service import MonitoredService
+from domain.services.pager_service import ServicePager
+from domain.services.sharded_event_engine import ShardedEventEngine
+from domain.services.stream_ingest import StreamIngestor
+from infrastructure.in_memory_monitored_service_repository import InMemoryMonitoredServiceRepository
+
+""" Streaming ingest benchmark
+Replays --events alert/healthy events of --services services through the ShardedEventEngine in front of
+an in-memory ServicePager, from a single connection:
+- per_event: one submission awaited per event, as the /alert and /health routes do per request
+- stream: NDJSON chunks of --chunk-kb through the StreamIngestor, acknowledged per --batch events
+HTTP framing is left out: the streaming path saves it on top of these figures.
+
+    python benchmarks/bench_stream.py --events 100000 --batch 500,2000
+"""
+
+
+def build_engine(services: int) -> ShardedEventEngine:
+    pager = ServicePager(
+        timer_system=NullTimerService(),
+        escalation_system=InMemoryEscalationPolicyService(default=build_policy(2, 1)),
+        mail_system=CountingNotificationService(),
+        sms_system=CountingNotificationService(),
+        repository=InMemoryMonitoredServiceRepository([MonitoredService(service_id) for service_id in service_ids(services)])
+    )
+    # Pure Python handlers: a single shard, more would only contend on the GIL
+    engine = ShardedEventEngine(lambda: pager, shards=1, queue_size=100_000)
+    engine.start()
+    return engine
+
+
+def build_lines(events: int, services: int) -> List[bytes]:
+    ids = service_ids(services)
+    lines = []
+    for i in range(events):
+        service_id = ids[i % services]
+        # Alternating rounds of alerts and recoveries of every service
+        if i // services % 2 == 0:
+            lines.append(json.dumps({'type': 'alert', 'service_id': service_id, 'message': 'Down!'}).encode())
+        else:
+            lines.append(json.dumps({'type': 'healthy', 'service_id': service_id}).encode())
+    return lines
+
+
+async def per_event(engine: ShardedEventEngine, lines: List[bytes]) -> Dict:
+    events = [json.loads(line) for line in lines]
+    started = time.perf_counter()
+    for event in events:
+        args = (event['message'],) if event['type'] == 'alert' else ()
+        await asyncio.wrap_future(engine.submit(event['type'], event['service_id'], *args))
+    return {'seconds': time.perf_counter() - started}
+
+
+async def stream(engine: ShardedEventEngine, lines: List[bytes], batch: int, chunk_kb: int) -> Dict:
+    payload = b'\n'.join(lines) + b'\n'
+    chunk = chunk_kb * 1024
+
+    async def chunks():
+        for start in range(0, len(payload), chunk):
+            yield payload[start:start + chunk]
+
+    ingestor = StreamIngestor(engine, batch_size=batch)
+    started = time.perf_counter()
+    acks = [ack async for ack in ingestor.ingest(chunks())]
+    return {
+        'seconds': time.perf_counter() - started,
+        'batches': len(acks),
+        'accepted': sum(ack['accepted'] for ack in acks),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--events', type=int, default=100_000)
+    parser.add_argument('--services', type=int, default=1_000)
+    parser.add_argument('--batch', type=parse_ints, default=[500, 2000])
+    parser.add_argument('--chunk-kb', type=int, default=64)
+    parser.add_argument('--output', help='JSON report path, printed when omitted')
+    args = parser.parse_args()
+
+    lines = build_lines(args.events, args.services)
+    scenarios = [('per_event', None, lambda engine: per_event(engine, lines))] + [
+        ('stream', batch, lambda engine, batch=batch: stream(engine, lines, batch, args.chunk_kb)) for batch in args.batch
+    ]
+    results = []
+    for name, batch, scenario in scenarios:
+        engine = build_engine(args.services)
+        try:
+            result = asyncio.run(scenario(engine))
+        finally:
+            engine.stop()
+        results.append({
+            'scenario': name, 'batch': batch, 'events': args.events,
+            'throughput': args.events / result['seconds'], **result,
+        })
+    write_report('stream', results, args.output)
+
+
+if __name__ == '__main__':
+    main()
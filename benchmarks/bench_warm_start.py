@@ -0,0 +1,133 @@
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+from typing import Dict
+
+from common import parse_ints, write_report
+from fakes import CountingNotificationService, NullTimerService, build_policy, service_ids
+
+from application.interfaces.escalation_policy_service import IEscalationPolicyService
+from domain.models.escalation_policy import EscalationPolicy
+from domain.services.pager_service import ServicePager
+from infrastructure.cached_escalation_policy_service import CachedEscalationPolicyService
+from infrastructure.event_log import SNAPSHOT_FILE, EventLog, replay
+from infrastructure.in_memory_monitored_service_repository import InMemoryMonitoredServiceRepository
+from infrastructure.snapshot_monitored_service_repository import SnapshotMonitoredServiceRepository
+from infrastructure.state_snapshot import SnapshotEscalationPolicyService, write_snapshot
+
+""" Time-to-first-alert benchmark
+Restarts a pager node tracking a fleet (a tenth of it alerting) and measures the time from boot until
+its first alert is handled (notified and escalation armed), with a remote EP Service answering in
+--ep-latency-ms:
+- event_log_replay: in-memory repository rebuilt from the JSON event log snapshot, policies fetched on demand
+- state_snapshot: SnapshotMonitoredServiceRepository memory mapping the columnar snapshot, policies served from it
+
+    python benchmarks/bench_warm_start.py --services 100000,1000000 --ep-latency-ms 20
+"""
+
+
+class RemoteEscalationPolicyService(IEscalationPolicyService):
+    """ EP Service behind a network round trip """
+    def __init__(self, policy: EscalationPolicy, latency: float):
+        self.policy = policy
+        self.latency = latency
+        self.calls = 0
+
+    def get(self, service_id: str) -> EscalationPolicy:
+        self.calls += 1
+        time.sleep(self.latency)
+        return self.policy
+
+
+def state_of(index: int) -> list:
+    if index % 10 == 0:
+        return ['unhealthy', 'Down!', False, 1, 3]
+    return ['healthy', '', False, 0, 1]
+
+
+def build_pager(repository, escalation_service) -> ServicePager:
+    notifications = CountingNotificationService()
+    return ServicePager(
+        timer_system=NullTimerService(),
+        escalation_system=escalation_service,
+        mail_system=notifications,
+        sms_system=notifications,
+        repository=repository
+    )
+
+
+def event_log_replay(directory: str, ids, remote: RemoteEscalationPolicyService) -> Dict:
+    log_directory = os.path.join(directory, 'log')
+    os.makedirs(log_directory)
+    started = time.perf_counter()
+    with open(os.path.join(log_directory, SNAPSHOT_FILE), 'w', encoding='utf-8') as f:
+        json.dump({'seq': len(ids), 'services': {service_id: state_of(i) for i, service_id in enumerate(ids)}, 'timers': {}}, f)
+    written = time.perf_counter() - started
+    size = os.path.getsize(os.path.join(log_directory, SNAPSHOT_FILE))
+
+    booted = time.perf_counter()
+    event_log = EventLog(log_directory)
+    repository = InMemoryMonitoredServiceRepository()
+    replay(event_log, repository, NullTimerService())
+    pager = build_pager(repository, CachedEscalationPolicyService(remote))
+    ready = time.perf_counter()
+    pager.handle_alert(ids[1], 'Down!')
+    alerted = time.perf_counter()
+    event_log.close()
+    return {'write_seconds': written, 'bytes': size, 'boot_ms': (ready - booted) * 1e3, 'first_alert_ms': (alerted - booted) * 1e3}
+
+
+def state_snapshot(directory: str, ids, remote: RemoteEscalationPolicyService) -> Dict:
+    path = os.path.join(directory, 'state.snapshot')
+    fetched_at = time.time()
+    started = time.perf_counter()
+    write_snapshot(path, (
+        (service_id, tuple(state_of(i)), (remote.policy, fetched_at)) for i, service_id in enumerate(ids)
+    ))
+    written = time.perf_counter() - started
+
+    booted = time.perf_counter()
+    repository = SnapshotMonitoredServiceRepository(path)
+    policies = SnapshotEscalationPolicyService(remote, lambda: repository.snapshot)
+    pager = build_pager(repository, CachedEscalationPolicyService(policies))
+    ready = time.perf_counter()
+    pager.handle_alert(ids[1], 'Down!')
+    alerted = time.perf_counter()
+    repository.snapshot.close()
+    return {'write_seconds': written, 'bytes': os.path.getsize(path), 'boot_ms': (ready - booted) * 1e3,
+            'first_alert_ms': (alerted - booted) * 1e3}
+
+
+SCENARIOS = {
+    'event_log_replay': event_log_replay,
+    'state_snapshot': state_snapshot,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--services', type=parse_ints, default=[10_000, 100_000])
+    parser.add_argument('--ep-latency-ms', type=float, default=20.0)
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS))
+    parser.add_argument('--output', help='JSON report path, printed when omitted')
+    args = parser.parse_args()
+
+    results = []
+    for count in args.services:
+        ids = service_ids(count)
+        for name in args.scenarios.split(','):
+            directory = tempfile.mkdtemp(prefix='bench-warm-start-')
+            remote = RemoteEscalationPolicyService(build_policy(3, 2), args.ep_latency_ms / 1e3)
+            try:
+                result = SCENARIOS[name](directory, ids, remote)
+            finally:
+                shutil.rmtree(directory)
+            results.append({'scenario': name, 'services': count, 'ep_calls': remote.calls, **result})
+    write_report('warm_start', results, args.output)
+
+
+if __name__ == '__main__':
+    main()
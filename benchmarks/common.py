@@ -0,0 +1,78 @@
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from typing import Callable, Dict, Iterable, List, Optional
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(os.path.join(ROOT, 'src'))
+
+""" Shared helpers of the benchmark suite: timing, percentiles and JSON reports """
+
+
+def percentile(sorted_samples: List[float], q: float) -> float:
+    """ Nearest-rank percentile of already sorted samples """
+    if not sorted_samples:
+        return 0.0
+    rank = max(0, min(len(sorted_samples) - 1, int(round(q / 100 * len(sorted_samples))) - 1))
+    return sorted_samples[rank]
+
+
+def summarize(samples_ns: List[int], wall_seconds: float) -> Dict[str, float]:
+    """ Latency percentiles (microseconds) and throughput (events per second) """
+    samples = sorted(sample / 1000 for sample in samples_ns)
+    return {
+        'events': len(samples),
+        'throughput': len(samples) / wall_seconds if wall_seconds > 0 else 0.0,
+        'mean_us': sum(samples) / len(samples) if samples else 0.0,
+        'p50_us': percentile(samples, 50),
+        'p90_us': percentile(samples, 90),
+        'p99_us': percentile(samples, 99),
+        'max_us': samples[-1] if samples else 0.0,
+    }
+
+
+def measure(handler: Callable[..., object], calls: Iterable[tuple]) -> Dict[str, float]:
+    """ Time each call of handler individually """
+    samples = []
+    clock = time.perf_counter_ns
+    started = time.perf_counter()
+    for args in calls:
+        before = clock()
+        handler(*args)
+        samples.append(clock() - before)
+    return summarize(samples, time.perf_counter() - started)
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def write_report(name: str, results: List[Dict], output: Optional[str]) -> Dict:
+    """ Write the results with enough context to compare runs across commits """
+    report = {
+        'benchmark': name,
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'timestamp': time.time(),
+        'results': results,
+    }
+    content = json.dumps(report, indent=2)
+    if output:
+        with open(output, 'w') as f:
+            f.write(content + '\n')
+    else:
+        print(content)
+    return report
+
+
+def parse_ints(value: str) -> List[int]:
+    return [int(item) for item in value.split(',') if item]
@@ -0,0 +1,53 @@
+import argparse
+import json
+from typing import Dict, Iterator, Tuple
+
+""" Compare two benchmark reports (e.g. before/after a commit) and flag regressions
+
+    python benchmarks/compare.py baseline.json candidate.json --threshold 10
+"""
+
+METRICS = ('throughput', 'p50_us', 'p99_us')
+# Scenario fields that are outcomes rather than parameters
+OUTCOMES = ('notifications',)
+
+
+def flatten(report: Dict) -> Iterator[Tuple[str, Dict]]:
+    """ (scenario/handler key, summary) pairs of a report """
+    for result in report['results']:
+        scenario = ','.join(
+            f'{key}={value}' for key, value in result.items() if not isinstance(value, dict) and key not in OUTCOMES
+        )
+        for group in ('handlers', 'endpoints', 'events'):
+            for name, summary in result.get(group, {}).items():
+                yield f'{scenario} {name}', summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('baseline')
+    parser.add_argument('candidate')
+    parser.add_argument('--threshold', type=float, default=10.0, help='Regression threshold in percent')
+    args = parser.parse_args()
+
+    with open(args.baseline) as f:
+        baseline = dict(flatten(json.load(f)))
+    with open(args.candidate) as f:
+        candidate = dict(flatten(json.load(f)))
+
+    regressions = 0
+    for key in sorted(baseline.keys() & candidate.keys()):
+        for metric in METRICS:
+            before, after = baseline[key].get(metric), candidate[key].get(metric)
+            if not before or after is None:
+                continue
+            change = (after - before) / before * 100
+            # Throughput regresses when it drops, latencies when they grow
+            regressed = change < -args.threshold if metric == 'throughput' else change > args.threshold
+            regressions += regressed
+            print(f"{'REGRESSION ' if regressed else ''}{key} {metric}: {before:.1f} -> {after:.1f} ({change:+.1f}%)")
+    raise SystemExit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+import threading
+from typing import Dict, List
+
+from application.interfaces.escalation_policy_service import IEscalationPolicyService
+from application.interfaces.mail_service import IMailService
+from application.interfaces.sms_service import ISMSService
+from application.interfaces.time_service import ITimerService
+from domain.models.email_target import EmailTarget
+from domain.models.escalation_policy import EscalationPolicy
+from domain.models.level import Level
+from domain.models.sms_target import SMSTarget
+
+""" Lightweight in-memory adapters for benchmarks: no I/O, no mocks, just counters """
+
+
+class InMemoryEscalationPolicyService(IEscalationPolicyService):
+    def __init__(self, policies: Dict[str, EscalationPolicy] = None, default: EscalationPolicy = None):
+        self.policies = policies or {}
+        self.default = default
+        self.calls = 0
+
+    def get(self, service_id: str) -> EscalationPolicy:
+        self.calls += 1
+        return self.policies.get(service_id, self.default)
+
+
+class CountingNotificationService(IMailService, ISMSService):
+    def __init__(self):
+        self.sent = 0
+        self._lock = threading.Lock()
+
+    def notify(self, target, service, msg: str):
+        with self._lock:
+            self.sent += 1
+
+
+class NullTimerService(ITimerService):
+    def __init__(self):
+        self.armed = 0
+        self.cancelled = 0
+
+    def add_timeout(self, msId: str, minutes: int):
+        self.armed += 1
+
+    def cancel_timeout(self, msId: str):
+        self.cancelled += 1
+
+
+def build_policy(depth: int, targets: int) -> EscalationPolicy:
+    """ A policy of `depth` levels with `targets` targets each, alternating email and SMS """
+    return EscalationPolicy([
+        Level(level, [
+            EmailTarget(f'oncall-{level}-{i}@aircall.com') if i % 2 == 0 else SMSTarget(f'+3360000{level:02d}{i:02d}')
+            for i in range(targets)
+        ])
+        for level in range(depth)
+    ])
+
+
+def service_ids(count: int) -> List[str]:
+    return [f'service-{i}' for i in range(count)]
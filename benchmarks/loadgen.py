@@ -0,0 +1,382 @@
+import argparse
+import http.client
+import json
+import queue
+import random
+import re
+import threading
+import time
+import zlib
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+from common import summarize, write_report
+from fakes import InMemoryEscalationPolicyService, NullTimerService, build_policy
+
+from application.interfaces.mail_service import IMailService
+from application.interfaces.sms_service import ISMSService
+from domain.models.escalation_policy import EscalationPolicy
+from domain.models.monitored_service import MonitoredService
+from domain.services.pager_service import ServicePager
+from infrastructure.in_memory_monitored_service_repository import InMemoryMonitoredServiceRepository
+
+""" Load generator
+Drives incident traffic (alert, acknowledge, healthy and timeout events) through the ServicePager
+in process, or through a running server.py over HTTP, and reports the achieved throughput, latency
+percentiles and escalation correctness.
+
+Events are synthesized (incidents interleaved across services, each escalated, maybe acknowledged,
+then resolved) or replayed from a JSONL file, one event per line:
+    {"t": 0.25, "event": "alert", "service_id": "service-1", "message": "Down!"}
+where t is the offset in seconds of the event in the recording. --scale replays a stream over
+several copies of its services.
+
+Events are paced by an arrival-rate shape: constant (--rate events per second), ramp (from 0 to
+--rate), replay (recorded offsets, sped up by --speed), or unpaced (--rate 0). Latencies are measured
+from the scheduled send time, so a target falling behind shows up in the percentiles. Each service is
+pinned to one of the --concurrency workers, so its events are sent in order.
+
+Correctness: the stream is replayed against a model of the escalation rules. In process, the
+notifications sent per level are compared to the expected ones; over HTTP, the committed transitions
+reported by /metrics are.
+
+    python benchmarks/loadgen.py --services 1000 --incidents 5000 --rate 2000 --concurrency 8
+    python benchmarks/loadgen.py --record storm.jsonl --services 100 --incidents 1000
+    python benchmarks/loadgen.py --replay storm.jsonl --shape replay --speed 10 --url http://localhost:8000
+"""
+
+EVENTS = ('alert', 'acknowledge', 'healthy', 'timeout')
+SHAPES = ('constant', 'ramp', 'replay')
+
+Event = Dict[str, object]
+# Sends an event, returns an HTTP-like status
+Sender = Callable[[Event], int]
+
+
+# ------------ EVENT STREAMS ------------
+
+def synthesize(services: int, incidents: int, escalations: int = 2, ack_ratio: float = 0.5, seed: int = 0) -> List[Event]:
+    """
+    Incidents spread over the services, interleaved at random, each in order:
+    alert, up to `escalations` timeouts, an acknowledgement (then a stale timeout) for ack_ratio of them, healthy
+    """
+    rng = random.Random(seed)
+    per_service: List[List[Event]] = [[] for _ in range(services)]
+    for incident in range(incidents):
+        service_id = f'service-{incident % services}'
+        sequence = [{'event': 'alert', 'service_id': service_id, 'message': f'Incident {incident}'}]
+        sequence += [{'event': 'timeout', 'service_id': service_id}] * rng.randint(0, escalations)
+        if rng.random() < ack_ratio:
+            sequence += [{'event': 'acknowledge', 'service_id': service_id}, {'event': 'timeout', 'service_id': service_id}]
+        sequence.append({'event': 'healthy', 'service_id': service_id})
+        per_service[incident % services].extend(dict(event) for event in sequence)
+
+    # Random merge: the order of each service is kept
+    cursors = [0] * services
+    active = [index for index in range(services) if per_service[index]]
+    events = []
+    while active:
+        position = rng.randrange(len(active))
+        index = active[position]
+        events.append(per_service[index][cursors[index]])
+        cursors[index] += 1
+        if cursors[index] == len(per_service[index]):
+            active[position] = active[-1]
+            active.pop()
+    return events
+
+
+def load_events(path: str) -> List[Event]:
+    events = []
+    with open(path, encoding='utf-8') as f:
+        for number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            event = json.loads(line)
+            if event.get('event') not in EVENTS or not event.get('service_id'):
+                raise ValueError(f"{path}:{number}: invalid event {line.strip()}")
+            events.append(event)
+    return events
+
+
+def save_events(path: str, events: List[Event]):
+    with open(path, 'w', encoding='utf-8') as f:
+        for event in events:
+            f.write(json.dumps(event) + '\n')
+
+
+def scale(events: List[Event], copies: int) -> List[Event]:
+    """ The stream over `copies` disjoint copies of its services, copies interleaved in time """
+    if copies <= 1:
+        return events
+    return [
+        {**event, 'service_id': f"{event['service_id']}-{copy}"}
+        for event in events
+        for copy in range(copies)
+    ]
+
+
+def schedule(events: List[Event], shape: str, rate: float, speed: float = 1.0) -> List[float]:
+    """ Send offset in seconds of each event, all zero when unpaced """
+    if shape == 'replay':
+        if any('t' not in event for event in events):
+            raise ValueError("The events have no 't' offsets, use another shape")
+        origin = min(float(event['t']) for event in events) if events else 0.0
+        return [(float(event['t']) - origin) / speed for event in events]
+    if rate <= 0:
+        return [0.0] * len(events)
+    if shape == 'ramp':
+        # Rate grows linearly from 0 to `rate`: the i-th event is sent once the area under the ramp reaches i
+        duration = 2 * len(events) / rate
+        return [duration * (index / len(events)) ** 0.5 for index in range(len(events))]
+    return [index / rate for index in range(len(events))]
+
+
+# ------------ EXPECTATIONS ------------
+
+def expected_outcome(events: List[Event], policy: EscalationPolicy) -> Tuple[Dict[int, int], Dict[str, int]]:
+    """
+    Replay the stream against the escalation rules of the ServicePager
+    :return: Notifications expected per level, and committed transitions expected per event
+    """
+    last_level = len(policy.levels) - 1
+    states: Dict[str, Tuple[bool, bool, int]] = {}  # Service ID -> (unhealthy, acknowledged, level)
+    notifications = {level.level: 0 for level in policy.levels}
+    transitions = {event: 0 for event in EVENTS}
+    for event in events:
+        unhealthy, acknowledged, level = states.get(event['service_id'], (False, False, 0))
+        kind = event['event']
+        if kind == 'alert' and not unhealthy:
+            unhealthy, acknowledged, level = True, False, 0
+            notifications[policy.levels[0].level] += len(policy.levels[0].targets)
+        elif kind == 'timeout' and unhealthy and not acknowledged and level < last_level:
+            level += 1
+            notifications[policy.levels[level].level] += len(policy.levels[level].targets)
+        elif kind == 'acknowledge' and unhealthy:
+            acknowledged = True
+        elif kind == 'healthy':
+            unhealthy, acknowledged, level = False, False, 0
+        else:
+            continue
+        transitions[kind] += 1
+        states[event['service_id']] = (unhealthy, acknowledged, level)
+    return notifications, transitions
+
+
+# ------------ TARGETS ------------
+
+class LevelCountingNotificationService(IMailService, ISMSService):
+    """ Counts notifications per escalation level of their target """
+    def __init__(self, policy: EscalationPolicy):
+        self.levels = {(type(target), target.channel, tuple(sorted(vars(target).items()))): level.level
+                       for level in policy.levels for target in level.targets}
+        self.sent = {level.level: 0 for level in policy.levels}
+        self._lock = threading.Lock()
+
+    def notify(self, target, service, msg: str):
+        level = self.levels[(type(target), target.channel, tuple(sorted(vars(target).items())))]
+        with self._lock:
+            self.sent[level] += 1
+
+
+def pager_target(events: List[Event], policy: EscalationPolicy):
+    """ ServicePager with in-memory adapters, timeouts only come from the stream """
+    ids = sorted({event['service_id'] for event in events})
+    notifications = LevelCountingNotificationService(policy)
+    pager = ServicePager(
+        timer_system=NullTimerService(),
+        escalation_system=InMemoryEscalationPolicyService(default=policy),
+        mail_system=notifications,
+        sms_system=notifications,
+        repository=InMemoryMonitoredServiceRepository([MonitoredService(service_id) for service_id in ids])
+    )
+    handlers = {
+        'alert': lambda event: pager.handle_alert(event['service_id'], event.get('message', 'Down!')),
+        'acknowledge': lambda event: pager.handle_acknowledge(event['service_id']),
+        'healthy': lambda event: pager.handle_healthy(event['service_id']),
+        'timeout': lambda event: pager.handle_timeout(event['service_id']),
+    }
+
+    def send(event: Event) -> int:
+        try:
+            handlers[event['event']](event)
+        except Exception:
+            return 500
+        return 200
+
+    return send, lambda: {'notifications': dict(notifications.sent)}
+
+
+def http_target(url: str, tenant: Optional[str] = None):
+    """ A running server.py; its services must exist """
+    target = urlparse(url)
+    local = threading.local()
+    headers = {'Content-Type': 'application/json'}
+    if tenant:
+        headers['X-Pager-Tenant'] = tenant
+
+    def request(method: str, path: str, body: Optional[dict] = None) -> Tuple[int, bytes]:
+        connection = getattr(local, 'connection', None)
+        if connection is None:
+            connection = local.connection = http.client.HTTPConnection(target.hostname, target.port or 80)
+        try:
+            connection.request(method, path, body=json.dumps(body) if body is not None else '', headers=headers)
+            response = connection.getresponse()
+            return response.status, response.read()
+        except (OSError, http.client.HTTPException):
+            local.connection = None
+            connection.close()
+            return 599, b''
+
+    def send(event: Event) -> int:
+        kind, service_id = event['event'], event['service_id']
+        if kind == 'alert':
+            return request('POST', '/alert', {'service_id': service_id, 'message': event.get('message', 'Down!')})[0]
+        path = {'acknowledge': '/acknowledge', 'healthy': '/health', 'timeout': '/timeout'}[kind]
+        return request('POST', f'{path}/{service_id}')[0]
+
+    def transitions() -> Optional[Dict[str, float]]:
+        status, body = request('GET', '/metrics')
+        if status != 200:
+            return None
+        counts = {event: 0.0 for event in EVENTS}
+        for match in re.finditer(r'^pager_transitions_total\{event="(\w+)"\} (\S+)$', body.decode(), re.MULTILINE):
+            counts[match.group(1)] = float(match.group(2))
+        return counts
+
+    baseline = transitions()
+
+    def outcome() -> Dict:
+        current = transitions()
+        if baseline is None or current is None:
+            return {}
+        return {'transitions': {event: current[event] - baseline[event] for event in EVENTS}}
+
+    return send, outcome
+
+
+# ------------ DRIVER ------------
+
+def run(events: List[Event], offsets: List[float], send: Sender, concurrency: int) -> Dict:
+    """ Send the events at their offsets from `concurrency` workers, each service pinned to a worker """
+    queues = [queue.Queue(1024) for _ in range(concurrency)]
+    latencies: Dict[str, List[int]] = {event: [] for event in EVENTS}
+    service_times: List[int] = []
+    errors = {event: 0 for event in EVENTS}
+    lock = threading.Lock()
+
+    def worker(inbox: queue.Queue):
+        while True:
+            item = inbox.get()
+            if item is None:
+                return
+            event, scheduled = item
+            before = time.perf_counter_ns()
+            status = send(event)
+            after = time.perf_counter_ns()
+            with lock:
+                latencies[event['event']].append(after - scheduled)
+                service_times.append(after - before)
+                if status >= 400:
+                    errors[event['event']] += 1
+
+    threads = [threading.Thread(target=worker, args=(inbox,), daemon=True) for inbox in queues]
+    for thread in threads:
+        thread.start()
+
+    # Unpaced: latencies start when the event is handed to its worker
+    paced = any(offsets)
+    started_ns = time.perf_counter_ns()
+    started = time.perf_counter()
+    for event, offset in zip(events, offsets):
+        delay = started + offset - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        scheduled = started_ns + int(offset * 1e9) if paced else time.perf_counter_ns()
+        queues[zlib.crc32(event['service_id'].encode()) % concurrency].put((event, scheduled))
+    for inbox in queues:
+        inbox.put(None)
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    every = [sample for samples in latencies.values() for sample in samples]
+    summary = summarize(every, elapsed)
+    service = summarize(service_times, elapsed)
+    return {
+        'achieved_throughput': summary['throughput'],
+        'latency': {key: value for key, value in summary.items() if key.endswith('_us')},
+        'service_time': {key: value for key, value in service.items() if key.endswith('_us')},
+        'errors': sum(errors.values()),
+        'events': {event: {**summarize(samples, elapsed), 'errors': errors[event]} for event, samples in latencies.items() if samples},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--replay', help='JSONL event stream to replay instead of synthesizing one')
+    parser.add_argument('--record', help='Write the event stream to this JSONL file and exit')
+    parser.add_argument('--services', type=int, default=1000, help='Services of a synthesized stream')
+    parser.add_argument('--incidents', type=int, default=5000, help='Incidents of a synthesized stream')
+    parser.add_argument('--escalations', type=int, default=2, help='Maximum timeouts per synthesized incident')
+    parser.add_argument('--ack-ratio', type=float, default=0.5, help='Share of synthesized incidents acknowledged')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--scale', type=int, default=1, help='Copies of the services of the stream')
+    parser.add_argument('--shape', choices=SHAPES, default='constant')
+    parser.add_argument('--rate', type=float, default=0, help='Target events per second, 0 to send as fast as possible')
+    parser.add_argument('--speed', type=float, default=1.0, help='Replay speed-up of the recorded offsets')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--depth', type=int, default=3, help='Levels of the in-process escalation policy')
+    parser.add_argument('--targets', type=int, default=2, help='Targets per level of the in-process escalation policy')
+    parser.add_argument('--url', help='Base URL of a running server, e.g. http://localhost:8000')
+    parser.add_argument('--tenant', help='Tenant of the HTTP events (X-Pager-Tenant)')
+    parser.add_argument('--output', help='JSON report path, printed when omitted')
+    args = parser.parse_args()
+
+    if args.replay:
+        events = load_events(args.replay)
+    else:
+        events = synthesize(args.services, args.incidents, args.escalations, args.ack_ratio, args.seed)
+    events = scale(events, args.scale)
+    if args.record:
+        save_events(args.record, events)
+        return
+
+    policy = build_policy(args.depth, args.targets)
+    expected_notifications, expected_transitions = expected_outcome(events, policy)
+    if args.url:
+        send, outcome = http_target(args.url, args.tenant)
+    else:
+        send, outcome = pager_target(events, policy)
+
+    result = run(events, schedule(events, args.shape, args.rate, args.speed), send, max(1, args.concurrency))
+    actual = outcome()
+    correctness: Dict[str, object] = {}
+    if 'notifications' in actual:
+        correctness = {
+            'expected_notifications': expected_notifications,
+            'notifications': actual['notifications'],
+            'correct': actual['notifications'] == expected_notifications,
+        }
+    elif 'transitions' in actual:
+        # Alerts may also be dropped by the server suppressor
+        correctness = {
+            'expected_transitions': expected_transitions,
+            'transitions': actual['transitions'],
+            'correct': actual['transitions'] == {event: float(count) for event, count in expected_transitions.items()},
+        }
+    write_report('loadgen', [{
+        'target': args.url or 'in-process',
+        'stream': args.replay or 'synthesized',
+        'event_count': len(events),
+        'services': len({event['service_id'] for event in events}),
+        'shape': args.shape if args.rate > 0 or args.shape == 'replay' else 'unpaced',
+        'rate': args.rate,
+        'concurrency': args.concurrency,
+        **result,
+        'correctness': correctness,
+    }], args.output)
+
+
+if __name__ == '__main__':
+    main()
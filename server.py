@@ -1,53 +1,455 @@
 import sys, os
-from fastapi import FastAPI, HTTPException, Path
+import asyncio
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, List, Optional
+import json
+from fastapi import Depends, FastAPI, Header, HTTPException, Path, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from starlette.requests import ClientDisconnect
 sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
-print(sys.path)
-from src.domain.services.pager_service import ServicePager
-from src.domain.models.alert import Alert
+from domain.services.pager_service import ServicePager
+from domain.services.async_pager_service import AsyncServicePager
+from domain.services.delivery_service import DeliveryService
+from domain.services.sharded_event_engine import EVENT_HANDLERS, ShardedEventEngine
+from domain.services.tenant_host import TenantHost
+from domain.services.fair_queue import TenantQueueFullError
+from domain.services.alert_suppressor import AlertSuppressor
+from domain.services.stream_ingest import StreamIngestor
+from domain.models.monitored_service import MonitoredService
+from infrastructure.http_schemas import Alert
+from infrastructure.cached_escalation_policy_service import CachedEscalationPolicyService
+from infrastructure.static_escalation_policy_service import StaticEscalationPolicyService
+from infrastructure.logging_notification_service import LoggingNotificationService
+from infrastructure.event_log import EventLog, JournaledTimerService, replay
+from infrastructure.incident_history_store import IncidentHistoryStore
+from infrastructure.async_adapters import (
+    AsyncEscalationPolicyServiceAdapter, AsyncMailServiceAdapter, AsyncMonitoredServiceRepositoryAdapter,
+    AsyncSMSServiceAdapter, AsyncTimerServiceAdapter
+)
+# Optional adapters (Redis timer, SQLite or snapshot repository, Prometheus, profiler) are imported
+# by the configuration that enables them, keeping the startup of the other processes short
 
 
 app = FastAPI()
 
 
+# Policies known upfront (PAGER_POLICIES=policies.json) until the EP Service is wired,
+# notifications are logged until the mail and SMS providers are
+policy_source_path = os.environ.get('PAGER_POLICIES')
+
+def build_policy_source() -> StaticEscalationPolicyService:
+    if policy_source_path:
+        return StaticEscalationPolicyService.from_file(policy_source_path)
+    return StaticEscalationPolicyService()
+
+def register_services(target_repository, service_ids: List[str]) -> List[str]:
+    """ Store the monitored services not known yet, healthy; returns the IDs registered """
+    service_ids = list(dict.fromkeys(service_ids))
+    known = target_repository.get_many(service_ids)
+    missing = [MonitoredService(service_id) for service_id in service_ids if service_id not in known]
+    if missing:
+        target_repository.save_many(missing)
+    return [service.id for service in missing]
+
+def incident_open(target_repository) -> Callable[[str], bool]:
+    """ Whether the incident of a service still needs its deliveries: unhealthy and not acknowledged """
+    def is_open(service_id: str) -> bool:
+        service = target_repository.get(service_id)
+        return service is not None and service.status == 'unhealthy' and not service.acknowledged
+    return is_open
+
+# Timeouts shared by several pager nodes on a Redis server (host:port), in-process otherwise
+redis_timer_address = os.environ.get('PAGER_TIMER_REDIS')
+if redis_timer_address:
+    from infrastructure.redis_timer_service import RedisTimerService
+    from infrastructure.resp_client import RespClient
+    redis_host, _, redis_port = redis_timer_address.partition(':')
+    timer_service = RedisTimerService(RespClient(redis_host, int(redis_port or 6379)))
+else:
+    from infrastructure.timing_wheel_timer_service import TimingWheelTimerService
+    timer_service = TimingWheelTimerService()
+log_directory = os.environ.get('PAGER_LOG_DIR', 'pager-log')
+event_log = EventLog(log_directory)
+# Warm start from a memory mapped state snapshot (PAGER_STATE_SNAPSHOT=path) instead of SQLite,
+# rewritten every PAGER_STATE_SNAPSHOT_INTERVAL seconds with the cached policies
+state_snapshot_path = os.environ.get('PAGER_STATE_SNAPSHOT')
+snapshot_repository = None
+if state_snapshot_path:
+    from infrastructure.snapshot_monitored_service_repository import SnapshotMonitoredServiceRepository
+    from infrastructure.state_snapshot import SnapshotEscalationPolicyService
+    repository = snapshot_repository = SnapshotMonitoredServiceRepository(
+        state_snapshot_path, interval=float(os.environ.get('PAGER_STATE_SNAPSHOT_INTERVAL', 60))
+    )
+    escalation_service = CachedEscalationPolicyService(
+        SnapshotEscalationPolicyService(build_policy_source(), lambda: snapshot_repository.snapshot)
+    )
+    snapshot_repository.policies = escalation_service.policies
+else:
+    from infrastructure.sqlite_monitored_service_repository import SQLiteMonitoredServiceRepository
+    repository = SQLiteMonitoredServiceRepository(os.environ.get('PAGER_DB_PATH', 'pager.db'))
+    escalation_service = CachedEscalationPolicyService(build_policy_source())
+mail_service = LoggingNotificationService('mail')
+sms_service = LoggingNotificationService('sms')
+journaled_timer = JournaledTimerService(timer_service, event_log)
+suppressor = AlertSuppressor()
+# Incidents of the default pager, queried on /incidents; MTTA/MTTR rolled up per PAGER_HISTORY_BUCKET seconds
+incident_history = IncidentHistoryStore(
+    os.path.join(log_directory, 'history'), bucket_seconds=float(os.environ.get('PAGER_HISTORY_BUCKET', 3600))
+)
+
+# Instrumentation: nothing is wrapped when disabled (PAGER_METRICS=0)
+metrics = None
+profiler = None
+if os.environ.get('PAGER_METRICS', '1') != '0':
+    from domain.services.instrumentation import (
+        InstrumentedEscalationPolicyService, InstrumentedMonitoredServiceRepository, InstrumentedNotificationService,
+        InstrumentedTimerService, instrument_handlers
+    )
+    from infrastructure.prometheus_metrics import PrometheusMetrics
+    metrics = PrometheusMetrics()
+    # Profile one handler call out of PAGER_PROFILE_EVERY, disabled when unset
+    profile_every = int(os.environ.get('PAGER_PROFILE_EVERY', 0))
+    if profile_every:
+        from infrastructure.profiling import CProfileHook
+        profiler = CProfileHook(profile_every)
+    repository = InstrumentedMonitoredServiceRepository(repository, metrics)
+    escalation_service = InstrumentedEscalationPolicyService(escalation_service, metrics)
+    mail_service = InstrumentedNotificationService(mail_service, metrics, 'mail')
+    sms_service = InstrumentedNotificationService(sms_service, metrics, 'sms')
+    journaled_timer = InstrumentedTimerService(journaled_timer, metrics)
 
-# Custom adapters for your system
-# Mocked for now
-from unittest.mock import MagicMock
+# Deliveries are queued and retried per channel, pending ones are saved on shutdown; retries of
+# acknowledged or recovered incidents are dropped.
+# Blocking senders: the async pager binds awaitable ones into its policies
+delivery_service = DeliveryService(
+    state_path=os.path.join(log_directory, 'deliveries.json'),
+    senders={'mail': mail_service, 'sms': sms_service},
+    call_timeout=float(os.environ.get('PAGER_SEND_TIMEOUT', 30)),
+    is_open=incident_open(repository)
+)
 
+# Alerts and acks go through the async pager, timeouts and streams through the engine pager: the
+# policies of the open incidents are shared, so a timeout escalates without fetching its policy again
+incident_policies = {}
 pager_service = ServicePager(
-    escalation_system = MagicMock(),
-    mail_system=MagicMock(),
-    sms_system=MagicMock(),
-    timer_system=MagicMock(),
-    repository=MagicMock()
+    escalation_system = escalation_service,
+    mail_system=mail_service,
+    sms_system=sms_service,
+    timer_system=journaled_timer,
+    repository=repository,
+    notifier=delivery_service,
+    event_log=event_log,
+    suppressor=suppressor,
+    metrics=metrics,
+    history=incident_history,
+    incident_policies=incident_policies
+)
+# HTTP events: blocking adapter calls run in this pool, never on the event loop
+io_executor = ThreadPoolExecutor(max_workers=int(os.environ.get('PAGER_IO_THREADS', 64)), thread_name_prefix='pager-io')
+async_pager_service = AsyncServicePager(
+    escalation_system=AsyncEscalationPolicyServiceAdapter(escalation_service, io_executor),
+    mail_system=AsyncMailServiceAdapter(mail_service, io_executor),
+    sms_system=AsyncSMSServiceAdapter(sms_service, io_executor),
+    timer_system=AsyncTimerServiceAdapter(journaled_timer, io_executor),
+    repository=AsyncMonitoredServiceRepositoryAdapter(repository, io_executor),
+    notifier=delivery_service,
+    event_log=event_log,
+    suppressor=suppressor,
+    metrics=metrics,
+    history=incident_history,
+    incident_policies=incident_policies
+)
+if metrics:
+    instrument_handlers(pager_service, metrics, profiler)
+    instrument_handlers(async_pager_service, metrics, profiler)
+# Timeouts: events of a service are processed in order by its shard
+event_engine = ShardedEventEngine(lambda: pager_service, shards=int(os.environ.get('PAGER_SHARDS', 0)) or None)
+# Streamed events (/stream) go through the engine too, PAGER_STREAM_BATCH events per acknowledged batch
+# and PAGER_STREAM_IN_FLIGHT unacknowledged batches per connection
+stream_ingestor = StreamIngestor(
+    event_engine,
+    batch_size=int(os.environ.get('PAGER_STREAM_BATCH', 1000)),
+    max_in_flight=int(os.environ.get('PAGER_STREAM_IN_FLIGHT', 8)),
+    executor=io_executor
+)
+
+# Tenants (X-Pager-Tenant header or /tenants/{tenant} prefix): one pager each, with its own
+# repository, policy cache, event log, delivery lanes and timer namespace. PAGER_TENANTS='team-a:3,team-b:1'
+# restricts the tenants and sets their weights; when unset, up to PAGER_MAX_TENANTS tenants are
+# accepted with weight 1
+tenant_weights = {
+    name: float(weight or 1)
+    for name, _, weight in (entry.strip().partition(':') for entry in os.environ.get('PAGER_TENANTS', '').split(','))
+    if name
+}
+max_tenants = len(tenant_weights) or int(os.environ.get('PAGER_MAX_TENANTS', 64))
+tenant_logs = {}
+tenant_deliveries = {}
+
+def build_tenant_pager(tenant: str, tenant_timer) -> ServicePager:
+    if tenant_weights and tenant not in tenant_weights:
+        raise ValueError(f"Unknown tenant '{tenant}'")
+    from infrastructure.sqlite_monitored_service_repository import SQLiteMonitoredServiceRepository
+    tenant_directory = os.path.join(log_directory, 'tenants', tenant)
+    tenant_log = tenant_logs[tenant] = EventLog(tenant_directory)
+    tenant_repository = SQLiteMonitoredServiceRepository(os.path.join(tenant_directory, 'pager.db'))
+    tenant_timer = JournaledTimerService(tenant_timer, tenant_log)
+    replay(tenant_log, tenant_repository, tenant_timer)
+    tenant_policies = build_policy_source()
+    register_services(tenant_repository, list(tenant_policies.policies))
+    # Own lanes: a tenant paging a lot only queues behind its own deliveries
+    tenant_delivery = tenant_deliveries[tenant] = DeliveryService(
+        channel_workers={'mail': 1, 'sms': 1},
+        state_path=os.path.join(tenant_directory, 'deliveries.json'),
+        senders={'mail': mail_service, 'sms': sms_service},
+        call_timeout=delivery_service.call_timeout,
+        is_open=incident_open(tenant_repository)
+    )
+    tenant_delivery.start()
+    return ServicePager(
+        escalation_system=CachedEscalationPolicyService(tenant_policies),
+        mail_system=mail_service,
+        sms_system=sms_service,
+        timer_system=tenant_timer,
+        repository=tenant_repository,
+        notifier=tenant_delivery,
+        event_log=tenant_log,
+        metrics=metrics
+    )
+
+tenant_host = TenantHost(
+    build_tenant_pager,
+    weights=tenant_weights,
+    shards=int(os.environ.get('PAGER_TENANT_SHARDS', 4)),
+    timer_service=timer_service,
+    max_tenants=max_tenants
 )
 
+def expire_timeouts(keys: List[str]) -> List[Future]:
+    """
+    Timer service handler: expired timeouts are routed to their tenant pager, or to the engine in one batch per shard
+    :return: Future of each timeout, a RedisTimerService only releases the leases of the handled ones
+    """
+    others, futures = tenant_host.route_timeouts(keys)
+    futures.update(zip(others, event_engine.timeouts(others)))
+    return [futures[key] for key in keys]
+
+timer_service.on_expire = expire_timeouts
+
+if metrics:
+    metrics.add_collector(lambda: [
+        ('pager_engine_queue_depth', {'shard': str(shard)}, stats['queue_depth'])
+        for shard, stats in enumerate(event_engine.metrics()['shards'])
+    ])
+    metrics.add_collector(lambda: [
+        ('pager_pending_deliveries', {'channel': channel}, stats['pending'])
+        for channel, stats in delivery_service.stats()['channels'].items()
+    ])
+
+@app.on_event("startup")
+def start_timer():
+    # Re-arm the timeouts pending when the previous process stopped
+    replay(event_log, repository, timer_service)
+    # The services of the policy file are monitored from the start, others are registered on POST /services
+    register_services(repository, list(build_policy_source().policies))
+    if snapshot_repository is not None:
+        snapshot_repository.start()
+    delivery_service.start()
+    event_engine.start()
+    tenant_host.start()
+    timer_service.start()
+
+@app.on_event("shutdown")
+def stop_timer():
+    timer_service.stop()
+    event_engine.stop()
+    tenant_host.stop()
+    io_executor.shutdown(wait=True)
+    delivery_service.stop()
+    for tenant_delivery in tenant_deliveries.values():
+        tenant_delivery.stop()
+    if snapshot_repository is not None:
+        snapshot_repository.stop()
+    event_log.close()
+    incident_history.close()
+    for tenant_log in tenant_logs.values():
+        tenant_log.close()
+
+
+def tenant_of(request: Request, x_pager_tenant: Optional[str] = Header(None)) -> Optional[str]:
+    """ Tenant of a request: the /tenants/{tenant} prefix, else the X-Pager-Tenant header """
+    return request.path_params.get('tenant') or x_pager_tenant
+
+
+async def handle_event(tenant: Optional[str], event: str, service_id: str, *args):
+    """ Events without a tenant go to the default pager, the others through the fair queues of their tenant """
+    try:
+        if tenant is None:
+            return await getattr(async_pager_service, EVENT_HANDLERS[event])(service_id, *args)
+        if tenant not in tenant_host.tenants:
+            # First event of the tenant: its pager is built (database, log replay) off the event loop
+            await asyncio.get_running_loop().run_in_executor(io_executor, tenant_host.pager, tenant)
+        return await asyncio.wrap_future(tenant_host.submit(tenant, event, service_id, *args))
+    except TenantQueueFullError as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    except ValueError as e:
+        # Unknown tenant or service
+        raise HTTPException(status_code=404, detail=str(e))
+
+
+@app.post("/services/{service_id}")
+async def register_service(service_id: str):
+    """ Monitor a service of the default pager, healthy until its first alert """
+    registered = await asyncio.get_running_loop().run_in_executor(io_executor, register_services, repository, [service_id])
+    return {"message": "Service registered" if registered else "Service already registered"}
+
+
 @app.post('/alert')
-def receive_alert(alert: Alert):
+@app.post('/tenants/{tenant}/alert')
+async def receive_alert(alert: Alert, tenant: Optional[str] = Depends(tenant_of)):
     # TODO
-    pager_service.handle_alert(alert.service_id, alert.message)
+    await handle_event(tenant, 'alert', alert.service_id, alert.message)
     return {"message": "Alert received"}
 
 
+@app.post('/alerts')
+@app.post('/tenants/{tenant}/alerts')
+async def receive_alerts(alerts: List[Alert], tenant: Optional[str] = Depends(tenant_of)):
+    """ Alerts of unknown services are reported in missing, the others are processed """
+    try:
+        if tenant is None:
+            batch = await async_pager_service.handle_alerts([(alert.service_id, alert.message) for alert in alerts])
+            return {"message": "Alerts received", "alerted": batch.alerted, "missing": batch.missing}
+        await asyncio.gather(*(handle_event(tenant, 'alert', alert.service_id, alert.message) for alert in alerts))
+    except ValueError as e:
+        # Missing policy
+        raise HTTPException(status_code=404, detail=str(e))
+    return {"message": "Alerts received", "alerted": None}
+
+
 @app.post("/health/{service_id}")
-async def service_health(service_id: str):
+@app.post("/tenants/{tenant}/health/{service_id}")
+async def service_health(service_id: str, tenant: Optional[str] = Depends(tenant_of)):
     # TODO
-    pager_service.mark_service_healthy(service_id)
+    await handle_event(tenant, 'healthy', service_id)
     return {"message": "Service marked as healthy"}
 
 @app.post("/acknowledge/{service_id}")
-async def acknowledge_alert(service_id: str):
+@app.post("/tenants/{tenant}/acknowledge/{service_id}")
+async def acknowledge_alert(service_id: str, tenant: Optional[str] = Depends(tenant_of)):
     # TODO
-    pager_service.acknowledge_alert(service_id)
+    await handle_event(tenant, 'acknowledge', service_id)
     return {"message": "Alert acknowledged"}
 
 @app.post("/timeout/{service_id}")
-async def timeout(service_id: str):
+@app.post("/tenants/{tenant}/timeout/{service_id}")
+async def timeout(service_id: str, tenant: Optional[str] = Depends(tenant_of)):
     # TODO
-    pager_service.handle_timeout(service_id)
+    await handle_event(tenant, 'timeout', service_id)
     return {"message": "Timeout handled"}
 
 
+class DuplexStreamingResponse(StreamingResponse):
+    """
+    Streams while the request body is still read. Before ASGI 2.4, StreamingResponse listens for a
+    disconnect on receive, consuming the body: like it does on 2.4 servers, a client gone fails a send instead
+    """
+    async def __call__(self, scope, receive, send):
+        try:
+            await self.stream_response(send)
+        except OSError:
+            raise ClientDisconnect()
+        if self.background is not None:
+            await self.background()
+
+
+@app.post("/stream")
+async def stream_events(request: Request):
+    """ Chunked NDJSON upload of events, answered with the NDJSON acknowledgements of its batches """
+    async def acknowledgements():
+        async for ack in stream_ingestor.ingest(request.stream()):
+            yield json.dumps(ack) + '\n'
+    return DuplexStreamingResponse(acknowledgements(), media_type='application/x-ndjson')
+
+
+@app.websocket("/stream")
+async def stream_events_websocket(websocket: WebSocket):
+    """ Each message holds NDJSON events, each batch is acknowledged by a JSON message """
+    await websocket.accept()
+
+    async def messages():
+        while True:
+            try:
+                message = await websocket.receive_text()
+            except WebSocketDisconnect:
+                return
+            # A message ends its last line
+            yield message if message.endswith('\n') else message + '\n'
+
+    try:
+        async for ack in stream_ingestor.ingest(messages()):
+            await websocket.send_json(ack)
+    except WebSocketDisconnect:
+        # The remaining events are still processed
+        pass
+
+
+# The history queries block on SQLite: plain functions, run by FastAPI in its thread pool
+
+@app.get("/incidents")
+def list_incidents(service_id: Optional[str] = None, since: Optional[float] = None,
+                   until: Optional[float] = None, limit: int = 100):
+    return incident_history.incidents(service_id, since, until, limit)
+
+
+@app.get("/incidents/events")
+def list_incident_events(service_id: Optional[str] = None, target: Optional[str] = None,
+                         since: Optional[float] = None, until: Optional[float] = None, limit: int = 100):
+    return incident_history.events(service_id, target, since=since, until=until, limit=limit)
+
+
+@app.get("/incidents/stats")
+def incident_stats(service_id: Optional[str] = None, since: Optional[float] = None, until: Optional[float] = None):
+    return incident_history.stats(service_id, since, until)
+
+
+@app.get("/incidents/{incident_id}")
+def get_incident(incident_id: int):
+    incident = incident_history.incident(incident_id)
+    if incident is None:
+        raise HTTPException(status_code=404, detail=f"Missing incident {incident_id}")
+    return incident
+
+
+@app.get("/engine/metrics")
+async def engine_metrics():
+    return event_engine.metrics()
+
+
+@app.get("/tenants/metrics")
+async def tenant_metrics():
+    return tenant_host.metrics()
+
+
+@app.get("/deliveries/metrics")
+async def delivery_metrics():
+    return delivery_service.stats()
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    if not metrics:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    return PlainTextResponse(metrics.render(), media_type='text/plain; version=0.0.4')
+
+
+@app.get("/debug/profile", response_class=PlainTextResponse)
+async def profile_report():
+    if not profiler:
+        raise HTTPException(status_code=404, detail="Profiling is disabled, set PAGER_PROFILE_EVERY")
+    return profiler.report()
+
+
 
 if __name__ == "__main__":
     import uvicorn
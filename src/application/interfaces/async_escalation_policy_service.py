@@ -0,0 +1,7 @@
+from abc import ABC, abstractmethod
+from domain.models.escalation_policy import EscalationPolicy
+
+class IAsyncEscalationPolicyService(ABC):
+    @abstractmethod
+    async def get(self, service_id: str) -> EscalationPolicy:
+        pass
\ No newline at end of file
@@ -0,0 +1,39 @@
+from abc import ABC, abstractmethod
+from typing import Dict, Iterable, List
+from domain.models.monitored_service import MonitoredService
+
+
+class IAsyncMonitoredServiceRepository(ABC):
+
+    @abstractmethod
+    async def save(self, service: MonitoredService) -> MonitoredService:
+        """
+        Compare-and-swap, same semantics as IMonitoredServiceRepository.save
+        :raises ConcurrentModificationError: the service was modified since it was read
+        """
+        pass
+
+    @abstractmethod
+    async def get(self, service_id: str) -> MonitoredService:
+        pass
+
+    async def get_many(self, service_ids: Iterable[str]) -> Dict[str, MonitoredService]:
+        """
+        Bulk read. Adapters should override it with a single round-trip to the database.
+        :param service_ids: IDs of the monitored services
+        :return: Found monitored services by ID, missing ones are left out
+        """
+        services = {}
+        for service_id in service_ids:
+            service = await self.get(service_id)
+            if service:
+                services[service_id] = service
+        return services
+
+    async def save_many(self, services: List[MonitoredService]) -> List[MonitoredService]:
+        """
+        Bulk write. Adapters should override it with a single all-or-nothing transaction,
+        with the same compare-and-swap semantics as save.
+        :param services: Monitored services to save
+        """
+        return [await self.save(service) for service in services]
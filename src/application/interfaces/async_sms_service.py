@@ -0,0 +1,14 @@
+from abc import ABC, abstractmethod
+from domain.models.target import Target
+from domain.models.monitored_service import MonitoredService
+
+class IAsyncSMSService(ABC):
+    @abstractmethod
+    async def notify(self, target: Target, service: MonitoredService, msg: str):
+        """
+        Send an SMS notification
+        :param target: The notified SMS target
+        :param service: The alerting monitored service
+        :param msg: The alert message
+        """
+        pass
\ No newline at end of file
@@ -0,0 +1,14 @@
+from abc import ABC, abstractmethod
+
+class IAsyncTimerService(ABC):
+    @abstractmethod
+    async def add_timeout(self, msId: str, minutes: int):
+        pass
+
+    @abstractmethod
+    async def cancel_timeout(self, msId: str):
+        """
+        Drop the pending acknowledgement timeout of a Monitored Service, if any
+        :param msId: ID of the monitored service
+        """
+        pass
\ No newline at end of file
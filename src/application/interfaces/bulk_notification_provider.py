@@ -0,0 +1,11 @@
+from abc import ABC, abstractmethod
+from typing import List, Tuple
+
+class IBulkNotificationProvider(ABC):
+    @abstractmethod
+    def send_bulk(self, messages: List[Tuple[str, str]]):
+        """
+        Send many messages with a single provider API call
+        :param messages: (recipient, body) pairs, the recipient being an email address or a phone number
+        """
+        pass
\ No newline at end of file
@@ -0,0 +1,22 @@
+from abc import ABC, abstractmethod
+from typing import List, Optional
+from domain.models.monitored_service import MonitoredService
+
+class IEventLog(ABC):
+    @abstractmethod
+    def record(self, event: str, services: List[MonitoredService]):
+        """
+        Durably record the committed state of monitored services after an event
+        :param event: 'alert', 'acknowledge', 'healthy' or 'timeout'
+        :param services: Monitored services the event changed
+        """
+        pass
+
+    @abstractmethod
+    def record_timer(self, service_id: str, due: Optional[float]):
+        """
+        Durably record the acknowledgement timeout of a monitored service
+        :param service_id: ID of the monitored service
+        :param due: Expiration as a UNIX timestamp, None when the timeout is cancelled
+        """
+        pass
\ No newline at end of file
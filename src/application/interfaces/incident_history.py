@@ -0,0 +1,21 @@
+from abc import ABC, abstractmethod
+from typing import List
+from domain.models.monitored_service import MonitoredService
+
+class IIncidentHistory(ABC):
+    @abstractmethod
+    def record(self, event: str, services: List[MonitoredService]):
+        """
+        Record the committed transitions of monitored services in their incident history
+        :param event: 'alert', 'acknowledge', 'healthy' or 'timeout', as journaled by the pagers
+        :param services: Monitored services the event changed
+        """
+        pass
+
+    @abstractmethod
+    def record_notifications(self, service: MonitoredService):
+        """
+        Record the notifications of the current level targets of an alerting monitored service
+        :param service: The notified monitored service, with its policy loaded
+        """
+        pass
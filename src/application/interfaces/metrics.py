@@ -0,0 +1,46 @@
+from abc import ABC, abstractmethod
+from typing import Callable
+
+# Metric names shared by the pagers and the instrumentation decorators
+STAGE_SECONDS = 'pager_stage_seconds'
+HANDLER_SECONDS = 'pager_handler_seconds'
+HANDLER_ERRORS = 'pager_handler_errors_total'
+NOTIFICATION_SECONDS = 'pager_notification_seconds'
+NOTIFICATION_ERRORS = 'pager_notification_errors_total'
+DELIVERY_FAILURES = 'pager_delivery_failures_total'
+TRANSITIONS = 'pager_transitions_total'
+
+class IMetrics(ABC):
+    @abstractmethod
+    def increment(self, name: str, value: float = 1, **labels: str):
+        """
+        Add to a counter
+        :param name: Name of the counter
+        :param value: Amount added
+        :param labels: Labels of the counter series
+        """
+        pass
+
+    @abstractmethod
+    def observe(self, name: str, seconds: float, **labels: str):
+        """
+        Record a duration in a histogram
+        :param name: Name of the histogram
+        :param seconds: The observed duration
+        :param labels: Labels of the histogram series
+        """
+        pass
+
+    def counter_of(self, name: str, **labels: str) -> Callable[[float], None]:
+        """
+        Bind a counter series once, for hot paths. Registries should override it to skip the label lookup.
+        :return: Adds its argument to the series
+        """
+        return lambda value=1: self.increment(name, value, **labels)
+
+    def histogram_of(self, name: str, **labels: str) -> Callable[[float], None]:
+        """
+        Bind a histogram series once, for hot paths. Registries should override it to skip the label lookup.
+        :return: Records its argument in the series
+        """
+        return lambda seconds: self.observe(name, seconds, **labels)
@@ -1,13 +1,47 @@
 from abc import ABC, abstractmethod
+from typing import Dict, Iterable, List
 from domain.models.monitored_service import MonitoredService
 
+
+class ConcurrentModificationError(Exception):
+    """ The stored Monitored Service changed since it was read (its version moved) """
+    def __init__(self, service_ids: List[str]):
+        super().__init__(f"Concurrent modification of services {service_ids}")
+        self.service_ids = service_ids
+
+
 class IMonitoredServiceRepository(ABC):
     
     @abstractmethod
     def save(self, service: MonitoredService) -> MonitoredService:
-        # Logic to save a monitored service
+        """
+        Compare-and-swap: the service is only written if the stored version is still
+        `service.version` (0 meaning not stored yet), then its version is incremented.
+        :raises ConcurrentModificationError: the service was modified since it was read
+        """
         pass
     
     @abstractmethod
     def get(self, service_id: str) -> MonitoredService:
         pass
+
+    def get_many(self, service_ids: Iterable[str]) -> Dict[str, MonitoredService]:
+        """
+        Bulk read. Adapters should override it with a single round-trip to the database.
+        :param service_ids: IDs of the monitored services
+        :return: Found monitored services by ID, missing ones are left out
+        """
+        services = {}
+        for service_id in service_ids:
+            service = self.get(service_id)
+            if service:
+                services[service_id] = service
+        return services
+
+    def save_many(self, services: List[MonitoredService]) -> List[MonitoredService]:
+        """
+        Bulk write. Adapters should override it with a single all-or-nothing transaction,
+        with the same compare-and-swap semantics as save.
+        :param services: Monitored services to save
+        """
+        return [self.save(service) for service in services]
@@ -4,4 +4,12 @@ from abc import ABC, abstractmethod
 class ITimerService(ABC):
     @abstractmethod
     def add_timeout(self, msId: str, minutes: int):
+        pass
+
+    @abstractmethod
+    def cancel_timeout(self, msId: str):
+        """
+        Drop the pending acknowledgement timeout of a Monitored Service, if any
+        :param msId: ID of the monitored service
+        """
         pass
\ No newline at end of file
@@ -0,0 +1,55 @@
+from typing import Any, Dict, Optional, Tuple
+
+from domain.models.level import DEFAULT_DELAY_MINUTES
+from domain.models.target import Target
+
+""" Compiled Policy
+Immutable form of an Escalation Policy, produced by the policy compiler and shared by every
+Monitored Service with the same policy structure. Levels and targets are tuples, targets are also
+grouped per channel, and the index of the last level is precomputed: notifying and escalating
+a service only read it. Each target is also bound to the sender of its channel, resolved once by
+the compiler of a pager context, along with the acknowledgement delay of each level.
+"""
+
+
+class CompiledLevel:
+    __slots__ = ('level', 'targets', 'channels', 'deliveries', 'delay_minutes')
+
+    def __init__(self,
+        level: int,
+        targets: Tuple[Target, ...],
+        senders: Optional[Dict[str, Any]] = None,
+        delay_minutes: int = DEFAULT_DELAY_MINUTES
+    ):
+        channels = {}
+        for target in targets:
+            channels.setdefault(target.channel, []).append(target)
+        object.__setattr__(self, 'level', level)
+        object.__setattr__(self, 'targets', targets)
+        # ((channel, targets), ...) in order of first appearance
+        object.__setattr__(self, 'channels', tuple((channel, tuple(grouped)) for channel, grouped in channels.items()))
+        # ((target, sender), ...), the sender is None when the compiler has none for the channel
+        senders = senders or {}
+        object.__setattr__(self, 'deliveries', tuple((target, senders.get(target.channel)) for target in targets))
+        # Acknowledgement delay of the level, before escalating to the next one
+        object.__setattr__(self, 'delay_minutes', delay_minutes)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("A compiled level is immutable")
+
+    def __repr__(self) -> str:
+        return f"CompiledLevel({self.level}, {len(self.targets)} targets)"
+
+
+class CompiledPolicy:
+    __slots__ = ('levels', 'last_level', '__weakref__')
+
+    def __init__(self, levels: Tuple[CompiledLevel, ...]):
+        object.__setattr__(self, 'levels', levels)
+        object.__setattr__(self, 'last_level', len(levels) - 1)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("A compiled policy is immutable")
+
+    def __repr__(self) -> str:
+        return f"CompiledPolicy({len(self.levels)} levels)"
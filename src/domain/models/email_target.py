@@ -1,12 +1,18 @@
+from typing import TYPE_CHECKING
 from domain.models.target import Target
-from domain.models.monitored_service import MonitoredService
+
+if TYPE_CHECKING:
+    from domain.models.monitored_service import MonitoredService
 
 class EmailTarget(Target):
+    channel = 'mail'
+
     def __init__(self, email):
         self.email = email
-        
-    def notify(self, service: MonitoredService, message: str):
-        from domain.services.service_provider import ServiceProvider
-        email_service = ServiceProvider.get('mail')
-        email_service.notify(self, service, message)        
-        
+
+    @property
+    def address(self) -> str:
+        return self.email
+
+    def notify(self, service: 'MonitoredService', message: str, sender):
+        sender.notify(self, service, message)
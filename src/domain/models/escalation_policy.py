@@ -3,6 +3,13 @@ from typing import List
 
 
 class EscalationPolicy:
-    def __init__(self, levels:  List[Level]):
+    def __init__(self, levels:  List[Level], version: int = 0):
         self.levels = levels
+        # Bumped by the EP Service each time the policy is edited
+        self.version = version
+
+    @property
+    def last_level(self) -> int:
+        """ Index of the last level, as precomputed by CompiledPolicy """
+        return len(self.levels) - 1
 
@@ -1,7 +1,12 @@
 from domain.models.target import Target
 from typing import List
 
+# Acknowledgement delay of the levels that do not set one
+DEFAULT_DELAY_MINUTES = 15
+
 class Level:
-    def __init__(self, level: int, targets: List[Target]):
+    def __init__(self, level: int, targets: List[Target], delay_minutes: int = DEFAULT_DELAY_MINUTES):
         self.level = level
         self.targets = targets
+        # Acknowledgement delay once this level is notified, before escalating to the next one
+        self.delay_minutes = delay_minutes
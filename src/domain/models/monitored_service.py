@@ -1,29 +1,45 @@
 from typing import Optional, Union
 from enum import Enum
+from domain.models.compiled_policy import CompiledPolicy
+from domain.services.policy_compiler import PolicyCompiler, policy_compiler
 
 class StatusT(str, Enum):
     healthy = 'healthy'
     unhealthy = 'unhealthy'
 
 class MonitoredService:
+    # No per-instance __dict__: large fleets keep many of these in memory
+    __slots__ = ('id', 'status', 'alert_msg', 'acknowledged', 'current_level', 'version', 'policy')
+
     def __init__(self, id: str):
-        from domain.models.escalation_policy import EscalationPolicy
         self.id: str = id
         self.status: StatusT = 'healthy'
         self.alert_msg: str = ''
         self.acknowledged: bool = False
         self.current_level: int = 0
-        self.policy: Optional[EscalationPolicy] = None
-
-    def load_policy(self):
-        """ Loads the Escalation Policy from its service """
-        from domain.services.service_provider import ServiceProvider
-        policy_service = ServiceProvider.get('escalation')
-        
-        policy = policy_service.get(self.id)
+        # Incremented by the repository on each save, for optimistic concurrency
+        self.version: int = 0
+        # Compiled form, shared with every service having the same policy
+        self.policy: Optional[CompiledPolicy] = None
+
+    def load_policy(self, context):
+        """
+        Loads the Escalation Policy from its service
+        :param context: PagerContext of the pager handling this service
+        """
+        self.attach_policy(context.escalation_service.get(self.id), context.compiler)
+
+    def attach_policy(self, policy, compiler: Optional[PolicyCompiler] = None):
+        """
+        Attach a policy fetched from the EP Service, in its compiled form
+        :param policy: The Escalation Policy of this service
+        :param compiler: PolicyCompiler binding the targets to their senders, none are bound without it
+        """
         if not policy:
             raise ValueError(f"Missing policy for service '{self.id}'")
-        self.policy = policy
+        if compiler is None:
+            compiler = policy_compiler
+        self.policy = compiler.compile(policy)
 
     def set_unhealthy(self, msg: str):
         self.status = 'unhealthy'
@@ -40,14 +56,33 @@ class MonitoredService:
     def set_acknowledged(self):
         self.acknowledged = True
 
-    def notify(self):
-        """ Notify all targets at the current level """
+    def current_targets(self) -> list:
+        """ Targets of the current level """
+        if not self.policy:
+            raise ValueError("Policy was not loaded")
+
+        return self.policy.levels[self.current_level].targets
+
+    def current_deliveries(self) -> tuple:
+        """ (target, sender) pairs of the current level """
+        if not self.policy:
+            raise ValueError("Policy was not loaded")
+
+        return self.policy.levels[self.current_level].deliveries
+
+    def current_delay(self) -> int:
+        """ Minutes before the current level escalates when not acknowledged """
         if not self.policy:
             raise ValueError("Policy was not loaded")
 
-        targets = self.policy.levels[self.current_level].targets
-        for target in targets:
-            target.notify(self, self.alert_msg)
+        return self.policy.levels[self.current_level].delay_minutes
+
+    def notify(self):
+        """ Notify all targets at the current level """
+        for target, sender in self.current_deliveries():
+            if sender is None:
+                raise ValueError(f"No sender bound for channel '{target.channel}'")
+            target.notify(self, self.alert_msg, sender)
 
     def escalate(self) -> bool:
         """ Escalate the alert to the next level """
@@ -55,7 +90,7 @@ class MonitoredService:
             raise ValueError("Policy was not loaded")
 
         # Last level reached
-        if self.current_level == len(self.policy.levels) - 1:
+        if self.current_level >= self.policy.last_level:
             return False
 
         self.current_level += 1
@@ -1,14 +1,18 @@
+from typing import TYPE_CHECKING
 from domain.models.target import Target
-from domain.models.monitored_service import MonitoredService
+
+if TYPE_CHECKING:
+    from domain.models.monitored_service import MonitoredService
 
 class SMSTarget(Target):
-    
+    channel = 'sms'
+
     def __init__(self, phone_number) -> None:
         self.phone_number = phone_number
-        
-    def notify(self, service: MonitoredService, message: str):
-        from domain.services.service_provider import ServiceProvider
-        sms_service = ServiceProvider.get_sms_service()
-        sms_service.notify(self, service, message)
-        
-        
\ No newline at end of file
+
+    @property
+    def address(self) -> str:
+        return self.phone_number
+
+    def notify(self, service: 'MonitoredService', message: str, sender):
+        sender.notify(self, service, message)
@@ -1,7 +1,22 @@
 from abc import ABC, abstractmethod
-from domain.models.monitored_service import MonitoredService
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from domain.models.monitored_service import MonitoredService
 
 class Target(ABC):
+    # Notification channel, the key of its sender in the pager context ('mail', 'sms')
+    channel: str = ''
+
+    @property
+    def address(self) -> str:
+        """ Recipient on its channel: email address, phone number """
+        return ''
+
     @abstractmethod
-    def notify(self, service: MonitoredService, message: str ):
+    def notify(self, service: 'MonitoredService', message: str, sender):
+        """
+        Notify the target through the sender of its channel, as bound by the pager context
+        :param sender: The IMailService or ISMSService of the pager
+        """
         pass
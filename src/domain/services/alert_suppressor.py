@@ -0,0 +1,146 @@
+import re
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Callable, Deque, Dict, Set, Tuple
+
+""" Alert Suppressor
+Drops repeated alerts before they reach the repository, the EP Service or the notifiers:
+- duplicates: an alert whose fingerprint (service + normalized message) opened an incident within the
+  window, since the service last recovered: a recurrence after a healthy event is a new incident
+- flapping: alerts of a service that switched between healthy and alerting too often recently
+The pagers only check alerts up front, and record the incidents and recoveries their transactions
+committed: an alert failing before its commit is not a duplicate, a heartbeat is not a transition.
+"""
+
+_VARIABLE_PARTS = re.compile(r'\d+')
+
+
+def fingerprint(service_id: str, msg: str) -> Tuple[str, str]:
+    """ Alerts differing only by numbers (timestamps, counters, durations) share a fingerprint """
+    return service_id, _VARIABLE_PARTS.sub('#', ' '.join(msg.lower().split()))
+
+
+class AlertSuppressor:
+    def __init__(self,
+        window: float = 300.0,
+        flap_threshold: int = 6,
+        flap_window: float = 900.0,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        """
+        :param window: Seconds during which an alert with the same fingerprint is a duplicate
+        :param flap_threshold: Healthy/alert transitions within flap_window that make a service flapping
+        :param flap_window: Sliding window of the flap detection, in seconds
+        :param clock: Monotonic clock in seconds
+        """
+        self.window = window
+        self.flap_threshold = flap_threshold
+        self.flap_window = flap_window
+        self.clock = clock
+
+        # Fingerprint -> time it was last forwarded, oldest first
+        self._forwarded: 'OrderedDict[Tuple[str, str], float]' = OrderedDict()
+        # Service ID -> its fingerprints in _forwarded
+        self._fingerprints: Dict[str, Set[Tuple[str, str]]] = {}
+        # Service ID -> times of its recent transitions
+        self._transitions: Dict[str, Deque[float]] = {}
+        self._lock = threading.Lock()
+
+        # Counters
+        self.forwarded = 0
+        self.suppressed_duplicates = 0
+        self.suppressed_flapping = 0
+
+    def should_suppress(self, service_id: str, msg: str, record: bool = True) -> bool:
+        """
+        Decide whether an alert is dropped
+        :param service_id: ID of the monitored service
+        :param msg: The alert message
+        :param record: Record a forwarded alert as an incident, as record_alert does. Pagers pass False
+            and record the incident once it is committed.
+        """
+        now = self.clock()
+        key = fingerprint(service_id, msg)
+        with self._lock:
+            self._expire(now)
+
+            if key in self._forwarded:
+                self.suppressed_duplicates += 1
+                return True
+
+            if self._is_flapping(service_id, now):
+                self.suppressed_flapping += 1
+                return True
+
+            if record:
+                self._record_alert(service_id, key, now)
+            self.forwarded += 1
+            return False
+
+    def record_alert(self, service_id: str, msg: str):
+        """
+        Register an alert that opened an incident: its fingerprint is a duplicate until the window
+        ends or the service recovers, and it is a transition for the flap detection
+        """
+        now = self.clock()
+        with self._lock:
+            self._record_alert(service_id, fingerprint(service_id, msg), now)
+
+    def record_healthy(self, service_id: str):
+        """
+        Register the recovery of an unhealthy service: the incident is over, so its alerts are no longer
+        duplicates; it is a transition for the flap detection, which handles the recurrences
+        """
+        with self._lock:
+            for key in self._fingerprints.pop(service_id, ()):
+                del self._forwarded[key]
+            self._record_transition(service_id, self.clock())
+
+    def is_flapping(self, service_id: str) -> bool:
+        with self._lock:
+            return self._is_flapping(service_id, self.clock())
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                'forwarded': self.forwarded,
+                'suppressed_duplicates': self.suppressed_duplicates,
+                'suppressed_flapping': self.suppressed_flapping,
+                'tracked_fingerprints': len(self._forwarded),
+            }
+
+    def _expire(self, now: float):
+        forwarded = self._forwarded
+        while forwarded:
+            key, forwarded_at = next(iter(forwarded.items()))
+            if now - forwarded_at < self.window:
+                break
+            del forwarded[key]
+            fingerprints = self._fingerprints[key[0]]
+            fingerprints.discard(key)
+            if not fingerprints:
+                del self._fingerprints[key[0]]
+
+    def _record_alert(self, service_id: str, key: Tuple[str, str], now: float):
+        self._forwarded[key] = now
+        self._forwarded.move_to_end(key)
+        self._fingerprints.setdefault(service_id, set()).add(key)
+        self._record_transition(service_id, now)
+
+    def _record_transition(self, service_id: str, now: float):
+        transitions = self._transitions.get(service_id)
+        if transitions is None:
+            transitions = self._transitions[service_id] = deque(maxlen=self.flap_threshold)
+        transitions.append(now)
+
+    def _is_flapping(self, service_id: str, now: float) -> bool:
+        transitions = self._transitions.get(service_id)
+        if transitions is None:
+            return False
+        while transitions and now - transitions[0] >= self.flap_window:
+            transitions.popleft()
+        if not transitions:
+            del self._transitions[service_id]
+            return False
+        return len(transitions) >= self.flap_threshold
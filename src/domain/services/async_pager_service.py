@@ -0,0 +1,203 @@
+import asyncio
+from typing import TYPE_CHECKING, Awaitable, Callable, Dict, List, Optional, Tuple, TypeVar
+
+from application.interfaces.async_escalation_policy_service import IAsyncEscalationPolicyService
+from application.interfaces.async_mail_service import IAsyncMailService
+from application.interfaces.async_monitored_service_repository import IAsyncMonitoredServiceRepository
+from application.interfaces.async_sms_service import IAsyncSMSService
+from application.interfaces.async_time_service import IAsyncTimerService
+from application.interfaces.event_log import IEventLog
+from application.interfaces.metrics import IMetrics
+from application.interfaces.incident_history import IIncidentHistory
+from application.interfaces.monitored_service_repository import ConcurrentModificationError
+from domain.models.escalation_policy import EscalationPolicy
+from domain.models.monitored_service import MonitoredService
+from domain.services.alert_suppressor import AlertSuppressor
+from domain.services import incident_state_machine as fsm
+from domain.services.incident_state_machine import Actions
+from domain.services.pager_core import AlertBatch, Committed, PagerCore
+
+if TYPE_CHECKING:
+    from domain.services.delivery_service import DeliveryService
+
+""" Async Pager Service
+Awaitable counterpart of the ServicePager, sharing its transactions and state machine (PagerCore),
+for asyncio servers: every repository, EP Service, notification and timer call is awaited, so a single
+event loop keeps thousands of events in flight. The targets of a level are notified concurrently, and
+the policies of a batch are fetched concurrently. Blocking logs (event log, incident history) are
+written from a worker thread.
+"""
+
+T = TypeVar('T')
+
+
+class AsyncServicePager(PagerCore):
+    def __init__(self,
+        timer_system: IAsyncTimerService,
+        escalation_system: IAsyncEscalationPolicyService,
+        mail_system: IAsyncMailService,
+        sms_system: IAsyncSMSService,
+        repository: IAsyncMonitoredServiceRepository,
+        notifier: Optional['DeliveryService'] = None,
+        max_retries: int = 5,
+        event_log: Optional[IEventLog] = None,
+        suppressor: Optional[AlertSuppressor] = None,
+        metrics: Optional[IMetrics] = None,
+        history: Optional[IIncidentHistory] = None,
+        incident_policies: Optional[Dict[str, EscalationPolicy]] = None
+    ):
+        # Queued, retried deliveries instead of notifying the targets in the handler
+        super().__init__(timer_system, escalation_system, mail_system, sms_system, repository,
+                         notifier, max_retries, event_log, suppressor, metrics, history, incident_policies)
+
+    # ------------ HANDLERS METHODS ------------
+    # Same transactions and state machine as the ServicePager: side effects only run once the
+    # transaction is committed.
+
+    async def handle_alert(self, service_id: str, msg: str):
+        """
+        Process an alert
+        :param service_id: ID of the monitored service
+        :param msg: The alert message
+        """
+        if self._suppressed(service_id, msg):
+            return
+
+        # Nothing to do for a duplicated alert
+        await self.__handle(service_id, fsm.ALERT, msg)
+
+    async def handle_alerts(self, alerts: List[Tuple[str, str]]) -> AlertBatch:
+        """
+        Process a batch of alerts with a single repository read and a single write. Alerts of unknown
+        services are dropped and reported, the others are processed.
+        :param alerts: (ID of the monitored service, alert message) pairs
+        :return: IDs of the monitored services that became unhealthy, and of the unknown ones
+        """
+        messages = self._alerts_to_process(alerts)
+        if not messages:
+            return AlertBatch([], [])
+
+        missing: List[str] = []
+
+        async def transaction() -> List[Committed]:
+            services = await self.repository.get_many(list(messages))
+
+            alerted = await self.__transitions(self._known(services, messages, missing), fsm.ALERT)
+            if alerted:
+                await self.repository.save_many([service for service, _ in alerted])
+            return alerted
+
+        alerted = await self.__commit(fsm.ALERT, transaction)
+        return AlertBatch([service.id for service, _ in alerted], missing)
+
+    async def handle_acknowledge(self, ms_id: str):
+        """
+        Process and register the acknowledgment for a Monitored Service
+        :param ms_id: ID of the monitored service
+        """
+        await self.__handle(ms_id, fsm.ACKNOWLEDGE)
+
+    async def handle_healthy(self, ms_id: str):
+        """
+        Process and register a healthy status for a Monitored Service
+        :param ms_id: ID of the monitored service
+        """
+        await self.__handle(ms_id, fsm.RECOVER)
+
+    async def handle_timeout(self, ms_id: str):
+        """
+        Process an escalation timeout
+        :param ms_id: ID of the monitored service
+        """
+        # Nothing to do when healthy, acknowledged or at the last level
+        await self.__handle(ms_id, fsm.TIMEOUT)
+
+    async def handle_timeouts(self, ms_ids: List[str]):
+        """
+        Process a batch of escalation timeouts with a single repository read and a single write
+        :param ms_ids: IDs of the monitored services whose timeout expired
+        """
+        async def transaction() -> List[Committed]:
+            services = await self.repository.get_many(ms_ids)
+            # Stale timeouts: the service is gone, healthy or acknowledged
+            escalated = await self.__transitions(
+                [(services[ms_id], None) for ms_id in dict.fromkeys(ms_ids) if services.get(ms_id)], fsm.TIMEOUT
+            )
+            if escalated:
+                await self.repository.save_many([service for service, _ in escalated])
+            return escalated
+
+        await self.__commit(fsm.TIMEOUT, transaction)
+
+    # ------------ INTERNALS ------------
+
+    async def __handle(self, ms_id: str, event: str, msg: Optional[str] = None):
+        """ Apply an event to a single service, then run its side effects """
+        async def transaction() -> List[Committed]:
+            service = self._require(await self.repository.get(ms_id), ms_id)
+            committed = await self.__transitions([(service, msg)], event)
+            if committed:
+                await self.repository.save(service)
+            return committed
+
+        await self.__commit(event, transaction)
+
+    async def __transitions(self, services: List[Tuple[MonitoredService, Optional[str]]],
+                            event: str) -> List[Committed]:
+        """ Apply the transition of an event to a batch of services, their policies are fetched concurrently """
+        pending = self._plan(services, event)
+        loading = self._needing_policy(pending)
+        policies = await asyncio.gather(*(self.escalation_service.get(service.id) for service in loading))
+        return self._apply(pending, self._attach(loading, policies))
+
+    async def __commit(self, event: str, transaction: Callable[[], Awaitable[List[Committed]]]) -> List[Committed]:
+        """ Run a transaction, journal what it committed and run the side effects concurrently """
+        committed = await self.__with_retries(transaction)
+        await self.__journal(event, [service for service, _ in committed])
+        self._track(committed)
+        await asyncio.gather(*(self.__run(service, actions) for service, actions in committed))
+        return committed
+
+    async def __with_retries(self, transaction: Callable[[], Awaitable[T]]) -> T:
+        """ Run a read-mutate-save transaction, starting over when it loses a race """
+        for attempt in range(self.max_retries):
+            try:
+                return await transaction()
+            except ConcurrentModificationError:
+                if attempt == self.max_retries - 1:
+                    raise
+
+    async def __journal(self, event: str, services: List[MonitoredService]):
+        # Logged once committed and before any side effect, so replay re-arms what was lost
+        if not services:
+            return
+        self._count(event, services)
+        if self.event_log is not None or self.history is not None:
+            await asyncio.get_running_loop().run_in_executor(None, self._persist, event, services)
+
+    async def __notify(self, service: MonitoredService):
+        """ Notify the targets of the current level concurrently, failures are raised once all were tried """
+        if self.notifier is not None:
+            # Only queues the deliveries
+            self.notifier.notify(service)
+            return
+        results = await asyncio.gather(*(
+            sender.notify(target, service, service.alert_msg)
+            for target, sender in service.current_deliveries()
+        ), return_exceptions=True)
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+
+    async def __run(self, service: MonitoredService, actions: Actions):
+        """ Run the side effects of a committed transition """
+        for action in actions:
+            if action == fsm.ARM:
+                # Armed first: a failing notification must not leave the incident without escalation
+                await self.time_service.add_timeout(service.id, service.current_delay())
+            elif action == fsm.NOTIFY:
+                await self.__notify(service)
+                if self.history is not None:
+                    await asyncio.get_running_loop().run_in_executor(None, self._record_notifications, service)
+            elif action == fsm.CANCEL:
+                await self.time_service.cancel_timeout(service.id)
@@ -0,0 +1,129 @@
+import threading
+import time
+from typing import Callable, Dict
+
+""" Circuit Breaker
+Stops calling a failing notification channel for a while instead of piling up calls on it:
+- closed: calls go through, consecutive failures (errors or calls slower than slow_call) are counted
+- open: after failure_threshold consecutive failures, calls are refused until reset_timeout elapsed
+- half-open: one trial call is let through, its outcome closes or re-opens the circuit
+"""
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitOpenError(Exception):
+    """ The channel is considered down, the call was not attempted """
+    def __init__(self, name: str, retry_at: float):
+        super().__init__(f"Circuit '{name}' is open")
+        self.name = name
+        self.retry_at = retry_at
+
+
+class CircuitBreaker:
+    def __init__(self,
+        name: str = '',
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+        slow_call: float = 5.0,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        """
+        :param name: Name of the protected channel
+        :param failure_threshold: Consecutive failures opening the circuit
+        :param reset_timeout: Seconds the circuit stays open before a trial call
+        :param slow_call: Seconds after which a successful call still counts as a failure
+        :param clock: Monotonic clock in seconds
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.slow_call = slow_call
+        self.clock = clock
+
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+        # Counters
+        self.opened = 0
+        self.rejected = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state(self.clock())
+
+    def retry_at(self) -> float:
+        """ Time at which the circuit lets a trial call through """
+        with self._lock:
+            return self._opened_at + self.reset_timeout if self._state != CLOSED else self.clock()
+
+    def allow(self) -> bool:
+        """ Whether a call may be attempted now; a granted half-open trial must report its outcome """
+        with self._lock:
+            state = self._current_state(self.clock())
+            if state == CLOSED:
+                return True
+            if state == HALF_OPEN and not self._trial_running:
+                self._trial_running = True
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self, elapsed: float = 0.0):
+        """
+        :param elapsed: Duration of the call, slow calls are failures
+        """
+        if elapsed >= self.slow_call:
+            self.record_failure()
+            return
+        with self._lock:
+            self._state = CLOSED
+            self._failures = 0
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            now = self.clock()
+            self._failures += 1
+            state = self._current_state(now)
+            # Calls still in flight when the circuit opened do not extend it
+            if state == HALF_OPEN or (state == CLOSED and self._failures >= self.failure_threshold):
+                self._state = OPEN
+                self.opened += 1
+                self._opened_at = now
+            self._trial_running = False
+
+    def call(self, function: Callable, *args):
+        """ Call function through the breaker
+        :raises CircuitOpenError: the call was refused
+        """
+        if not self.allow():
+            raise CircuitOpenError(self.name, self.retry_at())
+        started = self.clock()
+        try:
+            result = function(*args)
+        except Exception:
+            self.record_failure()
+            raise
+        self.record_success(self.clock() - started)
+        return result
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            return {
+                'state': self._current_state(self.clock()),
+                'consecutive_failures': self._failures,
+                'opened': self.opened,
+                'rejected': self.rejected,
+            }
+
+    def _current_state(self, now: float) -> str:
+        if self._state == OPEN and now - self._opened_at >= self.reset_timeout:
+            return HALF_OPEN
+        return self._state
@@ -0,0 +1,440 @@
+import heapq
+import json
+import logging
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Any, Callable, Dict, List, Optional
+
+from domain.models.email_target import EmailTarget
+from domain.models.monitored_service import MonitoredService
+from domain.models.sms_target import SMSTarget
+from domain.models.target import Target
+from domain.services.circuit_breaker import CircuitBreaker
+
+""" Delivery Service
+Notifier for the ServicePager that never blocks alert handling on a degraded provider: notify() only
+queues one delivery per target of the current level and returns. Each channel (mail, SMS) has its own
+workers, circuit breaker and retry queue: failed deliveries are retried with exponential backoff and
+jitter, deliveries of an open circuit wait for it to half-open, and the queue can be saved on shutdown
+and loaded on startup so pending deliveries survive restarts. Deliveries go through the senders given
+at construction, or the senders bound into the policy of the service. Sends run in a pool per channel
+sized like its workers: a send hanging past call_timeout counts as a failed attempt and keeps its pool
+thread, so hung calls never exceed the pool size and later sends time out until the circuit opens.
+Before each retry, the incident of the service is checked: deliveries of an acknowledged or recovered
+incident are dropped instead of paging again.
+"""
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHANNEL_WORKERS = {'mail': 4, 'sms': 2}
+# Seconds before a delivery refused while a half-open circuit runs its trial call is tried again
+REFUSED_RETRY_DELAY = 0.1
+# Seconds a provider call may take before the attempt counts as failed
+DEFAULT_CALL_TIMEOUT = 30.0
+# Target type of each channel: saved deliveries are rebuilt from their channel and address only
+TARGET_TYPES: Dict[str, Callable[[str], Target]] = {'mail': EmailTarget, 'sms': SMSTarget}
+
+
+class PendingDelivery:
+    __slots__ = ('due', 'seq', 'channel', 'target', 'sender', 'service', 'message', 'attempts', 'error')
+
+    def __init__(self,
+        channel: str,
+        target: Target,
+        sender: Any,
+        service: MonitoredService,
+        message: str,
+        attempts: int = 0
+    ):
+        self.due = 0.0
+        self.seq = 0
+        self.channel = channel
+        self.target = target
+        self.sender = sender
+        self.service = service
+        self.message = message
+        self.attempts = attempts
+        self.error: Optional[str] = None
+
+    def __lt__(self, other: 'PendingDelivery') -> bool:
+        return (self.due, self.seq) < (other.due, other.seq)
+
+    def __repr__(self) -> str:
+        return f"PendingDelivery({self.channel}, {self.service.id}, attempts={self.attempts})"
+
+
+class RetryQueue:
+    def __init__(self,
+        base_delay: float = 1.0,
+        max_delay: float = 300.0,
+        jitter: float = 0.5,
+        max_attempts: int = 10,
+        random: Callable[[], float] = random.random
+    ):
+        """
+        :param base_delay: Seconds before the first retry
+        :param max_delay: Cap of the exponential backoff, in seconds
+        :param jitter: Fraction of the backoff drawn at random, spreads retries of a provider outage
+        :param max_attempts: Failed attempts after which a delivery is given up
+        :param random: Random number generator in [0, 1)
+        """
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.jitter = jitter
+        self.max_attempts = max_attempts
+        self.random = random
+        self._heap: List[PendingDelivery] = []
+        self._seq = 0
+
+    def push(self, delivery: PendingDelivery, due: float):
+        self._seq += 1
+        delivery.due = due
+        delivery.seq = self._seq
+        heapq.heappush(self._heap, delivery)
+
+    def backoff(self, attempts: int) -> float:
+        """ Delay before the retry following the given number of failed attempts """
+        delay = min(self.max_delay, self.base_delay * 2 ** (attempts - 1))
+        return delay * (1 - self.jitter * self.random())
+
+    def retry(self, delivery: PendingDelivery, now: float) -> bool:
+        """
+        Reschedule a failed delivery
+        :return: False when the delivery ran out of attempts and was not rescheduled
+        """
+        if delivery.attempts >= self.max_attempts:
+            return False
+        self.push(delivery, now + self.backoff(delivery.attempts))
+        return True
+
+    def pop_due(self, now: float) -> Optional[PendingDelivery]:
+        if self._heap and self._heap[0].due <= now:
+            return heapq.heappop(self._heap)
+        return None
+
+    def next_due(self) -> Optional[float]:
+        return self._heap[0].due if self._heap else None
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def __iter__(self):
+        return iter(sorted(self._heap))
+
+
+class _Lane:
+    """ Workers, breaker and queue of a channel """
+    def __init__(self, channel: str, breaker: CircuitBreaker, queue: RetryQueue):
+        self.channel = channel
+        self.breaker = breaker
+        self.queue = queue
+        self.cond = threading.Condition()
+        self.threads: List[threading.Thread] = []
+        # Provider calls, when they are bounded by a timeout
+        self.executor: Optional[ThreadPoolExecutor] = None
+
+
+class DeliveryService:
+    def __init__(self,
+        channel_workers: Optional[Dict[str, int]] = None,
+        breaker_factory: Optional[Callable[[str], CircuitBreaker]] = None,
+        queue_factory: Callable[[], RetryQueue] = RetryQueue,
+        state_path: Optional[str] = None,
+        clock: Callable[[], float] = time.monotonic,
+        senders: Optional[Dict[str, Any]] = None,
+        call_timeout: Optional[float] = DEFAULT_CALL_TIMEOUT,
+        is_open: Optional[Callable[[str], bool]] = None
+    ):
+        """
+        :param channel_workers: Number of delivery threads per channel
+        :param breaker_factory: Builds the circuit breaker of a channel
+        :param queue_factory: Builds the retry queue of a channel
+        :param state_path: File the pending deliveries are saved to on stop and loaded from on creation
+        :param clock: Monotonic clock in seconds
+        :param senders: Channel -> blocking sender (IMailService, ISMSService), preferred over the senders
+            bound into the policies (those of an AsyncServicePager are awaitable) and needed by restored deliveries
+        :param call_timeout: Seconds a send may take before the attempt counts as failed, unbounded when None
+        :param is_open: Service ID -> whether its incident still needs notifications (unhealthy, not acknowledged),
+            checked before each retry; every retry is attempted when None
+        """
+        self.channel_workers = {**DEFAULT_CHANNEL_WORKERS, **(channel_workers or {})}
+        self.breaker_factory = breaker_factory or (lambda channel: CircuitBreaker(channel, clock=clock))
+        self.queue_factory = queue_factory
+        self.state_path = state_path
+        self.clock = clock
+        self.senders = dict(senders or {})
+        self.call_timeout = call_timeout
+        self.is_open = is_open
+
+        self._lanes: Dict[str, _Lane] = {}
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._running = False
+        # Deliveries out of attempts
+        self.dead_letters: List[PendingDelivery] = []
+
+        # Counters
+        self.queued = 0
+        self.delivered = 0
+        self.failed_attempts = 0
+        self.timed_out = 0
+        # Retries dropped because their incident was acknowledged or recovered
+        self.closed = 0
+
+        if state_path and os.path.exists(state_path):
+            self.load(state_path)
+
+    # ------------ NOTIFIER ------------
+
+    def notify(self, service: MonitoredService) -> int:
+        """
+        Queue the notifications of the current level of a service, without waiting for them
+        :return: Number of queued deliveries
+        """
+        message = service.alert_msg
+        deliveries = service.current_deliveries()
+        now = self.clock()
+        for target, sender in deliveries:
+            sender = self.senders.get(target.channel, sender)
+            self._enqueue(PendingDelivery(target.channel, target, sender, service, message), now)
+        return len(deliveries)
+
+    def deliver_due(self) -> int:
+        """
+        Attempt every delivery that is due, in the calling thread
+        :return: Number of successful deliveries
+        """
+        delivered = 0
+        for lane in list(self._lanes.values()):
+            # Bounded: refused deliveries are pushed back into the queue
+            for _ in range(len(lane.queue)):
+                with lane.cond:
+                    delivery = lane.queue.pop_due(self.clock())
+                if delivery is None:
+                    break
+                delivered += self._attempt(lane, delivery)
+        return delivered
+
+    # ------------ LIFECYCLE ------------
+
+    def start(self):
+        """ Start the workers of every channel; channels seen later get theirs when first used """
+        with self._lock:
+            self._stopped.clear()
+            self._running = True
+            for lane in self._lanes.values():
+                self._start_workers(lane)
+
+    def stop(self):
+        """ Stop the workers, then save the pending deliveries when a state path is set """
+        with self._lock:
+            self._running = False
+            self._stopped.set()
+            lanes = list(self._lanes.values())
+        for lane in lanes:
+            with lane.cond:
+                lane.cond.notify_all()
+            for thread in lane.threads:
+                thread.join()
+            lane.threads.clear()
+            if lane.executor is not None:
+                # Hung calls are not waited for
+                lane.executor.shutdown(wait=False)
+                lane.executor = None
+        if self.state_path:
+            self.save(self.state_path)
+
+    def pending(self) -> int:
+        return sum(len(lane.queue) for lane in self._lanes.values())
+
+    def breaker(self, channel: str) -> CircuitBreaker:
+        return self._lane(channel).breaker
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            'queued': self.queued,
+            'delivered': self.delivered,
+            'failed_attempts': self.failed_attempts,
+            'timed_out': self.timed_out,
+            'closed': self.closed,
+            'dead_letters': len(self.dead_letters),
+            'channels': {
+                channel: {'pending': len(lane.queue), **lane.breaker.stats()}
+                for channel, lane in list(self._lanes.items())
+            },
+        }
+
+    # ------------ PERSISTENCE ------------
+
+    def save(self, path: str):
+        """ Atomically write the pending deliveries, their due time relative to now """
+        now = self.clock()
+        records = []
+        for lane in list(self._lanes.values()):
+            with lane.cond:
+                records.extend(_to_record(delivery, now) for delivery in lane.queue)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(records, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    def load(self, path: str) -> int:
+        """
+        Queue the deliveries saved by a previous process
+        :return: Number of loaded deliveries
+        """
+        with open(path, encoding='utf-8') as f:
+            records = json.load(f)
+        now = self.clock()
+        loaded = 0
+        for record in records:
+            delivery = _from_record(record, self.senders)
+            if delivery is None:
+                logger.warning("Dropping a saved delivery of unknown channel %r", record.get('channel'))
+                continue
+            self._enqueue(delivery, now + record['delay'])
+            loaded += 1
+        return loaded
+
+    # ------------ INTERNALS ------------
+
+    def _lane(self, channel: str) -> _Lane:
+        lane = self._lanes.get(channel)
+        if lane is None:
+            with self._lock:
+                lane = self._lanes.get(channel)
+                if lane is None:
+                    lane = _Lane(channel, self.breaker_factory(channel), self.queue_factory())
+                    self._lanes[channel] = lane
+                    if self._running:
+                        self._start_workers(lane)
+        return lane
+
+    def _enqueue(self, delivery: PendingDelivery, due: float):
+        lane = self._lane(delivery.channel)
+        with lane.cond:
+            lane.queue.push(delivery, due)
+            lane.cond.notify()
+        with self._lock:
+            self.queued += 1
+
+    def _start_workers(self, lane: _Lane):
+        for index in range(self.channel_workers.get(lane.channel, 1)):
+            thread = threading.Thread(target=self._work, args=(lane,), name=f'deliver-{lane.channel or "default"}-{index}', daemon=True)
+            lane.threads.append(thread)
+            thread.start()
+
+    def _work(self, lane: _Lane):
+        while not self._stopped.is_set():
+            with lane.cond:
+                delivery = lane.queue.pop_due(self.clock())
+                if delivery is None:
+                    next_due = lane.queue.next_due()
+                    timeout = 1.0 if next_due is None else min(1.0, max(0.0, next_due - self.clock()))
+                    lane.cond.wait(timeout)
+                    continue
+            self._attempt(lane, delivery)
+
+    def _attempt(self, lane: _Lane, delivery: PendingDelivery) -> bool:
+        if delivery.attempts and not self._still_open(delivery):
+            with self._lock:
+                self.closed += 1
+            logger.info("Dropping %r: its incident is closed", delivery)
+            return False
+        if not lane.breaker.allow():
+            # Not an attempt: wait for the circuit to let a trial call through
+            with lane.cond:
+                lane.queue.push(delivery, max(lane.breaker.retry_at(), self.clock() + REFUSED_RETRY_DELAY))
+            return False
+
+        started = self.clock()
+        try:
+            if delivery.sender is None:
+                raise ValueError(f"No sender for channel '{delivery.channel}'")
+            if self.call_timeout is None:
+                delivery.target.notify(delivery.service, delivery.message, delivery.sender)
+            else:
+                self._call_with_timeout(lane, delivery)
+        except Exception as e:
+            if isinstance(e, TimeoutError):
+                with self._lock:
+                    self.timed_out += 1
+            lane.breaker.record_failure()
+            delivery.attempts += 1
+            delivery.error = repr(e)
+            with lane.cond:
+                rescheduled = lane.queue.retry(delivery, self.clock())
+            with self._lock:
+                self.failed_attempts += 1
+                if not rescheduled:
+                    self.dead_letters.append(delivery)
+            if not rescheduled:
+                logger.error("Giving up %r after %d attempts: %s", delivery, delivery.attempts, delivery.error)
+            return False
+
+        lane.breaker.record_success(self.clock() - started)
+        with self._lock:
+            self.delivered += 1
+        return True
+
+    def _still_open(self, delivery: PendingDelivery) -> bool:
+        if self.is_open is None:
+            return True
+        try:
+            return self.is_open(delivery.service.id)
+        except Exception:
+            # Better page twice than miss an incident
+            logger.exception("Checking the incident of %r failed, retrying it", delivery)
+            return True
+
+    def _call_with_timeout(self, lane: _Lane, delivery: PendingDelivery):
+        """ Send through the pool of the lane, the attempt fails when no answer came within call_timeout """
+        executor = lane.executor
+        if executor is None:
+            with self._lock:
+                if lane.executor is None:
+                    lane.executor = ThreadPoolExecutor(
+                        max_workers=self.channel_workers.get(lane.channel, 1),
+                        thread_name_prefix=f'deliver-call-{lane.channel or "default"}'
+                    )
+                executor = lane.executor
+        future = executor.submit(delivery.target.notify, delivery.service, delivery.message, delivery.sender)
+        try:
+            future.result(self.call_timeout)
+        except FutureTimeoutError:
+            # Still queued behind hung calls: never sent late
+            future.cancel()
+            raise TimeoutError(f"No answer from the provider within {self.call_timeout}s")
+
+
+def _to_record(delivery: PendingDelivery, now: float) -> dict:
+    return {
+        'channel': delivery.channel,
+        'address': delivery.target.address,
+        'service_id': delivery.service.id,
+        'level': delivery.service.current_level,
+        'message': delivery.message,
+        'attempts': delivery.attempts,
+        'delay': max(0.0, delivery.due - now),
+    }
+
+
+def _from_record(record: dict, senders: Dict[str, Any]) -> Optional[PendingDelivery]:
+    """ Rebuild a saved delivery, None when its channel has no known target type """
+    target_type = TARGET_TYPES.get(record['channel'])
+    if target_type is None:
+        return None
+    # Saved before the address was: the single attribute of the target
+    address = record['address'] if 'address' in record else next(iter(record['target'].values()))
+    target = target_type(address)
+
+    service = MonitoredService(record['service_id'])
+    service.set_unhealthy(record['message'])
+    service.current_level = record['level']
+    channel = record['channel']
+    return PendingDelivery(channel, target, senders.get(channel), service, record['message'], record['attempts'])
@@ -0,0 +1,120 @@
+import heapq
+import threading
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+""" Weighted Fair Queue
+Queue shared by several tenants, served by self-clocked weighted fair queuing: each event gets a
+virtual finish tag (the finish tag of the previous event of its tenant, or the current virtual time
+when the tenant was idle, plus cost / weight) and events are served by increasing tag. A tenant
+with twice the weight gets twice the share of a saturated queue, and an idle tenant is served
+right away however deep the queue of a noisy one is. Each tenant has its own bound.
+"""
+
+
+class TenantQueueFullError(Exception):
+    """ The tenant has too many events pending, the event was not queued """
+    def __init__(self, tenant: str, pending: int):
+        super().__init__(f"Tenant '{tenant}' has {pending} events pending")
+        self.tenant = tenant
+        self.pending = pending
+
+
+class WeightedFairQueue:
+    def __init__(self,
+        weights: Optional[Dict[str, float]] = None,
+        default_weight: float = 1.0,
+        max_pending: int = 10_000
+    ):
+        """
+        :param weights: Tenant -> share of the queue, relative to the other tenants
+        :param default_weight: Weight of tenants missing from weights
+        :param max_pending: Maximum number of queued events per tenant
+        """
+        if default_weight <= 0 or any(weight <= 0 for weight in (weights or {}).values()):
+            raise ValueError("Weights must be positive")
+
+        self.weights = dict(weights or {})
+        self.default_weight = default_weight
+        self.max_pending = max_pending
+
+        # Tenant -> (finish tag, item) in arrival order
+        self._queues: Dict[str, Deque[Tuple[float, Any]]] = {}
+        self._last_finish: Dict[str, float] = {}
+        # (finish tag, sequence, tenant) of the head of every non-empty tenant queue
+        self._heads: List[Tuple[float, int, str]] = []
+        self._virtual_time = 0.0
+        self._seq = 0
+        self._size = 0
+        self._closed = False
+        self._cond = threading.Condition()
+
+    def weight(self, tenant: str) -> float:
+        return self.weights.get(tenant, self.default_weight)
+
+    def push(self, tenant: str, item: Any, cost: float = 1.0, bounded: bool = True):
+        """
+        Queue an event of a tenant
+        :param cost: Share of the queue the event uses, e.g. the size of a batch
+        :param bounded: Refuse the event when the tenant has max_pending events queued
+        """
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("The queue is closed")
+            queue = self._queues.get(tenant)
+            if queue is None:
+                queue = self._queues[tenant] = deque()
+            if bounded and len(queue) >= self.max_pending:
+                raise TenantQueueFullError(tenant, len(queue))
+
+            # An idle tenant starts at the current virtual time: it cannot bank credit while idle
+            start = max(self._virtual_time, self._last_finish.get(tenant, 0.0))
+            finish = start + cost / self.weight(tenant)
+            self._last_finish[tenant] = finish
+            queue.append((finish, item))
+            if len(queue) == 1:
+                self._push_head(tenant, finish)
+            self._size += 1
+            self._cond.notify()
+
+    def pop(self, timeout: Optional[float] = None) -> Optional[Tuple[str, Any]]:
+        """
+        Dequeue the event with the smallest finish tag, waiting for one
+        :return: (tenant, item), None on timeout or once the queue is closed and drained
+        """
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._heads or self._closed, timeout):
+                return None
+            if not self._heads:
+                return None
+            finish, _, tenant = heapq.heappop(self._heads)
+            queue = self._queues[tenant]
+            _, item = queue.popleft()
+            self._virtual_time = finish
+            if queue:
+                self._push_head(tenant, queue[0][0])
+            else:
+                # Forget idle tenants, they restart from the virtual time
+                del self._queues[tenant]
+                del self._last_finish[tenant]
+            self._size -= 1
+            return tenant, item
+
+    def close(self):
+        """ Wake the consumers up: pop returns the remaining events, then None """
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def pending(self, tenant: Optional[str] = None) -> int:
+        with self._cond:
+            if tenant is None:
+                return self._size
+            return len(self._queues.get(tenant, ()))
+
+    def __len__(self) -> int:
+        return self.pending()
+
+    def _push_head(self, tenant: str, finish: float):
+        self._seq += 1
+        heapq.heappush(self._heads, (finish, self._seq, tenant))
@@ -0,0 +1,96 @@
+from typing import Dict, Optional, Tuple
+
+from domain.models.monitored_service import MonitoredService
+
+""" Incident State Machine
+Table-driven transitions of an incident: the (state, event) pair of a Monitored Service is looked up
+once in TRANSITIONS, giving the actions to run instead of branching on its fields in every handler.
+State actions mutate the service inside the pager transaction (apply), side-effect actions (ARM,
+NOTIFY, CANCEL) are run by the pager once the transaction is committed. Escalation delays are read
+from the compiled level, so arming a timeout costs a single lookup. Escalating only needs the policy
+the incident was opened with, which the pager keeps: a timeout never calls the EP Service.
+"""
+
+# States
+HEALTHY = 'healthy'
+ALERTING = 'alerting'
+ACKNOWLEDGED = 'acknowledged'
+
+# Events
+ALERT = 'alert'
+ACKNOWLEDGE = 'acknowledge'
+RECOVER = 'healthy'
+TIMEOUT = 'timeout'
+
+# State actions, applied in the transaction
+OPEN = 'open'
+ESCALATE = 'escalate'
+ACK = 'ack'
+RESET = 'reset'
+# Side-effect actions, run once committed
+ARM = 'arm'
+NOTIFY = 'notify'
+CANCEL = 'cancel'
+
+Actions = Tuple[str, ...]
+
+TRANSITIONS: Dict[Tuple[str, str], Actions] = {
+    (HEALTHY, ALERT): (OPEN, ARM, NOTIFY),
+    # Duplicated alerts of an open incident
+    (ALERTING, ALERT): (),
+    (ACKNOWLEDGED, ALERT): (),
+    (HEALTHY, ACKNOWLEDGE): (),
+    (ALERTING, ACKNOWLEDGE): (ACK, CANCEL),
+    # Repeated acknowledgements and healthy heartbeats: nothing is saved, logged or cancelled
+    (ACKNOWLEDGED, ACKNOWLEDGE): (),
+    (HEALTHY, RECOVER): (),
+    (ALERTING, RECOVER): (RESET, CANCEL),
+    (ACKNOWLEDGED, RECOVER): (RESET, CANCEL),
+    # Stale timeouts: the incident is over or acknowledged
+    (HEALTHY, TIMEOUT): (),
+    (ALERTING, TIMEOUT): (ESCALATE, ARM, NOTIFY),
+    (ACKNOWLEDGED, TIMEOUT): (),
+}
+
+# Actions needing the compiled policy of the service
+_POLICY_ACTIONS = frozenset((OPEN, ESCALATE))
+
+
+def state_of(service: MonitoredService) -> str:
+    if service.status != 'unhealthy':
+        return HEALTHY
+    return ACKNOWLEDGED if service.acknowledged else ALERTING
+
+
+def transition(service: MonitoredService, event: str) -> Actions:
+    """
+    Actions of an event in the current state of a service
+    :param event: ALERT, ACKNOWLEDGE, RECOVER or TIMEOUT
+    """
+    return TRANSITIONS[state_of(service), event]
+
+
+def needs_policy(actions: Actions) -> bool:
+    """ Whether the policy must be loaded before applying the actions """
+    return not _POLICY_ACTIONS.isdisjoint(actions)
+
+
+def apply(service: MonitoredService, actions: Actions, msg: Optional[str] = None) -> bool:
+    """
+    Apply the state actions of a transition to a service
+    :param msg: The alert message, for OPEN
+    :return: False if the service is left unchanged (no action, or the last level was already reached)
+    """
+    if not actions:
+        return False
+    for action in actions:
+        if action == OPEN:
+            service.set_unhealthy(msg)
+        elif action == ESCALATE:
+            if not service.escalate():
+                return False
+        elif action == ACK:
+            service.set_acknowledged()
+        elif action == RESET:
+            service.set_healthy()
+    return True
@@ -0,0 +1,216 @@
+import asyncio
+import functools
+import time
+from contextlib import nullcontext
+from typing import Callable, ContextManager, Dict, Iterable, List, Optional
+
+from application.interfaces.escalation_policy_service import IEscalationPolicyService
+from application.interfaces.mail_service import IMailService
+from application.interfaces.metrics import (
+    HANDLER_ERRORS, HANDLER_SECONDS, NOTIFICATION_ERRORS, NOTIFICATION_SECONDS, STAGE_SECONDS, TRANSITIONS, IMetrics
+)
+from application.interfaces.monitored_service_repository import IMonitoredServiceRepository
+from application.interfaces.sms_service import ISMSService
+from application.interfaces.time_service import ITimerService
+from domain.models.escalation_policy import EscalationPolicy
+from domain.models.monitored_service import MonitoredService
+from domain.models.target import Target
+
+""" Instrumentation
+Decorators timing each stage of the pager hot paths, applied when the adapters are composed:
+repository reads and writes, policy loads, notifications (per channel) and timers. instrument_handlers
+times the handlers of a ServicePager or AsyncServicePager and runs an optional profiling hook around them;
+a profiler is only enabled while an async handler runs, not while it awaits.
+Nothing is wrapped when metrics are disabled, so the hot paths run exactly as without instrumentation.
+"""
+
+HANDLERS = ('handle_alert', 'handle_alerts', 'handle_acknowledge', 'handle_healthy', 'handle_timeout', 'handle_timeouts')
+
+# Context manager factory run around each handler call, e.g. a profiler. When it yields an object with
+# enable() and disable() (a cProfile.Profile), async handlers are only profiled while they run
+ProfilingHook = Callable[[str], ContextManager]
+
+
+class NullMetrics(IMetrics):
+    """ Discards everything, for callers that always expect metrics """
+    def increment(self, name: str, value: float = 1, **labels: str):
+        pass
+
+    def observe(self, name: str, seconds: float, **labels: str):
+        pass
+
+
+class InstrumentedMonitoredServiceRepository(IMonitoredServiceRepository):
+    def __init__(self, repository: IMonitoredServiceRepository, metrics: IMetrics):
+        self.repository = repository
+        self.metrics = metrics
+        self._get = metrics.histogram_of(STAGE_SECONDS, stage='repository_get')
+        self._save = metrics.histogram_of(STAGE_SECONDS, stage='repository_save')
+        self._get_many = metrics.histogram_of(STAGE_SECONDS, stage='repository_get_many')
+        self._save_many = metrics.histogram_of(STAGE_SECONDS, stage='repository_save_many')
+
+    def get(self, service_id: str) -> MonitoredService:
+        started = time.perf_counter()
+        try:
+            return self.repository.get(service_id)
+        finally:
+            self._get(time.perf_counter() - started)
+
+    def save(self, service: MonitoredService) -> MonitoredService:
+        started = time.perf_counter()
+        try:
+            return self.repository.save(service)
+        finally:
+            self._save(time.perf_counter() - started)
+
+    def get_many(self, service_ids: Iterable[str]) -> Dict[str, MonitoredService]:
+        started = time.perf_counter()
+        try:
+            return self.repository.get_many(service_ids)
+        finally:
+            self._get_many(time.perf_counter() - started)
+
+    def save_many(self, services: List[MonitoredService]) -> List[MonitoredService]:
+        started = time.perf_counter()
+        try:
+            return self.repository.save_many(services)
+        finally:
+            self._save_many(time.perf_counter() - started)
+
+
+class InstrumentedEscalationPolicyService(IEscalationPolicyService):
+    def __init__(self, policy_service: IEscalationPolicyService, metrics: IMetrics):
+        self.policy_service = policy_service
+        self.metrics = metrics
+        self._get = metrics.histogram_of(STAGE_SECONDS, stage='load_policy')
+
+    def get(self, service_id: str) -> EscalationPolicy:
+        started = time.perf_counter()
+        try:
+            return self.policy_service.get(service_id)
+        finally:
+            self._get(time.perf_counter() - started)
+
+
+class InstrumentedNotificationService(IMailService, ISMSService):
+    def __init__(self, notification_service, metrics: IMetrics, channel: str):
+        """
+        :param notification_service: The IMailService or ISMSService of the channel
+        :param channel: Channel label of the latency histogram
+        """
+        self.notification_service = notification_service
+        self.metrics = metrics
+        self.channel = channel
+        self._notify = metrics.histogram_of(NOTIFICATION_SECONDS, channel=channel)
+        self._error = metrics.counter_of(NOTIFICATION_ERRORS, channel=channel)
+
+    def notify(self, target: Target, service: MonitoredService, msg: str):
+        started = time.perf_counter()
+        try:
+            return self.notification_service.notify(target, service, msg)
+        except Exception:
+            self._error()
+            raise
+        finally:
+            self._notify(time.perf_counter() - started)
+
+
+class InstrumentedTimerService(ITimerService):
+    def __init__(self, timer_service: ITimerService, metrics: IMetrics):
+        self.timer_service = timer_service
+        self.metrics = metrics
+        self._add = metrics.histogram_of(STAGE_SECONDS, stage='add_timeout')
+        self._cancel = metrics.histogram_of(STAGE_SECONDS, stage='cancel_timeout')
+
+    def add_timeout(self, msId: str, minutes: int):
+        started = time.perf_counter()
+        try:
+            return self.timer_service.add_timeout(msId, minutes)
+        finally:
+            self._add(time.perf_counter() - started)
+
+    def cancel_timeout(self, msId: str):
+        started = time.perf_counter()
+        try:
+            return self.timer_service.cancel_timeout(msId)
+        finally:
+            self._cancel(time.perf_counter() - started)
+
+
+def instrument_handlers(pager, metrics: IMetrics, hook: Optional[ProfilingHook] = None):
+    """
+    Time the handlers of a pager (sync or async), replacing them on the instance
+    :param pager: A ServicePager or an AsyncServicePager
+    :param metrics: Receives the handler durations and errors
+    :param hook: Entered around each handler call with the handler name, e.g. to profile it
+    """
+    for name in HANDLERS:
+        handler = getattr(pager, name)
+        timed = _timed_coroutine if asyncio.iscoroutinefunction(handler) else _timed
+        setattr(pager, name, timed(handler, name, metrics, hook))
+    return pager
+
+
+def _timed(handler: Callable, name: str, metrics: IMetrics, hook: Optional[ProfilingHook]) -> Callable:
+    observe = metrics.histogram_of(HANDLER_SECONDS, handler=name)
+    error = metrics.counter_of(HANDLER_ERRORS, handler=name)
+
+    @functools.wraps(handler)
+    def wrapper(*args):
+        started = time.perf_counter()
+        try:
+            with hook(name) if hook else nullcontext():
+                return handler(*args)
+        except Exception:
+            error()
+            raise
+        finally:
+            observe(time.perf_counter() - started)
+    return wrapper
+
+
+def _timed_coroutine(handler: Callable, name: str, metrics: IMetrics, hook: Optional[ProfilingHook]) -> Callable:
+    observe = metrics.histogram_of(HANDLER_SECONDS, handler=name)
+    error = metrics.counter_of(HANDLER_ERRORS, handler=name)
+
+    @functools.wraps(handler)
+    async def wrapper(*args):
+        started = time.perf_counter()
+        try:
+            with hook(name) if hook else nullcontext() as profiler:
+                if not hasattr(profiler, 'enable'):
+                    return await handler(*args)
+                profiler.disable()
+                return await _ProfiledSteps(handler(*args), profiler)
+        except Exception:
+            error()
+            raise
+        finally:
+            observe(time.perf_counter() - started)
+    return wrapper
+
+
+class _ProfiledSteps:
+    """ Awaits a coroutine with the profiler enabled while it runs, disabled while it waits """
+    def __init__(self, coroutine, profiler):
+        self.coroutine = coroutine
+        self.profiler = profiler
+
+    def __await__(self):
+        value, thrown = None, None
+        while True:
+            self.profiler.enable()
+            try:
+                yielded = self.coroutine.send(value) if thrown is None else self.coroutine.throw(thrown)
+            except StopIteration as stop:
+                return stop.value
+            finally:
+                self.profiler.disable()
+            try:
+                value, thrown = (yield yielded), None
+            except GeneratorExit:
+                self.coroutine.close()
+                raise
+            except BaseException as e:
+                # Cancellation: delivered to the coroutine
+                value, thrown = None, e
@@ -0,0 +1,132 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from domain.models.monitored_service import MonitoredService
+from domain.models.target import Target
+
+""" Notification Dispatcher
+Fans the notifications of an escalation level out to its targets concurrently.
+Each channel (mail, SMS) has its own bounded worker pool, so a slow provider only delays
+its own targets, and every target has a delivery timeout: notifying a level takes as long
+as its slowest target instead of the sum of all of them.
+"""
+
+DEFAULT_CHANNEL_LIMITS = {'mail': 16, 'sms': 8}
+
+
+class DeliveryResult:
+    def __init__(self, target: Target, delivered: bool, elapsed: float, error: Optional[BaseException] = None):
+        self.target = target
+        self.channel = target.channel
+        self.delivered = delivered
+        self.elapsed = elapsed
+        self.error = error
+
+    def __repr__(self) -> str:
+        status = 'delivered' if self.delivered else f'failed: {self.error!r}'
+        return f"DeliveryResult({self.channel}, {status}, {self.elapsed * 1000:.1f}ms)"
+
+
+class NotificationDispatcher:
+    def __init__(self,
+        channel_limits: Optional[Dict[str, int]] = None,
+        timeout: float = 10.0,
+        default_limit: int = 4
+    ):
+        """
+        :param channel_limits: Maximum number of concurrent deliveries per channel
+        :param timeout: Seconds to wait for a target before reporting it as failed
+        :param default_limit: Concurrency of channels missing from channel_limits
+        """
+        self.channel_limits = {**DEFAULT_CHANNEL_LIMITS, **(channel_limits or {})}
+        self.timeout = timeout
+        self.default_limit = default_limit
+        self._executors: Dict[str, ThreadPoolExecutor] = {}
+        self._lock = threading.Lock()
+
+    async def dispatch(self,
+        service: MonitoredService,
+        deliveries: Optional[Sequence[Tuple[Target, Any]]] = None,
+        message: Optional[str] = None
+    ) -> List[DeliveryResult]:
+        """
+        Notify targets concurrently
+        :param service: The alerting monitored service
+        :param deliveries: (target, sender) pairs to notify, defaults to the current level of the service
+        :param message: Message to send, defaults to the alert message of the service
+        :return: One delivery result per target, in the same order
+        """
+        if deliveries is None:
+            deliveries = service.current_deliveries()
+        if message is None:
+            message = service.alert_msg
+
+        loop = asyncio.get_running_loop()
+
+        async def deliver(target: Target, sender) -> DeliveryResult:
+            started = time.perf_counter()
+            future = loop.run_in_executor(self._executor(target.channel), _send, target, sender, service, message)
+            try:
+                elapsed = await asyncio.wait_for(future, self.timeout)
+            except asyncio.TimeoutError:
+                return DeliveryResult(target, False, time.perf_counter() - started, TimeoutError("Delivery timed out"))
+            except Exception as e:
+                return DeliveryResult(target, False, time.perf_counter() - started, e)
+            return DeliveryResult(target, True, elapsed)
+
+        return list(await asyncio.gather(*(deliver(target, sender) for target, sender in deliveries)))
+
+    def notify(self, service: MonitoredService) -> List[DeliveryResult]:
+        """
+        Blocking variant of dispatch for synchronous callers (ServicePager).
+        Notifies the current level of the service.
+        """
+        deliveries = service.current_deliveries()
+        targets = [target for target, _ in deliveries]
+        message = service.alert_msg
+
+        started = time.perf_counter()
+        futures: List[Future] = [
+            self._executor(target.channel).submit(_send, target, sender, service, message)
+            for target, sender in deliveries
+        ]
+        wait(futures, timeout=self.timeout)
+
+        results = []
+        for target, future in zip(targets, futures):
+            if not future.done():
+                future.cancel()
+                results.append(DeliveryResult(target, False, time.perf_counter() - started, TimeoutError("Delivery timed out")))
+            elif future.exception() is not None:
+                results.append(DeliveryResult(target, False, time.perf_counter() - started, future.exception()))
+            else:
+                results.append(DeliveryResult(target, True, future.result()))
+        return results
+
+    def close(self):
+        """ Shut the channel pools down, waiting for in-flight deliveries """
+        for executor in self._executors.values():
+            executor.shutdown(wait=True)
+        self._executors.clear()
+
+    def _executor(self, channel: str) -> ThreadPoolExecutor:
+        executor = self._executors.get(channel)
+        if executor is None:
+            with self._lock:
+                executor = self._executors.get(channel)
+                if executor is None:
+                    limit = self.channel_limits.get(channel, self.default_limit)
+                    executor = ThreadPoolExecutor(max_workers=limit, thread_name_prefix=f'notify-{channel or "default"}')
+                    self._executors[channel] = executor
+        return executor
+
+
+def _send(target: Target, sender, service: MonitoredService, message: str) -> float:
+    started = time.perf_counter()
+    if sender is None:
+        raise ValueError(f"No sender bound for channel '{target.channel}'")
+    target.notify(service, message, sender)
+    return time.perf_counter() - started
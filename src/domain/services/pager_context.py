@@ -0,0 +1,21 @@
+from typing import Any, Dict
+
+from application.interfaces.escalation_policy_service import IEscalationPolicyService
+from domain.services.policy_compiler import PolicyCompiler
+
+""" Pager Context
+Services a pager resolves once at construction and hands to its Monitored Services: the EP Service
+to load policies from, and the senders of each channel, bound into the compiled targets by the
+context compiler. Each pager has its own context, several pagers can run side by side in a process.
+"""
+
+
+class PagerContext:
+    def __init__(self, escalation_service: IEscalationPolicyService, senders: Dict[str, Any]):
+        """
+        :param escalation_service: EP Service the policies are loaded from
+        :param senders: Channel -> sender (IMailService, ISMSService) of the targets
+        """
+        self.escalation_service = escalation_service
+        self.senders = dict(senders)
+        self.compiler = PolicyCompiler(self.senders)
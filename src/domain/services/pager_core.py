@@ -0,0 +1,175 @@
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from application.interfaces.event_log import IEventLog
+from application.interfaces.metrics import TRANSITIONS, IMetrics
+from application.interfaces.incident_history import IIncidentHistory
+from domain.models.escalation_policy import EscalationPolicy
+from domain.models.monitored_service import MonitoredService
+from domain.services.alert_suppressor import AlertSuppressor
+from domain.services import incident_state_machine as fsm
+from domain.services.incident_state_machine import Actions
+from domain.services.pager_context import PagerContext
+
+""" Pager Core
+State and transaction logic shared by the ServicePager and the AsyncServicePager, which only differ
+in how they wait on I/O. A transaction reads the services, plans their transitions in the incident
+state machine, loads the policies the transitions need, applies them and saves the services
+(compare-and-swap); its side effects are run once it is committed.
+An incident escalates along the policy fetched when it was opened: that policy is kept per open
+incident, so a timeout is handled without any EP Service call. Pagers handling the events of the same
+services (the HTTP and the timer pagers of a server) share these policies, each compiling them with
+its own senders.
+"""
+
+# Planned transition of a service: (service, alert message, actions)
+Pending = Tuple[MonitoredService, Optional[str], Actions]
+Committed = Tuple[MonitoredService, Actions]
+
+
+class AlertBatch(NamedTuple):
+    """ Outcome of a batch of alerts """
+    # IDs of the monitored services that became unhealthy
+    alerted: List[str]
+    # IDs of the unknown services, whose alerts were dropped
+    missing: List[str]
+
+
+class PagerCore:
+    def __init__(self,
+        timer_system: Any,
+        escalation_system: Any,
+        mail_system: Any,
+        sms_system: Any,
+        repository: Any,
+        notifier: Any = None,
+        max_retries: int = 5,
+        event_log: Optional[IEventLog] = None,
+        suppressor: Optional[AlertSuppressor] = None,
+        metrics: Optional[IMetrics] = None,
+        history: Optional[IIncidentHistory] = None,
+        incident_policies: Optional[Dict[str, EscalationPolicy]] = None
+    ):
+        # Services, blocking or awaitable depending on the pager
+        self.time_service = timer_system
+        self.repository = repository
+        self.escalation_service = escalation_system
+        self.mail_service = mail_system
+        self.sms_service = sms_system
+        # Concurrent fan-out or queued, retried deliveries; targets are notified by the pager without it
+        self.notifier = notifier
+        # Attempts of a transaction losing compare-and-swap races before giving up
+        self.max_retries = max_retries
+        # Write-ahead log of committed transitions, replayed after a crash
+        self.event_log = event_log
+        # Drops duplicated and flapping alerts before any I/O
+        self.suppressor = suppressor
+        # Counts committed transitions, stages are timed by the instrumented adapters
+        self.metrics = metrics
+        # Timestamped incidents (alerts, escalations, notifications, acks, resolves) for analytics
+        self.history = history
+        # Resolved once: the loaded policies carry the senders of this pager
+        self.context = PagerContext(self.escalation_service, {'mail': self.mail_service, 'sms': self.sms_service})
+        # Service ID -> policy its open incident was opened with, as fetched, dropped once acknowledged
+        # or recovered; shared with the other pagers of the same services
+        self.incident_policies: Dict[str, EscalationPolicy] = {} if incident_policies is None else incident_policies
+
+    # ------------ TRANSACTIONS ------------
+
+    def _alerts_to_process(self, alerts: List[Tuple[str, str]]) -> Dict[str, str]:
+        """ Message of each alerted service: only the first alert of a service counts, suppressed ones are dropped """
+        messages: Dict[str, str] = {}
+        for service_id, msg in alerts:
+            if service_id in messages:
+                continue
+            if self._suppressed(service_id, msg):
+                continue
+            messages[service_id] = msg
+        return messages
+
+    def _suppressed(self, service_id: str, msg: str) -> bool:
+        # Only checked: the incident is recorded once committed (_track)
+        return self.suppressor is not None and self.suppressor.should_suppress(service_id, msg, record=False)
+
+    @staticmethod
+    def _require(service: Optional[MonitoredService], service_id: str) -> MonitoredService:
+        if not service:
+            raise ValueError(f"Missing service '{service_id}'")
+        return service
+
+    @staticmethod
+    def _known(services: Dict[str, MonitoredService], messages: Dict[str, str],
+               missing: List[str]) -> List[Tuple[MonitoredService, str]]:
+        """ (service, message) of the known services of a batch, the others are reported in missing """
+        missing[:] = [service_id for service_id in messages if not services.get(service_id)]
+        return [(services[service_id], msg) for service_id, msg in messages.items() if services.get(service_id)]
+
+    @staticmethod
+    def _plan(services: List[Tuple[MonitoredService, Optional[str]]], event: str) -> List[Pending]:
+        """ Transitions of an event to a batch of services, the ones with nothing to do are dropped """
+        pending = [(service, msg, fsm.transition(service, event)) for service, msg in services]
+        return [(service, msg, actions) for service, msg, actions in pending if actions]
+
+    def _needing_policy(self, pending: List[Pending]) -> List[MonitoredService]:
+        """
+        Services whose policy must be loaded before their transition is applied: the ones opening an
+        incident, which follows the current policy. Escalations reuse the policy of their incident.
+        """
+        needing = []
+        for service, _, actions in pending:
+            if not fsm.needs_policy(actions):
+                continue
+            if fsm.OPEN not in actions:
+                if service.policy is not None:
+                    continue
+                policy = self.incident_policies.get(service.id)
+                if policy is not None:
+                    service.attach_policy(policy, self.context.compiler)
+                    continue
+            needing.append(service)
+        return needing
+
+    def _attach(self, services: List[MonitoredService], policies: List[EscalationPolicy]) -> Dict[str, EscalationPolicy]:
+        """ Attach the policies fetched for services, compiled with the senders of this pager """
+        for service, policy in zip(services, policies):
+            service.attach_policy(policy, self.context.compiler)
+        return {service.id: policy for service, policy in zip(services, policies)}
+
+    def _apply(self, pending: List[Pending], fetched: Dict[str, EscalationPolicy]) -> List[Committed]:
+        """
+        Apply the planned transitions, the ones leaving their service unchanged are dropped
+        :param fetched: Service ID -> policy fetched for the transaction, kept for the incidents it opens
+        """
+        committed = [(service, actions) for service, msg, actions in pending if fsm.apply(service, actions, msg)]
+        for service, actions in committed:
+            if fsm.OPEN in actions:
+                self.incident_policies[service.id] = fetched[service.id]
+            elif fsm.ACK in actions or fsm.RESET in actions:
+                self.incident_policies.pop(service.id, None)
+        return committed
+
+    # ------------ SIDE EFFECTS ------------
+
+    def _count(self, event: str, services: List[MonitoredService]):
+        if self.metrics is not None:
+            self.metrics.increment(TRANSITIONS, len(services), event=event)
+
+    def _persist(self, event: str, services: List[MonitoredService]):
+        """ Log the committed transitions, blocking (fsync): run off the event loop by the async pager """
+        if self.event_log is not None:
+            self.event_log.record(event, services)
+        if self.history is not None:
+            self.history.record(event, services)
+
+    def _record_notifications(self, service: MonitoredService):
+        if self.history is not None:
+            self.history.record_notifications(service)
+
+    def _track(self, committed: List[Committed]):
+        """ Feed the suppressor with the committed incidents and recoveries, a RESET is always a real recovery """
+        if self.suppressor is None:
+            return
+        for service, actions in committed:
+            if fsm.OPEN in actions:
+                self.suppressor.record_alert(service.id, service.alert_msg)
+            elif fsm.RESET in actions:
+                self.suppressor.record_healthy(service.id)
@@ -1,58 +1,97 @@
+import logging
+
 from application.interfaces.escalation_policy_service import IEscalationPolicyService
 from application.interfaces.mail_service import IMailService
 from application.interfaces.sms_service import ISMSService
 from application.interfaces.time_service import ITimerService
-from application.interfaces.monitored_service_repository import IMonitoredServiceRepository
-from domain.services.service_provider import ServiceProvider
+from application.interfaces.monitored_service_repository import ConcurrentModificationError, IMonitoredServiceRepository
+from domain.services.pager_core import AlertBatch, Committed, PagerCore
+from domain.models.escalation_policy import EscalationPolicy
+from domain.models.monitored_service import MonitoredService
+from application.interfaces.event_log import IEventLog
+from application.interfaces.metrics import DELIVERY_FAILURES, IMetrics
+from application.interfaces.incident_history import IIncidentHistory
+from domain.services.alert_suppressor import AlertSuppressor
+from domain.services import incident_state_machine as fsm
+from domain.services.incident_state_machine import Actions
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Tuple, TypeVar
+
+if TYPE_CHECKING:
+    # Its asyncio fan-out is only loaded by the callers building one
+    from domain.services.notification_dispatcher import DeliveryResult, NotificationDispatcher
 
 """ Pager Service
 This service is responsible for handling alerts, acknowledgments or health events and timeouts from the different external systems.
 It manage all the core logic of the system, and it is the main entry point for the system.
 """
 
-class ServicePager:
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+class ServicePager(PagerCore):
     def __init__(self,
         timer_system: ITimerService,
         escalation_system: IEscalationPolicyService,
         mail_system: IMailService,
         sms_system: ISMSService,
-        repository: IMonitoredServiceRepository
+        repository: IMonitoredServiceRepository,
+        notifier: Optional['NotificationDispatcher'] = None,
+        max_retries: int = 5,
+        event_log: Optional[IEventLog] = None,
+        suppressor: Optional[AlertSuppressor] = None,
+        metrics: Optional[IMetrics] = None,
+        history: Optional[IIncidentHistory] = None,
+        incident_policies: Optional[Dict[str, EscalationPolicy]] = None
     ):
-        # Services
-        self.time_service = timer_system
-        self.repository = repository
-        self.escalation_service = escalation_system
-        self.mail_service = mail_system
-        self.sms_service = sms_system
-        self.__register_services()
-        
-        
+        # NotificationDispatcher (concurrent fan-out) or DeliveryService (queued, retried deliveries),
+        # targets are notified one by one without it
+        super().__init__(timer_system, escalation_system, mail_system, sms_system, repository,
+                         notifier, max_retries, event_log, suppressor, metrics, history, incident_policies)
+
+
     # ------------ HANDLERS METHODS ------------
-        
+    # Each handler reads, mutates and saves the service in a compare-and-swap transaction,
+    # retried when a concurrent handler saved the service first. The mutations and side effects
+    # of an event are looked up in the incident state machine. Side effects (notifications,
+    # timers) only run once the transaction is committed, so a level is notified exactly once.
+
     def handle_alert(self, service_id: str, msg: str):
         """
         Process an alert
         :param ms_id: ID of the monitored service
         :param msg: The alert message
         """
-        
-        service = self.repository.get(service_id)
+        if self._suppressed(service_id, msg):
+            return
 
-        if not service:
-            raise ValueError(f"Missing service '{service_id}'")
+        # Nothing to do for a duplicated alert
+        self.__handle(service_id, fsm.ALERT, msg)
 
-        # Do nothing: duplicated alert with no timeout
-        if service.status == 'unhealthy':
-            return
+    def handle_alerts(self, alerts: List[Tuple[str, str]]) -> AlertBatch:
+        """
+        Process a batch of alerts with a single repository read and a single write. Alerts of unknown
+        services are dropped and reported, the others are processed.
+        :param alerts: (ID of the monitored service, alert message) pairs
+        :return: IDs of the monitored services that became unhealthy, and of the unknown ones
+        """
+        messages = self._alerts_to_process(alerts)
+        if not messages:
+            return AlertBatch([], [])
 
-        # First alert
-        service.load_policy()
-        service.set_unhealthy(msg)
-        self.repository.save(service)
-        # Notify
-        service.notify()
-        # Add a timeout
-        self.time_service.add_timeout(service_id, 15)
+        missing: List[str] = []
+
+        def transaction() -> List[Committed]:
+            services = self.repository.get_many(list(messages))
+
+            # Policies are loaded once per distinct service, none for services already unhealthy
+            alerted = self.__transitions(self._known(services, messages, missing), fsm.ALERT)
+            if alerted:
+                self.repository.save_many([service for service, _ in alerted])
+            return alerted
+
+        alerted = self.__commit(fsm.ALERT, transaction)
+        return AlertBatch([service.id for service, _ in alerted], missing)
 
 
 
@@ -62,15 +101,8 @@ class ServicePager:
         :param ms_id: ID of the monitored service
         :param msg: The alert message
         """
-        service = self.repository.get(ms_id)
-        if not service:
-            raise ValueError(f"Missing service '{ms_id}'")
-
-        if service.status == 'healthy':
-            return
-
-        service.set_acknowledged()
-        self.repository.save(service)
+        # Escalation is over: drop the pending timeout instead of letting it fire
+        self.__handle(ms_id, fsm.ACKNOWLEDGE)
 
     def handle_healthy(self, ms_id: str):
         """
@@ -78,12 +110,7 @@ class ServicePager:
         :param ms_id: ID of the monitored service
         :param msg: The alert message
         """
-        service = self.repository.get(ms_id)
-        if not service:
-            raise ValueError(f"Missing service '{ms_id}'")
-
-        service.set_healthy()
-        self.repository.save(service)
+        self.__handle(ms_id, fsm.RECOVER)
 
     def handle_timeout(self, ms_id: str):
         """
@@ -91,25 +118,108 @@ class ServicePager:
         :param ms_id: ID of the monitored service
         :param msg: The alert message
         """
-        service = self.repository.get(ms_id)
-        if not service:
-            raise ValueError(f"Missing service '{ms_id}'")
+        # Nothing to do when healthy, acknowledged or at the last level
+        self.__handle(ms_id, fsm.TIMEOUT)
 
-        if service.status == 'healthy' or service.acknowledged:
+    def handle_timeouts(self, ms_ids: List[str]):
+        """
+        Process a batch of escalation timeouts, as dispatched by the timer service,
+        with a single repository read and a single write
+        :param ms_ids: IDs of the monitored services whose timeout expired
+        """
+        def transaction() -> List[Committed]:
+            services = self.repository.get_many(ms_ids)
+
+            # Stale timeouts: the service is gone, healthy or acknowledged
+            escalated = self.__transitions(
+                [(services[ms_id], None) for ms_id in dict.fromkeys(ms_ids) if services.get(ms_id)], fsm.TIMEOUT
+            )
+            if escalated:
+                self.repository.save_many([service for service, _ in escalated])
+            return escalated
+
+        self.__commit(fsm.TIMEOUT, transaction)
+
+
+
+    def __handle(self, ms_id: str, event: str, msg: Optional[str] = None):
+        """ Apply an event to a single service, then run its side effects """
+        def transaction() -> List[Committed]:
+            service = self._require(self.repository.get(ms_id), ms_id)
+            committed = self.__transitions([(service, msg)], event)
+            if committed:
+                self.repository.save(service)
+            return committed
+
+        self.__commit(event, transaction)
+
+    def __transitions(self, services: List[Tuple[MonitoredService, Optional[str]]], event: str) -> List[Committed]:
+        """ Apply the transitions of an event to a batch of services, within a transaction """
+        pending = self._plan(services, event)
+        loading = self._needing_policy(pending)
+        fetched = self._attach(loading, [self.escalation_service.get(service.id) for service in loading])
+        return self._apply(pending, fetched)
+
+    def __commit(self, event: str, transaction: Callable[[], List[Committed]]) -> List[Committed]:
+        """ Run a transaction, journal what it committed and run the side effects """
+        committed = self.__with_retries(transaction)
+        self.__journal(event, [service for service, _ in committed])
+        self._track(committed)
+        errors = []
+        for service, actions in committed:
+            try:
+                self.__run(service, actions)
+            except Exception as e:
+                # The next services of a batch still get their timeouts armed and notifications sent
+                errors.append(e)
+        if errors:
+            raise errors[0]
+        return committed
+
+    def __run(self, service: MonitoredService, actions: Actions):
+        """ Run the side effects of a committed transition """
+        for action in actions:
+            if action == fsm.ARM:
+                # Armed first: a failing notification must not leave the incident without escalation
+                self.time_service.add_timeout(service.id, service.current_delay())
+            elif action == fsm.NOTIFY:
+                self.__notify(service)
+                self._record_notifications(service)
+            elif action == fsm.CANCEL:
+                self.time_service.cancel_timeout(service.id)
+
+    def __with_retries(self, transaction: Callable[[], T]) -> T:
+        """ Run a read-mutate-save transaction, starting over when it loses a race """
+        for attempt in range(self.max_retries):
+            try:
+                return transaction()
+            except ConcurrentModificationError:
+                if attempt == self.max_retries - 1:
+                    raise
+
+    def __journal(self, event: str, services: List[MonitoredService]):
+        # Logged once committed and before any side effect, so replay re-arms what was lost
+        if not services:
             return
+        self._count(event, services)
+        self._persist(event, services)
 
-        service.load_policy()
-        if service.escalate():
+    def __notify(self, service: MonitoredService):
+        if self.notifier is None:
             service.notify()
-            self.repository.save(service)
-            self.time_service.add_timeout(ms_id, 15)
-
-    
-    
-    def __register_services(self):
-        ServiceProvider.register('repository', self.repository)
-        ServiceProvider.register('escalation', self.escalation_service)
-        ServiceProvider.register('mail', self.mail_service)
-        ServiceProvider.register('time', self.time_service)
-        ServiceProvider.register('sms', self.sms_service)
-        
+        else:
+            # A DeliveryService retries on its own, a NotificationDispatcher reports each target
+            results = self.notifier.notify(service)
+            if isinstance(results, list):
+                self.__report(service, results)
+
+    def __report(self, service: MonitoredService, results: List['DeliveryResult']):
+        """ Log and count the failed deliveries of a dispatched level, they are not retried """
+        for result in results:
+            if result.delivered:
+                continue
+            logger.error("Notifying '%s' of service '%s' by %s failed: %r", result.target.address, service.id,
+                         result.channel, result.error)
+            if self.metrics is not None:
+                self.metrics.increment(DELIVERY_FAILURES, channel=result.channel)
+
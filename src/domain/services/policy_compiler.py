@@ -0,0 +1,105 @@
+import threading
+import weakref
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+from domain.models.compiled_policy import CompiledLevel, CompiledPolicy
+from domain.models.escalation_policy import EscalationPolicy
+from domain.models.level import DEFAULT_DELAY_MINUTES
+from domain.models.target import Target
+
+""" Policy Compiler
+Turns the Escalation Policies fetched from the EP Service into Compiled Policies, hash-consed:
+structurally identical policies (same levels, same targets) compile to a single shared instance,
+and identical targets across policies are shared too. Compiled policies are held weakly, they
+are dropped once no Monitored Service references them anymore.
+Each pager context has its own compiler, binding the targets to the senders of that pager.
+"""
+
+
+class PolicyCompiler:
+    def __init__(self, senders: Optional[Dict[str, Any]] = None):
+        """
+        :param senders: Channel -> sender (IMailService, ISMSService) bound to the compiled targets
+        """
+        self.senders = dict(senders or {})
+        # Structure -> shared instance
+        self._policies: 'weakref.WeakValueDictionary[Hashable, CompiledPolicy]' = weakref.WeakValueDictionary()
+        self._targets: Dict[Hashable, Target] = {}
+        # Source policy -> (version, compiled): the EP Service (or its cache) often returns the same object
+        self._sources: 'weakref.WeakKeyDictionary[EscalationPolicy, Tuple[int, CompiledPolicy]]' = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def compile(self, policy: EscalationPolicy) -> CompiledPolicy:
+        """
+        Compile a policy, compiled policies are returned as is
+        :param policy: The Escalation Policy of a Monitored Service
+        """
+        if isinstance(policy, CompiledPolicy):
+            return policy
+
+        version = getattr(policy, 'version', 0)
+        with self._lock:
+            compiled = self._compiled_source(policy, version)
+            if compiled is not None:
+                return compiled
+
+            levels = tuple(tuple(self._intern_target(target) for target in level.targets) for level in policy.levels)
+            delays = tuple(getattr(level, 'delay_minutes', DEFAULT_DELAY_MINUTES) for level in policy.levels)
+            key = tuple(
+                (level.level, delay, tuple(id(target) for target in targets))
+                for level, delay, targets in zip(policy.levels, delays, levels)
+            )
+            compiled = self._policies.get(key)
+            if compiled is None:
+                compiled = CompiledPolicy(tuple(
+                    CompiledLevel(level.level, targets, self.senders, delay)
+                    for level, targets, delay in zip(policy.levels, levels, delays)
+                ))
+                self._policies[key] = compiled
+            self._remember_source(policy, version, compiled)
+            return compiled
+
+    def __len__(self) -> int:
+        """ Number of distinct compiled policies alive """
+        return len(self._policies)
+
+    def _compiled_source(self, policy: EscalationPolicy, version: int):
+        try:
+            entry = self._sources.get(policy)
+        except TypeError:
+            return None
+        if entry is not None and entry[0] == version:
+            return entry[1]
+        return None
+
+    def _remember_source(self, policy: EscalationPolicy, version: int, compiled: CompiledPolicy):
+        try:
+            self._sources[policy] = (version, compiled)
+        except TypeError:
+            # Not weakly referenceable: compiled again on each load
+            pass
+
+    def _intern_target(self, target: Target) -> Target:
+        key = _target_key(target)
+        if key is None:
+            return target
+        # Targets are kept for the compiler lifetime: there are far fewer targets than services
+        return self._targets.setdefault(key, target)
+
+
+def _target_key(target: Target):
+    """ Structural key of a target: its class and attributes, None when they are not hashable """
+    try:
+        key = (type(target), tuple(sorted(vars(target).items())))
+        hash(key)
+    except TypeError:
+        return None
+    return key
+
+
+# Binds no sender: for callers notifying the targets themselves (channels, targets)
+policy_compiler = PolicyCompiler()
+
+
+def compile_policy(policy: EscalationPolicy) -> CompiledPolicy:
+    return policy_compiler.compile(policy)
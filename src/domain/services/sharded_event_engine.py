@@ -0,0 +1,355 @@
+import logging
+import os
+import pickle
+import queue
+import threading
+import time
+import zlib
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from domain.services.pager_service import ServicePager
+
+""" Sharded Event Engine
+Front of the ServicePager: events are routed to N shards by hashing their service ID.
+Each shard owns a queue and a single worker, so the events of a given Monitored Service are
+processed strictly in order while events of different services run in parallel.
+Shards are threads, or processes to use every core (each process then builds its own pager).
+Streams submit their events in batches: each shard receives its part of a batch as a single queue
+item, and the batch completes once every part is processed. Expired timeouts are split by shard the
+same way, each part handled by ServicePager.handle_timeouts with a single read and write.
+"""
+
+logger = logging.getLogger(__name__)
+
+# Event type -> ServicePager handler
+EVENT_HANDLERS = {
+    'alert': 'handle_alert',
+    'acknowledge': 'handle_acknowledge',
+    'healthy': 'handle_healthy',
+    'timeout': 'handle_timeout',
+}
+
+PagerFactory = Callable[[], ServicePager]
+# (event type, service ID, extra arguments)
+Event = Tuple[str, str, tuple]
+
+_STOP = None
+# Queue item of a batch part, instead of an event type
+_BATCH = 'batch'
+# Queue item of the expired timeouts of a shard
+_TIMEOUTS = 'timeouts'
+
+
+class ShardMetrics:
+    def __init__(self):
+        self.submitted = 0
+        self.processed = 0
+        self.failed = 0
+        self.started_at = time.monotonic()
+
+    @property
+    def queue_depth(self) -> int:
+        """ Events submitted but not processed yet """
+        return self.submitted - self.processed - self.failed
+
+    def as_dict(self) -> Dict[str, float]:
+        elapsed = time.monotonic() - self.started_at
+        completed = self.processed + self.failed
+        return {
+            'queue_depth': self.queue_depth,
+            'processed': self.processed,
+            'failed': self.failed,
+            'throughput': completed / elapsed if elapsed > 0 else 0.0,
+        }
+
+
+class ShardedEventEngine:
+    def __init__(self,
+        pager_factory: PagerFactory,
+        shards: Optional[int] = None,
+        mode: str = 'thread',
+        queue_size: int = 10_000
+    ):
+        """
+        :param pager_factory: Builds the pager of a shard. In process mode it runs in the shard process,
+                              so it must be picklable (a module-level function).
+        :param shards: Number of shards, defaults to the number of CPUs
+        :param mode: 'thread' or 'process'
+        :param queue_size: Capacity of each shard queue; submit blocks when it is full
+        """
+        if mode not in ('thread', 'process'):
+            raise ValueError(f"Unknown mode '{mode}'")
+
+        self.pager_factory = pager_factory
+        self.shards = shards or os.cpu_count() or 1
+        self.mode = mode
+        self.queue_size = queue_size
+
+        self._metrics = [ShardMetrics() for _ in range(self.shards)]
+        # Sequence -> (shard, future, number of events of a batch part or None)
+        self._futures: Dict[int, Tuple[int, Future, Optional[int]]] = {}
+        self._sequence = 0
+        self._lock = threading.Lock()
+        self._queues: List[Any] = []
+        self._workers: List[Any] = []
+        self._results: Any = None
+        self._collector: Optional[threading.Thread] = None
+        self._running = False
+
+    # ------------ LIFECYCLE ------------
+
+    def start(self):
+        if self._running:
+            return
+        if self.mode == 'thread':
+            self._start_threads()
+        else:
+            self._start_processes()
+        self._running = True
+
+    def stop(self):
+        """ Process every queued event, then stop the shards """
+        if not self._running:
+            return
+        for shard_queue in self._queues:
+            shard_queue.put(_STOP)
+        for worker in self._workers:
+            worker.join()
+        if self._collector is not None:
+            self._results.put(_STOP)
+            self._collector.join()
+        self._queues, self._workers, self._collector = [], [], None
+        self._running = False
+
+    # ------------ EVENTS ------------
+
+    def submit(self, event: str, service_id: str, *args) -> Future:
+        """
+        Queue an event on the shard of its service
+        :param event: One of EVENT_HANDLERS
+        :param service_id: ID of the monitored service
+        :param args: Extra handler arguments (the message of an alert)
+        :return: Future resolved with the handler result once the event is processed
+        """
+        if event not in EVENT_HANDLERS:
+            raise ValueError(f"Unknown event '{event}'")
+        if not self._running:
+            raise RuntimeError("The engine is not started")
+
+        # (sequence, event type, service ID, extra arguments)
+        return self._put(self.shard_of(service_id), event, service_id, args, None)
+
+    def submit_many(self, events: List[Event]) -> Future:
+        """
+        Queue a batch of events, split by shard; blocks while a shard queue is full
+        :param events: (event type, service ID, extra arguments) triples, in order
+        :return: Future resolved with the failures of the batch (event index -> exception) once every
+                 event is processed, it cannot be cancelled
+        """
+        for event, _, _ in events:
+            if event not in EVENT_HANDLERS:
+                raise ValueError(f"Unknown event '{event}'")
+        if not self._running:
+            raise RuntimeError("The engine is not started")
+
+        parts: Dict[int, List[Tuple[int, str, str, tuple]]] = {}
+        for index, (event, service_id, args) in enumerate(events):
+            parts.setdefault(self.shard_of(service_id), []).append((index, event, service_id, args))
+        batch: Future = Future()
+        # Not cancellable: the events of a stream are still processed after its client is gone
+        # (asyncio.wrap_future cancels it), and are then resolved into a running future
+        batch.set_running_or_notify_cancel()
+        if not parts:
+            batch.set_result({})
+            return batch
+
+        failures: Dict[int, Exception] = {}
+        remaining = [len(parts)]
+        lock = threading.Lock()
+
+        def part_done(part: List[Tuple[int, str, str, tuple]], future: Future):
+            error = future.exception()
+            with lock:
+                if error is None:
+                    failures.update(future.result())
+                else:
+                    # The whole part failed (its shard stopped): every event of it counts as failed
+                    failures.update((index, error) for index, _, _, _ in part)
+                remaining[0] -= 1
+                if remaining[0]:
+                    return
+            batch.set_result(failures)
+
+        for shard, part in parts.items():
+            self._put(shard, _BATCH, None, part, len(part)).add_done_callback(
+                lambda future, part=part: part_done(part, future)
+            )
+        return batch
+
+    def alert(self, service_id: str, msg: str) -> Future:
+        return self.submit('alert', service_id, msg)
+
+    def acknowledge(self, service_id: str) -> Future:
+        return self.submit('acknowledge', service_id)
+
+    def healthy(self, service_id: str) -> Future:
+        return self.submit('healthy', service_id)
+
+    def timeout(self, service_id: str) -> Future:
+        return self.submit('timeout', service_id)
+
+    def timeouts(self, service_ids: List[str]) -> List[Future]:
+        """
+        Timer service handler: expired timeouts are split by shard, each part handled as one batch
+        :return: Future of each timeout, that of its part: it fails with the whole part. Failures are logged
+                 whether or not the caller waits for them
+        """
+        if not self._running:
+            raise RuntimeError("The engine is not started")
+
+        parts: Dict[int, List[str]] = {}
+        for service_id in service_ids:
+            parts.setdefault(self.shard_of(service_id), []).append(service_id)
+        futures: Dict[str, Future] = {}
+        for shard, part in parts.items():
+            future = self._put(shard, _TIMEOUTS, None, part, len(part))
+            future.add_done_callback(lambda future, part=part: _log_failure(part, future))
+            futures.update((service_id, future) for service_id in part)
+        return [futures[service_id] for service_id in service_ids]
+
+    def shard_of(self, service_id: str) -> int:
+        # Stable across processes, unlike hash()
+        return zlib.crc32(service_id.encode()) % self.shards
+
+    # ------------ METRICS ------------
+
+    def metrics(self) -> Dict[str, Any]:
+        shards = [metrics.as_dict() for metrics in self._metrics]
+        return {
+            'queue_depth': sum(shard['queue_depth'] for shard in shards),
+            'throughput': sum(shard['throughput'] for shard in shards),
+            'shards': shards,
+        }
+
+    # ------------ INTERNALS ------------
+
+    def _put(self, shard: int, name: str, service_id: Optional[str], args: Any, size: Optional[int]) -> Future:
+        future: Future = Future()
+        with self._lock:
+            self._sequence += 1
+            sequence = self._sequence
+            self._futures[sequence] = (shard, future, size)
+            self._metrics[shard].submitted += 1 if size is None else size
+        self._queues[shard].put((sequence, name, service_id, args))
+        return future
+
+    def _start_threads(self):
+        self._queues = [queue.Queue(self.queue_size) for _ in range(self.shards)]
+        self._workers = [
+            threading.Thread(target=self._run_thread_shard, args=(shard,), name=f'shard-{shard}', daemon=True)
+            for shard in range(self.shards)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def _run_thread_shard(self, shard: int):
+        pager = self.pager_factory()
+        shard_queue = self._queues[shard]
+        while True:
+            event = shard_queue.get()
+            if event is _STOP:
+                return
+            sequence, name, service_id, args = event
+            try:
+                result = _handle(pager, name, service_id, args)
+            except Exception as e:
+                self._complete(sequence, False, e)
+            else:
+                self._complete(sequence, True, result)
+
+    def _start_processes(self):
+        # Only loaded in process mode: it is the heaviest import of the thread mode path
+        import multiprocessing
+        context = multiprocessing.get_context()
+        self._results = context.Queue()
+        self._queues = [context.Queue(self.queue_size) for _ in range(self.shards)]
+        self._workers = [
+            context.Process(target=_run_process_shard, args=(self.pager_factory, shard_queue, self._results),
+                            name=f'shard-{shard}', daemon=True)
+            for shard, shard_queue in enumerate(self._queues)
+        ]
+        for worker in self._workers:
+            worker.start()
+        self._collector = threading.Thread(target=self._collect, name='shard-results', daemon=True)
+        self._collector.start()
+
+    def _collect(self):
+        while True:
+            result = self._results.get()
+            if result is _STOP:
+                return
+            self._complete(*result)
+
+    def _complete(self, sequence: int, ok: bool, result: Any):
+        with self._lock:
+            shard, future, size = self._futures.pop(sequence)
+            metrics = self._metrics[shard]
+            if size is None:
+                size, failed = 1, 0 if ok else 1
+            else:
+                # A batch part resolves with its failures
+                failed = len(result) if ok else size
+            metrics.processed += size - failed
+            metrics.failed += failed
+        if ok:
+            future.set_result(result)
+        else:
+            future.set_exception(result)
+
+
+def _log_failure(service_ids: List[str], future: Future):
+    if future.exception() is not None:
+        logger.error("Timeouts of services %s failed", service_ids, exc_info=future.exception())
+
+
+def _handle(pager: ServicePager, name: str, service_id: Optional[str], args: Any) -> Any:
+    if name == _TIMEOUTS:
+        pager.handle_timeouts(args)
+        # Resolved like a batch part without failures: the part succeeds or fails as a whole
+        return {}
+    if name != _BATCH:
+        return getattr(pager, EVENT_HANDLERS[name])(service_id, *args)
+    # A failing event does not stop the next ones of the batch part
+    failures = {}
+    for index, event, event_service_id, event_args in args:
+        try:
+            getattr(pager, EVENT_HANDLERS[event])(event_service_id, *event_args)
+        except Exception as e:
+            failures[index] = e
+    return failures
+
+
+def _picklable(e: Exception) -> Exception:
+    # The exception crosses the process boundary: keep its type when it can be pickled
+    try:
+        pickle.dumps(e)
+    except Exception:
+        return RuntimeError(repr(e))
+    return e
+
+
+def _run_process_shard(pager_factory: PagerFactory, shard_queue, results):
+    pager = pager_factory()
+    while True:
+        event = shard_queue.get()
+        if event is _STOP:
+            return
+        sequence, name, service_id, args = event
+        try:
+            result = _handle(pager, name, service_id, args)
+            if name == _BATCH:
+                result = {index: _picklable(e) for index, e in result.items()}
+            results.put((sequence, True, result))
+        except Exception as e:
+            results.put((sequence, False, _picklable(e)))
@@ -0,0 +1,147 @@
+import asyncio
+import json
+from concurrent.futures import Executor
+from typing import AsyncIterable, AsyncIterator, Dict, List, Optional, Tuple, Union
+
+from domain.services.sharded_event_engine import Event, ShardedEventEngine
+
+""" Stream Ingest
+Persistent ingest path of the monitoring integrations: a connection streams NDJSON events,
+one per line, instead of paying an HTTP round trip per event:
+
+    {"type": "alert", "service_id": "service-1", "message": "Down!"}
+    {"type": "healthy", "service_id": "service-1"}
+
+Events are cut into batches (the lines of a received chunk, at most batch_size) and submitted to the
+ShardedEventEngine, whose shards keep the events of a service in order. Each batch is acknowledged
+once processed, in order, with the lines it rejected. A connection has at most max_in_flight batches
+waiting for their acknowledgement: past that it stops reading, and the client is slowed down by
+its transport (TCP window, WebSocket flow control).
+"""
+
+# Events a monitoring integration may stream, timeouts come from the timer service
+STREAM_EVENTS = ('alert', 'acknowledge', 'healthy')
+
+_END = None
+
+
+class StreamIngestor:
+    def __init__(self,
+        engine: ShardedEventEngine,
+        batch_size: int = 1000,
+        max_in_flight: int = 8,
+        executor: Optional[Executor] = None
+    ):
+        """
+        :param engine: Started engine processing the events
+        :param batch_size: Maximum number of events per batch
+        :param max_in_flight: Batches of a connection submitted but not acknowledged yet
+        :param executor: Runs the submissions, which block while a shard queue is full; the loop default when omitted
+        """
+        if batch_size < 1 or max_in_flight < 1:
+            raise ValueError("batch_size and max_in_flight must be positive")
+        self.engine = engine
+        self.batch_size = batch_size
+        self.max_in_flight = max_in_flight
+        self.executor = executor
+
+    async def ingest(self, chunks: AsyncIterable[Union[bytes, str]]) -> AsyncIterator[Dict]:
+        """
+        Ingest the events of a connection
+        :param chunks: Received chunks of NDJSON; a line may span chunks, the last one may lack its newline
+        :return: Acknowledgement of each batch, in order:
+                 {'batch': number, 'events': count, 'accepted': count, 'errors': [{'line': number, 'error': reason}]}
+        """
+        submitted: asyncio.Queue = asyncio.Queue()
+        # Released once the acknowledgement of a batch is consumed, so a slow client stops the reader too
+        in_flight = asyncio.Semaphore(self.max_in_flight)
+        reader = asyncio.ensure_future(self.__read(chunks, submitted, in_flight))
+        try:
+            while True:
+                batch = await submitted.get()
+                if batch is _END:
+                    break
+                yield await self.__acknowledge(*batch)
+                in_flight.release()
+            # Raises the error that stopped the reader, if any
+            await reader
+        finally:
+            reader.cancel()
+
+    async def __read(self, chunks: AsyncIterable[Union[bytes, str]], submitted: asyncio.Queue,
+                     in_flight: asyncio.Semaphore):
+        try:
+            number = 0
+            line = 0
+            pending = b''
+            async for chunk in chunks:
+                if isinstance(chunk, str):
+                    chunk = chunk.encode()
+                lines = (pending + chunk).split(b'\n')
+                # Incomplete until the next chunk
+                pending = lines.pop()
+                for start in range(0, len(lines), self.batch_size):
+                    batch = lines[start:start + self.batch_size]
+                    number += 1
+                    await in_flight.acquire()
+                    submitted.put_nowait(await self.__submit(number, line, batch))
+                    line += len(batch)
+            if pending.strip():
+                await in_flight.acquire()
+                submitted.put_nowait(await self.__submit(number + 1, line, [pending]))
+        finally:
+            submitted.put_nowait(_END)
+
+    async def __submit(self, number: int, first_line: int, lines: List[bytes]) -> Tuple:
+        """ Parse the lines of a batch and submit its valid events, in order """
+        events: List[Event] = []
+        # Line number of each submitted event
+        event_lines: List[int] = []
+        errors: List[Dict] = []
+        for offset, raw in enumerate(lines, first_line + 1):
+            if not raw.strip():
+                continue
+            try:
+                events.append(parse_event(raw))
+                event_lines.append(offset)
+            except ValueError as e:
+                errors.append({'line': offset, 'error': str(e)})
+        # Awaited before the next batch is submitted, so the shards receive the batches in order
+        future = await asyncio.get_running_loop().run_in_executor(self.executor, self.engine.submit_many, events)
+        return number, event_lines, errors, asyncio.wrap_future(future)
+
+    async def __acknowledge(self, number: int, event_lines: List[int], errors: List[Dict],
+                            processed: asyncio.Future) -> Dict:
+        failures = await processed
+        count = len(event_lines) + len(errors)
+        if failures:
+            errors = sorted(errors + [
+                {'line': event_lines[index], 'error': str(e)} for index, e in failures.items()
+            ], key=lambda error: error['line'])
+        return {'batch': number, 'events': count, 'accepted': count - len(errors), 'errors': errors}
+
+
+def parse_event(line: Union[bytes, str]) -> Event:
+    """
+    Parse an NDJSON event line
+    :return: (event type, service ID, extra arguments) for the engine
+    :raises ValueError: Malformed line, unknown event type or missing field
+    """
+    try:
+        event = json.loads(line)
+    except ValueError:
+        raise ValueError("Malformed JSON")
+    if not isinstance(event, dict):
+        raise ValueError("An event must be a JSON object")
+    kind = event.get('type', 'alert')
+    if kind not in STREAM_EVENTS:
+        raise ValueError(f"Unknown event type '{kind}'")
+    service_id = event.get('service_id')
+    if not isinstance(service_id, str) or not service_id:
+        raise ValueError("Missing service_id")
+    if kind != 'alert':
+        return kind, service_id, ()
+    message = event.get('message')
+    if not isinstance(message, str):
+        raise ValueError("Missing message")
+    return kind, service_id, (message,)
@@ -0,0 +1,260 @@
+import re
+import threading
+import zlib
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from application.interfaces.time_service import ITimerService
+from domain.services.fair_queue import WeightedFairQueue
+from domain.services.pager_service import ServicePager
+from domain.services.sharded_event_engine import EVENT_HANDLERS
+
+""" Tenant Host
+Hosts one ServicePager per tenant in a single process. Each pager is built by a factory with its
+own repository and policy cache, and a timer namespace on the shared timer service: timeouts of
+a tenant are keyed '<tenant><separator><service ID>' and routed back to its pager on expiry.
+Pagers are built on the first event of their tenant, outside of the host lock so a slow build only
+delays its own tenant, and the number of tenants can be capped.
+Events are routed to shards by tenant and service, so the events of a service stay in order, and
+each shard serves its tenants by weighted fair queuing: an alert storm of one tenant only delays
+its own events, the escalations of the others keep their share.
+"""
+
+# ASCII unit separator: cannot appear in a tenant name
+NAMESPACE_SEPARATOR = '\x1f'
+# Tenant names end up in file names and URLs
+TENANT_PATTERN = re.compile(r'^[A-Za-z0-9][A-Za-z0-9_.-]{0,63}$')
+
+# Builds the pager of a tenant around its timer namespace, raises ValueError for unknown tenants
+TenantPagerFactory = Callable[[str, Optional[ITimerService]], ServicePager]
+
+_STOP = None
+
+
+class NamespacedTimerService(ITimerService):
+    """ Timer namespace of a tenant on a shared timer service """
+    def __init__(self, timer_service: ITimerService, tenant: str):
+        self.timer_service = timer_service
+        self.tenant = tenant
+        self.prefix = tenant + NAMESPACE_SEPARATOR
+
+    def add_timeout(self, msId: str, minutes: int):
+        return self.timer_service.add_timeout(self.prefix + msId, minutes)
+
+    def cancel_timeout(self, msId: str):
+        return self.timer_service.cancel_timeout(self.prefix + msId)
+
+
+class TenantMetrics:
+    def __init__(self):
+        self.submitted = 0
+        self.processed = 0
+        self.failed = 0
+
+    def as_dict(self) -> Dict[str, int]:
+        return {
+            'pending': self.submitted - self.processed - self.failed,
+            'processed': self.processed,
+            'failed': self.failed,
+        }
+
+
+class TenantHost:
+    def __init__(self,
+        pager_factory: TenantPagerFactory,
+        weights: Optional[Dict[str, float]] = None,
+        default_weight: float = 1.0,
+        shards: int = 4,
+        max_pending: int = 10_000,
+        timer_service: Optional[ITimerService] = None,
+        max_tenants: Optional[int] = None
+    ):
+        """
+        :param pager_factory: Builds the pager of a tenant on its first event
+        :param weights: Tenant -> share of the shards, relative to the other tenants
+        :param default_weight: Weight of tenants missing from weights
+        :param shards: Number of worker threads
+        :param max_pending: Maximum number of queued events per tenant and shard, submit fails beyond
+        :param timer_service: Shared timer service, namespaced per tenant
+        :param max_tenants: Maximum number of tenant pagers, new tenants are rejected beyond; unbounded when None
+        """
+        if shards <= 0:
+            raise ValueError("shards must be positive")
+
+        self.pager_factory = pager_factory
+        self.weights = dict(weights or {})
+        self.default_weight = default_weight
+        self.shards = shards
+        self.max_pending = max_pending
+        self.timer_service = timer_service
+        self.max_tenants = max_tenants
+
+        self._queues = self._new_queues()
+        self._pagers: Dict[str, ServicePager] = {}
+        # Tenant -> pager being built, awaited by the other events of the tenant
+        self._building: Dict[str, Future] = {}
+        self._metrics: Dict[str, TenantMetrics] = {}
+        self._lock = threading.Lock()
+        self._workers: List[threading.Thread] = []
+        self._running = False
+
+    # ------------ TENANTS ------------
+
+    def pager(self, tenant: str) -> ServicePager:
+        """
+        Pager of a tenant, built on first use
+        :raise ValueError: Invalid or unknown tenant, or too many tenants
+        """
+        pager = self._pagers.get(tenant)
+        if pager is not None:
+            return pager
+        with self._lock:
+            pager = self._pagers.get(tenant)
+            if pager is not None:
+                return pager
+            building = self._building.get(tenant)
+            if building is None:
+                if not TENANT_PATTERN.match(tenant):
+                    raise ValueError(f"Invalid tenant '{tenant}'")
+                if self.max_tenants is not None and len(self._pagers) + len(self._building) >= self.max_tenants:
+                    raise ValueError(f"Too many tenants, '{tenant}' is rejected")
+                building = self._building[tenant] = Future()
+                builder = True
+            else:
+                builder = False
+        if not builder:
+            return building.result()
+
+        try:
+            timer = NamespacedTimerService(self.timer_service, tenant) if self.timer_service is not None else None
+            pager = self.pager_factory(tenant, timer)
+        except BaseException as e:
+            # Not cached: the next event of the tenant tries again
+            with self._lock:
+                del self._building[tenant]
+            building.set_exception(e)
+            raise
+        with self._lock:
+            self._pagers[tenant] = pager
+            self._metrics[tenant] = TenantMetrics()
+            del self._building[tenant]
+        building.set_result(pager)
+        return pager
+
+    @property
+    def tenants(self) -> List[str]:
+        return list(self._pagers)
+
+    # ------------ LIFECYCLE ------------
+
+    def start(self):
+        if self._running:
+            return
+        self._workers = [
+            threading.Thread(target=self._work, args=(queue,), name=f'tenant-shard-{shard}', daemon=True)
+            for shard, queue in enumerate(self._queues)
+        ]
+        for worker in self._workers:
+            worker.start()
+        self._running = True
+
+    def stop(self):
+        """ Process every queued event, then stop the workers """
+        if not self._running:
+            return
+        for queue in self._queues:
+            queue.close()
+        for worker in self._workers:
+            worker.join()
+        # Closed queues cannot be reused
+        self._queues, self._workers = self._new_queues(), []
+        self._running = False
+
+    # ------------ EVENTS ------------
+
+    def submit(self, tenant: str, event: str, service_id: str, *args) -> Future:
+        """
+        Queue an event of a tenant on the shard of its service
+        :param tenant: Name of the tenant
+        :param event: One of EVENT_HANDLERS
+        :param service_id: ID of the monitored service in the tenant
+        :param args: Extra handler arguments (the message of an alert)
+        :return: Future resolved with the handler result once the event is processed
+        :raise TenantQueueFullError: The tenant has too many events pending on the shard (timeouts are never refused)
+        """
+        if event not in EVENT_HANDLERS:
+            raise ValueError(f"Unknown event '{event}'")
+        # Unknown and invalid tenants fail here, in the caller
+        pager = self.pager(tenant)
+
+        future: Future = Future()
+        # A refused timeout would be a lost escalation: only incoming events are bounded
+        self._queues[self.shard_of(tenant, service_id)].push(
+            tenant, (pager, event, service_id, args, future), bounded=event != 'timeout'
+        )
+        with self._lock:
+            self._metrics[tenant].submitted += 1
+        return future
+
+    def timeouts(self, keys: List[str]) -> List[str]:
+        """
+        Timer service handler: expired timeouts of a tenant namespace are routed to its pager
+        :return: Expired IDs outside of any tenant namespace
+        """
+        others, _ = self.route_timeouts(keys)
+        return others
+
+    def route_timeouts(self, keys: List[str]) -> Tuple[List[str], Dict[str, Future]]:
+        """
+        Route the expired timeouts of a tenant namespace to its pager
+        :return: Expired IDs outside of any tenant namespace, and the future of each routed timeout by key
+        """
+        others = []
+        futures: Dict[str, Future] = {}
+        for key in keys:
+            tenant, separator, service_id = key.partition(NAMESPACE_SEPARATOR)
+            if not separator:
+                others.append(key)
+                continue
+            futures[key] = self.submit(tenant, 'timeout', service_id)
+        return others, futures
+
+    def shard_of(self, tenant: str, service_id: str) -> int:
+        return zlib.crc32((tenant + NAMESPACE_SEPARATOR + service_id).encode()) % self.shards
+
+    # ------------ METRICS ------------
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            tenants = {tenant: metrics.as_dict() for tenant, metrics in self._metrics.items()}
+        return {
+            'pending': sum(len(queue) for queue in self._queues),
+            'tenants': tenants,
+        }
+
+    # ------------ INTERNALS ------------
+
+    def _new_queues(self) -> List[WeightedFairQueue]:
+        return [WeightedFairQueue(self.weights, self.default_weight, self.max_pending) for _ in range(self.shards)]
+
+    def _work(self, queue: WeightedFairQueue):
+        while True:
+            entry = queue.pop()
+            if entry is _STOP:
+                return
+            tenant, (pager, event, service_id, args, future) = entry
+            try:
+                result = getattr(pager, EVENT_HANDLERS[event])(service_id, *args)
+            except Exception as e:
+                self._complete(tenant, False)
+                future.set_exception(e)
+            else:
+                self._complete(tenant, True)
+                future.set_result(result)
+
+    def _complete(self, tenant: str, ok: bool):
+        with self._lock:
+            if ok:
+                self._metrics[tenant].processed += 1
+            else:
+                self._metrics[tenant].failed += 1
@@ -0,0 +1,97 @@
+import asyncio
+from concurrent.futures import Executor
+from typing import Callable, Dict, Iterable, List, Optional, TypeVar
+
+from application.interfaces.async_escalation_policy_service import IAsyncEscalationPolicyService
+from application.interfaces.async_mail_service import IAsyncMailService
+from application.interfaces.async_monitored_service_repository import IAsyncMonitoredServiceRepository
+from application.interfaces.async_sms_service import IAsyncSMSService
+from application.interfaces.async_time_service import IAsyncTimerService
+from application.interfaces.escalation_policy_service import IEscalationPolicyService
+from application.interfaces.mail_service import IMailService
+from application.interfaces.monitored_service_repository import IMonitoredServiceRepository
+from application.interfaces.sms_service import ISMSService
+from application.interfaces.time_service import ITimerService
+from domain.models.escalation_policy import EscalationPolicy
+from domain.models.monitored_service import MonitoredService
+from domain.models.target import Target
+
+""" Async Adapters
+Expose the synchronous adapters through the async interfaces used by the AsyncServicePager.
+Blocking calls run in a thread pool, so they never stall the event loop; adapters whose calls
+only take a lock (in-memory timers) can run inline instead.
+"""
+
+T = TypeVar('T')
+
+
+class _Offloaded:
+    def __init__(self, executor: Optional[Executor] = None, blocking: bool = True):
+        """
+        :param executor: Thread pool running the blocking calls, the loop default executor when None
+        :param blocking: Whether calls are offloaded, non-blocking adapters are called inline
+        """
+        self.executor = executor
+        self.blocking = blocking
+
+    async def _run(self, function: Callable[..., T], *args) -> T:
+        if not self.blocking:
+            return function(*args)
+        return await asyncio.get_running_loop().run_in_executor(self.executor, function, *args)
+
+
+class AsyncMonitoredServiceRepositoryAdapter(_Offloaded, IAsyncMonitoredServiceRepository):
+    def __init__(self, repository: IMonitoredServiceRepository, executor: Optional[Executor] = None, blocking: bool = True):
+        super().__init__(executor, blocking)
+        self.repository = repository
+
+    async def get(self, service_id: str) -> MonitoredService:
+        return await self._run(self.repository.get, service_id)
+
+    async def save(self, service: MonitoredService) -> MonitoredService:
+        return await self._run(self.repository.save, service)
+
+    async def get_many(self, service_ids: Iterable[str]) -> Dict[str, MonitoredService]:
+        return await self._run(self.repository.get_many, list(service_ids))
+
+    async def save_many(self, services: List[MonitoredService]) -> List[MonitoredService]:
+        return await self._run(self.repository.save_many, services)
+
+
+class AsyncEscalationPolicyServiceAdapter(_Offloaded, IAsyncEscalationPolicyService):
+    def __init__(self, policy_service: IEscalationPolicyService, executor: Optional[Executor] = None, blocking: bool = True):
+        super().__init__(executor, blocking)
+        self.policy_service = policy_service
+
+    async def get(self, service_id: str) -> EscalationPolicy:
+        return await self._run(self.policy_service.get, service_id)
+
+
+class AsyncMailServiceAdapter(_Offloaded, IAsyncMailService):
+    def __init__(self, mail_service: IMailService, executor: Optional[Executor] = None, blocking: bool = True):
+        super().__init__(executor, blocking)
+        self.mail_service = mail_service
+
+    async def notify(self, target: Target, service: MonitoredService, msg: str):
+        return await self._run(self.mail_service.notify, target, service, msg)
+
+
+class AsyncSMSServiceAdapter(_Offloaded, IAsyncSMSService):
+    def __init__(self, sms_service: ISMSService, executor: Optional[Executor] = None, blocking: bool = True):
+        super().__init__(executor, blocking)
+        self.sms_service = sms_service
+
+    async def notify(self, target: Target, service: MonitoredService, msg: str):
+        return await self._run(self.sms_service.notify, target, service, msg)
+
+
+class AsyncTimerServiceAdapter(_Offloaded, IAsyncTimerService):
+    def __init__(self, timer_service: ITimerService, executor: Optional[Executor] = None, blocking: bool = True):
+        super().__init__(executor, blocking)
+        self.timer_service = timer_service
+
+    async def add_timeout(self, msId: str, minutes: int):
+        return await self._run(self.timer_service.add_timeout, msId, minutes)
+
+    async def cancel_timeout(self, msId: str):
+        return await self._run(self.timer_service.cancel_timeout, msId)
@@ -0,0 +1,176 @@
+import logging
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+from application.interfaces.bulk_notification_provider import IBulkNotificationProvider
+from application.interfaces.mail_service import IMailService
+from application.interfaces.sms_service import ISMSService
+from domain.models.monitored_service import MonitoredService
+from domain.models.target import Target
+
+""" Buffered Notification Services
+IMailService and ISMSService implementations that coalesce the notifications sent to the same
+recipient within a flush window into a single digest, and hand all the digests that are due
+to the provider in one bulk call.
+"""
+
+logger = logging.getLogger(__name__)
+
+
+class _PendingDigest:
+    def __init__(self, opened_at: float):
+        self.opened_at = opened_at
+        # (service ID, message) -> None, keeps insertion order and drops exact duplicates
+        self.lines: 'OrderedDict[Tuple[str, str], None]' = OrderedDict()
+
+
+class BufferedNotificationService(ABC):
+    def __init__(self,
+        provider: IBulkNotificationProvider,
+        flush_window: float = 30.0,
+        max_pending: int = 1000,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        """
+        :param provider: Bulk API of the mail or SMS provider
+        :param flush_window: Seconds a recipient's first notification may wait for others to join its digest
+        :param max_pending: Number of buffered notifications that forces a flush
+        :param clock: Monotonic clock in seconds
+        """
+        self.provider = provider
+        self.flush_window = flush_window
+        self.max_pending = max_pending
+        self.clock = clock
+
+        self._digests: Dict[str, _PendingDigest] = {}
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        # Wakes the flusher before its interval elapsed, when max_pending is reached
+        self._wakeup = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @abstractmethod
+    def recipient_of(self, target: Target) -> str:
+        """ Address of a target on this channel """
+        pass
+
+    def notify(self, target: Target, service: MonitoredService, msg: str):
+        """
+        Buffer a notification; it is sent with the next flush of its recipient's digest,
+        never from the caller's thread while the background flusher runs
+        """
+        recipient = self.recipient_of(target)
+        with self._lock:
+            digest = self._digests.get(recipient)
+            if digest is None:
+                digest = self._digests[recipient] = _PendingDigest(self.clock())
+            if (service.id, msg) not in digest.lines:
+                digest.lines[(service.id, msg)] = None
+                self._pending += 1
+            full = self._pending >= self.max_pending
+
+        if full:
+            if self._thread is not None:
+                self._wakeup.set()
+            else:
+                # No flusher to bound the buffer
+                self.flush()
+
+    def flush_due(self) -> int:
+        """
+        Send the digests whose flush window elapsed
+        :return: Number of digests sent
+        """
+        now = self.clock()
+        return self._send(lambda digest: now - digest.opened_at >= self.flush_window)
+
+    def flush(self) -> int:
+        """
+        Send every buffered digest
+        :return: Number of digests sent
+        """
+        return self._send(lambda digest: True)
+
+    def start(self):
+        """ Flush due digests from a background thread """
+        if self._thread is not None:
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name=f'{type(self).__name__}-flush', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """ Stop the background thread and send what is still buffered """
+        self._stopped.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def _run(self):
+        interval = max(self.flush_window / 4, 0.01)
+        while True:
+            self._wakeup.wait(interval)
+            self._wakeup.clear()
+            if self._stopped.is_set():
+                return
+            try:
+                if self._pending >= self.max_pending:
+                    self.flush()
+                else:
+                    self.flush_due()
+            except Exception:
+                logger.exception("Digest flush failed")
+
+    def _send(self, is_due: Callable[[_PendingDigest], bool]) -> int:
+        with self._lock:
+            due = [(recipient, digest) for recipient, digest in self._digests.items() if is_due(digest)]
+            for recipient, digest in due:
+                del self._digests[recipient]
+                self._pending -= len(digest.lines)
+
+        if not due:
+            return 0
+        try:
+            self.provider.send_bulk([(recipient, format_digest(list(digest.lines))) for recipient, digest in due])
+        except Exception:
+            self._restore(due)
+            raise
+        return len(due)
+
+    def _restore(self, due: List[Tuple[str, _PendingDigest]]):
+        """ Put back the digests of a failed send, merged with the notifications buffered meanwhile """
+        with self._lock:
+            for recipient, digest in due:
+                newer = self._digests.get(recipient)
+                if newer is not None:
+                    self._pending -= len(newer.lines)
+                    for line in newer.lines:
+                        digest.lines[line] = None
+                self._digests[recipient] = digest
+                self._pending += len(digest.lines)
+
+
+class BufferedMailService(BufferedNotificationService, IMailService):
+    def recipient_of(self, target: Target) -> str:
+        return target.email
+
+
+class BufferedSMSService(BufferedNotificationService, ISMSService):
+    def recipient_of(self, target: Target) -> str:
+        return target.phone_number
+
+
+def format_digest(lines: List[Tuple[str, str]]) -> str:
+    """ Body of a digest: the alert itself, or a summary when several alerts were coalesced """
+    if len(lines) == 1:
+        service_id, msg = lines[0]
+        return f"[{service_id}] {msg}"
+    body = [f"{len(lines)} alerts:"]
+    body.extend(f"- [{service_id}] {msg}" for service_id, msg in lines)
+    return "\n".join(body)
@@ -0,0 +1,131 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple
+
+from application.interfaces.escalation_policy_service import IEscalationPolicyService
+from domain.models.escalation_policy import EscalationPolicy
+
+""" Cached Escalation Policy Service
+Decorator of an IEscalationPolicyService keeping the fetched policies in a bounded LRU cache.
+Entries expire after a TTL and can be explicitly invalidated when a new policy version is published.
+"""
+
+
+class CachedEscalationPolicyService(IEscalationPolicyService):
+    def __init__(self,
+        policy_service: IEscalationPolicyService,
+        max_size: int = 10_000,
+        ttl_seconds: float = 300.0,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        """
+        :param policy_service: The decorated (remote) EP Service
+        :param max_size: Maximum number of cached policies, the least recently used is evicted first
+        :param ttl_seconds: Lifetime of a cached policy
+        :param clock: Monotonic clock in seconds
+        """
+        if max_size <= 0:
+            raise ValueError("max_size must be positive")
+
+        self.policy_service = policy_service
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.clock = clock
+
+        # Service ID -> (policy, expiration time)
+        self._entries: 'OrderedDict[str, Tuple[EscalationPolicy, float]]' = OrderedDict()
+        # Service ID -> oldest policy version allowed in the cache
+        self._min_versions: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+        # Counters
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def get(self, service_id: str) -> EscalationPolicy:
+        now = self.clock()
+        with self._lock:
+            entry = self._entries.get(service_id)
+            if entry is not None:
+                policy, expires_at = entry
+                if now < expires_at:
+                    self._entries.move_to_end(service_id)
+                    self.hits += 1
+                    return policy
+                del self._entries[service_id]
+                self.expirations += 1
+            self.misses += 1
+
+        # Fetch outside the lock so a slow EP Service does not serialize every lookup
+        policy = self.policy_service.get(service_id)
+        if policy:
+            self._store(service_id, policy, now + self.ttl_seconds)
+        return policy
+
+    def invalidate(self, service_id: str, version: Optional[int] = None) -> bool:
+        """
+        Drop the cached policy of a Monitored Service
+        :param service_id: ID of the monitored service
+        :param version: Newly published version; a cached policy already at this version is kept
+        :return: True if an entry was dropped
+        """
+        with self._lock:
+            if version is not None:
+                self._min_versions[service_id] = max(version, self._min_versions.get(service_id, version))
+            entry = self._entries.get(service_id)
+            if entry is None:
+                return False
+            if version is not None and _version_of(entry[0]) >= version:
+                return False
+            del self._entries[service_id]
+            self.invalidations += 1
+            return True
+
+    def invalidate_all(self):
+        """ Drop every cached policy """
+        with self._lock:
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+
+    def policies(self) -> Dict[str, EscalationPolicy]:
+        """ The cached policies not expired yet, by service ID """
+        now = self.clock()
+        with self._lock:
+            return {service_id: policy for service_id, (policy, expires_at) in self._entries.items() if now < expires_at}
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations,
+            }
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _store(self, service_id: str, policy: EscalationPolicy, expires_at: float):
+        with self._lock:
+            min_version = self._min_versions.get(service_id)
+            if min_version is not None:
+                # A fetch that raced with an invalidation may return an outdated policy
+                if _version_of(policy) < min_version:
+                    return
+                del self._min_versions[service_id]
+
+            self._entries[service_id] = (policy, expires_at)
+            self._entries.move_to_end(service_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+
+def _version_of(policy: EscalationPolicy) -> int:
+    return getattr(policy, 'version', 0)
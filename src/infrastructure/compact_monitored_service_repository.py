@@ -0,0 +1,292 @@
+import threading
+from array import array
+from typing import Any, Dict, Hashable, Iterable, List, Optional
+
+from application.interfaces.monitored_service_repository import ConcurrentModificationError, IMonitoredServiceRepository
+from domain.models.escalation_policy import EscalationPolicy
+from domain.models.monitored_service import MonitoredService
+from domain.models.level import DEFAULT_DELAY_MINUTES
+
+""" Compact Monitored Service Repository
+In-memory IMonitoredServiceRepository for large fleets (1M+ services). The state of every service
+lives in typed arrays (one column per field) indexed by an interned service ID table; alert messages
+and escalation policies are interned too and referenced by index, never attached per service. `get` hands out lightweight views
+reading the columns; their changes stay local until `save` writes them back (compare-and-swap).
+Interned values are reference counted: a message or policy no row references anymore is released,
+so alert messages carrying timestamps or IDs do not accumulate. Policies are interned by structure,
+so the fresh objects fetched from the EP Service share a single entry.
+"""
+
+_STATUSES = ('healthy', 'unhealthy')
+_STATUS_CODES = {status: code for code, status in enumerate(_STATUSES)}
+_NO_POLICY = -1
+
+
+class _InternTable:
+    """ Values stored once and reference counted by the rows; slots of released values are reused """
+    def __init__(self):
+        self.values: List[Any] = []
+        self._counts: List[int] = []
+        self._refs: Dict[Hashable, int] = {}
+        self._keys: List[Optional[Hashable]] = []
+        self._free: List[int] = []
+
+    def acquire(self, value, key: Hashable) -> int:
+        ref = self._refs.get(key)
+        if ref is None:
+            if self._free:
+                ref = self._free.pop()
+                self.values[ref], self._counts[ref], self._keys[ref] = value, 0, key
+            else:
+                ref = len(self.values)
+                self.values.append(value)
+                self._counts.append(0)
+                self._keys.append(key)
+            self._refs[key] = ref
+        self._counts[ref] += 1
+        return ref
+
+    def release(self, ref: int):
+        self._counts[ref] -= 1
+        if self._counts[ref] == 0:
+            del self._refs[self._keys[ref]]
+            self.values[ref] = self._keys[ref] = None
+            self._free.append(ref)
+
+    def __len__(self) -> int:
+        return len(self._refs)
+
+
+class MonitoredServiceView(MonitoredService):
+    """
+    A MonitoredService backed by a row of the compact repository.
+    Reads go to the columns, writes are kept in a per-view overlay until the view is saved.
+    """
+    __slots__ = ('_repository', '_id', '_row', '_read_version', '_changes')
+
+    def __init__(self, repository: 'CompactMonitoredServiceRepository', service_id: str, row: int):
+        # The parent fields are served by the properties below: MonitoredService.__init__ is not called
+        self._repository = repository
+        self._id = service_id
+        self._row = row
+        self._read_version = repository._versions[row]
+        self._changes: Optional[Dict[str, Any]] = None
+
+    def _get(self, name: str, column: str):
+        changes = self._changes
+        if changes is not None and name in changes:
+            return changes[name]
+        return getattr(self._repository, column)[self._row]
+
+    def _set(self, name: str, value):
+        if self._changes is None:
+            self._changes = {}
+        self._changes[name] = value
+
+    @property
+    def id(self) -> str:
+        return self._id
+
+    @property
+    def status(self) -> str:
+        return _STATUSES[self._get('status', '_statuses')]
+
+    @status.setter
+    def status(self, value: str):
+        self._set('status', _STATUS_CODES[value])
+
+    @property
+    def alert_msg(self) -> str:
+        changes = self._changes
+        if changes is not None and 'alert_msg' in changes:
+            return changes['alert_msg']
+        return self._repository._messages.values[self._repository._message_refs[self._row]]
+
+    @alert_msg.setter
+    def alert_msg(self, value: str):
+        self._set('alert_msg', value)
+
+    @property
+    def acknowledged(self) -> bool:
+        return bool(self._get('acknowledged', '_acknowledged'))
+
+    @acknowledged.setter
+    def acknowledged(self, value: bool):
+        self._set('acknowledged', int(value))
+
+    @property
+    def current_level(self) -> int:
+        return self._get('current_level', '_levels')
+
+    @current_level.setter
+    def current_level(self, value: int):
+        self._set('current_level', value)
+
+    @property
+    def version(self) -> int:
+        changes = self._changes
+        if changes is not None and 'version' in changes:
+            return changes['version']
+        return self._read_version
+
+    @version.setter
+    def version(self, value: int):
+        self._set('version', value)
+
+    @property
+    def policy(self) -> Optional[EscalationPolicy]:
+        changes = self._changes
+        if changes is not None and 'policy' in changes:
+            return changes['policy']
+        return self._repository._policy_at(self._repository._policy_refs[self._row])
+
+    @policy.setter
+    def policy(self, value: Optional[EscalationPolicy]):
+        self._set('policy', value)
+
+
+class CompactMonitoredServiceRepository(IMonitoredServiceRepository):
+    def __init__(self, services: Iterable[MonitoredService] = ()):
+        # Interned service IDs: ID -> row
+        self._rows: Dict[str, int] = {}
+        # Columns
+        self._statuses = array('b')
+        self._acknowledged = array('b')
+        self._levels = array('H')
+        self._versions = array('I')
+        self._message_refs = array('I')
+        self._policy_refs = array('i')
+        # Interned alert messages and policies, shared by every service; the empty message is never released
+        self._messages = _InternTable()
+        self._messages.acquire('', '')
+        self._policies = _InternTable()
+
+        self._lock = threading.Lock()
+        services = list(services)
+        if services:
+            self.save_many(services)
+
+    # ------------ IMonitoredServiceRepository ------------
+
+    def get(self, service_id: str) -> Optional[MonitoredServiceView]:
+        row = self._rows.get(service_id)
+        return MonitoredServiceView(self, service_id, row) if row is not None else None
+
+    def get_many(self, service_ids: Iterable[str]) -> Dict[str, MonitoredServiceView]:
+        rows = self._rows
+        views = {}
+        for service_id in service_ids:
+            row = rows.get(service_id)
+            if row is not None:
+                views[service_id] = MonitoredServiceView(self, service_id, row)
+        return views
+
+    def save(self, service: MonitoredService) -> MonitoredService:
+        return self.save_many([service])[0]
+
+    def save_many(self, services: List[MonitoredService]) -> List[MonitoredService]:
+        with self._lock:
+            conflicts = [service.id for service in services if self._stored_version(service.id) != service.version]
+            if conflicts:
+                raise ConcurrentModificationError(conflicts)
+            for service in services:
+                self._write(service)
+        return services
+
+    # ------------ STORE ------------
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def policy_id(self, service_id: str) -> Optional[int]:
+        """ Index of the shared escalation policy of a service in the policy table """
+        row = self._rows.get(service_id)
+        if row is None or self._policy_refs[row] == _NO_POLICY:
+            return None
+        return self._policy_refs[row]
+
+    @property
+    def policies(self) -> List[EscalationPolicy]:
+        """ Policies referenced by at least one service """
+        return [policy for policy in self._policies.values if policy is not None]
+
+    @property
+    def messages(self) -> int:
+        """ Number of distinct alert messages referenced, the empty one included """
+        return len(self._messages)
+
+    def _stored_version(self, service_id: str) -> int:
+        row = self._rows.get(service_id)
+        return self._versions[row] if row is not None else 0
+
+    def _write(self, service: MonitoredService):
+        version = service.version + 1
+        status = _STATUS_CODES[service.status]
+        acknowledged = int(service.acknowledged)
+        level = service.current_level
+
+        row = self._rows.get(service.id)
+        message = self._intern_message(service.alert_msg, row)
+        policy = self._intern_policy(service.policy, row)
+        if row is None:
+            self._rows[service.id] = len(self._rows)
+            self._statuses.append(status)
+            self._message_refs.append(message)
+            self._acknowledged.append(acknowledged)
+            self._levels.append(level)
+            self._versions.append(version)
+            self._policy_refs.append(policy)
+        else:
+            self._statuses[row] = status
+            self._message_refs[row] = message
+            self._acknowledged[row] = acknowledged
+            self._levels[row] = level
+            self._versions[row] = version
+            self._policy_refs[row] = policy
+
+        if isinstance(service, MonitoredServiceView) and service._repository is self:
+            # The view now reflects the stored row
+            service._changes = None
+            service._read_version = version
+        else:
+            service.version = version
+
+    def _intern_message(self, message: str, row: Optional[int]) -> int:
+        """ Reference of the new message of a row, the previous one is released """
+        previous = self._message_refs[row] if row is not None else None
+        if previous is not None and self._messages.values[previous] == message:
+            return previous
+        ref = self._messages.acquire(message, message)
+        if previous is not None:
+            self._messages.release(previous)
+        return ref
+
+    def _intern_policy(self, policy: Optional[EscalationPolicy], row: Optional[int]) -> int:
+        """ Reference of the new policy of a row, the previous one is released """
+        previous = self._policy_refs[row] if row is not None else _NO_POLICY
+        if previous != _NO_POLICY and self._policies.values[previous] is policy:
+            return previous
+        ref = self._policies.acquire(policy, _policy_key(policy)) if policy is not None else _NO_POLICY
+        if previous != _NO_POLICY:
+            self._policies.release(previous)
+        return ref
+
+    def _policy_at(self, index: int) -> Optional[EscalationPolicy]:
+        return self._policies.values[index] if index != _NO_POLICY else None
+
+
+def _policy_key(policy) -> Hashable:
+    """ Structure of a policy (levels, delays, targets and, once compiled, their senders) and its version """
+    levels = []
+    for level in policy.levels:
+        # Compiled levels bind each target to its sender
+        deliveries = getattr(level, 'deliveries', None)
+        if deliveries is None:
+            deliveries = tuple((target, None) for target in level.targets)
+        levels.append((
+            level.level,
+            getattr(level, 'delay_minutes', DEFAULT_DELAY_MINUTES),
+            # The stored policy keeps its senders alive, so their id() is not reused meanwhile
+            tuple((type(target), target.address, id(sender)) for target, sender in deliveries),
+        ))
+    return type(policy), getattr(policy, 'version', 0), tuple(levels)
@@ -0,0 +1,303 @@
+import json
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from application.interfaces.event_log import IEventLog
+from application.interfaces.monitored_service_repository import IMonitoredServiceRepository
+from application.interfaces.time_service import ITimerService
+from domain.models.monitored_service import MonitoredService
+
+""" Event Log
+Append-only log of the pager events and acknowledgement timeouts, used to recover after a crash.
+Transitions are logged once committed to the repository and before their side effects, timeouts
+before they are armed: the log is not written ahead of the repository, replay reconciles the two
+by version and re-arms the timeouts of open incidents. Records are made durable by group commit: a
+background flusher writes and fsyncs every record appended meanwhile at once, and appenders wait
+for the fsync covering their record. The log folds its records into the latest state of each
+service; that state is periodically written as a snapshot and the log rotated, so replay time
+stays bounded. The snapshot is written outside of the log lock, appends go on meanwhile.
+"""
+
+logger = logging.getLogger(__name__)
+
+LOG_FILE = 'events.log'
+# Log rotated by a snapshot, until the snapshot covering it is written
+ROTATED_LOG_FILE = 'events.log.old'
+SNAPSHOT_FILE = 'snapshot.json'
+
+# (status, alert_msg, acknowledged, current_level, version)
+State = Tuple[str, str, bool, int, int]
+
+
+class EventLog(IEventLog):
+    def __init__(self,
+        directory: str,
+        commit_interval: float = 0.002,
+        snapshot_every: int = 100_000,
+        clock: Callable[[], float] = time.time
+    ):
+        """
+        :param directory: Where the log and its snapshot are stored
+        :param commit_interval: Seconds the flusher waits for more records before an fsync
+        :param snapshot_every: Number of records after which a snapshot is taken, 0 to disable
+        :param clock: Wall clock, timeouts are logged as UNIX timestamps to survive restarts
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.commit_interval = commit_interval
+        self.snapshot_every = snapshot_every
+        self.clock = clock
+
+        # Folded state, rebuilt from the snapshot and the log
+        self.services: Dict[str, State] = {}
+        self.timers: Dict[str, float] = {}
+
+        self._sequence = 0
+        self._durable = 0
+        self._since_snapshot = 0
+        self._buffer: List[str] = []
+        self._cond = threading.Condition()
+        # A single snapshot at a time
+        self._snapshot_lock = threading.Lock()
+        self._closed = False
+        self.commits = 0  # Number of fsyncs, a commit covers a group of records
+
+        self._load()
+        self._file = open(self._path(LOG_FILE), 'a', encoding='utf-8')
+        if os.path.exists(self._path(ROTATED_LOG_FILE)):
+            # Crashed before the snapshot covering it was written
+            self._write_snapshot({'seq': self._sequence, 'services': self.services, 'timers': self.timers})
+        self._flusher = threading.Thread(target=self._flush_loop, name='event-log', daemon=True)
+        self._flusher.start()
+
+    # ------------ IEventLog ------------
+
+    def record(self, event: str, services: List[MonitoredService]):
+        now = self.clock()
+        self.append([{
+            'type': event,
+            'service_id': service.id,
+            'state': [service.status, service.alert_msg, service.acknowledged, service.current_level, service.version],
+            'ts': now,
+        } for service in services])
+
+    def record_timer(self, service_id: str, due: Optional[float]):
+        if due is None:
+            self.append([{'type': 'timer_cancel', 'service_id': service_id}])
+        else:
+            self.append([{'type': 'timer', 'service_id': service_id, 'due': due}])
+
+    # ------------ LOG ------------
+
+    def append(self, records: List[dict]) -> int:
+        """
+        Append records and wait until they are durable
+        :return: Sequence number of the last record
+        """
+        if not records:
+            return self._sequence
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("The event log is closed")
+            for record in records:
+                self._sequence += 1
+                record['seq'] = self._sequence
+                self._buffer.append(json.dumps(record, separators=(',', ':')))
+                self._apply(record)
+            sequence = self._sequence
+            self._since_snapshot += len(records)
+            self._cond.notify_all()
+            while self._durable < sequence:
+                self._cond.wait()
+            snapshot_due = self.snapshot_every and self._since_snapshot >= self.snapshot_every
+
+        # Skipped while another appender takes one
+        if snapshot_due and self._snapshot_lock.acquire(blocking=False):
+            try:
+                self._snapshot()
+            finally:
+                self._snapshot_lock.release()
+        return sequence
+
+    def snapshot(self):
+        """ Write the folded state to the snapshot and drop the log it covers """
+        with self._snapshot_lock:
+            self._snapshot()
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._flusher.join()
+        self._file.close()
+
+    # ------------ INTERNALS ------------
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def _snapshot(self):
+        with self._cond:
+            while self._durable < self._sequence:
+                self._cond.wait()
+            # Copied and rotated under the lock, serialized and fsynced outside of it
+            state = {'seq': self._sequence, 'services': dict(self.services), 'timers': dict(self.timers)}
+            self._file.close()
+            os.replace(self._path(LOG_FILE), self._path(ROTATED_LOG_FILE))
+            self._file = open(self._path(LOG_FILE), 'w', encoding='utf-8')
+            # The new log holds the next acknowledged records: its name must be durable first
+            _fsync_directory(self.directory)
+            self._since_snapshot = 0
+        self._write_snapshot(state)
+
+    def _write_snapshot(self, state: dict):
+        _write_atomically(self._path(SNAPSHOT_FILE), json.dumps(state))
+        # Records up to the snapshot sequence are skipped on replay, dropping them is only an optimization
+        os.remove(self._path(ROTATED_LOG_FILE))
+
+    def _apply(self, record: dict):
+        kind = record['type']
+        service_id = record['service_id']
+        if kind == 'timer':
+            self.timers[service_id] = record['due']
+        elif kind == 'timer_cancel':
+            self.timers.pop(service_id, None)
+        else:
+            self.services[service_id] = tuple(record['state'])
+            # Acknowledged, healthy or escalated: the pending timeout is over
+            if kind != 'alert':
+                self.timers.pop(service_id, None)
+
+    def _load(self):
+        snapshot_path = self._path(SNAPSHOT_FILE)
+        if os.path.exists(snapshot_path):
+            with open(snapshot_path, encoding='utf-8') as f:
+                snapshot = json.load(f)
+            self._sequence = snapshot['seq']
+            self.services = {service_id: tuple(state) for service_id, state in snapshot['services'].items()}
+            self.timers = snapshot['timers']
+
+        # A log rotated by an interrupted snapshot holds the records before those of the current one
+        for name in (ROTATED_LOG_FILE, LOG_FILE):
+            self._load_log(self._path(name))
+        self._durable = self._sequence
+
+    def _load_log(self, log_path: str):
+        if not os.path.exists(log_path):
+            return
+        valid = 0
+        with open(log_path, 'rb') as f:
+            for line in f:
+                try:
+                    if not line.endswith(b'\n'):
+                        raise ValueError("Unterminated record")
+                    record = json.loads(line)
+                except ValueError:
+                    # Torn write of the last group commit before a crash: it was never acknowledged
+                    logger.warning("Ignoring a truncated event log record")
+                    break
+                valid += len(line)
+                if record['seq'] > self._sequence:
+                    self._sequence = record['seq']
+                    self._since_snapshot += 1
+                    self._apply(record)
+        # Cut the torn record, so the next group commit starts on a new line
+        if valid < os.path.getsize(log_path):
+            os.truncate(log_path, valid)
+
+    def _flush_loop(self):
+        while True:
+            with self._cond:
+                while not self._buffer and not self._closed:
+                    self._cond.wait()
+                if not self._buffer and self._closed:
+                    return
+            # Let concurrent appenders join this group commit
+            if self.commit_interval:
+                time.sleep(self.commit_interval)
+            with self._cond:
+                lines, self._buffer = self._buffer, []
+                sequence = self._sequence
+                # The log file is only swapped by snapshot(), which waits for this commit
+                self._file.write('\n'.join(lines) + '\n')
+                self._file.flush()
+            _fsync(self._file)
+            with self._cond:
+                self._durable = sequence
+                self.commits += 1
+                self._cond.notify_all()
+
+
+class JournaledTimerService(ITimerService):
+    """ ITimerService decorator logging armed and cancelled timeouts, so they can be re-armed after a crash """
+    def __init__(self, timer_service: ITimerService, event_log: IEventLog, clock: Callable[[], float] = time.time):
+        self.timer_service = timer_service
+        self.event_log = event_log
+        self.clock = clock
+
+    def add_timeout(self, msId: str, minutes: int):
+        self.event_log.record_timer(msId, self.clock() + minutes * 60)
+        self.timer_service.add_timeout(msId, minutes)
+
+    def cancel_timeout(self, msId: str):
+        self.event_log.record_timer(msId, None)
+        return self.timer_service.cancel_timeout(msId)
+
+
+def replay(event_log: EventLog, repository: IMonitoredServiceRepository, time_service: ITimerService) -> Dict[str, int]:
+    """
+    Rebuild the monitored services state from the event log and re-arm outstanding timeouts.
+    The repository is only written when it lags behind the log (a lower version or a missing service).
+    Unacknowledged incidents left without a timeout (crash before it was armed) are re-armed to expire now.
+    :return: Number of restored services and re-armed timeouts
+    """
+    logged = event_log.services
+    current = repository.get_many(list(logged))
+
+    restored = []
+    for service_id, state in logged.items():
+        stored = current.get(service_id)
+        if stored and stored.version >= state[4]:
+            continue
+        service = MonitoredService(service_id)
+        service.status, service.alert_msg, service.acknowledged, service.current_level, _ = state
+        service.version = stored.version if stored else 0
+        restored.append(service)
+    if restored:
+        repository.save_many(restored)
+
+    now = event_log.clock()
+    rearmed = 0
+    for service_id, (status, _, acknowledged, _, _) in logged.items():
+        if status != 'unhealthy' or acknowledged:
+            continue
+        due = event_log.timers.get(service_id, now)
+        time_service.add_timeout(service_id, max(0.0, due - now) / 60)
+        rearmed += 1
+
+    return {'restored': len(restored), 'rearmed': rearmed}
+
+
+def _fsync(file):
+    file.flush()
+    os.fsync(file.fileno())
+
+
+def _write_atomically(path: str, content: str):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(content)
+        _fsync(f)
+    os.replace(tmp_path, path)
+    _fsync_directory(os.path.dirname(path))
+
+
+def _fsync_directory(path: str):
+    directory = os.open(path or '.', os.O_RDONLY)
+    try:
+        os.fsync(directory)
+    finally:
+        os.close(directory)
@@ -0,0 +1,296 @@
+import bisect
+import hashlib
+import socketserver
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from infrastructure.resp_client import RespError
+
+""" Fake RESP Server
+In-process stand-in of a Redis server for tests and benchmarks, speaking RESP2 over TCP with the
+subset of commands the timer backend uses: sorted sets (ZADD with NX/XX/CH, ZREM, ZSCORE, ZCARD,
+ZRANGEBYSCORE with WITHSCORES/LIMIT), DEL, PING and FLUSHALL. Each command runs under a global
+lock, so commands are atomic with respect to each other as on a real server.
+There is no Lua interpreter: EVAL, EVALSHA and SCRIPT LOAD run the Python equivalent registered for
+the source of a script, atomically too.
+"""
+
+# Python equivalent of a Lua script: (call, KEYS, ARGV) -> reply, call(*command) standing for redis.call
+Script = Callable[[Callable[..., Any], List[str], List[str]], Any]
+
+
+class SortedSet:
+    """ Members ordered by (score, member), with O(1) score lookups """
+    def __init__(self):
+        self.scores: Dict[str, float] = {}
+        self._entries: List[Tuple[float, str]] = []
+
+    def add(self, member: str, score: float):
+        previous = self.scores.get(member)
+        if previous is not None:
+            del self._entries[bisect.bisect_left(self._entries, (previous, member))]
+        self.scores[member] = score
+        bisect.insort(self._entries, (score, member))
+
+    def remove(self, member: str) -> bool:
+        score = self.scores.pop(member, None)
+        if score is None:
+            return False
+        del self._entries[bisect.bisect_left(self._entries, (score, member))]
+        return True
+
+    def range_by_score(self, low: float, low_open: bool, high: float, high_open: bool,
+                       offset: int = 0, count: int = -1) -> List[Tuple[float, str]]:
+        if low_open:
+            start = bisect.bisect_right(self._entries, (low, '\U0010ffff'))
+        else:
+            start = bisect.bisect_left(self._entries, (low, ''))
+        entries = []
+        for index in range(start + offset, len(self._entries)):
+            score, member = self._entries[index]
+            if score > high or (high_open and score == high):
+                break
+            if 0 <= count <= len(entries):
+                break
+            entries.append((score, member))
+        return entries
+
+    def __len__(self) -> int:
+        return len(self.scores)
+
+
+class FakeRespServer:
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, scripts: Optional[Dict[str, Script]] = None):
+        """
+        :param port: Port to listen on, 0 picks a free one (see address)
+        :param scripts: Lua source -> Python equivalent, the scripts clients may run
+        """
+        self.data: Dict[str, SortedSet] = {}
+        self.commands = 0
+        self._lock = threading.Lock()
+        self._scripts: Dict[str, Script] = {
+            hashlib.sha1(source.encode()).hexdigest(): script for source, script in (scripts or {}).items()
+        }
+        # Loaded by SCRIPT LOAD or EVAL, EVALSHA only runs those
+        self._loaded = set()
+        self._handlers: Dict[str, Callable[[List[str]], object]] = {
+            'PING': self._ping,
+            'ZADD': self._zadd,
+            'ZREM': self._zrem,
+            'ZSCORE': self._zscore,
+            'ZCARD': self._zcard,
+            'ZRANGEBYSCORE': self._zrangebyscore,
+            'DEL': self._del,
+            'FLUSHALL': self._flushall,
+            'EVAL': self._eval,
+            'EVALSHA': self._evalsha,
+            'SCRIPT': self._script,
+        }
+        server = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            # Replies of pipelined commands are written one by one: do not wait for ACKs between them
+            disable_nagle_algorithm = True
+
+            def handle(self):
+                server._serve(self.rfile, self.wfile)
+
+        self._server = socketserver.ThreadingTCPServer((host, port), Handler, bind_and_activate=False)
+        self._server.daemon_threads = True
+        self._server.allow_reuse_address = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def address(self) -> Tuple[str, int]:
+        return self._server.server_address[:2]
+
+    def start(self) -> 'FakeRespServer':
+        self._server.server_bind()
+        self._server.server_activate()
+        self._thread = threading.Thread(target=self._server.serve_forever, args=(0.05,), name='fake-resp-server', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def execute(self, *args: str):
+        """ Run a command in process, as received from a client """
+        handler = self._handlers.get(args[0].upper())
+        if handler is None:
+            return RespError(f"ERR unknown command '{args[0]}'")
+        with self._lock:
+            self.commands += 1
+            try:
+                return handler([str(arg) for arg in args[1:]])
+            except (ValueError, IndexError) as e:
+                return RespError(f"ERR {e}")
+
+    # ------------ PROTOCOL ------------
+
+    def _serve(self, reader, writer):
+        while True:
+            line = reader.readline()
+            if not line:
+                return
+            if not line.startswith(b'*'):
+                # Inline command
+                args = line.decode().split()
+            else:
+                args = []
+                for _ in range(int(line[1:-2])):
+                    length = int(reader.readline()[1:-2])
+                    args.append(reader.read(length + 2)[:-2].decode())
+            if args:
+                writer.write(_encode_reply(self.execute(*args)))
+
+    # ------------ COMMANDS ------------
+
+    def _ping(self, args: List[str]):
+        return _Status('PONG')
+
+    def _zadd(self, args: List[str]):
+        key, args = args[0], args[1:]
+        flags = set()
+        while args and args[0].upper() in ('NX', 'XX', 'CH', 'GT', 'LT'):
+            flags.add(args.pop(0).upper())
+        if not args or len(args) % 2:
+            raise ValueError("syntax error")
+        if 'NX' in flags and ('XX' in flags or 'GT' in flags or 'LT' in flags):
+            raise ValueError("GT, LT, and/or NX options at the same time are not compatible")
+
+        zset = self.data.setdefault(key, SortedSet())
+        changed = 0
+        for index in range(0, len(args), 2):
+            score, member = _parse_score(args[index]), args[index + 1]
+            previous = zset.scores.get(member)
+            if previous is None:
+                if 'XX' in flags:
+                    continue
+            else:
+                if 'NX' in flags or ('GT' in flags and score <= previous) or ('LT' in flags and score >= previous):
+                    continue
+                if score == previous:
+                    continue
+            zset.add(member, score)
+            if previous is None or 'CH' in flags:
+                changed += 1
+        if not zset:
+            del self.data[key]
+        return changed
+
+    def _zrem(self, args: List[str]):
+        zset = self.data.get(args[0])
+        if zset is None:
+            return 0
+        removed = sum(zset.remove(member) for member in args[1:])
+        if not zset:
+            del self.data[args[0]]
+        return removed
+
+    def _zscore(self, args: List[str]):
+        zset = self.data.get(args[0])
+        score = zset.scores.get(args[1]) if zset is not None else None
+        return None if score is None else _format_score(score)
+
+    def _zcard(self, args: List[str]):
+        zset = self.data.get(args[0])
+        return len(zset) if zset is not None else 0
+
+    def _zrangebyscore(self, args: List[str]):
+        key, low, high, options = args[0], args[1], args[2], [option.upper() for option in args[3:]]
+        with_scores = 'WITHSCORES' in options
+        offset, count = 0, -1
+        if 'LIMIT' in options:
+            index = options.index('LIMIT')
+            offset, count = int(args[3 + index + 1]), int(args[3 + index + 2])
+        zset = self.data.get(key)
+        if zset is None:
+            return []
+        low_open, high_open = low.startswith('('), high.startswith('(')
+        entries = zset.range_by_score(_parse_score(low.lstrip('(')), low_open, _parse_score(high.lstrip('(')), high_open,
+                                      offset, count)
+        if with_scores:
+            return [item for score, member in entries for item in (member, _format_score(score))]
+        return [member for _, member in entries]
+
+    def _del(self, args: List[str]):
+        return sum(self.data.pop(key, None) is not None for key in args)
+
+    def _flushall(self, args: List[str]):
+        self.data.clear()
+        return _Status('OK')
+
+    def _eval(self, args: List[str]):
+        sha = hashlib.sha1(args[0].encode()).hexdigest()
+        if sha not in self._scripts:
+            raise ValueError("no Python equivalent registered for this script")
+        self._loaded.add(sha)
+        return self._run_script(sha, args[1:])
+
+    def _evalsha(self, args: List[str]):
+        sha = args[0].lower()
+        if sha not in self._loaded:
+            return RespError("NOSCRIPT No matching script. Please use EVAL.")
+        return self._run_script(sha, args[1:])
+
+    def _script(self, args: List[str]):
+        if args[0].upper() != 'LOAD':
+            raise ValueError(f"unknown subcommand '{args[0]}'")
+        sha = hashlib.sha1(args[1].encode()).hexdigest()
+        if sha not in self._scripts:
+            raise ValueError("no Python equivalent registered for this script")
+        self._loaded.add(sha)
+        return sha
+
+    def _run_script(self, sha: str, args: List[str]):
+        """ Run under the lock of the EVAL command, so the script is atomic """
+        count = int(args[0])
+        keys, argv = args[1:1 + count], args[1 + count:]
+
+        def call(*command):
+            reply = self._handlers[str(command[0]).upper()]([str(arg) for arg in command[1:]])
+            if isinstance(reply, RespError):
+                raise reply
+            return reply
+
+        try:
+            return self._scripts[sha](call, keys, argv)
+        except RespError as e:
+            return e
+
+
+class _Status(str):
+    """ Simple string reply """
+
+
+def _parse_score(value: str) -> float:
+    lowered = value.lower()
+    if lowered in ('-inf', '+inf', 'inf'):
+        return float(lowered if lowered != 'inf' else '+inf')
+    return float(value)
+
+
+def _format_score(score: float) -> str:
+    return str(int(score)) if score.is_integer() else repr(score)
+
+
+def _encode_reply(reply) -> bytes:
+    if isinstance(reply, RespError):
+        return b'-%s\r\n' % str(reply).encode()
+    if isinstance(reply, _Status):
+        return b'+%s\r\n' % reply.encode()
+    if isinstance(reply, int):
+        return b':%d\r\n' % reply
+    if reply is None:
+        return b'$-1\r\n'
+    if isinstance(reply, str):
+        data = reply.encode()
+        return b'$%d\r\n%s\r\n' % (len(data), data)
+    if isinstance(reply, list):
+        return b'*%d\r\n' % len(reply) + b''.join(_encode_reply(item) for item in reply)
+    raise TypeError(f"Cannot encode {reply!r}")
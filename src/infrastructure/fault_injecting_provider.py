@@ -0,0 +1,64 @@
+import random
+import threading
+import time
+from typing import Callable, List, Tuple
+
+from application.interfaces.mail_service import IMailService
+from application.interfaces.sms_service import ISMSService
+from domain.models.monitored_service import MonitoredService
+from domain.models.target import Target
+
+""" Fault-Injecting Provider
+Stand-in for a degraded mail or SMS provider, for tests and resilience drills: it fails a share of
+the calls, adds latency, or goes fully down, and records the notifications it delivered.
+"""
+
+
+class ProviderError(Exception):
+    """ Injected provider failure """
+
+
+class FaultInjectingProvider(IMailService, ISMSService):
+    def __init__(self,
+        failure_rate: float = 0.0,
+        latency: float = 0.0,
+        seed: int = 0,
+        sleep: Callable[[float], None] = time.sleep
+    ):
+        """
+        :param failure_rate: Share of the calls failing, in [0, 1]
+        :param latency: Seconds every call takes
+        :param seed: Seed of the failure draws, runs are reproducible
+        :param sleep: Used to simulate the latency
+        """
+        self.failure_rate = failure_rate
+        self.latency = latency
+        self.sleep = sleep
+        self.down = False
+        self._random = random.Random(seed)
+        self._fail_next = 0
+        self._lock = threading.Lock()
+
+        self.attempts = 0
+        self.delivered: List[Tuple[Target, str, str]] = []
+
+    def notify(self, target: Target, service: MonitoredService, msg: str):
+        if self.latency:
+            self.sleep(self.latency)
+        with self._lock:
+            self.attempts += 1
+            if self._fail_next:
+                self._fail_next -= 1
+                raise ProviderError("Injected failure")
+            if self.down or self._random.random() < self.failure_rate:
+                raise ProviderError("Provider unavailable" if self.down else "Injected failure")
+            self.delivered.append((target, service.id, msg))
+
+    def fail_next(self, calls: int):
+        """ Make the next calls fail, whatever the failure rate """
+        with self._lock:
+            self._fail_next = calls
+
+    def outage(self, down: bool = True):
+        """ Start or end a full outage """
+        self.down = down
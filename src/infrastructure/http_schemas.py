@@ -0,0 +1,11 @@
+from pydantic import BaseModel
+
+""" HTTP Schemas
+Request bodies of the HTTP endpoints, validated by FastAPI. pydantic is only a dependency of the
+HTTP layer: the domain and its adapters import with the standard library only.
+"""
+
+
+class Alert(BaseModel):
+    service_id: str
+    message: str
@@ -0,0 +1,32 @@
+import threading
+from typing import List, Tuple
+
+from application.interfaces.bulk_notification_provider import IBulkNotificationProvider
+
+""" In-Memory Bulk Provider
+Stand-in for a mail or SMS provider, for tests and benchmarks.
+It only records what it is asked to send and counts the API calls.
+"""
+
+
+class InMemoryBulkProvider(IBulkNotificationProvider):
+    def __init__(self):
+        self.calls: List[List[Tuple[str, str]]] = []
+        self._lock = threading.Lock()
+
+    def send_bulk(self, messages: List[Tuple[str, str]]):
+        with self._lock:
+            self.calls.append(list(messages))
+
+    @property
+    def call_count(self) -> int:
+        return len(self.calls)
+
+    @property
+    def sent(self) -> List[Tuple[str, str]]:
+        """ Every message sent so far """
+        return [message for call in self.calls for message in call]
+
+    def reset(self):
+        with self._lock:
+            self.calls.clear()
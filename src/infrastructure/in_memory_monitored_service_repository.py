@@ -0,0 +1,57 @@
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from application.interfaces.monitored_service_repository import ConcurrentModificationError, IMonitoredServiceRepository
+from domain.models.monitored_service import MonitoredService
+
+""" In-Memory Monitored Service Repository
+IMonitoredServiceRepository keeping rows in a dictionary, for tests and benchmarks.
+Like a database, it hands out fresh copies so concurrent handlers never share a MonitoredService.
+"""
+
+# (status, alert_msg, acknowledged, current_level, version)
+Row = Tuple[str, str, bool, int, int]
+
+
+class InMemoryMonitoredServiceRepository(IMonitoredServiceRepository):
+    def __init__(self, services: Iterable[MonitoredService] = ()):
+        self._rows: Dict[str, Row] = {}
+        self._lock = threading.Lock()
+        for service in services:
+            self.save(service)
+
+    def get(self, service_id: str) -> Optional[MonitoredService]:
+        row = self._rows.get(service_id)
+        return _to_service(service_id, row) if row else None
+
+    def get_many(self, service_ids: Iterable[str]) -> Dict[str, MonitoredService]:
+        rows = self._rows
+        return {service_id: _to_service(service_id, rows[service_id]) for service_id in service_ids if service_id in rows}
+
+    def save(self, service: MonitoredService) -> MonitoredService:
+        return self.save_many([service])[0]
+
+    def save_many(self, services: List[MonitoredService]) -> List[MonitoredService]:
+        with self._lock:
+            conflicts = [service.id for service in services if self._stored_version(service.id) != service.version]
+            if conflicts:
+                raise ConcurrentModificationError(conflicts)
+            for service in services:
+                service.version += 1
+                self._rows[service.id] = (
+                    service.status, service.alert_msg, service.acknowledged, service.current_level, service.version
+                )
+        return services
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def _stored_version(self, service_id: str) -> int:
+        row = self._rows.get(service_id)
+        return row[4] if row else 0
+
+
+def _to_service(service_id: str, row: Row) -> MonitoredService:
+    service = MonitoredService(service_id)
+    service.status, service.alert_msg, service.acknowledged, service.current_level, service.version = row
+    return service
@@ -0,0 +1,367 @@
+import json
+import logging
+import math
+import os
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from typing import Callable, Dict, List, Optional, Sequence
+
+from application.interfaces.incident_history import IIncidentHistory
+from domain.models.monitored_service import MonitoredService
+
+""" Incident History Store
+Append-optimized history of the incidents: every alert, escalation, notification, acknowledgement
+and resolve is appended with its timestamp to typed columns (one array per field, strings interned
+once), so millions of events stay compact. Events are indexed by service, target and incident as
+sorted position arrays; timestamps never go backward, so time ranges are bisected on these positions.
+MTTA/MTTR are served from rollups updated on each append, per time bucket, globally and per service:
+a query sums the buckets of its range instead of scanning the events.
+The events are also appended to an NDJSON log, replayed on start. It is not fsynced: the history is
+for analytics, the pager state is recovered from the event log.
+"""
+
+logger = logging.getLogger(__name__)
+
+HISTORY_FILE = 'history.log'
+
+KINDS = ('alert', 'escalate', 'notify', 'acknowledge', 'resolve')
+ALERT, ESCALATE, NOTIFY, ACKNOWLEDGE, RESOLVE = range(len(KINDS))
+# Events journaled by the pagers -> kind of their history event
+_PAGER_EVENTS = {'alert': ALERT, 'timeout': ESCALATE, 'acknowledge': ACKNOWLEDGE, 'healthy': RESOLVE}
+# Interned string reference of the events without target or message
+_NONE = 0xFFFFFFFF
+# Rollup counters of a bucket: incidents opened in it, then acknowledged and resolved with their durations
+OPENED, ACKNOWLEDGED, ACK_SECONDS, RESOLVED, RESOLVE_SECONDS = range(5)
+
+
+class IncidentHistoryStore(IIncidentHistory):
+    def __init__(self,
+        directory: Optional[str] = None,
+        bucket_seconds: float = 3600.0,
+        clock: Callable[[], float] = time.time
+    ):
+        """
+        :param directory: Where the history log is stored, kept in memory only when omitted
+        :param bucket_seconds: Granularity of the MTTA/MTTR rollups
+        :param clock: Wall clock of the event timestamps
+        """
+        self.bucket_seconds = bucket_seconds
+        self.clock = clock
+        self._lock = threading.Lock()
+
+        # Interned service IDs, target addresses and alert messages
+        self._strings: List[str] = []
+        self._refs: Dict[str, int] = {}
+
+        # Events, by position
+        self._times = array('d')
+        self._kinds = array('B')
+        self._incident_refs = array('I')
+        self._levels = array('H')
+        self._target_refs = array('I')
+        self._message_refs = array('I')
+
+        # Incidents, by ID; NaN until acknowledged or resolved
+        self._services = array('I')
+        self._opened = array('d')
+        self._acknowledged = array('d')
+        self._resolved = array('d')
+        self._max_levels = array('H')
+        # Service reference -> its open incident
+        self._open: Dict[int, int] = {}
+
+        # Secondary indexes: sorted event positions, and incident IDs of each service
+        self._by_service: Dict[int, array] = {}
+        self._by_target: Dict[int, array] = {}
+        self._by_incident: List[array] = []
+        self._incidents_by_service: Dict[int, array] = {}
+
+        # Bucket -> counters, globally and per service reference; buckets are created in order
+        self._rollups: Dict[int, List[float]] = {}
+        self._buckets: List[int] = []
+        self._service_rollups: Dict[int, Dict[int, List[float]]] = {}
+        self._service_buckets: Dict[int, List[int]] = {}
+
+        self._file = None
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+            path = os.path.join(directory, HISTORY_FILE)
+            self._load(path)
+            self._file = open(path, 'a', encoding='utf-8')
+
+    # ------------ IIncidentHistory ------------
+
+    def record(self, event: str, services: List[MonitoredService]):
+        kind = _PAGER_EVENTS.get(event)
+        if kind is None:
+            return
+        with self._lock:
+            at = self._now()
+            for service in services:
+                self._append(at, kind, service.id, service.current_level, None, service.alert_msg if kind == ALERT else None)
+
+    def record_notifications(self, service: MonitoredService):
+        with self._lock:
+            at = self._now()
+            for target in service.current_targets():
+                self._append(at, NOTIFY, service.id, service.current_level, target.address, None)
+
+    # ------------ QUERIES ------------
+
+    def events(self,
+        service_id: Optional[str] = None,
+        target: Optional[str] = None,
+        incident: Optional[int] = None,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+        limit: int = 100
+    ) -> List[dict]:
+        """
+        Events matching every given criteria, newest first
+        :param target: Address of a notified target (email address, phone number)
+        :param since: Oldest timestamp, included
+        :param until: Newest timestamp, excluded
+        """
+        with self._lock:
+            service_ref = self._refs.get(service_id, _NONE)
+            target_ref = self._refs.get(target, _NONE)
+            # Most selective index first, the other criteria are filtered
+            if incident is not None:
+                positions = self._by_incident[incident] if 0 <= incident < len(self._by_incident) else ()
+            elif target is not None:
+                positions = self._by_target.get(target_ref, ())
+            elif service_id is not None:
+                positions = self._by_service.get(service_ref, ())
+            else:
+                positions = range(len(self._times))
+            start, stop = self._range(positions, self._times.__getitem__, since, until)
+
+            found = []
+            for i in range(stop - 1, start - 1, -1):
+                if len(found) >= limit:
+                    break
+                position = positions[i]
+                if service_id is not None and self._services[self._incident_refs[position]] != service_ref:
+                    continue
+                if target is not None and self._target_refs[position] != target_ref:
+                    continue
+                found.append(self._event(position))
+            return found
+
+    def incidents(self,
+        service_id: Optional[str] = None,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+        limit: int = 100
+    ) -> List[dict]:
+        """
+        Incidents opened in a time range, newest first
+        :param since: Oldest opening timestamp, included
+        :param until: Newest opening timestamp, excluded
+        """
+        with self._lock:
+            if service_id is not None:
+                ids = self._incidents_by_service.get(self._refs.get(service_id, _NONE), ())
+            else:
+                ids = range(len(self._opened))
+            start, stop = self._range(ids, self._opened.__getitem__, since, until)
+            return [self._incident(ids[i]) for i in range(stop - 1, max(start, stop - limit) - 1, -1)]
+
+    def incident(self, incident_id: int) -> Optional[dict]:
+        """ An incident with its events, oldest first """
+        with self._lock:
+            if not 0 <= incident_id < len(self._opened):
+                return None
+            return {
+                **self._incident(incident_id),
+                'events': [self._event(position) for position in self._by_incident[incident_id]],
+            }
+
+    def stats(self, service_id: Optional[str] = None, since: Optional[float] = None, until: Optional[float] = None) -> dict:
+        """
+        MTTA/MTTR of the incidents opened in a time range, read from the rollups. The range is
+        rounded to the buckets: those starting in [since, until) are counted
+        :return: Number of incidents opened, acknowledged and resolved, and their mean times in seconds
+        """
+        with self._lock:
+            if service_id is None:
+                rollups, buckets = self._rollups, self._buckets
+            else:
+                service_ref = self._refs.get(service_id, _NONE)
+                rollups = self._service_rollups.get(service_ref, {})
+                buckets = self._service_buckets.get(service_ref, [])
+            start = 0 if since is None else bisect_left(buckets, math.ceil(since / self.bucket_seconds))
+            stop = len(buckets) if until is None else bisect_left(buckets, math.ceil(until / self.bucket_seconds))
+            totals = [0.0] * 5
+            for bucket in buckets[start:stop]:
+                for field, value in enumerate(rollups[bucket]):
+                    totals[field] += value
+        return {
+            'incidents': int(totals[OPENED]),
+            'acknowledged': int(totals[ACKNOWLEDGED]),
+            'resolved': int(totals[RESOLVED]),
+            'mtta_seconds': totals[ACK_SECONDS] / totals[ACKNOWLEDGED] if totals[ACKNOWLEDGED] else None,
+            'mttr_seconds': totals[RESOLVE_SECONDS] / totals[RESOLVED] if totals[RESOLVED] else None,
+        }
+
+    def __len__(self) -> int:
+        """ Number of events """
+        return len(self._times)
+
+    def flush(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.flush()
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    # ------------ INTERNALS ------------
+
+    def _now(self) -> float:
+        # Never before the last event: time ranges are bisected on the append order
+        now = self.clock()
+        if self._times and now < self._times[-1]:
+            return self._times[-1]
+        return now
+
+    def _intern(self, value: Optional[str]) -> int:
+        if value is None:
+            return _NONE
+        ref = self._refs.get(value)
+        if ref is None:
+            ref = self._refs[value] = len(self._strings)
+            self._strings.append(value)
+        return ref
+
+    def _append(self, at: float, kind: int, service_id: str, level: int, target: Optional[str],
+                message: Optional[str], log: bool = True):
+        service = self._intern(service_id)
+        incident = self._open.get(service)
+        if kind == ALERT:
+            # Alerting already (history attached mid-incident): the incident stays open
+            if incident is not None:
+                return
+            incident = self._open_incident(service, at)
+        elif incident is None:
+            # No incident recorded for the service: healthy already, or opened before the history
+            return
+
+        position = len(self._times)
+        self._times.append(at)
+        self._kinds.append(kind)
+        self._incident_refs.append(incident)
+        self._levels.append(level)
+        target_ref = self._intern(target)
+        self._target_refs.append(target_ref)
+        self._message_refs.append(self._intern(message))
+        self._by_service.setdefault(service, array('I')).append(position)
+        self._by_incident[incident].append(position)
+        if target_ref != _NONE:
+            self._by_target.setdefault(target_ref, array('I')).append(position)
+
+        if kind == ESCALATE:
+            self._max_levels[incident] = max(self._max_levels[incident], level)
+        elif kind == ACKNOWLEDGE and math.isnan(self._acknowledged[incident]):
+            # Only the first acknowledgement counts
+            self._acknowledged[incident] = at
+            self._roll_up(service, incident, ACKNOWLEDGED, ACK_SECONDS, at)
+        elif kind == RESOLVE:
+            self._resolved[incident] = at
+            del self._open[service]
+            self._roll_up(service, incident, RESOLVED, RESOLVE_SECONDS, at)
+
+        if log and self._file is not None:
+            self._file.write(json.dumps([at, KINDS[kind], service_id, level, target, message], separators=(',', ':')) + '\n')
+
+    def _open_incident(self, service: int, at: float) -> int:
+        incident = self._open[service] = len(self._opened)
+        self._services.append(service)
+        self._opened.append(at)
+        self._acknowledged.append(math.nan)
+        self._resolved.append(math.nan)
+        self._max_levels.append(0)
+        self._by_incident.append(array('I'))
+        self._incidents_by_service.setdefault(service, array('I')).append(incident)
+        for rollup in self._rollups_of(service, at):
+            rollup[OPENED] += 1
+        return incident
+
+    def _roll_up(self, service: int, incident: int, count: int, seconds: int, at: float):
+        # Attributed to the bucket where the incident was opened, which already exists
+        opened = self._opened[incident]
+        for rollup in self._rollups_of(service, opened):
+            rollup[count] += 1
+            rollup[seconds] += at - opened
+
+    def _rollups_of(self, service: int, at: float) -> Sequence[List[float]]:
+        bucket = math.floor(at / self.bucket_seconds)
+        rollup = self._rollups.get(bucket)
+        if rollup is None:
+            rollup = self._rollups[bucket] = [0.0] * 5
+            self._buckets.append(bucket)
+        service_rollups = self._service_rollups.setdefault(service, {})
+        service_rollup = service_rollups.get(bucket)
+        if service_rollup is None:
+            service_rollup = service_rollups[bucket] = [0.0] * 5
+            self._service_buckets.setdefault(service, []).append(bucket)
+        return rollup, service_rollup
+
+    def _range(self, positions, time_of: Callable[[int], float], since: Optional[float], until: Optional[float]):
+        """ Slice of sorted positions whose time is in [since, until) """
+        start = 0 if since is None else bisect_left(positions, since, key=time_of)
+        stop = len(positions) if until is None else bisect_left(positions, until, key=time_of)
+        return start, max(start, stop)
+
+    def _event(self, position: int) -> dict:
+        incident = self._incident_refs[position]
+        return {
+            'at': self._times[position],
+            'kind': KINDS[self._kinds[position]],
+            'incident': incident,
+            'service_id': self._strings[self._services[incident]],
+            'level': self._levels[position],
+            'target': self._string(self._target_refs[position]),
+            'message': self._string(self._message_refs[position]),
+        }
+
+    def _incident(self, incident: int) -> dict:
+        opened = self._opened[incident]
+        acknowledged = self._acknowledged[incident]
+        resolved = self._resolved[incident]
+        return {
+            'id': incident,
+            'service_id': self._strings[self._services[incident]],
+            'message': self._string(self._message_refs[self._by_incident[incident][0]]),
+            'opened_at': opened,
+            'acknowledged_at': None if math.isnan(acknowledged) else acknowledged,
+            'resolved_at': None if math.isnan(resolved) else resolved,
+            'max_level': self._max_levels[incident],
+        }
+
+    def _string(self, ref: int) -> Optional[str]:
+        return None if ref == _NONE else self._strings[ref]
+
+    def _load(self, path: str):
+        if not os.path.exists(path):
+            return
+        valid = 0
+        with open(path, 'rb') as f:
+            for line in f:
+                try:
+                    if not line.endswith(b'\n'):
+                        raise ValueError("Unterminated record")
+                    at, kind, service_id, level, target, message = json.loads(line)
+                except ValueError:
+                    # Torn write before a crash: cut, so the next events start on a new line
+                    logger.warning("Ignoring a truncated incident history record")
+                    break
+                self._append(at, KINDS.index(kind), service_id, level, target, message, log=False)
+                valid += len(line)
+        if valid < os.path.getsize(path):
+            os.truncate(path, valid)
@@ -0,0 +1,26 @@
+import logging
+
+from application.interfaces.mail_service import IMailService
+from application.interfaces.sms_service import ISMSService
+from domain.models.monitored_service import MonitoredService
+from domain.models.target import Target
+
+""" Logging Notification Service
+IMailService and ISMSService logging the notifications instead of sending them, used by the server
+until real mail and SMS providers are configured.
+"""
+
+logger = logging.getLogger(__name__)
+
+
+class LoggingNotificationService(IMailService, ISMSService):
+    def __init__(self, channel: str):
+        """
+        :param channel: Name of the channel in the log lines ('mail', 'sms')
+        """
+        self.channel = channel
+        self.sent = 0
+
+    def notify(self, target: Target, service: MonitoredService, msg: str):
+        self.sent += 1
+        logger.info("%s notification for service '%s' to %s: %s", self.channel, service.id, target.address, msg)
@@ -0,0 +1,70 @@
+import cProfile
+import io
+import pstats
+import threading
+from contextlib import contextmanager, nullcontext
+from typing import ContextManager, Dict
+
+""" Profiling
+Profiling hook for instrument_handlers: runs cProfile around one handler call out of sample_every
+and accumulates the samples, so a live server can be profiled at a bounded cost. A single call is
+profiled at a time; concurrent calls run unprofiled. The profiler is handed to the caller, which
+turns it off while an async handler awaits: the other tasks of the event loop are not sampled.
+"""
+
+
+class CProfileHook:
+    def __init__(self, sample_every: int = 100):
+        """
+        :param sample_every: Profile one handler call out of sample_every
+        """
+        self.sample_every = sample_every
+        self.enabled = True
+        self.samples: Dict[str, int] = {}
+        self._calls = 0
+        self._stats: pstats.Stats = None
+        self._busy = threading.Lock()
+        self._lock = threading.Lock()
+
+    def __call__(self, handler: str) -> ContextManager:
+        if not self.enabled:
+            return nullcontext()
+        with self._lock:
+            self._calls += 1
+            sampled = self._calls % self.sample_every == 0
+        if not sampled or not self._busy.acquire(blocking=False):
+            return nullcontext()
+        return self._profile(handler)
+
+    @contextmanager
+    def _profile(self, handler: str):
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+            try:
+                yield profiler
+            finally:
+                profiler.disable()
+            with self._lock:
+                self.samples[handler] = self.samples.get(handler, 0) + 1
+                if self._stats is None:
+                    self._stats = pstats.Stats(profiler)
+                else:
+                    self._stats.add(profiler)
+        finally:
+            self._busy.release()
+
+    def report(self, limit: int = 30, sort: str = 'cumulative') -> str:
+        """ Most expensive functions over every sample """
+        with self._lock:
+            if self._stats is None:
+                return 'No samples\n'
+            output = io.StringIO()
+            self._stats.stream = output
+            self._stats.sort_stats(sort).print_stats(limit)
+            return output.getvalue()
+
+    def reset(self):
+        with self._lock:
+            self._stats = None
+            self.samples.clear()
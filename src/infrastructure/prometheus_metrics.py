@@ -0,0 +1,177 @@
+import bisect
+import threading
+from typing import Callable, Dict, Iterable, List, Tuple
+
+from application.interfaces.metrics import IMetrics
+
+""" Prometheus Metrics
+In-process IMetrics registry rendered in the Prometheus text exposition format. Counters and
+histograms are kept per label set; histograms have fixed cumulative buckets. Collectors add
+gauges computed at scrape time (queue depths, pending deliveries).
+"""
+
+# Seconds, from sub-millisecond in-memory calls to slow provider APIs
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+HELP = {
+    'pager_stage_seconds': 'Duration of each stage of the pager handlers',
+    'pager_handler_seconds': 'Duration of the pager handlers',
+    'pager_handler_errors_total': 'Pager handler calls that raised',
+    'pager_notification_seconds': 'Duration of a notification, per channel',
+    'pager_notification_errors_total': 'Notifications that failed, per channel',
+    'pager_transitions_total': 'Committed monitored service transitions, per event',
+}
+
+Labels = Tuple[Tuple[str, str], ...]
+# Returns (name, labels, value) gauge samples
+Collector = Callable[[], Iterable[Tuple[str, Dict[str, str], float]]]
+
+
+class _Counter:
+    __slots__ = ('value',)
+
+    def __init__(self):
+        self.value = 0
+
+
+class _Histogram:
+    __slots__ = ('counts', 'sum', 'count')
+
+    def __init__(self, buckets: int):
+        self.counts = [0] * buckets
+        self.sum = 0.0
+        self.count = 0
+
+
+class PrometheusMetrics(IMetrics):
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        """
+        :param buckets: Upper bounds of the histogram buckets, in seconds
+        """
+        self.buckets = tuple(sorted(buckets))
+        self._counters: Dict[str, Dict[Labels, _Counter]] = {}
+        self._histograms: Dict[str, Dict[Labels, _Histogram]] = {}
+        self._collectors: List[Collector] = []
+        self._lock = threading.Lock()
+
+    # ------------ IMetrics ------------
+
+    def increment(self, name: str, value: float = 1, **labels: str):
+        counter = self._counter(name, tuple(sorted(labels.items())))
+        with self._lock:
+            counter.value += value
+
+    def observe(self, name: str, seconds: float, **labels: str):
+        histogram = self._histogram(name, tuple(sorted(labels.items())))
+        # Index of the first bucket holding the value, len(buckets) for +Inf only
+        bucket = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            histogram.counts[bucket] += 1
+            histogram.sum += seconds
+            histogram.count += 1
+
+    def counter_of(self, name: str, **labels: str) -> Callable[[float], None]:
+        counter = self._counter(name, tuple(sorted(labels.items())))
+        lock = self._lock
+
+        def increment(value: float = 1):
+            with lock:
+                counter.value += value
+        return increment
+
+    def histogram_of(self, name: str, **labels: str) -> Callable[[float], None]:
+        histogram = self._histogram(name, tuple(sorted(labels.items())))
+        buckets = self.buckets
+        lock = self._lock
+
+        def observe(seconds: float):
+            bucket = bisect.bisect_left(buckets, seconds)
+            with lock:
+                histogram.counts[bucket] += 1
+                histogram.sum += seconds
+                histogram.count += 1
+        return observe
+
+    # ------------ REGISTRY ------------
+
+    def add_collector(self, collector: Collector):
+        """ Register gauges computed on each scrape """
+        self._collectors.append(collector)
+
+    def counter(self, name: str, **labels: str) -> float:
+        with self._lock:
+            counter = self._counters.get(name, {}).get(tuple(sorted(labels.items())))
+            return counter.value if counter else 0
+
+    def histogram(self, name: str, **labels: str) -> Tuple[int, float]:
+        """ Number and sum of the observations of a series """
+        with self._lock:
+            histogram = self._histograms.get(name, {}).get(tuple(sorted(labels.items())))
+            return (histogram.count, histogram.sum) if histogram else (0, 0.0)
+
+    def render(self) -> str:
+        """ Text exposition format, version 0.0.4 """
+        lines: List[str] = []
+        with self._lock:
+            for name, series in sorted(self._counters.items()):
+                _header(lines, name, 'counter')
+                for labels, counter in series.items():
+                    lines.append(f'{name}{_format_labels(labels)} {_format_value(counter.value)}')
+
+            for name, series in sorted(self._histograms.items()):
+                _header(lines, name, 'histogram')
+                for labels, histogram in series.items():
+                    cumulative = 0
+                    for bound, count in zip(self.buckets + (float('inf'),), histogram.counts):
+                        cumulative += count
+                        le = '+Inf' if bound == float('inf') else repr(bound)
+                        lines.append(f'{name}_bucket{_format_labels(labels + (("le", le),))} {cumulative}')
+                    lines.append(f'{name}_sum{_format_labels(labels)} {_format_value(histogram.sum)}')
+                    lines.append(f'{name}_count{_format_labels(labels)} {histogram.count}')
+
+        gauges: Dict[str, List[str]] = {}
+        for collector in self._collectors:
+            for name, labels, value in collector():
+                gauges.setdefault(name, []).append(
+                    f'{name}{_format_labels(tuple(sorted(labels.items())))} {_format_value(value)}'
+                )
+        for name, samples in sorted(gauges.items()):
+            _header(lines, name, 'gauge')
+            lines.extend(samples)
+        return '\n'.join(lines) + '\n'
+
+    def _counter(self, name: str, labels: Labels) -> _Counter:
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            counter = series.get(labels)
+            if counter is None:
+                counter = series[labels] = _Counter()
+            return counter
+
+    def _histogram(self, name: str, labels: Labels) -> _Histogram:
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            histogram = series.get(labels)
+            if histogram is None:
+                histogram = series[labels] = _Histogram(len(self.buckets) + 1)
+            return histogram
+
+
+def _header(lines: List[str], name: str, kind: str):
+    if name in HELP:
+        lines.append(f'# HELP {name} {HELP[name]}')
+    lines.append(f'# TYPE {name} {kind}')
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in labels) + '}'
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
@@ -0,0 +1,240 @@
+import hashlib
+import logging
+import threading
+import time
+from concurrent.futures import Future, wait
+from typing import Any, Callable, List, Optional
+
+from application.interfaces.time_service import ITimerService
+from infrastructure.resp_client import RespClient, RespError
+
+""" Redis Timer Service
+Distributed implementation of the ITimerService on Redis sorted sets, for several pager nodes
+sharing the same timeouts. Pending timeouts live in a sorted set scored by their due time (epoch
+seconds). Nodes poll the due ones in batches and claim each of them in a second sorted set of
+leases with ZADD NX, which a single node wins, before removing it from the pending set and handing
+the batch to on_expire (usually ServicePager.handle_timeouts). A Lua script removes each leased
+timeout only if it is still due, so a timeout re-armed in between is never dropped. Leases are
+released once the batch is handled: when on_expire hands back a future per timeout (queued to an
+event engine), once each future succeeded, the leases of the timeouts still in flight being extended
+meanwhile, so a slow queue never hands them to another node. The leases of a node that died in
+between, or of a failed timeout, expire and their timeouts are pending again. A timeout is thus
+handled by exactly one node, and again only after a failure (at least once).
+"""
+
+logger = logging.getLogger(__name__)
+
+# Called with a batch of expired IDs, may return the future of each, in the same order
+TimeoutHandler = Callable[[List[str]], Optional[List[Future]]]
+
+# KEYS: pending timeouts, leases; ARGV: now, leased IDs. Returns the claimed IDs
+CLAIM_SCRIPT = """
+local now = tonumber(ARGV[1])
+local claimed = {}
+for i = 2, #ARGV do
+    local score = redis.call('ZSCORE', KEYS[1], ARGV[i])
+    if score and tonumber(score) <= now then
+        redis.call('ZREM', KEYS[1], ARGV[i])
+        claimed[#claimed + 1] = ARGV[i]
+    else
+        redis.call('ZREM', KEYS[2], ARGV[i])
+    end
+end
+return claimed
+"""
+CLAIM_SCRIPT_SHA = hashlib.sha1(CLAIM_SCRIPT.encode()).hexdigest()
+
+
+def claim_script(call: Callable[..., Any], keys: List[str], argv: List[str]) -> List[str]:
+    """ CLAIM_SCRIPT in Python, for servers without Lua (FakeRespServer) """
+    now = float(argv[0])
+    claimed = []
+    for msId in argv[1:]:
+        score = call('ZSCORE', keys[0], msId)
+        if score is not None and float(score) <= now:
+            call('ZREM', keys[0], msId)
+            claimed.append(msId)
+        else:
+            call('ZREM', keys[1], msId)
+    return claimed
+
+
+# Scripts of this service, to register on a FakeRespServer
+SCRIPTS = {CLAIM_SCRIPT: claim_script}
+
+
+class RedisTimerService(ITimerService):
+    def __init__(self,
+        client: RespClient,
+        on_expire: Optional[TimeoutHandler] = None,
+        key: str = 'pager:timeouts',
+        batch_size: int = 100,
+        lease_seconds: float = 60.0,
+        poll_interval: float = 1.0,
+        clock: Callable[[], float] = time.time,
+        renew_every: Optional[float] = None
+    ):
+        """
+        :param client: Connection to the Redis server, owned by this service
+        :param on_expire: Called with a batch of Monitored Service IDs whose timeout expired; may return
+            the future of each, the leases are then released once the futures are resolved
+        :param key: Sorted set of the pending timeouts, the leases are kept in '<key>:leases'
+        :param batch_size: Maximum number of timeouts claimed per poll
+        :param lease_seconds: Time a node has to handle a claimed batch before other nodes take it over
+        :param poll_interval: Seconds between polls when no timeout is due
+        :param clock: Wall clock in seconds, shared by every node
+        :param renew_every: Seconds between the extensions of the leases of timeouts in flight, a third of
+            lease_seconds by default
+        """
+        if batch_size <= 0:
+            raise ValueError("batch_size must be positive")
+
+        self.client = client
+        self.on_expire = on_expire
+        self.key = key
+        self.lease_key = key + ':leases'
+        self.batch_size = batch_size
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.clock = clock
+        self.renew_every = lease_seconds / 3 if renew_every is None else renew_every
+
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # ------------ ITimerService ------------
+
+    def add_timeout(self, msId: str, minutes: int):
+        """
+        Arm (or re-arm) the timeout of a Monitored Service, replacing the pending one
+        :param msId: ID of the monitored service
+        :param minutes: Delay before the timeout expires
+        """
+        self.client.execute('ZADD', self.key, self.clock() + minutes * 60, msId)
+
+    def cancel_timeout(self, msId: str) -> bool:
+        """
+        Drop the pending timeout of a Monitored Service
+        :return: True if a timeout was pending
+        """
+        return self.client.execute('ZREM', self.key, msId) == 1
+
+    # ------------ DRIVER ------------
+
+    def claim(self, now: Optional[float] = None) -> List[str]:
+        """
+        Claim a batch of due timeouts: their leases are held until release
+        :param now: Clock reading in seconds, defaults to the current clock value
+        :return: IDs of the claimed timeouts, claimed by no other node
+        """
+        now = self.clock() if now is None else now
+        due = self.client.execute('ZRANGEBYSCORE', self.key, '-inf', now, 'LIMIT', 0, self.batch_size)
+        if not due:
+            return []
+
+        # Round trip 1: a single node wins each lease
+        lease_until = now + self.lease_seconds
+        leases = self.client.pipeline([('ZADD', self.lease_key, 'NX', lease_until, msId) for msId in due])
+        won = [msId for msId, lease in zip(due, leases) if lease == 1]
+        if not won:
+            return []
+
+        # Round trip 2, atomic: the listing may be stale (handled and re-armed by the previous lease
+        # holder, or re-armed since), such timeouts stay pending and their leases are dropped
+        return self._eval_claim(now, won)
+
+    def release(self, msIds: List[str]):
+        """ Drop the leases of handled timeouts """
+        if msIds:
+            self.client.execute('ZREM', self.lease_key, *msIds)
+
+    def extend(self, msIds: List[str]):
+        """ Extend the leases of timeouts still being handled, from now; released ones are not taken again """
+        if msIds:
+            lease_until = self.clock() + self.lease_seconds
+            self.client.execute('ZADD', self.lease_key, 'XX', *(arg for msId in msIds for arg in (lease_until, msId)))
+
+    def recover(self, now: Optional[float] = None) -> int:
+        """
+        Make the timeouts of expired leases (a node died while handling them) pending again
+        :return: Number of recovered timeouts
+        """
+        now = self.clock() if now is None else now
+        expired = self.client.execute('ZRANGEBYSCORE', self.lease_key, '-inf', now, 'LIMIT', 0, self.batch_size)
+        if not expired:
+            return 0
+        # NX: a timeout re-armed in the meantime keeps its due time
+        self.client.pipeline(
+            [('ZADD', self.key, 'NX', now, msId) for msId in expired] + [('ZREM', self.lease_key, *expired)]
+        )
+        return len(expired)
+
+    def poll(self, now: Optional[float] = None) -> int:
+        """
+        Claim due timeouts, hand them to on_expire and release them, until none is due
+        :return: Number of handled timeouts
+        """
+        self.recover(now)
+        handled = 0
+        while True:
+            claimed = self.claim(now)
+            if not claimed:
+                return handled
+            if self.on_expire is not None:
+                # Left leased when the handler fails: retried once the lease expires
+                futures = self.on_expire(claimed)
+                if futures is not None:
+                    claimed = self._await_handled(claimed, futures)
+            self.release(claimed)
+            handled += len(claimed)
+
+    def start(self):
+        """ Poll from a background thread """
+        if self._thread is not None:
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name='redis-timer', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def pending(self, msId: str) -> bool:
+        """ Whether a Monitored Service has a pending timeout """
+        return self.client.execute('ZSCORE', self.key, msId) is not None
+
+    def __len__(self) -> int:
+        return self.client.execute('ZCARD', self.key)
+
+    # ------------ INTERNALS ------------
+
+    def _eval_claim(self, now: float, leased: List[str]) -> List[str]:
+        args = (2, self.key, self.lease_key, now, *leased)
+        try:
+            return self.client.execute('EVALSHA', CLAIM_SCRIPT_SHA, *args)
+        except RespError as e:
+            if not str(e).startswith('NOSCRIPT'):
+                raise
+            # First run on this server (or its script cache was flushed): EVAL caches the script
+            return self.client.execute('EVAL', CLAIM_SCRIPT, *args)
+
+    def _await_handled(self, claimed: List[str], futures: List[Future]) -> List[str]:
+        """ Wait for the handling of the claimed timeouts, extending their leases meanwhile; the failed ones keep their lease """
+        while wait(futures, timeout=self.renew_every).not_done:
+            self.extend([msId for msId, future in zip(claimed, futures) if not future.done()])
+        failed = [msId for msId, future in zip(claimed, futures) if future.exception() is not None]
+        if failed:
+            logger.error("Timeouts %s failed, retried once their lease expires", failed)
+        return [msId for msId, future in zip(claimed, futures) if future.exception() is None]
+
+    def _run(self):
+        while not self._stopped.wait(self.poll_interval):
+            try:
+                self.poll()
+            except (OSError, ConnectionError, RespError):
+                logger.exception("Polling the timeouts failed")
+            except Exception:
+                logger.exception("Timeout dispatch failed")
@@ -0,0 +1,113 @@
+import socket
+import threading
+from typing import Any, List, Optional, Sequence, Union
+
+""" RESP Client
+Minimal client of the Redis serialization protocol (RESP2): commands are sent as arrays of bulk
+strings and replies parsed back into Python values (str, int, None, lists). Several commands can
+be pipelined in a single round trip. One connection, guarded by a lock: give each worker its own.
+"""
+
+Argument = Union[str, bytes, int, float]
+
+
+class RespError(Exception):
+    """ Error reply of the server """
+
+
+class RespClient:
+    def __init__(self, host: str = '127.0.0.1', port: int = 6379, timeout: Optional[float] = 5.0):
+        """
+        :param timeout: Seconds to wait for the connection and for each reply
+        """
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self._socket: Optional[socket.socket] = None
+        self._reader = None
+        self._lock = threading.Lock()
+
+    def execute(self, *args: Argument) -> Any:
+        """ Send a command and return its reply, an error reply is raised as RespError """
+        reply, = self.pipeline([args])
+        if isinstance(reply, RespError):
+            raise reply
+        return reply
+
+    def pipeline(self, commands: Sequence[Sequence[Argument]]) -> List[Any]:
+        """
+        Send several commands at once, then read their replies
+        :return: One reply per command, error replies are returned as RespError instances
+        """
+        if not commands:
+            return []
+        payload = b''.join(encode_command(command) for command in commands)
+        with self._lock:
+            try:
+                self._connect()
+                self._socket.sendall(payload)
+                return [self._read_reply() for _ in commands]
+            except (OSError, ConnectionError):
+                # The replies of the connection are out of sync now
+                self._close()
+                raise
+
+    def close(self):
+        with self._lock:
+            self._close()
+
+    def _connect(self):
+        if self._socket is None:
+            self._socket = socket.create_connection((self.host, self.port), self.timeout)
+            self._socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self._reader = self._socket.makefile('rb')
+
+    def _close(self):
+        if self._socket is not None:
+            self._reader.close()
+            self._socket.close()
+            self._socket, self._reader = None, None
+
+    def _read_reply(self) -> Any:
+        return read_reply(self._reader)
+
+
+def encode_command(args: Sequence[Argument]) -> bytes:
+    parts = [b'*%d\r\n' % len(args)]
+    for arg in args:
+        if isinstance(arg, bytes):
+            data = arg
+        elif isinstance(arg, float):
+            data = repr(arg).encode()
+        else:
+            data = str(arg).encode()
+        parts.append(b'$%d\r\n%s\r\n' % (len(data), data))
+    return b''.join(parts)
+
+
+def read_reply(reader) -> Any:
+    """ Parse one reply from a binary file-like object """
+    line = reader.readline()
+    if not line.endswith(b'\r\n'):
+        raise ConnectionError("Connection closed by the server")
+    kind, data = line[:1], line[1:-2]
+    if kind == b'+':
+        return data.decode()
+    if kind == b'-':
+        return RespError(data.decode())
+    if kind == b':':
+        return int(data)
+    if kind == b'$':
+        length = int(data)
+        if length < 0:
+            return None
+        value = reader.read(length + 2)
+        if len(value) != length + 2:
+            raise ConnectionError("Connection closed by the server")
+        return value[:-2].decode()
+    if kind == b'*':
+        length = int(data)
+        if length < 0:
+            return None
+        return [read_reply(reader) for _ in range(length)]
+    raise ConnectionError(f"Unexpected reply type {kind!r}")
@@ -0,0 +1,163 @@
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Mapping, Optional
+
+from application.interfaces.monitored_service_repository import ConcurrentModificationError, IMonitoredServiceRepository
+from domain.models.escalation_policy import EscalationPolicy
+from domain.models.monitored_service import MonitoredService
+from infrastructure.state_snapshot import Row, StateSnapshot, write_snapshot
+
+""" Snapshot Monitored Service Repository
+In-memory IMonitoredServiceRepository warm started from a memory mapped state snapshot. Services never
+saved since the snapshot are decoded from it on demand, one record per read, the saved ones are kept
+in an overlay of rows. The snapshot is rewritten periodically (and on stop) with the overlay and the
+policies of the policy source merged in, then the overlay is folded into it. Saves between two
+snapshots are only durable through the event log: replay restores them at startup.
+"""
+
+logger = logging.getLogger(__name__)
+
+PolicySource = Callable[[], Mapping[str, EscalationPolicy]]
+
+
+class SnapshotMonitoredServiceRepository(IMonitoredServiceRepository):
+    def __init__(self,
+        path: str,
+        policies: Optional[PolicySource] = None,
+        interval: float = 60.0,
+        clock: Callable[[], float] = time.time
+    ):
+        """
+        :param path: Snapshot file, loaded when it exists
+        :param policies: Returns the policies to snapshot by service ID, e.g. CachedEscalationPolicyService.policies
+        :param interval: Seconds between two snapshots written by the background thread
+        :param clock: Wall clock, policies are timestamped when snapshotted
+        """
+        self.path = path
+        self.policies = policies
+        self.interval = interval
+        self.clock = clock
+        self.snapshot: Optional[StateSnapshot] = StateSnapshot(path) if os.path.exists(path) else None
+
+        # Rows saved since the snapshot was written
+        self._rows: Dict[str, Row] = {}
+        self._lock = threading.Lock()
+        # Only one snapshot written at a time
+        self._write_lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # ------------ IMonitoredServiceRepository ------------
+
+    def get(self, service_id: str) -> Optional[MonitoredService]:
+        row = self._rows.get(service_id)
+        if row is not None:
+            return _to_service(service_id, row)
+        snapshot = self.snapshot
+        return snapshot.get(service_id) if snapshot is not None else None
+
+    def get_many(self, service_ids: Iterable[str]) -> Dict[str, MonitoredService]:
+        services = {}
+        for service_id in service_ids:
+            service = self.get(service_id)
+            if service is not None:
+                services[service_id] = service
+        return services
+
+    def save(self, service: MonitoredService) -> MonitoredService:
+        return self.save_many([service])[0]
+
+    def save_many(self, services: List[MonitoredService]) -> List[MonitoredService]:
+        with self._lock:
+            conflicts = [service.id for service in services if self._stored_version(service.id) != service.version]
+            if conflicts:
+                raise ConcurrentModificationError(conflicts)
+            for service in services:
+                service.version += 1
+                self._rows[service.id] = (
+                    service.status, service.alert_msg, service.acknowledged, service.current_level, service.version
+                )
+        return services
+
+    # ------------ SNAPSHOTS ------------
+
+    def write_snapshot(self) -> int:
+        """
+        Write the current state to the snapshot file and map the new snapshot
+        :return: Number of snapshotted services
+        """
+        with self._write_lock:
+            with self._lock:
+                rows, snapshot = dict(self._rows), self.snapshot
+            now = self.clock()
+            fresh = self.policies() if self.policies is not None else {}
+
+            def merged():
+                if snapshot is not None:
+                    for service_id, row, timed_policy in snapshot.rows():
+                        policy = fresh.get(service_id)
+                        # Snapshotted policies keep the time they were fetched
+                        yield service_id, rows.pop(service_id, row), (policy, now) if policy else timed_policy
+                for service_id, row in rows.items():
+                    policy = fresh.get(service_id)
+                    yield service_id, row, (policy, now) if policy else None
+
+            written = write_snapshot(self.path, merged(), self.clock)
+            # Replaced, the previous one is unmapped once no reader holds it
+            replacement = StateSnapshot(self.path)
+            with self._lock:
+                self.snapshot = replacement
+                for service_id, row in dict(self._rows).items():
+                    stored = replacement.row(service_id)
+                    if stored is not None and stored[4] == row[4]:
+                        del self._rows[service_id]
+            return written
+
+    def start(self):
+        """ Write snapshots from a background thread """
+        if self._thread is not None:
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name='state-snapshot', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """ Stop the background thread and write a last snapshot """
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.write_snapshot()
+
+    def pending(self) -> int:
+        """ Number of services saved since the last snapshot """
+        return len(self._rows)
+
+    def __len__(self) -> int:
+        snapshot = self.snapshot
+        if snapshot is None:
+            return len(self._rows)
+        return len(snapshot) + sum(1 for service_id in list(self._rows) if service_id not in snapshot)
+
+    # ------------ INTERNALS ------------
+
+    def _stored_version(self, service_id: str) -> int:
+        row = self._rows.get(service_id)
+        if row is not None:
+            return row[4]
+        return self.snapshot.version(service_id) if self.snapshot is not None else 0
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            try:
+                self.write_snapshot()
+            except Exception:
+                logger.exception("Writing the state snapshot failed")
+
+
+def _to_service(service_id: str, row: Row) -> MonitoredService:
+    service = MonitoredService(service_id)
+    service.status, service.alert_msg, service.acknowledged, service.current_level, service.version = row
+    return service
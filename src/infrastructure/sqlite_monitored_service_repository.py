@@ -0,0 +1,145 @@
+import sqlite3
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from application.interfaces.monitored_service_repository import ConcurrentModificationError, IMonitoredServiceRepository
+from domain.models.monitored_service import MonitoredService
+
+""" SQLite Monitored Service Repository
+IMonitoredServiceRepository persisted in SQLite, in WAL mode with synchronous=FULL:
+once save/save_many returns, the transaction is committed and survives a crash or a power loss.
+Writes are compare-and-swap on a version column (optimistic concurrency).
+Only the state of a Monitored Service is stored, its policy is always loaded from the EP Service.
+"""
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS monitored_services (
+    id TEXT PRIMARY KEY,
+    status INTEGER NOT NULL,
+    alert_msg TEXT NOT NULL,
+    acknowledged INTEGER NOT NULL,
+    current_level INTEGER NOT NULL,
+    version INTEGER NOT NULL DEFAULT 1
+) WITHOUT ROWID
+"""
+
+_COLUMNS = "id, status, alert_msg, acknowledged, current_level, version"
+
+# Statements are built once: sqlite3 keeps them compiled in its statement cache
+_SELECT_ONE = f"SELECT {_COLUMNS} FROM monitored_services WHERE id = ?"
+# Compare-and-swap writes: a service never stored (version 0) is inserted,
+# otherwise the row is only updated if nobody saved it since it was read
+_INSERT = f"INSERT INTO monitored_services ({_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT(id) DO NOTHING"
+_UPDATE = """
+UPDATE monitored_services
+SET status = ?, alert_msg = ?, acknowledged = ?, current_level = ?, version = ?
+WHERE id = ? AND version = ?
+"""
+
+_STATUSES = ('healthy', 'unhealthy')
+_STATUS_CODES = {status: code for code, status in enumerate(_STATUSES)}
+
+Row = Tuple[str, int, str, int, int, int]
+
+
+class SQLiteMonitoredServiceRepository(IMonitoredServiceRepository):
+    def __init__(self, path: str = ':memory:', max_batch: int = 512):
+        """
+        :param path: Database file, ':memory:' for a throwaway database
+        :param max_batch: Maximum number of IDs per SELECT ... IN query
+        """
+        self.path = path
+        self.max_batch = max_batch
+        self._lock = threading.Lock()
+        # Transactions are managed explicitly (BEGIN IMMEDIATE / COMMIT)
+        self._conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False, cached_statements=256)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=FULL")
+        self._conn.execute(_SCHEMA)
+        self._migrate()
+
+    def get(self, service_id: str) -> Optional[MonitoredService]:
+        with self._lock:
+            row = self._conn.execute(_SELECT_ONE, (service_id,)).fetchone()
+        return _to_service(row) if row else None
+
+    def get_many(self, service_ids: Iterable[str]) -> Dict[str, MonitoredService]:
+        ids = list(dict.fromkeys(service_ids))
+        services = {}
+        with self._lock:
+            for start in range(0, len(ids), self.max_batch):
+                chunk = ids[start:start + self.max_batch]
+                for row in self._conn.execute(_select_many(len(chunk)), _pad(chunk)):
+                    services[row[0]] = _to_service(row)
+        return services
+
+    def save(self, service: MonitoredService) -> MonitoredService:
+        return self.save_many([service])[0]
+
+    def save_many(self, services: List[MonitoredService]) -> List[MonitoredService]:
+        """ Save all the services in a single all-or-nothing transaction """
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                conflicts = [service.id for service in services if not self._compare_and_swap(service)]
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            if conflicts:
+                self._conn.execute("ROLLBACK")
+                raise ConcurrentModificationError(conflicts)
+            self._conn.execute("COMMIT")
+
+        for service in services:
+            service.version += 1
+        return services
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _compare_and_swap(self, service: MonitoredService) -> bool:
+        status = _STATUS_CODES[service.status]
+        acknowledged = int(service.acknowledged)
+        if service.version == 0:
+            cursor = self._conn.execute(_INSERT, (
+                service.id, status, service.alert_msg, acknowledged, service.current_level, 1
+            ))
+        else:
+            cursor = self._conn.execute(_UPDATE, (
+                status, service.alert_msg, acknowledged, service.current_level, service.version + 1,
+                service.id, service.version
+            ))
+        return cursor.rowcount == 1
+
+    def _migrate(self):
+        # Databases created before optimistic concurrency have no version column
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(monitored_services)")]
+        if 'version' not in columns:
+            self._conn.execute("ALTER TABLE monitored_services ADD COLUMN version INTEGER NOT NULL DEFAULT 1")
+
+
+def _select_many(size: int) -> str:
+    # Placeholder counts are rounded up to a power of two, so only a handful
+    # of distinct IN (...) statements ever get compiled and cached
+    placeholders = ", ".join("?" * _bucket(size))
+    return f"SELECT {_COLUMNS} FROM monitored_services WHERE id IN ({placeholders})"
+
+
+def _bucket(size: int) -> int:
+    return 1 << (size - 1).bit_length()
+
+
+def _pad(ids: List[str]) -> List[str]:
+    # Padding repeats an ID already requested, it does not add rows to the result
+    return ids + [ids[0]] * (_bucket(len(ids)) - len(ids))
+
+
+def _to_service(row: Row) -> MonitoredService:
+    service = MonitoredService(row[0])
+    service.status = _STATUSES[row[1]]
+    service.alert_msg = row[2]
+    service.acknowledged = bool(row[3])
+    service.current_level = row[4]
+    service.version = row[5]
+    return service
@@ -0,0 +1,339 @@
+import mmap
+import os
+import struct
+import sys
+import time
+from array import array
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from application.interfaces.escalation_policy_service import IEscalationPolicyService
+from domain.models.email_target import EmailTarget
+from domain.models.escalation_policy import EscalationPolicy
+from domain.models.level import DEFAULT_DELAY_MINUTES, Level
+from domain.models.monitored_service import MonitoredService
+from domain.models.sms_target import SMSTarget
+
+""" State Snapshot
+Compact binary, columnar snapshot of the Monitored Services states and their escalation policies, for
+warm starts. Services are sorted by ID and each field is a typed column (one array per field); alert
+messages and policies are interned in tables referenced by index. The file is memory mapped when
+opened: nothing is decoded upfront, a lookup binary searches the ID column and decodes a single
+record, so a node serves its first alert within milliseconds of boot whatever the fleet size.
+Snapshots are node-local: columns are stored in the native byte order.
+"""
+
+MAGIC = b'PGSNAP\x00\x01'
+FORMAT_VERSION = 1
+
+# magic, format version, little endian flag, created_at, services, messages, policies
+_HEADER = struct.Struct('<8sHHdIII4x')
+# (offset, length) of each section, in _SECTIONS order
+_SECTION = struct.Struct('<QQ')
+_SECTIONS = (
+    ('id_offsets', 'I'),
+    ('ids', 'B'),
+    ('statuses', 'B'),
+    ('acknowledged', 'B'),
+    ('levels', 'H'),
+    ('versions', 'I'),
+    ('message_refs', 'I'),
+    ('policy_refs', 'i'),
+    ('message_offsets', 'I'),
+    ('messages', 'B'),
+    ('policy_offsets', 'I'),
+    ('policies', 'B'),
+)
+_ALIGNMENT = 8
+
+_STATUSES = ('healthy', 'unhealthy')
+_STATUS_CODES = {status: code for code, status in enumerate(_STATUSES)}
+_NO_POLICY = -1
+
+# Policy records: fetched_at, then the policy body: version, levels; per level: level, delay_minutes,
+# targets; per target: channel code, address length, followed by the UTF-8 address
+_FETCHED_AT = struct.Struct('<d')
+_POLICY = struct.Struct('<IH')
+_LEVEL = struct.Struct('<HIH')
+_TARGET = struct.Struct('<BH')
+_CHANNELS = ('mail', 'sms')
+_CHANNEL_CODES = {channel: code for code, channel in enumerate(_CHANNELS)}
+
+# (status, alert_msg, acknowledged, current_level, version)
+Row = Tuple[str, str, bool, int, int]
+# (policy, fetched_at): wall clock time the policy was fetched from the EP Service, at the latest
+TimedPolicy = Tuple[EscalationPolicy, float]
+
+
+class StateSnapshot:
+    def __init__(self, path: str):
+        """
+        Memory map a snapshot, only its header is read
+        :raises ValueError: not a snapshot, or written with another format or byte order
+        """
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            magic, version, little_endian, self.created_at, count, messages, policies = _HEADER.unpack_from(self._mmap)
+        except struct.error:
+            self._mmap.close()
+            raise ValueError(f"Truncated snapshot '{path}'")
+        if magic != MAGIC or version != FORMAT_VERSION:
+            self._mmap.close()
+            raise ValueError(f"Unsupported snapshot '{path}'")
+        if bool(little_endian) != (sys.byteorder == 'little'):
+            self._mmap.close()
+            raise ValueError(f"Snapshot '{path}' was written with another byte order")
+
+        self._count = count
+        self._buffer = memoryview(self._mmap)
+        self._views: List[memoryview] = [self._buffer]
+        columns = {}
+        for index, (name, typecode) in enumerate(_SECTIONS):
+            offset, length = _SECTION.unpack_from(self._mmap, _HEADER.size + index * _SECTION.size)
+            view = self._buffer[offset:offset + length].cast(typecode)
+            self._views.append(view)
+            columns[name] = view
+        self._id_offsets = columns['id_offsets']
+        self._ids = columns['ids']
+        self._statuses = columns['statuses']
+        self._acknowledged = columns['acknowledged']
+        self._levels = columns['levels']
+        self._versions = columns['versions']
+        self._message_refs = columns['message_refs']
+        self._policy_refs = columns['policy_refs']
+        self._message_offsets = columns['message_offsets']
+        self._messages = columns['messages']
+        self._policy_offsets = columns['policy_offsets']
+        self._policies = columns['policies']
+        # Decoded once: services sharing a policy share its instance
+        self._decoded_policies: Dict[int, TimedPolicy] = {}
+
+    # ------------ LOOKUPS ------------
+
+    def index(self, service_id: str) -> Optional[int]:
+        """ Binary search of a service in the ID column """
+        key = service_id.encode()
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high) // 2
+            if self._id_at(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        return low if low < self._count and self._id_at(low) == key else None
+
+    def row(self, service_id: str) -> Optional[Row]:
+        index = self.index(service_id)
+        return self._row_at(index) if index is not None else None
+
+    def get(self, service_id: str) -> Optional[MonitoredService]:
+        """ Decode the record of a single service """
+        row = self.row(service_id)
+        return _to_service(service_id, row) if row is not None else None
+
+    def version(self, service_id: str) -> int:
+        """ Version of a service, 0 if it is not in the snapshot """
+        index = self.index(service_id)
+        return self._versions[index] if index is not None else 0
+
+    def policy(self, service_id: str) -> Optional[TimedPolicy]:
+        """ Escalation policy of a service and when it was fetched, if one was snapshotted """
+        index = self.index(service_id)
+        if index is None or self._policy_refs[index] == _NO_POLICY:
+            return None
+        return self._policy_at(self._policy_refs[index])
+
+    def rows(self) -> Iterator[Tuple[str, Row, Optional[TimedPolicy]]]:
+        """ Decode every record, in ID order """
+        for index in range(self._count):
+            ref = self._policy_refs[index]
+            yield (self._id_at(index).decode(), self._row_at(index),
+                   self._policy_at(ref) if ref != _NO_POLICY else None)
+
+    def __contains__(self, service_id: str) -> bool:
+        return self.index(service_id) is not None
+
+    def __len__(self) -> int:
+        return self._count
+
+    def close(self):
+        for view in reversed(self._views):
+            view.release()
+        self._mmap.close()
+
+    # ------------ DECODING ------------
+
+    def _id_at(self, index: int) -> bytes:
+        return bytes(self._ids[self._id_offsets[index]:self._id_offsets[index + 1]])
+
+    def _row_at(self, index: int) -> Row:
+        ref = self._message_refs[index]
+        message = bytes(self._messages[self._message_offsets[ref]:self._message_offsets[ref + 1]]).decode()
+        return (_STATUSES[self._statuses[index]], message, bool(self._acknowledged[index]),
+                self._levels[index], self._versions[index])
+
+    def _policy_at(self, ref: int) -> TimedPolicy:
+        decoded = self._decoded_policies.get(ref)
+        if decoded is None:
+            data = bytes(self._policies[self._policy_offsets[ref]:self._policy_offsets[ref + 1]])
+            decoded = self._decoded_policies[ref] = _decode_policy(data)
+        return decoded
+
+
+def write_snapshot(path: str,
+    rows: Iterable[Tuple[str, Row, Optional[TimedPolicy]]],
+    clock: Callable[[], float] = time.time
+) -> int:
+    """
+    Write a snapshot atomically (written aside, then renamed over the previous one)
+    :param rows: (service ID, state, (policy, fetched_at) or None) of every service
+    :return: Number of written services
+    """
+    records = sorted(((service_id.encode(), row, policy) for service_id, row, policy in rows), key=lambda record: record[0])
+
+    columns = {name: array(typecode) for name, typecode in _SECTIONS}
+    columns['id_offsets'].append(0)
+    columns['message_offsets'].append(0)
+    columns['policy_offsets'].append(0)
+    message_index: Dict[str, int] = {}
+    # Identical policies are stored once, as fetched the earliest
+    policy_index: Dict[bytes, int] = {}
+    policy_bodies: List[bytes] = []
+    policy_times: List[float] = []
+    encoded: Dict[int, bytes] = {}
+
+    for key, (status, message, acknowledged, level, version), timed_policy in records:
+        columns['ids'].frombytes(key)
+        columns['id_offsets'].append(len(columns['ids']))
+        columns['statuses'].append(_STATUS_CODES[status])
+        columns['acknowledged'].append(int(acknowledged))
+        columns['levels'].append(level)
+        columns['versions'].append(version)
+
+        ref = message_index.get(message)
+        if ref is None:
+            ref = message_index[message] = len(message_index)
+            columns['messages'].frombytes(message.encode())
+            columns['message_offsets'].append(len(columns['messages']))
+        columns['message_refs'].append(ref)
+
+        if timed_policy is None:
+            columns['policy_refs'].append(_NO_POLICY)
+            continue
+        policy, fetched_at = timed_policy
+        body = encoded.get(id(policy))
+        if body is None:
+            body = encoded[id(policy)] = _encode_policy(policy)
+        ref = policy_index.get(body)
+        if ref is None:
+            ref = policy_index[body] = len(policy_bodies)
+            policy_bodies.append(body)
+            policy_times.append(fetched_at)
+        else:
+            policy_times[ref] = min(policy_times[ref], fetched_at)
+        columns['policy_refs'].append(ref)
+
+    for body, fetched_at in zip(policy_bodies, policy_times):
+        columns['policies'].frombytes(_FETCHED_AT.pack(fetched_at) + body)
+        columns['policy_offsets'].append(len(columns['policies']))
+
+    header_size = _HEADER.size + len(_SECTIONS) * _SECTION.size
+    offset = _align(header_size)
+    sections = []
+    for name, _ in _SECTIONS:
+        length = len(columns[name]) * columns[name].itemsize
+        sections.append((offset, length))
+        offset = _align(offset + length)
+
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(_HEADER.pack(MAGIC, FORMAT_VERSION, int(sys.byteorder == 'little'), clock(),
+                             len(records), len(message_index), len(policy_bodies)))
+        for section in sections:
+            f.write(_SECTION.pack(*section))
+        for (name, _), (offset, _) in zip(_SECTIONS, sections):
+            f.write(b'\0' * (offset - f.tell()))
+            columns[name].tofile(f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    return len(records)
+
+
+class SnapshotEscalationPolicyService(IEscalationPolicyService):
+    """
+    Decorator of an IEscalationPolicyService serving the policies found in a state snapshot, as long
+    as they were fetched less than max_age_seconds ago, so the first alerts after a restart do not
+    wait for the EP Service. Usually decorated by the CachedEscalationPolicyService.
+    """
+    def __init__(self,
+        policy_service: IEscalationPolicyService,
+        snapshot_source: Callable[[], Optional[StateSnapshot]],
+        max_age_seconds: float = 3600.0,
+        clock: Callable[[], float] = time.time
+    ):
+        """
+        :param policy_service: The decorated (remote) EP Service
+        :param snapshot_source: Returns the current snapshot, if any
+        :param max_age_seconds: Snapshotted policies older than this are fetched again
+        :param clock: Wall clock, the snapshot fetch times survive restarts
+        """
+        self.policy_service = policy_service
+        self.snapshot_source = snapshot_source
+        self.max_age_seconds = max_age_seconds
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, service_id: str) -> EscalationPolicy:
+        snapshot = self.snapshot_source()
+        timed_policy = snapshot.policy(service_id) if snapshot is not None else None
+        if timed_policy is not None and self.clock() - timed_policy[1] <= self.max_age_seconds:
+            self.hits += 1
+            return timed_policy[0]
+        self.misses += 1
+        return self.policy_service.get(service_id)
+
+
+def _align(offset: int) -> int:
+    return (offset + _ALIGNMENT - 1) // _ALIGNMENT * _ALIGNMENT
+
+
+def _encode_policy(policy: EscalationPolicy) -> bytes:
+    """ Policy body, the same for identical policies whenever they were fetched """
+    parts = [_POLICY.pack(getattr(policy, 'version', 0), len(policy.levels))]
+    for level in policy.levels:
+        parts.append(_LEVEL.pack(level.level, getattr(level, 'delay_minutes', DEFAULT_DELAY_MINUTES), len(level.targets)))
+        for target in level.targets:
+            if target.channel not in _CHANNEL_CODES:
+                raise ValueError(f"Cannot snapshot targets of channel '{target.channel}'")
+            address = target.address.encode()
+            parts.append(_TARGET.pack(_CHANNEL_CODES[target.channel], len(address)))
+            parts.append(address)
+    return b''.join(parts)
+
+
+def _decode_policy(data: bytes) -> TimedPolicy:
+    fetched_at, = _FETCHED_AT.unpack_from(data)
+    version, level_count = _POLICY.unpack_from(data, _FETCHED_AT.size)
+    offset = _FETCHED_AT.size + _POLICY.size
+    levels = []
+    for _ in range(level_count):
+        level, delay_minutes, target_count = _LEVEL.unpack_from(data, offset)
+        offset += _LEVEL.size
+        targets = []
+        for _ in range(target_count):
+            channel, length = _TARGET.unpack_from(data, offset)
+            offset += _TARGET.size
+            address = data[offset:offset + length].decode()
+            offset += length
+            targets.append(EmailTarget(address) if _CHANNELS[channel] == 'mail' else SMSTarget(address))
+        levels.append(Level(level, targets, delay_minutes))
+    return EscalationPolicy(levels, version), fetched_at
+
+
+def _to_service(service_id: str, row: Row) -> MonitoredService:
+    service = MonitoredService(service_id)
+    service.status, service.alert_msg, service.acknowledged, service.current_level, service.version = row
+    return service
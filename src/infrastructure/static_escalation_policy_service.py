@@ -0,0 +1,45 @@
+import json
+from typing import Dict, Optional
+
+from application.interfaces.escalation_policy_service import IEscalationPolicyService
+from domain.models.email_target import EmailTarget
+from domain.models.escalation_policy import EscalationPolicy
+from domain.models.level import DEFAULT_DELAY_MINUTES, Level
+from domain.models.sms_target import SMSTarget
+
+""" Static Escalation Policy Service
+IEscalationPolicyService serving policies known upfront, loaded from a JSON file mapping each service
+ID to its levels, used by the server until the EP Service is wired:
+
+    {"service-1": [{"level": 0, "delay_minutes": 15, "targets": [{"email": "oncall@aircall.com"}]},
+                   {"level": 1, "targets": [{"phone_number": "+33600000000"}]}]}
+"""
+
+
+class StaticEscalationPolicyService(IEscalationPolicyService):
+    def __init__(self, policies: Optional[Dict[str, EscalationPolicy]] = None):
+        self.policies = policies or {}
+
+    @classmethod
+    def from_file(cls, path: str) -> 'StaticEscalationPolicyService':
+        """ :raises ValueError: a target is neither an email nor a phone number """
+        with open(path, encoding='utf-8') as f:
+            document = json.load(f)
+        return cls({
+            service_id: EscalationPolicy([
+                Level(level['level'], [_target(target) for target in level['targets']], level.get('delay_minutes', DEFAULT_DELAY_MINUTES))
+                for level in levels
+            ])
+            for service_id, levels in document.items()
+        })
+
+    def get(self, service_id: str) -> Optional[EscalationPolicy]:
+        return self.policies.get(service_id)
+
+
+def _target(target: dict):
+    if 'email' in target:
+        return EmailTarget(target['email'])
+    if 'phone_number' in target:
+        return SMSTarget(target['phone_number'])
+    raise ValueError(f"Unknown target {target}")
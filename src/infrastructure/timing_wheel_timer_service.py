@@ -0,0 +1,197 @@
+import logging
+import math
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from application.interfaces.time_service import ITimerService
+
+""" Timing Wheel Timer Service
+In-process implementation of the ITimerService backed by a hierarchical timing wheel.
+Scheduling and cancelling a timeout are O(1); expired timeouts are handed over to a
+handler (usually ServicePager.handle_timeouts) in batches.
+"""
+
+logger = logging.getLogger(__name__)
+
+TimeoutHandler = Callable[[List[str]], None]
+
+
+class TimingWheelTimerService(ITimerService):
+    def __init__(self,
+        on_expire: Optional[TimeoutHandler] = None,
+        tick_ms: int = 1000,
+        wheel_bits: Tuple[int, ...] = (8, 6, 6, 6),
+        batch_size: int = 256,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        """
+        :param on_expire: Called with a batch of Monitored Service IDs whose timeout expired
+        :param tick_ms: Resolution of the wheel in milliseconds
+        :param wheel_bits: Number of slots (as a power of two) of each wheel, from the finest to the coarsest
+        :param batch_size: Maximum number of IDs handed to on_expire at once
+        :param clock: Monotonic clock in seconds
+        """
+        if tick_ms <= 0:
+            raise ValueError("tick_ms must be positive")
+        if batch_size <= 0:
+            raise ValueError("batch_size must be positive")
+
+        self.on_expire = on_expire
+        self.tick_ms = tick_ms
+        self.batch_size = batch_size
+        self.clock = clock
+
+        # Wheel i covers ticks in [2^shift_i, 2^(shift_i + bits_i)) from now
+        self._shifts = [sum(wheel_bits[:i]) for i in range(len(wheel_bits))]
+        self._masks = [(1 << bits) - 1 for bits in wheel_bits]
+        self._spans = [1 << (shift + bits) for shift, bits in zip(self._shifts, wheel_bits)]
+        # Each slot maps a Monitored Service ID to its absolute expiration tick
+        self._wheels: List[List[Dict[str, int]]] = [[{} for _ in range(1 << bits)] for bits in wheel_bits]
+        # Monitored Service ID -> (wheel, slot) for O(1) cancellation
+        self._index: Dict[str, Tuple[int, int]] = {}
+
+        self._origin = clock()
+        self._tick = 0  # Last processed tick
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # ------------ ITimerService ------------
+
+    def add_timeout(self, msId: str, minutes: int):
+        """
+        Arm (or re-arm) the timeout of a Monitored Service.
+        A service has at most one pending timeout: re-arming replaces the previous one.
+        :param msId: ID of the monitored service
+        :param minutes: Delay before the timeout expires
+        """
+        ticks = max(1, math.ceil(minutes * 60_000 / self.tick_ms))
+        with self._lock:
+            self._remove(msId)
+            expires = max(self._now_tick(), self._tick) + ticks
+            self._insert(msId, expires)
+
+    def cancel_timeout(self, msId: str) -> bool:
+        """
+        Drop the pending timeout of a Monitored Service
+        :param msId: ID of the monitored service
+        :return: True if a timeout was pending
+        """
+        with self._lock:
+            return self._remove(msId)
+
+    # ------------ DRIVER ------------
+
+    def advance(self, now: Optional[float] = None) -> int:
+        """
+        Process every tick elapsed up to `now` and dispatch the expired timeouts
+        :param now: Clock reading in seconds, defaults to the current clock value
+        :return: Number of expired timeouts
+        """
+        expired: List[str] = []
+        with self._lock:
+            target = self._now_tick(now)
+            while self._tick < target:
+                if not self._index:
+                    # Nothing scheduled: jump straight to the target tick
+                    self._tick = target
+                    break
+                self._tick += 1
+                self._process_tick(self._tick, expired)
+
+        self._dispatch(expired)
+        return len(expired)
+
+    def start(self):
+        """ Drive the wheel from a background thread """
+        if self._thread is not None:
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name='timing-wheel', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """ Stop the background thread """
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def pending(self, msId: str) -> bool:
+        """ Whether a Monitored Service has a pending timeout """
+        return msId in self._index
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    # ------------ INTERNALS ------------
+
+    def _run(self):
+        interval = self.tick_ms / 1000
+        while not self._stopped.wait(interval):
+            try:
+                self.advance()
+            except Exception:
+                logger.exception("Timeout dispatch failed")
+
+    def _now_tick(self, now: Optional[float] = None) -> int:
+        if now is None:
+            now = self.clock()
+        return int((now - self._origin) * 1000 // self.tick_ms)
+
+    def _insert(self, msId: str, expires: int):
+        delta = expires - self._tick
+        last = len(self._wheels) - 1
+        wheel = 0
+        while wheel < last and delta >= self._spans[wheel]:
+            wheel += 1
+        if delta >= self._spans[last]:
+            # Beyond the coarsest wheel: park it at its horizon, it is re-inserted on cascade
+            slot = ((self._tick + self._spans[last] - 1) >> self._shifts[last]) & self._masks[last]
+        else:
+            slot = (expires >> self._shifts[wheel]) & self._masks[wheel]
+        self._wheels[wheel][slot][msId] = expires
+        self._index[msId] = (wheel, slot)
+
+    def _remove(self, msId: str) -> bool:
+        location = self._index.pop(msId, None)
+        if location is None:
+            return False
+        wheel, slot = location
+        del self._wheels[wheel][slot][msId]
+        return True
+
+    def _process_tick(self, tick: int, expired: List[str]):
+        # Cascade coarser wheels first so their entries can land in finer wheels this very tick
+        for wheel in range(len(self._wheels) - 1, 0, -1):
+            if tick & ((1 << self._shifts[wheel]) - 1) == 0:
+                self._cascade(wheel, (tick >> self._shifts[wheel]) & self._masks[wheel])
+
+        slot = self._wheels[0][tick & self._masks[0]]
+        if not slot:
+            return
+        entries = list(slot.items())
+        slot.clear()
+        for msId, expires in entries:
+            del self._index[msId]
+            if expires <= tick:
+                expired.append(msId)
+            else:
+                self._insert(msId, expires)
+
+    def _cascade(self, wheel: int, slot_index: int):
+        slot = self._wheels[wheel][slot_index]
+        if not slot:
+            return
+        entries = list(slot.items())
+        slot.clear()
+        for msId, expires in entries:
+            del self._index[msId]
+            self._insert(msId, expires)
+
+    def _dispatch(self, expired: List[str]):
+        if not expired or self.on_expire is None:
+            return
+        for start in range(0, len(expired), self.batch_size):
+            self.on_expire(expired[start:start + self.batch_size])
@@ -0,0 +1,141 @@
+import unittest
+from unittest.mock import MagicMock
+import sys, os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+from domain.services.alert_suppressor import AlertSuppressor
+from domain.services.pager_service import ServicePager
+from infrastructure.in_memory_monitored_service_repository import InMemoryMonitoredServiceRepository
+from domain.models.monitored_service import MonitoredService
+from domain.models.level import Level
+from domain.models.email_target import EmailTarget
+from domain.models.escalation_policy import EscalationPolicy
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestAlertSuppressor(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.suppressor = AlertSuppressor(window=60, flap_threshold=4, flap_window=600, clock=self.clock)
+
+    def test_duplicates_within_window(self):
+        self.assertFalse(self.suppressor.should_suppress('service-1', 'CPU at 95% since 10:02'))
+        # Same fingerprint: only numbers differ
+        self.clock.now = 30
+        self.assertTrue(self.suppressor.should_suppress('service-1', 'CPU  at 97% since 10:03'))
+        # Other message or other service
+        self.assertFalse(self.suppressor.should_suppress('service-1', 'Disk full'))
+        self.assertFalse(self.suppressor.should_suppress('service-2', 'CPU at 95% since 10:02'))
+
+        self.clock.now = 60
+        self.assertFalse(self.suppressor.should_suppress('service-1', 'CPU at 99% since 10:04'))
+        self.assertEqual(self.suppressor.suppressed_duplicates, 1)
+        self.assertEqual(self.suppressor.forwarded, 4)
+
+    def test_flapping_service(self):
+        # alert / healthy / alert / healthy: four transitions within the flap window
+        for i in range(2):
+            self.clock.now = i * 100
+            self.assertFalse(self.suppressor.should_suppress('service-1', 'Down!'))
+            self.suppressor.record_healthy('service-1')
+
+        self.clock.now = 200
+        self.assertTrue(self.suppressor.is_flapping('service-1'))
+        self.assertTrue(self.suppressor.should_suppress('service-1', 'Down!'))
+        self.assertEqual(self.suppressor.suppressed_flapping, 1)
+
+        # Calm for a whole flap window
+        self.clock.now = 800
+        self.assertFalse(self.suppressor.should_suppress('service-1', 'Down!'))
+
+    def test_recovery_ends_the_deduplication(self):
+        suppressor = AlertSuppressor(window=300, clock=self.clock)
+        self.assertFalse(suppressor.should_suppress('service-1', 'Down!'))
+        self.clock.now = 60
+        suppressor.record_healthy('service-1')
+        self.clock.now = 120
+        self.assertFalse(suppressor.should_suppress('service-1', 'Down!'))
+        self.assertEqual(suppressor.stats()['suppressed_duplicates'], 0)
+        # Still deduplicated within the new incident
+        self.assertTrue(suppressor.should_suppress('service-1', 'Down!'))
+
+
+
+class TestServicePagerSuppression(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.repository = MagicMock(wraps=InMemoryMonitoredServiceRepository([MonitoredService('service-1')]))
+        escalation_mock = MagicMock()
+        escalation_mock.get.return_value = EscalationPolicy([Level(0, [EmailTarget('demoA@aircall.com')])])
+        self.pager = ServicePager(
+            timer_system=MagicMock(),
+            escalation_system=escalation_mock,
+            mail_system=MagicMock(),
+            sms_system=MagicMock(),
+            repository=self.repository,
+            suppressor=AlertSuppressor(window=60, flap_threshold=4, flap_window=600, clock=self.clock)
+        )
+
+    def test_flapping_alerts_never_reach_the_backends(self):
+        for i in range(5):
+            self.clock.now = i * 61
+            self.pager.handle_alert('service-1', 'Down!')
+            self.pager.handle_healthy('service-1')
+
+        # The two first incidents are notified, then the service is flapping
+        self.assertEqual(self.pager.mail_service.notify.call_count, 2)
+        self.assertEqual(self.pager.escalation_service.get.call_count, 2)
+        self.assertEqual(self.pager.suppressor.suppressed_flapping, 3)
+
+    def test_duplicates_are_dropped_from_batches(self):
+        self.pager.handle_alerts([('service-1', 'Down!')])
+        self.repository.reset_mock()
+
+        self.assertEqual(self.pager.handle_alerts([('service-1', 'Down!')]).alerted, [])
+        self.assertEqual(self.repository.get_many.call_count, 0)
+        self.assertEqual(self.pager.suppressor.suppressed_duplicates, 1)
+
+    def test_recurring_alert_after_recovery_is_paged(self):
+        self.pager.suppressor.window = 300
+        self.pager.handle_alert('service-1', 'Down!')
+        self.clock.now = 60
+        self.pager.handle_healthy('service-1')
+        self.clock.now = 120
+        self.pager.handle_alert('service-1', 'Down!')
+
+        self.assertEqual(self.repository.get('service-1').status, 'unhealthy')
+        self.assertEqual(self.pager.mail_service.notify.call_count, 2)
+        self.assertEqual(self.pager.suppressor.suppressed_duplicates, 0)
+
+    def test_failed_alert_is_not_a_duplicate(self):
+        policy = self.pager.escalation_service.get.return_value
+        self.pager.escalation_service.get.return_value = None
+        with self.assertRaises(ValueError):
+            self.pager.handle_alert('service-1', 'Down!')
+
+        # The retry opens the incident
+        self.pager.escalation_service.get.return_value = policy
+        self.pager.handle_alert('service-1', 'Down!')
+        self.assertEqual(self.repository.get('service-1').status, 'unhealthy')
+        self.assertEqual(self.pager.mail_service.notify.call_count, 1)
+        self.assertEqual(self.pager.suppressor.suppressed_duplicates, 0)
+
+    def test_healthy_heartbeats_are_not_flaps(self):
+        for i in range(6):
+            self.clock.now = i
+            self.pager.handle_healthy('service-1')
+
+        self.assertFalse(self.pager.suppressor.is_flapping('service-1'))
+        self.pager.handle_alert('service-1', 'Down!')
+        self.assertEqual(self.pager.mail_service.notify.call_count, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
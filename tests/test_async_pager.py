@@ -0,0 +1,112 @@
+import asyncio
+import threading
+import time
+import unittest
+from unittest.mock import MagicMock
+import sys, os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+from domain.services.async_pager_service import AsyncServicePager
+from infrastructure.async_adapters import (
+    AsyncEscalationPolicyServiceAdapter, AsyncMailServiceAdapter, AsyncMonitoredServiceRepositoryAdapter,
+    AsyncSMSServiceAdapter, AsyncTimerServiceAdapter
+)
+from infrastructure.in_memory_monitored_service_repository import InMemoryMonitoredServiceRepository
+from domain.models.monitored_service import MonitoredService
+from domain.models.level import Level
+from domain.models.email_target import EmailTarget
+from domain.models.sms_target import SMSTarget
+from domain.models.escalation_policy import EscalationPolicy
+
+
+class TestAsyncServicePager(unittest.TestCase):
+    def setUp(self):
+        self.repository = InMemoryMonitoredServiceRepository([MonitoredService(f'service-{i}') for i in range(3)])
+        self.escalation = MagicMock()
+        self.escalation.get.return_value = EscalationPolicy([
+            Level(0, [EmailTarget('demoA@aircall.com'), SMSTarget('+33600000000')]),
+            Level(1, [EmailTarget('demoB@aircall.com')]),
+        ])
+        self.mail = MagicMock()
+        self.sms = MagicMock()
+        self.timer = MagicMock()
+        self.pager = AsyncServicePager(
+            timer_system=AsyncTimerServiceAdapter(self.timer, blocking=False),
+            escalation_system=AsyncEscalationPolicyServiceAdapter(self.escalation),
+            mail_system=AsyncMailServiceAdapter(self.mail),
+            sms_system=AsyncSMSServiceAdapter(self.sms),
+            repository=AsyncMonitoredServiceRepositoryAdapter(self.repository)
+        )
+
+    def test_incident_lifecycle(self):
+        async def scenario():
+            await self.pager.handle_alert('service-1', 'Down!')
+            await self.pager.handle_alert('service-1', 'Down!')
+            await self.pager.handle_timeout('service-1')
+            await self.pager.handle_acknowledge('service-1')
+            await self.pager.handle_timeout('service-1')
+            await self.pager.handle_healthy('service-1')
+        asyncio.run(scenario())
+
+        service = self.repository.get('service-1')
+        self.assertEqual((service.status, service.current_level, service.acknowledged), ('healthy', 0, False))
+        self.assertEqual(self.mail.notify.call_count, 2)
+        self.assertEqual(self.sms.notify.call_count, 1)
+        self.assertEqual(self.timer.add_timeout.call_count, 2)
+        self.assertEqual(self.timer.cancel_timeout.call_count, 2)
+
+    def test_batches(self):
+        async def scenario():
+            alerted = await self.pager.handle_alerts([('service-0', 'Down!'), ('service-1', 'Down!'), ('service-0', 'Again')])
+            await self.pager.handle_timeouts(['service-0', 'service-1', 'service-2'])
+            return alerted
+        self.assertEqual(asyncio.run(scenario()).alerted, ['service-0', 'service-1'])
+
+        self.assertEqual(self.repository.get('service-0').current_level, 1)
+        self.assertEqual(self.repository.get('service-2').current_level, 0)
+        with self.assertRaises(ValueError):
+            asyncio.run(self.pager.handle_alert('unknown', 'Down!'))
+
+    def test_history_is_recorded_off_the_loop(self):
+        threads = []
+        history = MagicMock()
+        history.record.side_effect = lambda *args: threads.append(threading.current_thread())
+        history.record_notifications.side_effect = lambda *args: threads.append(threading.current_thread())
+        self.pager.history = history
+
+        async def scenario():
+            await self.pager.handle_alert('service-1', 'Down!')
+            await self.pager.handle_healthy('service-1')
+        asyncio.run(scenario())
+
+        self.assertEqual([call[0][0] for call in history.record.call_args_list], ['alert', 'healthy'])
+        history.record_notifications.assert_called_once()
+        self.assertEqual(len(threads), 3)
+        self.assertNotIn(threading.main_thread(), threads)
+
+    def test_blocking_calls_do_not_stall_the_loop(self):
+        self.mail.notify.side_effect = lambda *args: time.sleep(0.2)
+        ticks = []
+
+        async def heartbeat():
+            for _ in range(5):
+                ticks.append(time.perf_counter())
+                await asyncio.sleep(0.02)
+
+        async def scenario():
+            started = time.perf_counter()
+            await asyncio.gather(
+                heartbeat(),
+                *(self.pager.handle_alert(f'service-{i}', 'Down!') for i in range(3))
+            )
+            return time.perf_counter() - started
+
+        elapsed = asyncio.run(scenario())
+        # Blocking notifications ran in parallel, off the event loop
+        self.assertLess(elapsed, 0.5)
+        self.assertLess(max(b - a for a, b in zip(ticks, ticks[1:])), 0.15)
+        self.assertEqual(self.mail.notify.call_count, 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
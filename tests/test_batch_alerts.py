@@ -0,0 +1,102 @@
+import unittest
+from unittest.mock import MagicMock
+import sys, os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+from domain.services.pager_service import ServicePager
+from domain.models.monitored_service import MonitoredService
+from domain.models.level import Level
+from domain.models.email_target import EmailTarget
+from domain.models.escalation_policy import EscalationPolicy
+
+
+class TestServicePagerBatches(unittest.TestCase):
+    def setUp(self):
+        self.services = {
+            'service-1': MonitoredService('service-1'),
+            'service-2': MonitoredService('service-2'),
+            'service-3': MonitoredService('service-3'),
+        }
+        self.services['service-3'].status = 'unhealthy'
+
+        repo_mock = MagicMock()
+        repo_mock.get_many.side_effect = lambda ids: {i: self.services[i] for i in ids if i in self.services}
+        escalation_mock = MagicMock()
+        escalation_mock.get.return_value = EscalationPolicy([
+            Level(0, [EmailTarget('demoA@aircall.com')]),
+            Level(1, [EmailTarget('demoB@aircall.com'), EmailTarget('demoC@aircall.com')])
+        ])
+
+        self.pager = ServicePager(
+            timer_system=MagicMock(),
+            escalation_system=escalation_mock,
+            mail_system=MagicMock(),
+            sms_system=MagicMock(),
+            repository=repo_mock
+        )
+
+    def test_alert_batch(self):
+        alerted = self.pager.handle_alerts([
+            ('service-1', 'Down!'),
+            ('service-2', 'Slow!'),
+            ('service-1', 'Still down!'),
+            ('service-3', 'Down again!'),
+        ])
+
+        self.assertEqual(alerted.alerted, ['service-1', 'service-2'])
+        self.assertEqual(alerted.missing, [])
+        self.assertEqual(self.services['service-1'].alert_msg, 'Down!')
+        self.assertEqual(self.services['service-2'].status, 'unhealthy')
+
+        # One bulk read, one bulk write, one policy fetch per alerted service
+        self.assertEqual(self.pager.repository.get_many.call_count, 1)
+        self.assertEqual(self.pager.repository.save_many.call_count, 1)
+        self.assertEqual(self.pager.repository.get.call_count, 0)
+        self.assertEqual(self.pager.repository.save.call_count, 0)
+        self.assertEqual(self.pager.escalation_service.get.call_count, 2)
+
+        self.assertEqual(self.pager.mail_service.notify.call_count, 2)
+        self.assertEqual(self.pager.time_service.add_timeout.call_count, 2)
+
+    def test_alert_batch_with_missing_service(self):
+        batch = self.pager.handle_alerts([('service-1', 'Down!'), ('unknown', 'Down!')])
+
+        # The known services of the batch are still processed
+        self.assertEqual(batch.alerted, ['service-1'])
+        self.assertEqual(batch.missing, ['unknown'])
+        self.assertEqual(self.services['service-1'].status, 'unhealthy')
+        self.assertEqual(self.pager.repository.save_many.call_count, 1)
+        self.assertEqual(self.pager.mail_service.notify.call_count, 1)
+
+    def test_timeout_batch(self):
+        self.pager.handle_alerts([('service-1', 'Down!'), ('service-2', 'Slow!')])
+        self.services['service-2'].set_acknowledged()
+        self.pager.repository.reset_mock()
+        self.pager.mail_service.reset_mock()
+        self.pager.time_service.reset_mock()
+
+        self.pager.handle_timeouts(['service-1', 'service-2', 'unknown'])
+
+        self.assertEqual(self.services['service-1'].current_level, 1)
+        self.assertEqual(self.services['service-2'].current_level, 0)
+        self.assertEqual(self.pager.repository.get_many.call_count, 1)
+        self.assertEqual(self.pager.repository.save_many.call_count, 1)
+        self.assertEqual(self.pager.mail_service.notify.call_count, 2)
+        self.pager.time_service.add_timeout.assert_called_once_with('service-1', 15)
+
+    def test_failed_side_effects_do_not_stop_the_batch(self):
+        self.pager.handle_alerts([('service-1', 'Down!'), ('service-2', 'Slow!')])
+        self.pager.time_service.reset_mock()
+        self.pager.mail_service.reset_mock()
+        self.pager.mail_service.notify.side_effect = [ConnectionError('Mail down'), None, None]
+
+        with self.assertRaises(ConnectionError):
+            self.pager.handle_timeouts(['service-1', 'service-2'])
+
+        # Both escalations are armed and the second service notified although the first notification failed
+        self.assertEqual(self.pager.time_service.add_timeout.call_count, 2)
+        self.assertEqual(self.pager.mail_service.notify.call_count, 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,132 @@
+import time
+import unittest
+from unittest.mock import MagicMock
+import sys, os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+from infrastructure.buffered_notification_service import BufferedMailService, BufferedSMSService
+from infrastructure.in_memory_bulk_provider import InMemoryBulkProvider
+from domain.services.pager_service import ServicePager
+from domain.models.monitored_service import MonitoredService
+from domain.models.level import Level
+from domain.models.email_target import EmailTarget
+from domain.models.sms_target import SMSTarget
+from domain.models.escalation_policy import EscalationPolicy
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestBufferedNotificationServices(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.mail_provider = InMemoryBulkProvider()
+        self.sms_provider = InMemoryBulkProvider()
+        self.mail = BufferedMailService(self.mail_provider, flush_window=30, clock=self.clock)
+        self.sms = BufferedSMSService(self.sms_provider, flush_window=30, clock=self.clock)
+
+        self.services = {f'service-{i}': MonitoredService(f'service-{i}') for i in range(10)}
+        repo_mock = MagicMock()
+        repo_mock.get.side_effect = lambda service_id: self.services[service_id]
+        escalation_mock = MagicMock()
+        escalation_mock.get.return_value = EscalationPolicy([
+            Level(0, [EmailTarget('oncall@aircall.com'), SMSTarget('+33600000000')])
+        ])
+        self.pager = ServicePager(
+            timer_system=MagicMock(),
+            escalation_system=escalation_mock,
+            mail_system=self.mail,
+            sms_system=self.sms,
+            repository=repo_mock
+        )
+
+    def test_storm_is_coalesced_into_one_digest_per_recipient(self):
+        for service_id in self.services:
+            self.pager.handle_alert(service_id, 'Down!')
+
+        # Still within the flush window
+        self.assertEqual(self.mail_provider.call_count, 0)
+
+        self.clock.now = 30
+        self.assertEqual(self.mail.flush_due(), 1)
+        self.assertEqual(self.sms.flush_due(), 1)
+
+        self.assertEqual(self.mail_provider.call_count, 1)
+        self.assertEqual(self.sms_provider.call_count, 1)
+        recipient, body = self.mail_provider.sent[0]
+        self.assertEqual(recipient, 'oncall@aircall.com')
+        self.assertTrue(body.startswith('10 alerts:'))
+        self.assertEqual(self.sms_provider.sent[0][0], '+33600000000')
+
+    def test_single_notification_and_duplicates(self):
+        target = EmailTarget('oncall@aircall.com')
+        service = self.services['service-1']
+        self.mail.notify(target, service, 'Down!')
+        self.mail.notify(target, service, 'Down!')
+
+        self.assertEqual(self.mail.flush(), 1)
+        self.assertEqual(self.mail_provider.sent, [('oncall@aircall.com', '[service-1] Down!')])
+
+    def test_digests_due_are_sent_in_one_bulk_call(self):
+        self.mail.notify(EmailTarget('a@aircall.com'), self.services['service-1'], 'Down!')
+        self.clock.now = 10
+        self.mail.notify(EmailTarget('b@aircall.com'), self.services['service-2'], 'Down!')
+
+        # Only the first recipient's window elapsed
+        self.clock.now = 30
+        self.mail.flush_due()
+        self.assertEqual([recipient for recipient, _ in self.mail_provider.sent], ['a@aircall.com'])
+
+        self.mail.notify(EmailTarget('c@aircall.com'), self.services['service-3'], 'Down!')
+        self.mail.flush()
+        self.assertEqual(self.mail_provider.call_count, 2)
+        self.assertEqual(len(self.mail_provider.calls[1]), 2)
+
+    def test_max_pending_forces_flush(self):
+        mail = BufferedMailService(self.mail_provider, flush_window=30, max_pending=3, clock=self.clock)
+        for i in range(3):
+            mail.notify(EmailTarget(f'{i}@aircall.com'), self.services['service-1'], 'Down!')
+
+        self.assertEqual(self.mail_provider.call_count, 1)
+        self.assertEqual(len(self.mail_provider.sent), 3)
+
+    def test_failed_send_keeps_the_digests(self):
+        target = EmailTarget('oncall@aircall.com')
+        self.mail.notify(target, self.services['service-1'], 'Down!')
+        self.mail_provider.send_bulk = MagicMock(side_effect=ConnectionError("Provider down"))
+        self.clock.now = 30
+        with self.assertRaises(ConnectionError):
+            self.mail.flush_due()
+
+        # Buffered meanwhile: joins the restored digest
+        self.mail.notify(target, self.services['service-2'], 'Down!')
+        del self.mail_provider.send_bulk
+        self.assertEqual(self.mail.flush_due(), 1)
+        self.assertTrue(self.mail_provider.sent[0][1].startswith('2 alerts:'))
+
+    def test_notify_leaves_flushing_to_the_flusher(self):
+        mail = BufferedMailService(self.mail_provider, flush_window=30, max_pending=3, clock=self.clock)
+        mail.flush_due = MagicMock()
+        mail.start()
+        self.clock.now = 60
+        for i in range(3):
+            mail.notify(EmailTarget(f'{i}@aircall.com'), self.services['service-1'], 'Down!')
+        # Woken up by the full buffer, long before its interval
+        for _ in range(100):
+            if self.mail_provider.call_count:
+                break
+            time.sleep(0.01)
+        self.assertEqual(self.mail_provider.call_count, 1)
+        mail.stop()
+
+        mail.flush_due.assert_not_called()
+        self.assertEqual(len(self.mail_provider.sent), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,105 @@
+import unittest
+from unittest.mock import MagicMock
+import sys, os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+from application.interfaces.monitored_service_repository import ConcurrentModificationError
+from infrastructure.compact_monitored_service_repository import CompactMonitoredServiceRepository
+from domain.services.pager_service import ServicePager
+from domain.models.monitored_service import MonitoredService
+from domain.models.level import Level
+from domain.models.email_target import EmailTarget
+from domain.models.escalation_policy import EscalationPolicy
+
+
+class TestCompactRepository(unittest.TestCase):
+    def setUp(self):
+        self.repository = CompactMonitoredServiceRepository([MonitoredService(f'service-{i}') for i in range(3)])
+        self.policy = EscalationPolicy([Level(0, [EmailTarget('demoA@aircall.com')])])
+
+    def test_view_changes_are_local_until_saved(self):
+        service = self.repository.get('service-1')
+        service.set_unhealthy('Down!')
+        service.policy = self.policy
+        self.assertEqual(self.repository.get('service-1').status, 'healthy')
+
+        self.repository.save(service)
+        stored = self.repository.get('service-1')
+        self.assertEqual((stored.status, stored.alert_msg, stored.acknowledged, stored.current_level), ('unhealthy', 'Down!', False, 0))
+        self.assertEqual(stored.version, 2)
+        self.assertIs(stored.policy, self.policy)
+        self.assertIsNone(self.repository.get('service-0').policy)
+        self.assertIsNone(self.repository.get('unknown'))
+
+    def test_policies_and_messages_are_shared(self):
+        services = list(self.repository.get_many(['service-0', 'service-1', 'service-2']).values())
+        for service in services:
+            service.set_unhealthy('Down!')
+            service.policy = self.policy
+        self.repository.save_many(services)
+
+        self.assertEqual(self.repository.policies, [self.policy])
+        self.assertEqual({self.repository.policy_id(f'service-{i}') for i in range(3)}, {0})
+
+    def test_unreferenced_messages_and_policies_are_released(self):
+        for i in range(100):
+            service = self.repository.get('service-1')
+            service.set_unhealthy(f'Down at {i}!')
+            # A fresh copy of the same policy on each fetch
+            service.policy = EscalationPolicy([Level(0, [EmailTarget('demoA@aircall.com')])])
+            self.repository.save(service)
+
+        self.assertEqual(self.repository.messages, 2)
+        self.assertEqual(len(self.repository.policies), 1)
+        self.assertEqual(self.repository.get('service-1').alert_msg, 'Down at 99!')
+
+        service = self.repository.get('service-1')
+        service.set_healthy()
+        service.policy = EscalationPolicy([Level(0, [EmailTarget('demoB@aircall.com')])], version=2)
+        self.repository.save(service)
+        self.assertEqual(self.repository.messages, 1)
+        self.assertEqual(self.repository.policies, [service.policy])
+
+    def test_compare_and_swap(self):
+        first = self.repository.get('service-1')
+        second = self.repository.get('service-1')
+        first.set_acknowledged()
+        self.repository.save(first)
+
+        second.set_unhealthy('Down!')
+        with self.assertRaises(ConcurrentModificationError):
+            self.repository.save_many([self.repository.get('service-2'), second])
+        # All or nothing
+        self.assertEqual(self.repository.get('service-2').version, 1)
+        self.assertTrue(self.repository.get('service-1').acknowledged)
+
+        # A saved view can be saved again
+        first.set_unhealthy('Down again!')
+        self.repository.save(first)
+        self.assertEqual(self.repository.get('service-1').version, 3)
+        self.assertEqual(len(self.repository), 3)
+
+    def test_pager_on_compact_repository(self):
+        escalation_mock = MagicMock()
+        escalation_mock.get.return_value = EscalationPolicy([
+            Level(0, [EmailTarget('demoA@aircall.com')]),
+            Level(1, [EmailTarget('demoB@aircall.com')]),
+        ])
+        pager = ServicePager(
+            timer_system=MagicMock(),
+            escalation_system=escalation_mock,
+            mail_system=MagicMock(),
+            sms_system=MagicMock(),
+            repository=self.repository
+        )
+        pager.handle_alerts([('service-0', 'Down!'), ('service-1', 'Down!')])
+        pager.handle_timeout('service-0')
+        pager.handle_acknowledge('service-1')
+
+        self.assertEqual(self.repository.get('service-0').current_level, 1)
+        self.assertTrue(self.repository.get('service-1').acknowledged)
+        self.assertEqual(pager.mail_service.notify.call_count, 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,149 @@
+import random
+import sys, os
+import threading
+import unittest
+from collections import Counter
+from unittest.mock import MagicMock
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+from application.interfaces.monitored_service_repository import ConcurrentModificationError
+from infrastructure.in_memory_monitored_service_repository import InMemoryMonitoredServiceRepository
+from infrastructure.sqlite_monitored_service_repository import SQLiteMonitoredServiceRepository
+from domain.services.pager_service import ServicePager
+from domain.models.monitored_service import MonitoredService
+from domain.models.level import Level
+from domain.models.email_target import EmailTarget
+from domain.models.escalation_policy import EscalationPolicy
+
+
+class TestCompareAndSwap(unittest.TestCase):
+    def check_stale_save_is_rejected(self, repository):
+        repository.save(MonitoredService('service-1'))
+        first = repository.get('service-1')
+        second = repository.get('service-1')
+
+        first.set_acknowledged()
+        repository.save(first)
+        self.assertEqual(first.version, 2)
+
+        second.set_unhealthy('Down!')
+        with self.assertRaises(ConcurrentModificationError):
+            repository.save(second)
+        # A service created twice conflicts as well
+        with self.assertRaises(ConcurrentModificationError):
+            repository.save(MonitoredService('service-1'))
+        self.assertTrue(repository.get('service-1').acknowledged)
+
+    def test_in_memory_repository(self):
+        self.check_stale_save_is_rejected(InMemoryMonitoredServiceRepository())
+
+    def test_sqlite_repository(self):
+        repository = SQLiteMonitoredServiceRepository()
+        self.check_stale_save_is_rejected(repository)
+
+        # save_many is all-or-nothing
+        stale = repository.get('service-1')
+        repository.save(repository.get('service-1'))
+        fresh = MonitoredService('service-2')
+        with self.assertRaises(ConcurrentModificationError):
+            repository.save_many([fresh, stale])
+        self.assertIsNone(repository.get('service-2'))
+        self.assertEqual(fresh.version, 0)
+        repository.close()
+
+    def test_pager_gives_up_after_max_retries(self):
+        repository = MagicMock()
+        repository.get.side_effect = lambda service_id: MonitoredService(service_id)
+        repository.save.side_effect = ConcurrentModificationError(['service-1'])
+        pager = ServicePager(
+            timer_system=MagicMock(),
+            escalation_system=MagicMock(),
+            mail_system=MagicMock(),
+            sms_system=MagicMock(),
+            repository=repository,
+            max_retries=3
+        )
+
+        with self.assertRaises(ConcurrentModificationError):
+            pager.handle_alert('service-1', 'Down!')
+        self.assertEqual(repository.save.call_count, 3)
+        self.assertEqual(pager.mail_service.notify.call_count, 0)
+        self.assertEqual(pager.time_service.add_timeout.call_count, 0)
+
+
+class TestConcurrentHandlers(unittest.TestCase):
+    """
+    Several workers receive the same alerts, timeouts and acknowledgements at the same time:
+    every level of an incident must be notified at most once, the first one exactly once.
+    """
+    SERVICES = 40
+    WORKERS = 8
+
+    def setUp(self):
+        self.switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+
+    def tearDown(self):
+        sys.setswitchinterval(self.switch_interval)
+
+    def run_storm(self, repository):
+        service_ids = [f'service-{i}' for i in range(self.SERVICES)]
+        repository.save_many([MonitoredService(service_id) for service_id in service_ids])
+
+        notified = Counter()
+        lock = threading.Lock()
+
+        def record(target, service, msg):
+            with lock:
+                notified[(service.id, service.current_level)] += 1
+
+        mail_mock = MagicMock()
+        mail_mock.notify.side_effect = record
+        escalation_mock = MagicMock()
+        escalation_mock.get.return_value = EscalationPolicy([
+            Level(0, [EmailTarget('level0@aircall.com')]),
+            Level(1, [EmailTarget('level1@aircall.com')]),
+            Level(2, [EmailTarget('level2@aircall.com')]),
+        ])
+        pager = ServicePager(
+            timer_system=MagicMock(),
+            escalation_system=escalation_mock,
+            mail_system=mail_mock,
+            sms_system=MagicMock(),
+            repository=repository,
+            max_retries=100
+        )
+
+        def worker(seed):
+            events = [(handler, service_id) for service_id in service_ids for handler in (
+                lambda service_id: pager.handle_alert(service_id, 'Down!'),
+                lambda service_id: pager.handle_alert(service_id, 'Down!'),
+                pager.handle_timeout,
+                pager.handle_acknowledge,
+            )]
+            random.Random(seed).shuffle(events)
+            for handler, service_id in events:
+                handler(service_id)
+
+        threads = [threading.Thread(target=worker, args=(seed,)) for seed in range(self.WORKERS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        for service_id in service_ids:
+            self.assertEqual(notified[(service_id, 0)], 1)
+        self.assertLessEqual(max(notified.values()), 1)
+        self.assertTrue(all(service.acknowledged for service in repository.get_many(service_ids).values()))
+
+    def test_in_memory_repository(self):
+        self.run_storm(InMemoryMonitoredServiceRepository())
+
+    def test_sqlite_repository(self):
+        repository = SQLiteMonitoredServiceRepository()
+        self.run_storm(repository)
+        repository.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,227 @@
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+from unittest.mock import MagicMock
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+from domain.services.circuit_breaker import CircuitBreaker, CircuitOpenError
+from domain.services.delivery_service import DeliveryService, RetryQueue
+from domain.services.pager_service import ServicePager
+from infrastructure.fault_injecting_provider import FaultInjectingProvider, ProviderError
+from infrastructure.in_memory_monitored_service_repository import InMemoryMonitoredServiceRepository
+from domain.models.monitored_service import MonitoredService
+from domain.models.level import Level
+from domain.models.email_target import EmailTarget
+from domain.models.sms_target import SMSTarget
+from domain.models.escalation_policy import EscalationPolicy
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.breaker = CircuitBreaker('sms', failure_threshold=2, reset_timeout=30, slow_call=1, clock=self.clock)
+
+    def fail(self):
+        with self.assertRaises(ProviderError):
+            self.breaker.call(FaultInjectingProvider(failure_rate=1).notify, None, MonitoredService('service-1'), 'Down!')
+
+    def test_opens_then_half_opens(self):
+        self.fail()
+        self.assertEqual(self.breaker.state, 'closed')
+        self.fail()
+        self.assertEqual(self.breaker.state, 'open')
+        with self.assertRaises(CircuitOpenError):
+            self.breaker.call(print)
+
+        self.clock.now = 30
+        self.assertEqual(self.breaker.state, 'half_open')
+        # A single trial call, its failure re-opens the circuit
+        self.assertTrue(self.breaker.allow())
+        self.assertFalse(self.breaker.allow())
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, 'open')
+
+        self.clock.now = 60
+        self.assertTrue(self.breaker.allow())
+        self.breaker.record_success()
+        self.assertEqual(self.breaker.state, 'closed')
+
+    def test_slow_calls_are_failures(self):
+        self.breaker.record_success(elapsed=2)
+        self.breaker.record_success(elapsed=2)
+        self.assertEqual(self.breaker.state, 'open')
+
+
+class TestRetryQueue(unittest.TestCase):
+    def test_exponential_backoff_with_jitter(self):
+        queue = RetryQueue(base_delay=1, max_delay=10, jitter=0.5, random=lambda: 1.0)
+        self.assertEqual([queue.backoff(attempts) for attempts in range(1, 6)], [0.5, 1, 2, 4, 5])
+        queue.random = lambda: 0.0
+        self.assertEqual(queue.backoff(10), 10)
+
+
+class TestDeliveryService(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.mail = FaultInjectingProvider()
+        self.sms = FaultInjectingProvider()
+        self.timer = MagicMock()
+        escalation_mock = MagicMock()
+        escalation_mock.get.return_value = EscalationPolicy([
+            Level(0, [EmailTarget('demoA@aircall.com'), SMSTarget('+33600000000')]),
+        ])
+        self.delivery = DeliveryService(
+            breaker_factory=lambda channel: CircuitBreaker(channel, failure_threshold=3, reset_timeout=60, clock=self.clock),
+            queue_factory=lambda: RetryQueue(base_delay=1, max_delay=8, max_attempts=5, random=lambda: 0.0),
+            clock=self.clock
+        )
+        self.pager = ServicePager(
+            timer_system=self.timer,
+            escalation_system=escalation_mock,
+            mail_system=self.mail,
+            sms_system=self.sms,
+            repository=InMemoryMonitoredServiceRepository([MonitoredService(f'service-{i}') for i in range(5)]),
+            notifier=self.delivery
+        )
+
+    def test_alerts_are_handled_during_an_outage(self):
+        self.sms.outage()
+        for i in range(5):
+            self.pager.handle_alert(f'service-{i}', 'Down!')
+        self.assertEqual(self.timer.add_timeout.call_count, 5)
+
+        self.assertEqual(self.delivery.deliver_due(), 5)
+        # Three failures open the SMS circuit: the two other deliveries wait without calling the provider
+        self.assertEqual(self.sms.attempts, 3)
+        self.assertEqual(self.delivery.breaker('sms').state, 'open')
+        self.assertEqual(self.delivery.breaker('mail').state, 'closed')
+
+        self.sms.outage(False)
+        self.clock.now = 60
+        self.delivery.deliver_due()
+        self.clock.now = 61
+        self.delivery.deliver_due()
+        self.assertEqual(len(self.sms.delivered), 5)
+        self.assertEqual(self.delivery.pending(), 0)
+
+    def test_retries_back_off_until_given_up(self):
+        self.sms.outage()
+        self.pager.handle_alert('service-1', 'Down!')
+        for now in [0, 1, 3, 7, 15]:
+            self.clock.now = now
+            self.delivery.breaker('sms').record_success()
+            self.delivery.deliver_due()
+        self.assertEqual(self.sms.attempts, 5)
+        self.assertEqual(len(self.delivery.dead_letters), 1)
+        self.assertEqual(self.delivery.pending(), 0)
+
+    def test_pending_deliveries_survive_a_restart(self):
+        self.sms.outage()
+        self.pager.handle_alert('service-1', 'Down!')
+        self.delivery.deliver_due()
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'deliveries.json')
+            self.delivery.save(path)
+            restarted = DeliveryService(state_path=path, clock=self.clock, senders={'sms': self.sms})
+
+        self.sms.outage(False)
+        self.clock.now = 10
+        self.assertEqual(restarted.deliver_due(), 1)
+        target, service_id, message = self.sms.delivered[0]
+        self.assertEqual((target.phone_number, service_id, message), ('+33600000000', 'service-1', 'Down!'))
+
+    def test_saved_deliveries_only_rebuild_known_targets(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'deliveries.json')
+            record = {'service_id': 'service-1', 'level': 0, 'message': 'Down!', 'attempts': 1, 'delay': 0.0}
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump([
+                    {**record, 'channel': 'sms', 'address': '+33600000000'},
+                    # Saved before the address was
+                    {**record, 'channel': 'mail', 'target_type': 'domain.models.email_target:EmailTarget',
+                     'target': {'email': 'demoA@aircall.com'}},
+                    {**record, 'channel': 'pager', 'target_type': 'os:system', 'target': {'command': 'true'}},
+                ], f)
+            restarted = DeliveryService(state_path=path, clock=self.clock, senders={'mail': self.mail, 'sms': self.sms})
+
+        self.assertEqual(restarted.deliver_due(), 2)
+        self.assertEqual([target.phone_number for target, _, _ in self.sms.delivered], ['+33600000000'])
+        self.assertEqual([target.email for target, _, _ in self.mail.delivered], ['demoA@aircall.com'])
+
+    def test_hung_sends_are_failed_attempts(self):
+        released = threading.Event()
+        self.sms.notify = lambda *args: released.wait()
+        self.delivery.call_timeout = 0.05
+        try:
+            self.pager.handle_alert('service-1', 'Down!')
+            self.assertEqual(self.delivery.deliver_due(), 1)
+        finally:
+            released.set()
+        self.assertEqual((self.delivery.failed_attempts, self.delivery.timed_out), (1, 1))
+        [delivery] = list(self.delivery._lane('sms').queue)
+        self.assertIn('TimeoutError', delivery.error)
+
+    def test_hung_sends_are_bounded(self):
+        released = threading.Event()
+        calls = []
+        self.sms.notify = lambda *args: calls.append(args) or released.wait()
+        self.delivery.channel_workers['sms'] = 1
+        self.delivery.call_timeout = 0.05
+        try:
+            self.pager.handle_alerts([(f'service-{i}', 'Down!') for i in range(3)])
+            self.delivery.deliver_due()
+            # The pool thread is held by the first hung call, the next sends time out without being made
+            self.assertEqual(len(calls), 1)
+            self.assertEqual(self.delivery.timed_out, 3)
+        finally:
+            released.set()
+            self.delivery.stop()
+
+    def test_retries_of_closed_incidents_are_dropped(self):
+        self.delivery.is_open = lambda service_id: not self.pager.repository.get(service_id).acknowledged
+        self.sms.outage()
+        self.pager.handle_alerts([('service-1', 'Down!'), ('service-2', 'Down!')])
+        self.delivery.deliver_due()
+        self.assertEqual(self.sms.attempts, 2)
+
+        self.pager.handle_acknowledge('service-1')
+        self.sms.outage(False)
+        self.clock.now = 1
+        self.delivery.deliver_due()
+
+        self.assertEqual([service_id for _, service_id, _ in self.sms.delivered], ['service-2'])
+        self.assertEqual(self.delivery.closed, 1)
+        self.assertEqual(self.delivery.pending(), 0)
+
+    def test_workers_complete_deliveries(self):
+        delivery = DeliveryService(queue_factory=lambda: RetryQueue(base_delay=0.01))
+        self.pager.notifier = delivery
+        self.sms.fail_next(2)
+        delivery.start()
+        try:
+            self.pager.handle_alerts([(f'service-{i}', 'Down!') for i in range(5)])
+            deadline = time.monotonic() + 5
+            while delivery.delivered < 10 and time.monotonic() < deadline:
+                time.sleep(0.01)
+        finally:
+            delivery.stop()
+        self.assertEqual(len(self.mail.delivered), 5)
+        self.assertEqual(len(self.sms.delivered), 5)
+        self.assertEqual(delivery.failed_attempts, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,225 @@
+import os
+import threading
+import time
+import unittest
+from unittest.mock import MagicMock, patch
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+from domain.services import sharded_event_engine
+from domain.services.sharded_event_engine import ShardedEventEngine
+from domain.services.pager_service import ServicePager
+from infrastructure.in_memory_monitored_service_repository import InMemoryMonitoredServiceRepository
+from domain.models.monitored_service import MonitoredService
+from domain.models.level import Level
+from domain.models.email_target import EmailTarget
+from domain.models.escalation_policy import EscalationPolicy
+
+
+class RecordingPager:
+    """ Stand-in pager recording the order events reach it """
+    def __init__(self):
+        self.events = []
+        self.lock = threading.Lock()
+
+    def _record(self, event, service_id):
+        # Give other shards a chance to interleave
+        time.sleep(0.0001)
+        with self.lock:
+            self.events.append((service_id, event))
+        return os.getpid()
+
+    def handle_alert(self, service_id, msg):
+        return self._record('alert', service_id)
+
+    def handle_acknowledge(self, service_id):
+        return self._record('acknowledge', service_id)
+
+    def handle_healthy(self, service_id):
+        return self._record('healthy', service_id)
+
+    def handle_timeout(self, service_id):
+        if service_id == 'broken':
+            raise ValueError("Missing service 'broken'")
+        return self._record('timeout', service_id)
+
+    def handle_timeouts(self, service_ids):
+        if 'broken' in service_ids:
+            raise ValueError("Missing service 'broken'")
+        for service_id in service_ids:
+            self._record('timeouts', service_id)
+
+
+def recording_pager_factory():
+    return RecordingPager()
+
+
+class TestShardedEventEngine(unittest.TestCase):
+    def test_events_of_a_service_stay_ordered(self):
+        pager = RecordingPager()
+        engine = ShardedEventEngine(lambda: pager, shards=4)
+        engine.start()
+
+        sequence = ['alert', 'timeout', 'timeout', 'acknowledge', 'healthy']
+        futures = []
+        for event in sequence:
+            for i in range(20):
+                futures.append(engine.submit(event, f'service-{i}', *(['Down!'] if event == 'alert' else [])))
+        for future in futures:
+            future.result(timeout=5)
+        engine.stop()
+
+        for i in range(20):
+            events = [event for service_id, event in pager.events if service_id == f'service-{i}']
+            self.assertEqual(events, sequence)
+
+    def test_failures_and_metrics(self):
+        engine = ShardedEventEngine(RecordingPager, shards=2)
+        engine.start()
+
+        with self.assertRaises(ValueError):
+            engine.timeout('broken').result(timeout=5)
+        for i in range(10):
+            engine.alert(f'service-{i}', 'Down!')
+        engine.stop()
+
+        metrics = engine.metrics()
+        self.assertEqual(metrics['queue_depth'], 0)
+        self.assertEqual(sum(shard['processed'] for shard in metrics['shards']), 10)
+        self.assertEqual(sum(shard['failed'] for shard in metrics['shards']), 1)
+        self.assertGreater(metrics['throughput'], 0)
+
+        with self.assertRaises(RuntimeError):
+            engine.alert('service-1', 'Down!')
+
+    def test_timeouts_are_handled_in_one_batch_per_shard(self):
+        pager = RecordingPager()
+        engine = ShardedEventEngine(lambda: pager, shards=2)
+        engine.start()
+        service_ids = [f'service-{i}' for i in range(10)]
+        for future in engine.timeouts(service_ids):
+            future.result(timeout=5)
+        engine.stop()
+
+        self.assertEqual(sorted(pager.events), sorted((service_id, 'timeouts') for service_id in service_ids))
+        self.assertEqual(sum(shard['processed'] for shard in engine.metrics()['shards']), 10)
+
+    def test_failed_timeouts_are_logged(self):
+        engine = ShardedEventEngine(RecordingPager, shards=2)
+        engine.start()
+        healthy = next(f'service-{i}' for i in range(10) if engine.shard_of(f'service-{i}') != engine.shard_of('broken'))
+        sharing = next(f'service-{i}' for i in range(10) if engine.shard_of(f'service-{i}') == engine.shard_of('broken'))
+        with self.assertLogs('domain.services.sharded_event_engine', level='ERROR') as logs:
+            futures = engine.timeouts([healthy, 'broken', sharing])
+            engine.stop()
+        self.assertIsNone(futures[0].exception())
+        # The part of the broken timeout fails as a whole
+        self.assertIsInstance(futures[1].exception(), ValueError)
+        self.assertIs(futures[2], futures[1])
+        self.assertEqual(len(logs.records), 1)
+        self.assertIn("'broken'", logs.output[0])
+        self.assertEqual(sum(shard['failed'] for shard in engine.metrics()['shards']), 2)
+
+    def test_batches_are_split_by_shard(self):
+        pager = RecordingPager()
+        engine = ShardedEventEngine(lambda: pager, shards=4)
+        engine.start()
+
+        batch = [('alert', f'service-{i}', ('Down!',)) for i in range(20)] + [('timeout', 'broken', ())]
+        batch += [('acknowledge', f'service-{i}', ()) for i in range(20)]
+        failures = engine.submit_many(batch).result(timeout=5)
+        self.assertEqual(list(failures), [20])
+        self.assertIsInstance(failures[20], ValueError)
+        self.assertEqual(engine.submit_many([]).result(timeout=5), {})
+        with self.assertRaises(ValueError):
+            engine.submit_many([('unknown', 'service-1', ())])
+        engine.stop()
+
+        for i in range(20):
+            self.assertEqual([event for service_id, event in pager.events if service_id == f'service-{i}'], ['alert', 'acknowledge'])
+        metrics = engine.metrics()
+        self.assertEqual(sum(shard['processed'] for shard in metrics['shards']), 40)
+        self.assertEqual(sum(shard['failed'] for shard in metrics['shards']), 1)
+
+    def test_failed_batch_parts_fail_their_events(self):
+        engine = ShardedEventEngine(recording_pager_factory, shards=2)
+        engine.start()
+        broken = engine.shard_of('service-1')
+        handle = sharded_event_engine._handle
+
+        def failing_part(pager, name, service_id, args):
+            if any(engine.shard_of(event_service_id) == broken for _, _, event_service_id, _ in args):
+                raise RuntimeError('Shard down')
+            return handle(pager, name, service_id, args)
+
+        batch = [('healthy', f'service-{i}', ()) for i in range(10)]
+        with patch.object(sharded_event_engine, '_handle', failing_part):
+            failures = engine.submit_many(batch).result(timeout=5)
+        engine.stop()
+
+        self.assertEqual(sorted(failures), [i for i in range(10) if engine.shard_of(f'service-{i}') == broken])
+        self.assertTrue(all(isinstance(e, RuntimeError) for e in failures.values()))
+        self.assertEqual(sum(shard['failed'] for shard in engine.metrics()['shards']), len(failures))
+
+    def test_batches_cannot_be_cancelled(self):
+        engine = ShardedEventEngine(recording_pager_factory, shards=2)
+        engine.start()
+        release = threading.Event()
+        handle = sharded_event_engine._handle
+
+        def blocked_part(pager, name, service_id, args):
+            release.wait(5)
+            return handle(pager, name, service_id, args)
+
+        with patch.object(sharded_event_engine, '_handle', blocked_part):
+            batch = engine.submit_many([('healthy', f'service-{i}', ()) for i in range(10)])
+            # As when the stream of the batch disconnects
+            self.assertFalse(batch.cancel())
+            release.set()
+            self.assertEqual(batch.result(timeout=5), {})
+        engine.stop()
+
+    def test_process_shards(self):
+        engine = ShardedEventEngine(recording_pager_factory, shards=2, mode='process')
+        engine.start()
+
+        pids = {engine.alert(f'service-{i}', 'Down!').result(timeout=10) for i in range(20)}
+        with self.assertRaises(ValueError):
+            engine.timeout('broken').result(timeout=10)
+        self.assertEqual(list(engine.submit_many([('timeout', 'broken', ()), ('alert', 'service-1', ('Down!',))]).result(timeout=10)), [0])
+        engine.stop()
+
+        self.assertEqual(len(pids), 2)
+        self.assertNotIn(os.getpid(), pids)
+
+    def test_engine_in_front_of_pager(self):
+        repository = InMemoryMonitoredServiceRepository([MonitoredService(f'service-{i}') for i in range(10)])
+        escalation_mock = MagicMock()
+        escalation_mock.get.return_value = EscalationPolicy([
+            Level(0, [EmailTarget('demoA@aircall.com')]),
+            Level(1, [EmailTarget('demoB@aircall.com')])
+        ])
+        pager = ServicePager(
+            timer_system=MagicMock(),
+            escalation_system=escalation_mock,
+            mail_system=MagicMock(),
+            sms_system=MagicMock(),
+            repository=repository
+        )
+        engine = ShardedEventEngine(lambda: pager, shards=3)
+        engine.start()
+
+        for i in range(10):
+            engine.alert(f'service-{i}', 'Down!')
+            engine.timeout(f'service-{i}')
+            engine.acknowledge(f'service-{i}')
+        engine.stop()
+
+        for service in repository.get_many([f'service-{i}' for i in range(10)]).values():
+            self.assertEqual(service.current_level, 1)
+            self.assertTrue(service.acknowledged)
+        self.assertEqual(pager.mail_service.notify.call_count, 20)
+
+
+if __name__ == "__main__":
+    unittest.main()
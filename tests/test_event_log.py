@@ -0,0 +1,210 @@
+import os
+import tempfile
+import threading
+import unittest
+from unittest.mock import MagicMock, patch
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+from infrastructure import event_log as event_log_module
+from infrastructure.event_log import EventLog, JournaledTimerService, replay, LOG_FILE, ROTATED_LOG_FILE
+from infrastructure.in_memory_monitored_service_repository import InMemoryMonitoredServiceRepository
+from infrastructure.timing_wheel_timer_service import TimingWheelTimerService
+from domain.services.pager_service import ServicePager
+from domain.models.monitored_service import MonitoredService
+from domain.models.level import Level
+from domain.models.email_target import EmailTarget
+from domain.models.escalation_policy import EscalationPolicy
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1_700_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestEventLog(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.clock = FakeClock()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def start_node(self, services=(), snapshot_every=0):
+        """ Boot a pager node on the log directory, with non-durable repository and timer """
+        event_log = EventLog(self.directory.name, snapshot_every=snapshot_every, clock=self.clock)
+        repository = InMemoryMonitoredServiceRepository(services)
+        timer = TimingWheelTimerService()
+        escalation_mock = MagicMock()
+        escalation_mock.get.return_value = EscalationPolicy([
+            Level(0, [EmailTarget('demoA@aircall.com')]),
+            Level(1, [EmailTarget('demoB@aircall.com')]),
+            Level(2, [EmailTarget('demoC@aircall.com')]),
+        ])
+        pager = ServicePager(
+            timer_system=JournaledTimerService(timer, event_log, clock=self.clock),
+            escalation_system=escalation_mock,
+            mail_system=MagicMock(),
+            sms_system=MagicMock(),
+            repository=repository,
+            event_log=event_log
+        )
+        return event_log, repository, timer, pager
+
+    def run_incidents(self, pager):
+        pager.handle_alerts([('service-1', 'Down!'), ('service-2', 'Slow!'), ('service-3', 'Down!')])
+        pager.handle_acknowledge('service-2')
+        self.clock.now += 15 * 60
+        pager.handle_timeout('service-1')
+        pager.handle_healthy('service-3')
+        pager.handle_alert('service-4', 'Down!')
+
+    def check_recovery(self):
+        event_log, repository, timer, _ = self.start_node()
+        stats = replay(event_log, repository, timer)
+        event_log.close()
+
+        services = repository.get_many([f'service-{i}' for i in range(1, 5)])
+        self.assertEqual(services['service-1'].current_level, 1)
+        self.assertTrue(services['service-2'].acknowledged)
+        self.assertEqual(services['service-3'].status, 'healthy')
+        self.assertEqual(services['service-4'].alert_msg, 'Down!')
+
+        # Only the unacknowledged incidents escalate again
+        self.assertEqual(stats, {'restored': 4, 'rearmed': 2})
+        self.assertTrue(timer.pending('service-1'))
+        self.assertTrue(timer.pending('service-4'))
+        self.assertFalse(timer.pending('service-2'))
+
+    def test_crash_recovery(self):
+        event_log, _, _, pager = self.start_node([MonitoredService(f'service-{i}') for i in range(1, 5)])
+        self.run_incidents(pager)
+        # Crash: the repository and the timer are lost, the log is not
+        event_log.close()
+
+        self.check_recovery()
+
+    def test_recovery_from_snapshot(self):
+        event_log, _, _, pager = self.start_node([MonitoredService(f'service-{i}') for i in range(1, 5)], snapshot_every=4)
+        self.run_incidents(pager)
+        event_log.close()
+
+        with open(os.path.join(self.directory.name, LOG_FILE)) as f:
+            self.assertLess(len(f.readlines()), 4)
+        self.check_recovery()
+
+    def test_repository_ahead_of_the_log_is_kept(self):
+        event_log = EventLog(self.directory.name, clock=self.clock)
+        service = MonitoredService('service-1')
+        service.set_unhealthy('Down!')
+        repository = InMemoryMonitoredServiceRepository([service])
+        event_log.record('alert', [service])
+
+        # Saved after the alert, but the node crashed before logging it
+        stored = repository.get('service-1')
+        stored.set_acknowledged()
+        repository.save(stored)
+
+        self.assertEqual(replay(event_log, repository, MagicMock())['restored'], 0)
+        self.assertTrue(repository.get('service-1').acknowledged)
+        event_log.close()
+
+    def test_appends_go_on_while_a_snapshot_is_written(self):
+        event_log = EventLog(self.directory.name, clock=self.clock)
+        event_log.record_timer('service-1', self.clock.now)
+        writing, release = threading.Event(), threading.Event()
+        write = event_log_module._write_atomically
+
+        def slow_write(path, content):
+            writing.set()
+            release.wait(5)
+            write(path, content)
+
+        with patch.object(event_log_module, '_write_atomically', slow_write):
+            snapshot = threading.Thread(target=event_log.snapshot)
+            snapshot.start()
+            self.assertTrue(writing.wait(5))
+            appended = threading.Thread(target=event_log.record_timer, args=('service-2', self.clock.now))
+            appended.start()
+            appended.join(5)
+            self.assertFalse(appended.is_alive())
+            release.set()
+            snapshot.join()
+        event_log.close()
+
+        self.assertFalse(os.path.exists(os.path.join(self.directory.name, ROTATED_LOG_FILE)))
+        recovered = EventLog(self.directory.name)
+        self.assertEqual(sorted(recovered.timers), ['service-1', 'service-2'])
+        recovered.close()
+
+    def test_interrupted_snapshot_is_recovered(self):
+        event_log = EventLog(self.directory.name, clock=self.clock)
+        event_log.record_timer('service-1', self.clock.now)
+        with patch.object(event_log_module, '_write_atomically', MagicMock(side_effect=OSError('Disk full'))):
+            with self.assertRaises(OSError):
+                event_log.snapshot()
+        event_log.record_timer('service-2', self.clock.now)
+        event_log.close()
+
+        # The rotated log is replayed, then covered by a snapshot
+        recovered = EventLog(self.directory.name)
+        self.assertEqual(sorted(recovered.timers), ['service-1', 'service-2'])
+        self.assertFalse(os.path.exists(os.path.join(self.directory.name, ROTATED_LOG_FILE)))
+        recovered.close()
+        restarted = EventLog(self.directory.name)
+        self.assertEqual(sorted(restarted.timers), ['service-1', 'service-2'])
+        restarted.close()
+
+    def test_group_commit(self):
+        event_log = EventLog(self.directory.name, commit_interval=0.01, clock=self.clock)
+
+        def append(worker):
+            for i in range(10):
+                event_log.record_timer(f'service-{worker}-{i}', self.clock.now)
+
+        threads = [threading.Thread(target=append, args=(worker,)) for worker in range(20)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        event_log.close()
+
+        # 200 durable records, far fewer fsyncs
+        recovered = EventLog(self.directory.name)
+        self.assertEqual(len(recovered.timers), 200)
+        self.assertLess(event_log.commits, 100)
+        recovered.close()
+
+    def test_torn_record_is_ignored(self):
+        event_log = EventLog(self.directory.name, clock=self.clock)
+        event_log.record_timer('service-1', self.clock.now)
+        event_log.close()
+        with open(os.path.join(self.directory.name, LOG_FILE), 'a') as f:
+            f.write('{"type":"timer","service_id":"serv')
+
+        recovered = EventLog(self.directory.name)
+        self.assertEqual(list(recovered.timers), ['service-1'])
+        recovered.close()
+
+    def test_records_after_a_torn_record_survive_the_next_restart(self):
+        event_log = EventLog(self.directory.name, clock=self.clock)
+        event_log.record_timer('service-1', self.clock.now)
+        event_log.close()
+        with open(os.path.join(self.directory.name, LOG_FILE), 'a') as f:
+            f.write('{"type":"alert","serv')
+
+        # Crash, then a record acknowledged after the restart
+        recovered = EventLog(self.directory.name, clock=self.clock)
+        recovered.record_timer('service-2', self.clock.now)
+        recovered.close()
+
+        restarted = EventLog(self.directory.name)
+        self.assertEqual(sorted(restarted.timers), ['service-1', 'service-2'])
+        restarted.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,39 @@
+import os
+import subprocess
+import sys
+import unittest
+
+SRC = os.path.abspath(os.path.join(os.path.dirname(__file__), '../src'))
+
+# Imports every module of the domain package, then prints the top-level modules it loaded
+_IMPORT_DOMAIN = """
+import importlib, pkgutil, sys
+before = set(sys.modules)
+import domain
+for module in pkgutil.walk_packages(domain.__path__, 'domain.'):
+    importlib.import_module(module.name)
+print('\\n'.join(sorted({name.split('.')[0] for name in set(sys.modules) - before})))
+"""
+
+
+class TestImports(unittest.TestCase):
+    def test_domain_imports_with_the_standard_library_only(self):
+        completed = subprocess.run(
+            [sys.executable, '-c', _IMPORT_DOMAIN],
+            env=dict(os.environ, PYTHONPATH=SRC), capture_output=True, text=True
+        )
+        self.assertEqual(completed.returncode, 0, completed.stderr)
+        loaded = set(completed.stdout.split())
+        self.assertIn('domain', loaded)
+        self.assertEqual(loaded - set(sys.stdlib_module_names) - {'domain', 'application'}, set())
+
+    def test_pager_does_not_load_asyncio(self):
+        completed = subprocess.run(
+            [sys.executable, '-c', "import sys, domain.services.pager_service; print('asyncio' in sys.modules)"],
+            env=dict(os.environ, PYTHONPATH=SRC), capture_output=True, text=True
+        )
+        self.assertEqual(completed.stdout.strip(), 'False', completed.stderr)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,140 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import MagicMock
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+from infrastructure.incident_history_store import HISTORY_FILE, IncidentHistoryStore
+from infrastructure.in_memory_monitored_service_repository import InMemoryMonitoredServiceRepository
+from domain.services.pager_service import ServicePager
+from domain.models.monitored_service import MonitoredService
+from domain.models.level import Level
+from domain.models.email_target import EmailTarget
+from domain.models.sms_target import SMSTarget
+from domain.models.escalation_policy import EscalationPolicy
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1_700_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestIncidentHistory(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.clock = FakeClock()
+        self.history = IncidentHistoryStore(self.directory, bucket_seconds=3600, clock=self.clock)
+        self.repository = InMemoryMonitoredServiceRepository()
+        self.repository.save_many([MonitoredService('service-1'), MonitoredService('service-2')])
+        policy = EscalationPolicy([
+            Level(0, [EmailTarget('demoA@aircall.com'), SMSTarget('+33600000000')]),
+            Level(1, [EmailTarget('demoB@aircall.com')]),
+        ])
+        self.pager = ServicePager(
+            timer_system=MagicMock(),
+            escalation_system=MagicMock(get=MagicMock(return_value=policy)),
+            mail_system=MagicMock(),
+            sms_system=MagicMock(),
+            repository=self.repository,
+            history=self.history
+        )
+
+    def tearDown(self):
+        self.history.close()
+        shutil.rmtree(self.directory)
+
+    def test_incident_lifecycle_is_recorded(self):
+        self.pager.handle_alert('service-1', 'Down!')
+        self.clock.now += 900
+        self.pager.handle_timeout('service-1')
+        self.clock.now += 60
+        self.pager.handle_acknowledge('service-1')
+        self.pager.handle_acknowledge('service-1')
+        self.clock.now += 240
+        self.pager.handle_healthy('service-1')
+        # Healthy already: no incident to resolve
+        self.pager.handle_healthy('service-2')
+
+        [incident] = self.history.incidents()
+        self.assertEqual(incident, {
+            'id': 0, 'service_id': 'service-1', 'message': 'Down!', 'opened_at': 1_700_000_000.0,
+            'acknowledged_at': 1_700_000_960.0, 'resolved_at': 1_700_001_200.0, 'max_level': 1,
+        })
+        events = self.history.incident(0)['events']
+        self.assertEqual([(event['kind'], event['level'], event['target']) for event in events], [
+            ('alert', 0, None),
+            ('notify', 0, 'demoA@aircall.com'),
+            ('notify', 0, '+33600000000'),
+            ('escalate', 1, None),
+            ('notify', 1, 'demoB@aircall.com'),
+            # The repeated acknowledgement is a no-op
+            ('acknowledge', 1, None),
+            ('resolve', 0, None),
+        ])
+        self.assertIsNone(self.history.incident(1))
+
+    def test_events_are_queried_by_index(self):
+        for _ in range(3):
+            self.pager.handle_alert('service-1', 'Down!')
+            self.pager.handle_alert('service-2', 'Slow')
+            self.clock.now += 600
+            self.pager.handle_healthy('service-1')
+            self.pager.handle_healthy('service-2')
+            self.clock.now += 600
+
+        self.assertEqual(len(self.history.events(service_id='service-2', limit=1000)), 12)
+        latest = self.history.events(service_id='service-2', limit=2)
+        self.assertEqual([(event['kind'], event['at']) for event in latest], [
+            ('resolve', 1_700_003_000.0), ('notify', 1_700_002_400.0)
+        ])
+        by_target = self.history.events(target='+33600000000', since=1_700_001_200.0)
+        self.assertEqual([event['service_id'] for event in by_target], ['service-2', 'service-1'] * 2)
+        self.assertEqual(self.history.events(target='+33600000000', service_id='service-1', until=1_700_001_200.0)[0]['incident'], 0)
+        self.assertEqual(self.history.events(service_id='service-3'), [])
+        self.assertEqual([incident['id'] for incident in self.history.incidents('service-1', since=1_700_001_000.0)], [4, 2])
+
+    def test_stats_are_rolled_up_per_bucket(self):
+        # Acknowledged in 5 and 15 minutes, resolved in 10 and 30 minutes, the last one still open
+        for ack, resolve in ((300, 600), (900, 1800)):
+            self.pager.handle_alert('service-1', 'Down!')
+            self.clock.now += ack
+            self.pager.handle_acknowledge('service-1')
+            self.clock.now += resolve - ack
+            self.pager.handle_healthy('service-1')
+            self.clock.now += 3600
+        self.pager.handle_alert('service-2', 'Down!')
+
+        stats = self.history.stats()
+        self.assertEqual(stats, {'incidents': 3, 'acknowledged': 2, 'resolved': 2, 'mtta_seconds': 600.0, 'mttr_seconds': 1200.0})
+        self.assertEqual(self.history.stats('service-1', since=1_700_002_000.0)['mttr_seconds'], 1800.0)
+        self.assertEqual(self.history.stats('service-2')['mtta_seconds'], None)
+        self.assertEqual(self.history.stats(until=1_699_999_000.0)['incidents'], 0)
+
+    def test_history_is_replayed_on_restart(self):
+        self.pager.handle_alert('service-1', 'Down!')
+        self.clock.now += 120
+        self.pager.handle_acknowledge('service-1')
+        self.history.close()
+        # Torn write of the last record
+        with open(os.path.join(self.directory, HISTORY_FILE), 'a', encoding='utf-8') as f:
+            f.write('[1700000200.0,"resolve","serv')
+
+        self.history = IncidentHistoryStore(self.directory, clock=self.clock)
+        self.assertEqual(len(self.history), 4)
+        self.assertEqual(self.history.stats()['mtta_seconds'], 120.0)
+        self.clock.now += 60
+        self.history.record('healthy', [MonitoredService('service-1')])
+        self.history.close()
+
+        restarted = IncidentHistoryStore(self.directory, clock=self.clock)
+        self.assertEqual(restarted.incident(0)['resolved_at'], 1_700_000_180.0)
+        restarted.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,154 @@
+import asyncio
+import unittest
+from unittest.mock import MagicMock
+import sys, os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+from domain.services.instrumentation import (
+    InstrumentedEscalationPolicyService, InstrumentedMonitoredServiceRepository, InstrumentedNotificationService,
+    InstrumentedTimerService, NullMetrics, instrument_handlers
+)
+from domain.services.async_pager_service import AsyncServicePager
+from domain.services.pager_service import ServicePager
+from infrastructure.async_adapters import (
+    AsyncEscalationPolicyServiceAdapter, AsyncMailServiceAdapter, AsyncMonitoredServiceRepositoryAdapter,
+    AsyncSMSServiceAdapter, AsyncTimerServiceAdapter
+)
+from infrastructure.in_memory_monitored_service_repository import InMemoryMonitoredServiceRepository
+from infrastructure.prometheus_metrics import PrometheusMetrics
+from infrastructure.profiling import CProfileHook
+from domain.models.monitored_service import MonitoredService
+from domain.models.level import Level
+from domain.models.email_target import EmailTarget
+from domain.models.sms_target import SMSTarget
+from domain.models.escalation_policy import EscalationPolicy
+
+
+def parse_alert(msg):
+    return msg.upper()
+
+
+def busy_neighbour():
+    return sum(range(100))
+
+
+class SleepingPager:
+    """ Stand-in async pager, awaiting before it handles its event """
+    async def handle_alert(self, service_id, msg):
+        await asyncio.sleep(0.05)
+        return parse_alert(msg)
+
+    handle_alerts = handle_acknowledge = handle_healthy = handle_timeout = handle_timeouts = handle_alert
+
+
+class TestPrometheusMetrics(unittest.TestCase):
+    def test_render(self):
+        metrics = PrometheusMetrics(buckets=(0.01, 0.1))
+        metrics.increment('pager_transitions_total', event='alert')
+        metrics.increment('pager_transitions_total', 2, event='alert')
+        metrics.observe('pager_notification_seconds', 0.05, channel='sms')
+        metrics.observe('pager_notification_seconds', 0.5, channel='sms')
+        metrics.add_collector(lambda: [('pager_pending_deliveries', {'channel': 'sms'}, 3)])
+
+        lines = metrics.render().splitlines()
+        self.assertIn('# TYPE pager_transitions_total counter', lines)
+        self.assertIn('pager_transitions_total{event="alert"} 3', lines)
+        self.assertIn('pager_notification_seconds_bucket{channel="sms",le="0.01"} 0', lines)
+        self.assertIn('pager_notification_seconds_bucket{channel="sms",le="0.1"} 1', lines)
+        self.assertIn('pager_notification_seconds_bucket{channel="sms",le="+Inf"} 2', lines)
+        self.assertIn('pager_notification_seconds_count{channel="sms"} 2', lines)
+        self.assertIn('pager_pending_deliveries{channel="sms"} 3', lines)
+
+
+class TestInstrumentedPager(unittest.TestCase):
+    def setUp(self):
+        self.metrics = PrometheusMetrics()
+        self.repository = InMemoryMonitoredServiceRepository([MonitoredService('service-1'), MonitoredService('service-2')])
+        escalation_mock = MagicMock()
+        escalation_mock.get.return_value = EscalationPolicy([
+            Level(0, [EmailTarget('demoA@aircall.com'), SMSTarget('+33600000000')]),
+            Level(1, [SMSTarget('+33600000001')]),
+        ])
+        self.escalation = escalation_mock
+        self.mail = MagicMock()
+        self.sms = MagicMock()
+
+    def build_pager(self, metrics, profiler=None):
+        pager = ServicePager(
+            timer_system=InstrumentedTimerService(MagicMock(), metrics),
+            escalation_system=InstrumentedEscalationPolicyService(self.escalation, metrics),
+            mail_system=InstrumentedNotificationService(self.mail, metrics, 'mail'),
+            sms_system=InstrumentedNotificationService(self.sms, metrics, 'sms'),
+            repository=InstrumentedMonitoredServiceRepository(self.repository, metrics),
+            metrics=metrics
+        )
+        return instrument_handlers(pager, metrics, profiler)
+
+    def test_stages_channels_and_transitions(self):
+        pager = self.build_pager(self.metrics)
+        self.sms.notify.side_effect = [None, RuntimeError('SMS provider down')]
+        pager.handle_alert('service-1', 'Down!')
+        with self.assertRaises(RuntimeError):
+            pager.handle_timeout('service-1')
+        pager.handle_acknowledge('service-1')
+
+        for stage, count in [('repository_get', 3), ('repository_save', 3), ('load_policy', 1), ('add_timeout', 2), ('cancel_timeout', 1)]:
+            self.assertEqual(self.metrics.histogram('pager_stage_seconds', stage=stage)[0], count, stage)
+        self.assertEqual(self.metrics.histogram('pager_notification_seconds', channel='mail')[0], 1)
+        self.assertEqual(self.metrics.histogram('pager_notification_seconds', channel='sms')[0], 2)
+        self.assertEqual(self.metrics.counter('pager_notification_errors_total', channel='sms'), 1)
+        self.assertEqual(self.metrics.counter('pager_transitions_total', event='timeout'), 1)
+        self.assertEqual(self.metrics.counter('pager_handler_errors_total', handler='handle_timeout'), 1)
+        self.assertEqual(self.metrics.histogram('pager_handler_seconds', handler='handle_alert')[0], 1)
+
+    def test_async_handlers_and_profiling_hook(self):
+        profiler = CProfileHook(sample_every=1)
+        pager = AsyncServicePager(
+            timer_system=AsyncTimerServiceAdapter(MagicMock(), blocking=False),
+            escalation_system=AsyncEscalationPolicyServiceAdapter(self.escalation, blocking=False),
+            mail_system=AsyncMailServiceAdapter(self.mail, blocking=False),
+            sms_system=AsyncSMSServiceAdapter(self.sms, blocking=False),
+            repository=AsyncMonitoredServiceRepositoryAdapter(self.repository, blocking=False),
+            metrics=self.metrics
+        )
+        instrument_handlers(pager, self.metrics, profiler)
+        asyncio.run(pager.handle_alerts([('service-1', 'Down!'), ('service-2', 'Down!')]))
+
+        self.assertEqual(self.metrics.counter('pager_transitions_total', event='alert'), 2)
+        self.assertEqual(self.metrics.histogram('pager_handler_seconds', handler='handle_alerts')[0], 1)
+        self.assertEqual(profiler.samples, {'handle_alerts': 1})
+        self.assertIn('handle_alerts', profiler.report())
+
+    def test_profiler_is_off_while_a_handler_awaits(self):
+        profiler = CProfileHook(sample_every=1)
+        pager = instrument_handlers(SleepingPager(), self.metrics, profiler)
+
+        async def run():
+            handled = asyncio.ensure_future(pager.handle_alert('service-1', 'Down!'))
+            while not handled.done():
+                busy_neighbour()
+                await asyncio.sleep(0.001)
+            return handled.result()
+
+        self.assertEqual(asyncio.run(run()), 'DOWN!')
+        report = profiler.report(limit=100)
+        self.assertIn('parse_alert', report)
+        self.assertNotIn('busy_neighbour', report)
+
+    def test_disabled_metrics_wrap_nothing(self):
+        pager = ServicePager(
+            timer_system=MagicMock(),
+            escalation_system=self.escalation,
+            mail_system=self.mail,
+            sms_system=self.sms,
+            repository=self.repository
+        )
+        self.assertEqual(pager.handle_alert.__func__, ServicePager.handle_alert)
+        pager.handle_alert('service-1', 'Down!')
+        # A no-op sink is available for callers that always expect metrics
+        self.build_pager(NullMetrics()).handle_timeout('service-1')
+        self.assertEqual(self.repository.get('service-1').current_level, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,119 @@
+import asyncio
+import time
+import unittest
+from unittest.mock import MagicMock
+import sys, os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+from domain.services.notification_dispatcher import NotificationDispatcher
+from domain.services.pager_service import ServicePager
+from infrastructure.prometheus_metrics import PrometheusMetrics
+from domain.models.monitored_service import MonitoredService
+from domain.models.level import Level
+from domain.models.email_target import EmailTarget
+from domain.models.sms_target import SMSTarget
+from domain.models.escalation_policy import EscalationPolicy
+
+
+def slow(seconds):
+    return MagicMock(side_effect=lambda *args: time.sleep(seconds))
+
+
+class TestNotificationDispatcher(unittest.TestCase):
+    def setUp(self):
+        self.service = MonitoredService('service-1')
+        self.policy = EscalationPolicy([
+            Level(0, [
+                EmailTarget('demoA@aircall.com'),
+                EmailTarget('demoB@aircall.com'),
+                SMSTarget('+33600000000'),
+                SMSTarget('+33600000001'),
+            ])
+        ])
+        repo_mock = MagicMock()
+        repo_mock.get.return_value = self.service
+        escalation_mock = MagicMock()
+        escalation_mock.get.return_value = self.policy
+        self.dispatcher = NotificationDispatcher(timeout=1.0)
+        self.pager = ServicePager(
+            timer_system=MagicMock(),
+            escalation_system=escalation_mock,
+            mail_system=MagicMock(),
+            sms_system=MagicMock(),
+            repository=repo_mock,
+            notifier=self.dispatcher
+        )
+        self.service.load_policy(self.pager.context)
+        self.service.set_unhealthy('Down!')
+
+    def tearDown(self):
+        self.dispatcher.close()
+
+    def test_targets_are_notified_in_parallel(self):
+        self.pager.mail_service.notify = slow(0.2)
+        self.pager.sms_service.notify = slow(0.2)
+
+        started = time.perf_counter()
+        results = self.dispatcher.notify(self.service)
+        elapsed = time.perf_counter() - started
+
+        self.assertTrue(all(result.delivered for result in results))
+        self.assertEqual([result.channel for result in results], ['mail', 'mail', 'sms', 'sms'])
+        self.assertLess(elapsed, 0.6)
+
+    def test_channel_concurrency_limit(self):
+        dispatcher = NotificationDispatcher(channel_limits={'mail': 1, 'sms': 1})
+        self.pager.mail_service.notify = slow(0.1)
+        self.pager.sms_service.notify = slow(0.1)
+
+        started = time.perf_counter()
+        dispatcher.notify(self.service)
+        dispatcher.close()
+
+        self.assertGreaterEqual(time.perf_counter() - started, 0.2)
+
+    def test_failures_and_timeouts_are_reported(self):
+        self.dispatcher.timeout = 0.1
+        self.pager.mail_service.notify = MagicMock(side_effect=ConnectionError("SMTP down"))
+        self.pager.sms_service.notify = slow(0.5)
+
+        results = self.dispatcher.notify(self.service)
+
+        self.assertFalse(any(result.delivered for result in results))
+        self.assertIsInstance(results[0].error, ConnectionError)
+        self.assertIsInstance(results[2].error, TimeoutError)
+
+    def test_async_dispatch(self):
+        self.pager.mail_service.notify = slow(0.2)
+        self.pager.sms_service.notify = MagicMock(side_effect=ConnectionError("SMS provider down"))
+
+        results = asyncio.run(self.dispatcher.dispatch(self.service))
+
+        self.assertEqual([result.delivered for result in results], [True, True, False, False])
+
+    def test_pager_uses_dispatcher(self):
+        service = MonitoredService('service-2')
+        self.pager.repository.get.return_value = service
+
+        self.pager.handle_alert(service.id, 'Down!')
+
+        self.assertEqual(self.pager.mail_service.notify.call_count, 2)
+        self.assertEqual(self.pager.sms_service.notify.call_count, 2)
+
+    def test_pager_reports_failed_deliveries(self):
+        service = MonitoredService('service-2')
+        self.pager.repository.get.return_value = service
+        self.pager.metrics = PrometheusMetrics()
+        self.pager.sms_service.notify = MagicMock(side_effect=ConnectionError("SMS provider down"))
+
+        with self.assertLogs('domain.services.pager_service', level='ERROR') as logs:
+            self.pager.handle_alert(service.id, 'Down!')
+
+        self.assertEqual(len(logs.records), 2)
+        self.assertIn("'+33600000000'", logs.output[0])
+        self.assertEqual(self.pager.metrics.counter('pager_delivery_failures_total', channel='sms'), 2)
+        self.assertEqual(self.pager.metrics.counter('pager_delivery_failures_total', channel='mail'), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+import unittest
+from unittest.mock import MagicMock
+import sys, os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+from domain.services.pager_service import ServicePager
+from infrastructure.in_memory_monitored_service_repository import InMemoryMonitoredServiceRepository
+from domain.models.monitored_service import MonitoredService
+from domain.models.level import Level
+from domain.models.email_target import EmailTarget
+from domain.models.sms_target import SMSTarget
+from domain.models.escalation_policy import EscalationPolicy
+
+
+def build_policy():
+    return EscalationPolicy([
+        Level(0, [EmailTarget('demoA@aircall.com'), SMSTarget('+33600000000')]),
+        Level(1, [EmailTarget('demoB@aircall.com')]),
+    ])
+
+
+class TestPagerContext(unittest.TestCase):
+    def build_pager(self):
+        escalation_mock = MagicMock()
+        escalation_mock.get.side_effect = lambda service_id: build_policy()
+        return ServicePager(
+            timer_system=MagicMock(),
+            escalation_system=escalation_mock,
+            mail_system=MagicMock(),
+            sms_system=MagicMock(),
+            repository=InMemoryMonitoredServiceRepository([MonitoredService('service-1')])
+        )
+
+    def test_pagers_do_not_share_their_senders(self):
+        first = self.build_pager()
+        second = self.build_pager()
+
+        first.handle_alert('service-1', 'Down!')
+        # Built after the first pager: a global registry would now point at its senders
+        third = self.build_pager()
+        second.handle_alert('service-1', 'Down too!')
+        first.handle_timeout('service-1')
+
+        self.assertEqual(first.mail_service.notify.call_count, 2)
+        self.assertEqual(first.sms_service.notify.call_count, 1)
+        self.assertEqual(second.mail_service.notify.call_count, 1)
+        self.assertEqual(second.sms_service.notify.call_count, 1)
+        self.assertEqual(second.mail_service.notify.call_args[0][2], 'Down too!')
+        third.mail_service.notify.assert_not_called()
+
+    def test_senders_are_bound_into_the_compiled_targets(self):
+        pager = self.build_pager()
+        pager.handle_alert('service-1', 'Down!')
+        service = pager.repository.get('service-1')
+        service.load_policy(pager.context)
+
+        deliveries = service.current_deliveries()
+        self.assertEqual([sender for _, sender in deliveries], [pager.mail_service, pager.sms_service])
+        self.assertEqual([target for target, _ in deliveries], list(service.current_targets()))
+
+    def test_unbound_channel_is_reported(self):
+        service = MonitoredService('service-1')
+        # No compiler given: nothing is bound
+        service.attach_policy(build_policy())
+        service.set_unhealthy('Down!')
+        with self.assertRaises(ValueError):
+            service.notify()
+
+
+if __name__ == "__main__":
+    unittest.main()
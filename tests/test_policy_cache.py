@@ -0,0 +1,100 @@
+import unittest
+from unittest.mock import MagicMock
+import sys, os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+from infrastructure.cached_escalation_policy_service import CachedEscalationPolicyService
+from domain.services.pager_service import ServicePager
+from domain.models.monitored_service import MonitoredService
+from domain.models.level import Level
+from domain.models.email_target import EmailTarget
+from domain.models.escalation_policy import EscalationPolicy
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestCachedEscalationPolicyService(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.remote = MagicMock()
+        self.remote.get.side_effect = lambda service_id: EscalationPolicy([Level(0, [])], version=1)
+        self.cache = CachedEscalationPolicyService(self.remote, max_size=2, ttl_seconds=60, clock=self.clock)
+
+    def test_hits_and_misses(self):
+        policy = self.cache.get('service-1')
+        self.assertIs(self.cache.get('service-1'), policy)
+        self.assertEqual(self.remote.get.call_count, 1)
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+
+    def test_ttl(self):
+        self.cache.get('service-1')
+        self.clock.now = 60
+        self.cache.get('service-1')
+        self.assertEqual(self.remote.get.call_count, 2)
+        self.assertEqual(self.cache.expirations, 1)
+
+    def test_lru_eviction(self):
+        self.cache.get('service-1')
+        self.cache.get('service-2')
+        self.cache.get('service-1')
+        self.cache.get('service-3')
+
+        # service-2 was the least recently used
+        self.assertEqual(self.cache.evictions, 1)
+        self.cache.get('service-1')
+        self.cache.get('service-2')
+        self.assertEqual(self.remote.get.call_count, 4)
+
+    def test_invalidation_by_version(self):
+        self.cache.get('service-1')
+
+        # Already up to date
+        self.assertFalse(self.cache.invalidate('service-1', version=1))
+        self.assertTrue(self.cache.invalidate('service-1', version=2))
+
+        # The EP Service still serves the old version: it is not cached
+        self.cache.get('service-1')
+        self.cache.get('service-1')
+        self.assertEqual(self.remote.get.call_count, 3)
+
+        self.remote.get.side_effect = lambda service_id: EscalationPolicy([Level(0, [])], version=2)
+        self.cache.get('service-1')
+        self.cache.get('service-1')
+        self.assertEqual(self.remote.get.call_count, 4)
+
+    def test_timeout_chain_fetches_policy_once(self):
+        service = MonitoredService('service-1')
+        repository = MagicMock()
+        repository.get.return_value = service
+        self.remote.get.side_effect = None
+        self.remote.get.return_value = EscalationPolicy([
+            Level(0, [EmailTarget('demoA@aircall.com')]),
+            Level(1, [EmailTarget('demoB@aircall.com')]),
+            Level(2, [EmailTarget('demoC@aircall.com')]),
+        ])
+        pager = ServicePager(
+            timer_system=MagicMock(),
+            escalation_system=self.cache,
+            mail_system=MagicMock(),
+            sms_system=MagicMock(),
+            repository=repository
+        )
+
+        pager.handle_alert(service.id, 'Down!')
+        pager.handle_timeout(service.id)
+        pager.handle_timeout(service.id)
+
+        self.assertEqual(service.current_level, 2)
+        self.assertEqual(self.remote.get.call_count, 1)
+        # Timeouts reuse the policy of the incident, the cache is not even asked
+        self.assertEqual(self.cache.hits, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,78 @@
+import unittest
+from unittest.mock import MagicMock
+import sys, os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+from domain.services.policy_compiler import PolicyCompiler
+from domain.services.pager_context import PagerContext
+from domain.models.compiled_policy import CompiledPolicy
+from domain.models.monitored_service import MonitoredService
+from domain.models.level import Level
+from domain.models.email_target import EmailTarget
+from domain.models.sms_target import SMSTarget
+from domain.models.escalation_policy import EscalationPolicy
+
+
+def build_policy(version=0):
+    return EscalationPolicy([
+        Level(0, [EmailTarget('demoA@aircall.com'), SMSTarget('+33600000000'), EmailTarget('demoB@aircall.com')]),
+        Level(1, [SMSTarget('+33600000001')]),
+    ], version)
+
+
+class TestPolicyCompiler(unittest.TestCase):
+    def setUp(self):
+        self.compiler = PolicyCompiler()
+
+    def test_compiled_form(self):
+        compiled = self.compiler.compile(build_policy())
+
+        self.assertIsInstance(compiled.levels, tuple)
+        self.assertEqual(compiled.last_level, 1)
+        first = compiled.levels[0]
+        self.assertEqual([channel for channel, _ in first.channels], ['mail', 'sms'])
+        self.assertEqual([target.email for target in first.channels[0][1]], ['demoA@aircall.com', 'demoB@aircall.com'])
+        with self.assertRaises(AttributeError):
+            compiled.last_level = 3
+        # Compiling is idempotent
+        self.assertIs(self.compiler.compile(compiled), compiled)
+
+    def test_identical_policies_are_shared(self):
+        first = self.compiler.compile(build_policy())
+        second = self.compiler.compile(build_policy(version=3))
+        self.assertIs(first, second)
+        self.assertEqual(len(self.compiler), 1)
+
+        other = self.compiler.compile(EscalationPolicy([Level(0, [EmailTarget('demoA@aircall.com')])]))
+        self.assertIsNot(other, first)
+        # Equal targets are shared across policies
+        self.assertIs(other.levels[0].targets[0], first.levels[0].targets[0])
+
+    def test_edited_policy_is_compiled_again(self):
+        policy = build_policy()
+        compiled = self.compiler.compile(policy)
+        self.assertIs(self.compiler.compile(policy), compiled)
+
+        policy.levels.pop()
+        policy.version += 1
+        self.assertEqual(self.compiler.compile(policy).last_level, 0)
+
+    def test_load_policy_attaches_the_compiled_form(self):
+        escalation_mock = MagicMock()
+        escalation_mock.get.side_effect = lambda service_id: build_policy()
+        context = PagerContext(escalation_mock, {'mail': MagicMock(), 'sms': MagicMock()})
+
+        services = [MonitoredService(f'service-{i}') for i in range(3)]
+        for service in services:
+            service.load_policy(context)
+        self.assertIsInstance(services[0].policy, CompiledPolicy)
+        self.assertTrue(all(service.policy is services[0].policy for service in services))
+
+        service = services[0]
+        self.assertTrue(service.escalate())
+        self.assertFalse(service.escalate())
+        self.assertEqual(service.current_level, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,236 @@
+import threading
+import time
+import unittest
+from concurrent.futures import Future
+from unittest.mock import MagicMock
+import sys, os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+from infrastructure.fake_resp_server import FakeRespServer
+from infrastructure.redis_timer_service import SCRIPTS, RedisTimerService
+from infrastructure.resp_client import RespClient, RespError
+from infrastructure.in_memory_monitored_service_repository import InMemoryMonitoredServiceRepository
+from domain.services.pager_service import ServicePager
+from domain.models.monitored_service import MonitoredService
+from domain.models.level import Level
+from domain.models.email_target import EmailTarget
+from domain.models.escalation_policy import EscalationPolicy
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1_700_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestRespClient(unittest.TestCase):
+    def setUp(self):
+        self.server = FakeRespServer(scripts=SCRIPTS).start()
+        self.client = RespClient(*self.server.address)
+
+    def tearDown(self):
+        self.client.close()
+        self.server.stop()
+
+    def test_sorted_set_commands(self):
+        self.assertEqual(self.client.execute('PING'), 'PONG')
+        replies = self.client.pipeline([
+            ('ZADD', 'timeouts', 30, 'service-2'),
+            ('ZADD', 'timeouts', 10.5, 'service-1'),
+            ('ZADD', 'timeouts', 'NX', 99, 'service-1'),
+            ('ZRANGEBYSCORE', 'timeouts', '-inf', 30, 'WITHSCORES'),
+            ('ZRANGEBYSCORE', 'timeouts', '(10.5', '+inf', 'LIMIT', 0, 1),
+            ('ZREM', 'timeouts', 'service-1', 'service-3'),
+            ('ZSCORE', 'timeouts', 'service-1'),
+        ])
+        self.assertEqual(replies, [1, 1, 0, ['service-1', '10.5', 'service-2', '30'], ['service-2'], 1, None])
+
+    def test_error_replies_are_raised(self):
+        with self.assertRaises(RespError):
+            self.client.execute('GETDEL', 'timeouts')
+        # The connection is still usable
+        self.assertEqual(self.client.execute('ZCARD', 'timeouts'), 0)
+
+
+class TestRedisTimerService(unittest.TestCase):
+    def setUp(self):
+        self.server = FakeRespServer(scripts=SCRIPTS).start()
+        self.clock = FakeClock()
+        self.clients = []
+
+    def tearDown(self):
+        for client in self.clients:
+            client.close()
+        self.server.stop()
+
+    def build_timer(self, **kwargs) -> RedisTimerService:
+        client = RespClient(*self.server.address)
+        self.clients.append(client)
+        return RedisTimerService(client, clock=self.clock, **kwargs)
+
+    def test_timeouts_expire_once(self):
+        timer = self.build_timer()
+        timer.add_timeout('service-1', 15)
+        timer.add_timeout('service-2', 15)
+        timer.add_timeout('service-2', 30)
+        self.assertTrue(timer.cancel_timeout('service-1'))
+        timer.add_timeout('service-3', 5)
+
+        self.assertEqual(timer.claim(), [])
+        self.clock.now += 15 * 60
+        self.assertEqual(timer.claim(), ['service-3'])
+        self.clock.now += 15 * 60
+        self.assertEqual(timer.claim(), ['service-2'])
+        self.assertEqual(len(timer), 0)
+
+    def test_competing_nodes_claim_each_timeout_once(self):
+        handled = []
+        lock = threading.Lock()
+
+        def on_expire(service_ids):
+            with lock:
+                handled.extend(service_ids)
+
+        nodes = [self.build_timer(on_expire=on_expire, batch_size=16) for _ in range(4)]
+        for i in range(500):
+            nodes[0].add_timeout(f'service-{i}', 0)
+
+        threads = [threading.Thread(target=node.poll) for node in nodes]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(sorted(handled), sorted(f'service-{i}' for i in range(500)))
+        self.assertEqual(self.server.execute('ZCARD', nodes[0].lease_key), 0)
+
+    def test_timeouts_of_a_dead_node_are_taken_over(self):
+        dead, alive = self.build_timer(lease_seconds=60), self.build_timer(lease_seconds=60)
+        dead.add_timeout('service-1', 0)
+        self.assertEqual(dead.claim(), ['service-1'])
+
+        # Leased: nobody else handles it
+        self.assertEqual(alive.poll(), 0)
+        self.clock.now += 61
+        alive.on_expire = MagicMock(return_value=None)
+        self.assertEqual(alive.poll(), 1)
+        alive.on_expire.assert_called_once_with(['service-1'])
+
+    def test_stale_listing_does_not_claim_a_rearmed_timeout(self):
+        node = self.build_timer()
+        node.add_timeout('service-1', 0)
+        # Listed as due, but re-armed by another node before the lease is taken
+        original = node.client.pipeline
+
+        def rearm_first(commands):
+            self.server.execute('ZADD', node.key, self.clock() + 900, 'service-1')
+            node.client.pipeline = original
+            return original(commands)
+
+        node.client.pipeline = rearm_first
+        self.assertEqual(node.claim(), [])
+        self.assertTrue(node.pending('service-1'))
+        self.assertEqual(self.server.execute('ZCARD', node.lease_key), 0)
+
+    def test_timeout_rearmed_once_leased_is_kept(self):
+        node = self.build_timer()
+        node.add_timeout('service-1', 0)
+        original = node.client.pipeline
+
+        def rearm_after_leasing(commands):
+            replies = original(commands)
+            # Re-armed between the lease and the removal from the pending set
+            self.server.execute('ZADD', node.key, self.clock() + 900, 'service-1')
+            node.client.pipeline = original
+            return replies
+
+        node.client.pipeline = rearm_after_leasing
+        self.assertEqual(node.claim(), [])
+        self.assertEqual(float(self.server.execute('ZSCORE', node.key, 'service-1')), self.clock() + 900)
+        self.assertEqual(self.server.execute('ZCARD', node.lease_key), 0)
+
+    def test_leases_are_released_once_the_timeouts_are_handled(self):
+        def on_expire(service_ids):
+            futures = [Future() for _ in service_ids]
+            for service_id, future in zip(service_ids, futures):
+                if service_id == 'service-2':
+                    future.set_exception(RuntimeError('Shard down'))
+                else:
+                    future.set_result(None)
+            return futures
+
+        node = self.build_timer(on_expire=on_expire, lease_seconds=60)
+        for i in range(3):
+            node.add_timeout(f'service-{i}', 0)
+        with self.assertLogs('infrastructure.redis_timer_service', 'ERROR'):
+            self.assertEqual(node.poll(), 2)
+        # The failed timeout stays leased, then is pending again
+        self.assertEqual(self.server.execute('ZRANGEBYSCORE', node.lease_key, '-inf', '+inf'), ['service-2'])
+        self.clock.now += 61
+        node.on_expire = MagicMock(return_value=None)
+        self.assertEqual(node.poll(), 1)
+        node.on_expire.assert_called_once_with(['service-2'])
+
+    def test_leases_are_extended_while_the_timeouts_are_handled(self):
+        handling = threading.Event()
+        future = Future()
+
+        def on_expire(service_ids):
+            handling.set()
+            return [future for _ in service_ids]
+
+        node = self.build_timer(on_expire=on_expire, lease_seconds=60, renew_every=0.01)
+        other = self.build_timer(lease_seconds=60)
+        node.add_timeout('service-1', 0)
+        poller = threading.Thread(target=node.poll)
+        poller.start()
+        self.assertTrue(handling.wait(5))
+
+        # Past the initial lease: still leased by the node handling it
+        self.clock.now += 50
+        time.sleep(0.1)
+        self.clock.now += 30
+        other.on_expire = MagicMock(return_value=None)
+        self.assertEqual(other.poll(), 0)
+        other.on_expire.assert_not_called()
+
+        future.set_result(None)
+        poller.join(5)
+        self.assertEqual(self.server.execute('ZCARD', node.lease_key), 0)
+
+    def test_scripts_are_loaded_on_first_use(self):
+        node = self.build_timer()
+        node.add_timeout('service-1', 0)
+        self.assertEqual(node.claim(), ['service-1'])
+        node.add_timeout('service-2', 0)
+        commands = self.server.commands
+        self.assertEqual(node.claim(), ['service-2'])
+        # Listing, leases, then the cached script by its SHA
+        self.assertEqual(self.server.commands - commands, 3)
+
+    def test_escalates_through_the_pager(self):
+        timer = self.build_timer()
+        pager = ServicePager(
+            timer_system=timer,
+            escalation_system=MagicMock(get=MagicMock(return_value=EscalationPolicy([
+                Level(0, [EmailTarget('demoA@aircall.com')]),
+                Level(1, [EmailTarget('demoB@aircall.com')]),
+            ]))),
+            mail_system=MagicMock(),
+            sms_system=MagicMock(),
+            repository=InMemoryMonitoredServiceRepository([MonitoredService('service-1')])
+        )
+        timer.on_expire = pager.handle_timeouts
+        pager.handle_alert('service-1', 'Down!')
+
+        self.clock.now += 15 * 60
+        self.assertEqual(timer.poll(), 1)
+        self.assertEqual(pager.repository.get('service-1').current_level, 1)
+        # Re-armed by the escalation
+        self.assertTrue(timer.pending('service-1'))
+
+
+if __name__ == "__main__":
+    unittest.main()
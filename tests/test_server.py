@@ -0,0 +1,159 @@
+import asyncio
+import json
+import os
+import shutil
+import tempfile
+import time
+import unittest
+import sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(os.path.join(ROOT, 'src'))
+
+try:
+    from fastapi.testclient import TestClient
+    from starlette.background import BackgroundTask
+except ImportError:
+    TestClient = None
+
+# The server composes its adapters on import, from the environment, and is started once
+directory = None
+server = None
+client = None
+
+
+def setUpModule():
+    global directory, server, client
+    if TestClient is None:
+        return
+    directory = tempfile.mkdtemp()
+    policies = os.path.join(directory, 'policies.json')
+    with open(policies, 'w', encoding='utf-8') as f:
+        json.dump({
+            f'service-{i}': [{'level': 0, 'targets': [{'email': 'oncall@aircall.com'}]}] for i in range(3)
+        }, f)
+    os.environ.update({
+        'PAGER_LOG_DIR': os.path.join(directory, 'log'),
+        'PAGER_DB_PATH': os.path.join(directory, 'pager.db'),
+        'PAGER_POLICIES': policies,
+        'PAGER_METRICS': '0',
+        'PAGER_SHARDS': '2',
+    })
+    sys.path.append(ROOT)
+    import server as server_module
+    server = server_module
+    client = TestClient(server.app)
+    client.__enter__()
+
+
+def tearDownModule():
+    if client is not None:
+        client.__exit__(None, None, None)
+    if directory is not None:
+        shutil.rmtree(directory)
+
+
+@unittest.skipIf(TestClient is None, "fastapi is not installed")
+class TestServer(unittest.TestCase):
+    def test_services_of_the_policy_file_are_registered(self):
+        self.assertEqual(client.post('/alert', json={'service_id': 'service-0', 'message': 'Down!'}).status_code, 200)
+        self.assertEqual(client.post('/acknowledge/service-0').status_code, 200)
+        self.assertEqual(client.post('/health/service-0').status_code, 200)
+
+        [incident] = client.get('/incidents', params={'service_id': 'service-0'}).json()
+        self.assertIsNotNone(incident['resolved_at'])
+
+    def test_unknown_services_are_not_found(self):
+        response = client.post('/alert', json={'service_id': 'unknown', 'message': 'Down!'})
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(client.post('/health/unknown').status_code, 404)
+        self.assertEqual(client.post('/acknowledge/unknown').status_code, 404)
+
+        self.assertEqual(client.post('/services/service-9').json(), {'message': 'Service registered'})
+        self.assertEqual(client.post('/services/service-9').json(), {'message': 'Service already registered'})
+        self.assertEqual(client.post('/health/service-9').status_code, 200)
+        # Registered, but the policy file has no policy for it
+        response = client.post('/alert', json={'service_id': 'service-9', 'message': 'Down!'})
+        self.assertEqual((response.status_code, response.json()['detail']), (404, "Missing policy for service 'service-9'"))
+
+    def test_unknown_services_of_a_batch_are_reported(self):
+        response = client.post('/alerts', json=[
+            {'service_id': 'service-2', 'message': 'Down!'},
+            {'service_id': 'unknown', 'message': 'Down!'},
+        ])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.json()['alerted'], response.json()['missing']), (['service-2'], ['unknown']))
+        self.assertEqual(client.post('/health/service-2').status_code, 200)
+
+    def test_tenants_have_their_own_delivery_lanes(self):
+        response = client.post('/tenants/team-a/alert', json={'service_id': 'service-0', 'message': 'Down!'})
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNot(server.tenant_host.pager('team-a').notifier, server.delivery_service)
+        self.assertEqual(client.post('/tenants/team-a/health/service-0').status_code, 200)
+        self.assertEqual(client.post('/tenants/..%2Fx/health/service-0').status_code, 404)
+
+    def wait_for_status(self, service_id: str, status: str):
+        deadline = time.monotonic() + 5
+        while server.repository.get(service_id).status != status and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(server.repository.get(service_id).status, status)
+
+    def test_stream_acknowledges_a_chunked_upload(self):
+        def chunks():
+            # Lines span chunks, the last one has no newline
+            yield b'{"type": "alert", "service_id": "service-1", "message": "Down!"}\n{"type": "ale'
+            yield b'rt", "service_id": "service-2", "message": "Down!"}\nnot json\n'
+            yield b'{"type": "healthy", "service_id": "service-1"}\n{"type": "healthy", "service_id": "service-2"}'
+
+        response = client.post('/stream', content=chunks(), headers={'Content-Type': 'application/x-ndjson'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers['content-type'], 'application/x-ndjson')
+        acks = [json.loads(line) for line in response.text.splitlines()]
+        self.assertEqual([ack['batch'] for ack in acks], list(range(1, len(acks) + 1)))
+        self.assertEqual(sum(ack['events'] for ack in acks), 5)
+        self.assertEqual(sum(ack['accepted'] for ack in acks), 4)
+        self.assertEqual([error for ack in acks for error in ack['errors']], [{'line': 3, 'error': 'Malformed JSON'}])
+        self.assertEqual(server.repository.get('service-2').status, 'healthy')
+
+    def test_stream_over_websocket(self):
+        with client.websocket_connect('/stream') as websocket:
+            websocket.send_text('{"type": "alert", "service_id": "service-1", "message": "Down!"}')
+            first = websocket.receive_json()
+            websocket.send_text('{"type": "healthy", "service_id": "service-1"}\n{"type": "healthy", "service_id": "unknown"}\n')
+            second = websocket.receive_json()
+
+        self.assertEqual(first, {'batch': 1, 'events': 1, 'accepted': 1, 'errors': []})
+        self.assertEqual(second, {'batch': 2, 'events': 2, 'accepted': 1, 'errors': [
+            {'line': 3, 'error': "Missing service 'unknown'"},
+        ]})
+        self.assertEqual(server.repository.get('service-1').status, 'healthy')
+
+    def test_events_of_a_disconnected_websocket_are_processed(self):
+        with client.websocket_connect('/stream') as websocket:
+            websocket.send_text('{"type": "alert", "service_id": "service-2", "message": "Down!"}')
+        # Gone without reading the acknowledgement
+        self.wait_for_status('service-2', 'unhealthy')
+        self.assertEqual(client.post('/health/service-2').status_code, 200)
+
+    def test_duplex_response_runs_background_tasks(self):
+        ran = []
+        sent = []
+
+        async def body():
+            yield '{"batch": 1}\n'
+
+        async def send(message):
+            sent.append(message)
+
+        async def receive():
+            raise AssertionError("The request body is left to the handler")
+
+        response = server.DuplexStreamingResponse(body(), background=BackgroundTask(ran.append, True))
+        asyncio.run(response({'type': 'http', 'asgi': {'version': '3.0'}}, receive, send))
+        self.assertEqual([message['type'] for message in sent],
+                         ['http.response.start', 'http.response.body', 'http.response.body'])
+        self.assertEqual(ran, [True])
+
+
+if __name__ == "__main__":
+    unittest.main()
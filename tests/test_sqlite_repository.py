@@ -0,0 +1,84 @@
+import tempfile
+import unittest
+from unittest.mock import MagicMock
+import sys, os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+from infrastructure.sqlite_monitored_service_repository import SQLiteMonitoredServiceRepository
+from domain.services.pager_service import ServicePager
+from domain.models.monitored_service import MonitoredService
+from domain.models.level import Level
+from domain.models.email_target import EmailTarget
+from domain.models.escalation_policy import EscalationPolicy
+
+
+class TestSQLiteMonitoredServiceRepository(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'pager.db')
+        self.repository = SQLiteMonitoredServiceRepository(self.path)
+
+    def tearDown(self):
+        self.repository.close()
+        self.directory.cleanup()
+
+    def test_save_and_get(self):
+        service = MonitoredService('service-1')
+        service.set_unhealthy('Down!')
+        service.current_level = 2
+        self.repository.save(service)
+
+        stored = self.repository.get('service-1')
+        self.assertEqual(stored.status, 'unhealthy')
+        self.assertEqual(stored.alert_msg, 'Down!')
+        self.assertEqual(stored.current_level, 2)
+        self.assertFalse(stored.acknowledged)
+        self.assertIsNone(self.repository.get('unknown'))
+
+    def test_bulk_methods(self):
+        services = [MonitoredService(f'service-{i}') for i in range(1200)]
+        self.repository.save_many(services)
+
+        found = self.repository.get_many([f'service-{i}' for i in range(0, 1300, 3)])
+        self.assertEqual(len(found), 400)
+        self.assertEqual(found['service-3'].status, 'healthy')
+
+        services[3].set_acknowledged()
+        self.repository.save_many([services[3]])
+        self.assertTrue(self.repository.get_many(['service-3'])['service-3'].acknowledged)
+
+    def test_committed_state_survives_reopening(self):
+        service = MonitoredService('service-1')
+        service.set_unhealthy('Down!')
+        self.repository.save(service)
+        self.repository.close()
+
+        self.repository = SQLiteMonitoredServiceRepository(self.path)
+        self.assertEqual(self.repository.get('service-1').status, 'unhealthy')
+
+    def test_pager_with_sqlite(self):
+        self.repository.save_many([MonitoredService('service-1'), MonitoredService('service-2')])
+        escalation_mock = MagicMock()
+        escalation_mock.get.return_value = EscalationPolicy([
+            Level(0, [EmailTarget('demoA@aircall.com')]),
+            Level(1, [EmailTarget('demoB@aircall.com')])
+        ])
+        pager = ServicePager(
+            timer_system=MagicMock(),
+            escalation_system=escalation_mock,
+            mail_system=MagicMock(),
+            sms_system=MagicMock(),
+            repository=self.repository
+        )
+
+        pager.handle_alerts([('service-1', 'Down!'), ('service-2', 'Slow!')])
+        pager.handle_timeouts(['service-1'])
+        pager.handle_acknowledge('service-2')
+
+        self.assertEqual(self.repository.get('service-1').current_level, 1)
+        self.assertTrue(self.repository.get('service-2').acknowledged)
+        self.assertEqual(pager.mail_service.notify.call_count, 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,182 @@
+import asyncio
+import unittest
+from unittest.mock import AsyncMock, MagicMock
+import sys, os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+from domain.services import incident_state_machine as fsm
+from domain.services.policy_compiler import PolicyCompiler
+from domain.services.pager_service import ServicePager
+from domain.services.async_pager_service import AsyncServicePager
+from domain.models.monitored_service import MonitoredService
+from domain.models.level import Level
+from domain.models.email_target import EmailTarget
+from domain.models.sms_target import SMSTarget
+from domain.models.escalation_policy import EscalationPolicy
+from infrastructure.in_memory_monitored_service_repository import InMemoryMonitoredServiceRepository
+from infrastructure.sqlite_monitored_service_repository import SQLiteMonitoredServiceRepository
+from infrastructure.async_adapters import AsyncMonitoredServiceRepositoryAdapter
+
+
+def build_policy():
+    return EscalationPolicy([
+        Level(0, [EmailTarget('demoA@aircall.com')], delay_minutes=5),
+        Level(1, [SMSTarget('+33600000000')], delay_minutes=30),
+        Level(2, [EmailTarget('demoB@aircall.com')]),
+    ])
+
+
+class TestIncidentStateMachine(unittest.TestCase):
+    def test_every_event_is_handled_in_every_state(self):
+        for state in (fsm.HEALTHY, fsm.ALERTING, fsm.ACKNOWLEDGED):
+            for event in (fsm.ALERT, fsm.ACKNOWLEDGE, fsm.RECOVER, fsm.TIMEOUT):
+                self.assertIn((state, event), fsm.TRANSITIONS)
+
+    def test_transitions(self):
+        service = MonitoredService('service-1')
+        service.attach_policy(build_policy(), PolicyCompiler())
+        self.assertEqual(fsm.state_of(service), fsm.HEALTHY)
+        self.assertEqual(fsm.transition(service, fsm.TIMEOUT), ())
+
+        actions = fsm.transition(service, fsm.ALERT)
+        self.assertTrue(fsm.needs_policy(actions))
+        self.assertTrue(fsm.apply(service, actions, 'Down!'))
+        self.assertEqual(fsm.state_of(service), fsm.ALERTING)
+        self.assertEqual(fsm.transition(service, fsm.ALERT), ())
+
+        # The last level is never escalated past
+        for _ in range(2):
+            self.assertTrue(fsm.apply(service, fsm.transition(service, fsm.TIMEOUT)))
+        self.assertFalse(fsm.apply(service, fsm.transition(service, fsm.TIMEOUT)))
+        self.assertEqual(service.current_level, 2)
+
+        actions = fsm.transition(service, fsm.ACKNOWLEDGE)
+        self.assertFalse(fsm.needs_policy(actions))
+        fsm.apply(service, actions)
+        self.assertEqual(fsm.state_of(service), fsm.ACKNOWLEDGED)
+        self.assertEqual(fsm.transition(service, fsm.TIMEOUT), ())
+
+    def test_heartbeats_and_repeated_acknowledgements_are_no_ops(self):
+        repository = MagicMock(wraps=InMemoryMonitoredServiceRepository([MonitoredService('service-1')]))
+        timer = MagicMock()
+        pager = ServicePager(
+            timer_system=timer,
+            escalation_system=MagicMock(get=MagicMock(return_value=build_policy())),
+            mail_system=MagicMock(),
+            sms_system=MagicMock(),
+            repository=repository
+        )
+        pager.handle_healthy('service-1')
+        pager.handle_alert('service-1', 'Down!')
+        pager.handle_acknowledge('service-1')
+        pager.handle_acknowledge('service-1')
+
+        # Saved by the alert and the first acknowledgement only
+        self.assertEqual(repository.save.call_count, 2)
+        timer.cancel_timeout.assert_called_once_with('service-1')
+
+    def test_delays_are_precomputed(self):
+        compiled = PolicyCompiler().compile(build_policy())
+
+        self.assertEqual([level.delay_minutes for level in compiled.levels], [5, 30, 15])
+
+    def test_delays_are_part_of_the_structure(self):
+        compiler = PolicyCompiler()
+        other = build_policy()
+        other.levels[0].delay_minutes = 10
+        self.assertIsNot(compiler.compile(other), compiler.compile(build_policy()))
+
+
+class TestPerLevelDelays(unittest.TestCase):
+    def setUp(self):
+        self.timer = MagicMock()
+        self.pager = ServicePager(
+            timer_system=self.timer,
+            escalation_system=MagicMock(get=MagicMock(return_value=build_policy())),
+            mail_system=MagicMock(),
+            sms_system=MagicMock(),
+            repository=InMemoryMonitoredServiceRepository([MonitoredService('service-1')])
+        )
+
+    def test_each_level_arms_its_own_delay(self):
+        self.pager.handle_alert('service-1', 'Down!')
+        self.pager.handle_timeouts(['service-1'])
+        self.pager.handle_timeout('service-1')
+        self.assertEqual([call.args for call in self.timer.add_timeout.call_args_list],
+                         [('service-1', 5), ('service-1', 30), ('service-1', 15)])
+
+        # Last level reached: nothing re-armed
+        self.pager.handle_timeout('service-1')
+        self.assertEqual(self.timer.add_timeout.call_count, 3)
+
+        self.pager.handle_acknowledge('service-1')
+        self.timer.cancel_timeout.assert_called_once_with('service-1')
+
+    def test_timeouts_do_not_fetch_the_policy(self):
+        # Stores no policy: services are read back without one
+        repository = SQLiteMonitoredServiceRepository(':memory:')
+        repository.save_many([MonitoredService('service-1')])
+        self.pager.repository = repository
+
+        self.pager.handle_alert('service-1', 'Down!')
+        self.pager.handle_timeout('service-1')
+        self.pager.handle_timeouts(['service-1'])
+        self.assertEqual(repository.get('service-1').current_level, 2)
+        self.assertEqual(self.pager.escalation_service.get.call_count, 1)
+
+        # The policy of the incident is dropped once acknowledged, a new incident fetches the current one
+        self.pager.handle_acknowledge('service-1')
+        self.assertEqual(self.pager.incident_policies, {})
+        self.pager.handle_healthy('service-1')
+        self.pager.handle_alert('service-1', 'Down again!')
+        self.assertEqual(self.pager.escalation_service.get.call_count, 2)
+
+    def test_pagers_share_the_policies_of_open_incidents(self):
+        repository = InMemoryMonitoredServiceRepository([MonitoredService('service-1')])
+        incident_policies = {}
+        async_pager = AsyncServicePager(
+            timer_system=MagicMock(add_timeout=AsyncMock(), cancel_timeout=AsyncMock()),
+            escalation_system=MagicMock(get=AsyncMock(return_value=build_policy())),
+            mail_system=MagicMock(notify=AsyncMock()),
+            sms_system=MagicMock(notify=AsyncMock()),
+            repository=AsyncMonitoredServiceRepositoryAdapter(repository),
+            incident_policies=incident_policies
+        )
+        self.pager.repository = repository
+        self.pager.incident_policies = incident_policies
+        # Read back without their policy, as from a database
+        repository.get('service-1').policy = None
+
+        asyncio.run(async_pager.handle_alert('service-1', 'Down!'))
+        repository.get('service-1').policy = None
+        self.pager.handle_timeout('service-1')
+        self.assertEqual(self.pager.escalation_service.get.call_count, 0)
+        # Notified with the senders of the pager handling the timeout
+        self.pager.sms_service.notify.assert_called_once()
+
+        self.pager.handle_acknowledge('service-1')
+        self.assertEqual(incident_policies, {})
+
+    def test_async_pager_arms_the_same_delays(self):
+        timer = MagicMock(add_timeout=AsyncMock(), cancel_timeout=AsyncMock())
+        pager = AsyncServicePager(
+            timer_system=timer,
+            escalation_system=MagicMock(get=AsyncMock(return_value=build_policy())),
+            mail_system=MagicMock(notify=AsyncMock()),
+            sms_system=MagicMock(notify=AsyncMock()),
+            repository=AsyncMonitoredServiceRepositoryAdapter(InMemoryMonitoredServiceRepository([MonitoredService('service-1')]))
+        )
+
+        async def scenario():
+            await pager.handle_alerts([('service-1', 'Down!')])
+            await pager.handle_timeouts(['service-1'])
+            await pager.handle_healthy('service-1')
+
+        asyncio.run(scenario())
+        self.assertEqual([call.args for call in timer.add_timeout.call_args_list],
+                         [('service-1', 5), ('service-1', 30)])
+        timer.cancel_timeout.assert_awaited_once_with('service-1')
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,144 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import MagicMock
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+from infrastructure.state_snapshot import SnapshotEscalationPolicyService, StateSnapshot, write_snapshot
+from infrastructure.snapshot_monitored_service_repository import SnapshotMonitoredServiceRepository
+from infrastructure.cached_escalation_policy_service import CachedEscalationPolicyService
+from application.interfaces.monitored_service_repository import ConcurrentModificationError
+from domain.services.pager_service import ServicePager
+from domain.models.monitored_service import MonitoredService
+from domain.models.level import Level
+from domain.models.email_target import EmailTarget
+from domain.models.sms_target import SMSTarget
+from domain.models.escalation_policy import EscalationPolicy
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1_700_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+def build_policy(version=0):
+    return EscalationPolicy([
+        Level(0, [EmailTarget('demoA@aircall.com'), SMSTarget('+33600000000')], delay_minutes=5),
+        Level(1, [EmailTarget('demoB@aircall.com')]),
+    ], version)
+
+
+class TestStateSnapshot(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'state.snapshot')
+        self.clock = FakeClock()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_records_are_decoded_one_by_one(self):
+        policy = build_policy(version=4)
+        rows = [
+            (f'service-{i}', ('unhealthy' if i % 3 == 0 else 'healthy', 'Down!' if i % 3 == 0 else '', i % 2 == 0, i % 2, i + 1),
+             (policy, self.clock.now - 10) if i % 2 else None)
+            for i in range(100)
+        ]
+        self.assertEqual(write_snapshot(self.path, reversed(rows), self.clock), 100)
+
+        snapshot = StateSnapshot(self.path)
+        self.assertEqual(len(snapshot), 100)
+        self.assertEqual(snapshot.created_at, self.clock.now)
+        service = snapshot.get('service-42')
+        self.assertEqual((service.status, service.alert_msg, service.acknowledged, service.current_level, service.version),
+                         ('unhealthy', 'Down!', True, 0, 43))
+        self.assertIsNone(snapshot.get('service-100'))
+        self.assertIsNone(snapshot.policy('service-42'))
+        self.assertEqual(snapshot.version('service-7'), 8)
+
+        decoded, fetched_at = snapshot.policy('service-7')
+        self.assertEqual(fetched_at, self.clock.now - 10)
+        self.assertEqual(decoded.version, 4)
+        self.assertEqual([(level.level, level.delay_minutes) for level in decoded.levels], [(0, 5), (1, 15)])
+        self.assertEqual([target.email for target in decoded.levels[0].targets[:1]], ['demoA@aircall.com'])
+        self.assertEqual(decoded.levels[0].targets[1].phone_number, '+33600000000')
+        # Interned: decoded once for every service sharing it
+        self.assertIs(snapshot.policy('service-9')[0], decoded)
+        self.assertEqual([service_id for service_id, _, _ in snapshot.rows()], sorted(row[0] for row in rows))
+        snapshot.close()
+
+    def test_foreign_files_are_rejected(self):
+        with open(self.path, 'wb') as f:
+            f.write(b'{"services": {}}' * 8)
+        with self.assertRaises(ValueError):
+            StateSnapshot(self.path)
+
+
+class TestSnapshotRepository(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'state.snapshot')
+        self.clock = FakeClock()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_restart_from_the_snapshot(self):
+        repository = SnapshotMonitoredServiceRepository(self.path, clock=self.clock)
+        repository.save_many([MonitoredService(f'service-{i}') for i in range(10)])
+        self.assertEqual(repository.write_snapshot(), 10)
+        self.assertEqual(repository.pending(), 0)
+
+        # Saved after the snapshot: kept in the overlay until the next one
+        service = repository.get('service-3')
+        service.set_unhealthy('Down!')
+        repository.save(service)
+        self.assertEqual(repository.pending(), 1)
+        stale = repository.get_many(['service-3'])['service-3']
+        stale.version = 1
+        with self.assertRaises(ConcurrentModificationError):
+            repository.save(stale)
+        repository.stop()
+
+        restarted = SnapshotMonitoredServiceRepository(self.path, clock=self.clock)
+        self.assertEqual(len(restarted), 10)
+        service = restarted.get('service-3')
+        self.assertEqual((service.status, service.alert_msg, service.version), ('unhealthy', 'Down!', 2))
+        self.assertIsNone(restarted.get('service-10'))
+
+    def test_pager_serves_alerts_from_the_snapshot(self):
+        cache = CachedEscalationPolicyService(MagicMock(get=MagicMock(return_value=build_policy())))
+        repository = SnapshotMonitoredServiceRepository(self.path, policies=cache.policies, clock=self.clock)
+        repository.save(MonitoredService('service-1'))
+        cache.get('service-1')
+        repository.write_snapshot()
+
+        # Restarted node: the EP Service is only called once snapshotted policies are too old
+        remote = MagicMock(get=MagicMock(return_value=build_policy()))
+        restarted = SnapshotMonitoredServiceRepository(self.path, clock=self.clock)
+        policies = SnapshotEscalationPolicyService(remote, lambda: restarted.snapshot, max_age_seconds=60, clock=self.clock)
+        mail = MagicMock()
+        pager = ServicePager(
+            timer_system=MagicMock(),
+            escalation_system=policies,
+            mail_system=mail,
+            sms_system=MagicMock(),
+            repository=restarted
+        )
+        pager.handle_alert('service-1', 'Down!')
+        self.assertEqual(mail.notify.call_count, 1)
+        remote.get.assert_not_called()
+        pager.time_service.add_timeout.assert_called_once_with('service-1', 5)
+
+        self.clock.now += 61
+        policies.get('service-1')
+        remote.get.assert_called_once_with('service-1')
+
+
+if __name__ == "__main__":
+    unittest.main()
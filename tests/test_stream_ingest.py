@@ -0,0 +1,122 @@
+import asyncio
+import os
+import threading
+import unittest
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+from domain.services.sharded_event_engine import ShardedEventEngine
+from domain.services.stream_ingest import StreamIngestor, parse_event
+
+
+class RecordingPager:
+    """ Stand-in pager recording the events it handles, blocked while `gate` is cleared """
+    def __init__(self):
+        self.events = []
+        self.lock = threading.Lock()
+        self.gate = threading.Event()
+        self.gate.set()
+
+    def _record(self, event, service_id):
+        self.gate.wait()
+        if service_id == 'missing':
+            raise ValueError("Missing service 'missing'")
+        with self.lock:
+            self.events.append((service_id, event))
+
+    def handle_alert(self, service_id, msg):
+        self._record('alert', service_id)
+
+    def handle_acknowledge(self, service_id):
+        self._record('acknowledge', service_id)
+
+    def handle_healthy(self, service_id):
+        self._record('healthy', service_id)
+
+
+async def chunks_of(payload: bytes, size: int, read: list = None):
+    for start in range(0, len(payload), size):
+        if read is not None:
+            read.append(start)
+        yield payload[start:start + size]
+
+
+class TestStreamIngest(unittest.TestCase):
+    def setUp(self):
+        self.pager = RecordingPager()
+        self.engine = ShardedEventEngine(lambda: self.pager, shards=4)
+        self.engine.start()
+
+    def tearDown(self):
+        self.pager.gate.set()
+        self.engine.stop()
+
+    def ingest(self, ingestor: StreamIngestor, chunks) -> list:
+        async def run():
+            return [ack async for ack in ingestor.ingest(chunks)]
+        return asyncio.run(run())
+
+    def test_events_are_acknowledged_by_batch_in_order(self):
+        lines = []
+        for round in range(5):
+            for i in range(10):
+                lines.append(f'{{"type": "alert", "service_id": "service-{i}", "message": "Down {round}"}}')
+                lines.append(f'{{"type": "acknowledge", "service_id": "service-{i}"}}')
+                lines.append(f'{{"type": "healthy", "service_id": "service-{i}"}}')
+        # Lines span chunks, the last one has no newline
+        acks = self.ingest(StreamIngestor(self.engine, batch_size=7), chunks_of('\n'.join(lines).encode(), 100))
+
+        self.assertEqual([ack['batch'] for ack in acks], list(range(1, len(acks) + 1)))
+        self.assertEqual(sum(ack['accepted'] for ack in acks), 150)
+        self.assertTrue(all(ack['events'] <= 7 and not ack['errors'] for ack in acks))
+        self.assertEqual(
+            [event for service_id, event in self.pager.events if service_id == 'service-3'],
+            ['alert', 'acknowledge', 'healthy'] * 5
+        )
+
+    def test_rejected_lines_are_reported(self):
+        payload = '\n'.join([
+            '{"type": "alert", "service_id": "service-1", "message": "Down!"}',
+            '{"type": "alert", "service_id": "service-1"',
+            '',
+            '{"type": "timeout", "service_id": "service-1"}',
+            '{"type": "healthy", "service_id": "missing"}',
+            '{"service_id": "service-2", "message": "Slow"}',
+        ]) + '\n'
+        [ack] = self.ingest(StreamIngestor(self.engine), chunks_of(payload.encode(), len(payload)))
+
+        self.assertEqual(ack, {'batch': 1, 'events': 5, 'accepted': 2, 'errors': [
+            {'line': 2, 'error': 'Malformed JSON'},
+            {'line': 4, 'error': "Unknown event type 'timeout'"},
+            {'line': 5, 'error': "Missing service 'missing'"},
+        ]})
+        self.assertEqual(sorted(self.pager.events), [('service-1', 'alert'), ('service-2', 'alert')])
+
+    def test_reading_stops_while_batches_are_unacknowledged(self):
+        payload = b''.join(b'{"type": "healthy", "service_id": "service-%d"}\n' % i for i in range(50))
+        read = []
+        self.pager.gate.clear()
+
+        async def run():
+            ingestor = StreamIngestor(self.engine, batch_size=1, max_in_flight=2)
+            acks = ingestor.ingest(chunks_of(payload, len(payload) // 50, read))
+            first = asyncio.ensure_future(acks.__anext__())
+            await asyncio.sleep(0.05)
+            # Two batches submitted, the third one waits for an acknowledgement
+            self.assertEqual(len(read), 3)
+            self.pager.gate.set()
+            return [await first] + [ack async for ack in acks]
+
+        acks = asyncio.run(run())
+        self.assertEqual(sum(ack['accepted'] for ack in acks), 50)
+
+    def test_parse_event(self):
+        self.assertEqual(parse_event(b'{"service_id": "service-1", "message": "Down!"}\r'), ('alert', 'service-1', ('Down!',)))
+        self.assertEqual(parse_event('{"type": "acknowledge", "service_id": "service-1"}'), ('acknowledge', 'service-1', ()))
+        for line in ('[]', '{"type": "alert", "service_id": "service-1"}', '{"type": "healthy"}'):
+            with self.assertRaises(ValueError):
+                parse_event(line)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,183 @@
+import threading
+import unittest
+from unittest.mock import MagicMock
+import sys, os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+from domain.services.fair_queue import TenantQueueFullError, WeightedFairQueue
+from domain.services.tenant_host import TenantHost
+from domain.services.pager_service import ServicePager
+from infrastructure.in_memory_monitored_service_repository import InMemoryMonitoredServiceRepository
+from infrastructure.timing_wheel_timer_service import TimingWheelTimerService
+from domain.models.monitored_service import MonitoredService
+from domain.models.level import Level
+from domain.models.email_target import EmailTarget
+from domain.models.escalation_policy import EscalationPolicy
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestWeightedFairQueue(unittest.TestCase):
+    def drain(self, queue):
+        order = []
+        while queue.pending():
+            order.append(queue.pop(timeout=0)[0])
+        return order
+
+    def test_quiet_tenant_is_not_starved(self):
+        queue = WeightedFairQueue()
+        for i in range(1000):
+            queue.push('noisy', i)
+        queue.push('quiet', 'escalation')
+
+        order = self.drain(queue)
+        self.assertLessEqual(order.index('quiet'), 1)
+        self.assertEqual(len(order), 1001)
+
+    def test_weights_share_a_saturated_queue(self):
+        queue = WeightedFairQueue(weights={'gold': 3})
+        for i in range(300):
+            queue.push('gold', i)
+            queue.push('bronze', i)
+
+        first = self.drain(queue)[:200]
+        self.assertEqual(first.count('gold'), 150)
+        self.assertEqual(first.count('bronze'), 50)
+
+    def test_events_of_a_tenant_stay_in_order(self):
+        queue = WeightedFairQueue()
+        for i in range(5):
+            queue.push('a', i)
+            queue.push('b', i)
+        items = [queue.pop(timeout=0) for _ in range(10)]
+        self.assertEqual([item for tenant, item in items if tenant == 'a'], list(range(5)))
+
+    def test_pending_events_are_bounded_per_tenant(self):
+        queue = WeightedFairQueue(max_pending=2)
+        queue.push('a', 1)
+        queue.push('a', 2)
+        with self.assertRaises(TenantQueueFullError):
+            queue.push('a', 3)
+        queue.push('a', 3, bounded=False)
+        queue.push('b', 1)
+        self.assertEqual(queue.pending('a'), 3)
+
+
+class TestTenantHost(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.timer = TimingWheelTimerService(clock=self.clock)
+        self.mail = {}
+        self.host = TenantHost(self.build_pager, weights={'team-a': 2}, shards=2, timer_service=self.timer)
+
+    def build_pager(self, tenant, timer):
+        if tenant not in ('team-a', 'team-b'):
+            raise ValueError(f"Unknown tenant '{tenant}'")
+        escalation_mock = MagicMock()
+        escalation_mock.get.return_value = EscalationPolicy([
+            Level(0, [EmailTarget(f'first@{tenant}.com')]),
+            Level(1, [EmailTarget(f'second@{tenant}.com')]),
+        ])
+        self.mail[tenant] = MagicMock()
+        return ServicePager(
+            timer_system=timer,
+            escalation_system=escalation_mock,
+            mail_system=self.mail[tenant],
+            sms_system=MagicMock(),
+            repository=InMemoryMonitoredServiceRepository([MonitoredService('service-1')])
+        )
+
+    def tearDown(self):
+        self.host.stop()
+
+    def test_tenants_have_isolated_state(self):
+        self.host.start()
+        self.host.submit('team-a', 'alert', 'service-1', 'Down!').result(5)
+        self.host.submit('team-b', 'alert', 'service-1', 'Down!').result(5)
+        self.host.submit('team-b', 'acknowledge', 'service-1').result(5)
+
+        self.assertFalse(self.host.pager('team-a').repository.get('service-1').acknowledged)
+        self.assertTrue(self.host.pager('team-b').repository.get('service-1').acknowledged)
+        self.assertEqual(self.mail['team-a'].notify.call_args[0][0].email, 'first@team-a.com')
+        self.assertEqual(self.host.metrics()['tenants']['team-b']['processed'], 2)
+
+    def test_timeouts_are_routed_to_their_tenant(self):
+        expired = []
+        self.timer.on_expire = lambda keys: expired.extend(self.host.timeouts(keys))
+        self.host.start()
+        self.host.submit('team-a', 'alert', 'service-1', 'Down!').result(5)
+        self.host.submit('team-b', 'alert', 'service-1', 'Down!').result(5)
+        self.host.submit('team-b', 'acknowledge', 'service-1').result(5)
+        self.timer.add_timeout('service-2', 15)
+
+        self.clock.now = 15 * 60 + 1
+        self.timer.advance()
+        self.host.stop()
+
+        self.assertEqual(self.host.pager('team-a').repository.get('service-1').current_level, 1)
+        self.assertEqual(self.host.pager('team-b').repository.get('service-1').current_level, 0)
+        # Not in a tenant namespace: left to the caller
+        self.assertEqual(expired, ['service-2'])
+
+    def test_noisy_tenant_does_not_delay_others(self):
+        # A single shard: both tenants share its queue
+        self.host = TenantHost(self.build_pager, shards=1)
+        order = []
+        done = threading.Event()
+        for tenant in ('team-a', 'team-b'):
+            pager = self.host.pager(tenant)
+            pager.handle_healthy = lambda service_id, tenant=tenant: order.append(tenant)
+        for _ in range(500):
+            self.host.submit('team-b', 'healthy', 'service-1')
+        self.host.submit('team-a', 'healthy', 'service-1').add_done_callback(lambda _: done.set())
+
+        self.host.start()
+        self.assertTrue(done.wait(5))
+        self.host.stop()
+        self.assertLessEqual(order.index('team-a'), 1)
+
+    def test_unknown_and_invalid_tenants_are_rejected(self):
+        with self.assertRaises(ValueError):
+            self.host.submit('team-c', 'alert', 'service-1', 'Down!')
+        with self.assertRaises(ValueError):
+            self.host.submit('../team-a', 'alert', 'service-1', 'Down!')
+        self.assertEqual(self.host.tenants, [])
+
+    def test_tenants_are_capped(self):
+        self.host = TenantHost(self.build_pager, shards=1, max_tenants=1)
+        self.host.pager('team-a')
+        with self.assertRaises(ValueError):
+            self.host.pager('team-b')
+        self.assertEqual(self.host.tenants, ['team-a'])
+
+    def test_a_slow_build_only_delays_its_tenant(self):
+        building = threading.Event()
+        release = threading.Event()
+
+        def build_pager(tenant, timer):
+            if tenant == 'team-a':
+                building.set()
+                release.wait(5)
+            return self.build_pager(tenant, timer)
+
+        self.host = TenantHost(build_pager, shards=1)
+        slow = []
+        thread = threading.Thread(target=lambda: slow.append(self.host.pager('team-a')))
+        thread.start()
+        self.assertTrue(building.wait(5))
+        self.host.pager('team-b')
+        self.assertEqual(self.host.tenants, ['team-b'])
+
+        release.set()
+        thread.join(5)
+        self.assertIs(self.host.pager('team-a'), slow[0])
+
+
+if __name__ == "__main__":
+    unittest.main()
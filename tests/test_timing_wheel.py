@@ -0,0 +1,118 @@
+import unittest
+from unittest.mock import MagicMock
+import sys, os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+from infrastructure.timing_wheel_timer_service import TimingWheelTimerService
+from domain.services.pager_service import ServicePager
+from domain.models.monitored_service import MonitoredService
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestTimingWheelTimerService(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.batches = []
+        self.timer = TimingWheelTimerService(
+            on_expire=self.batches.append,
+            tick_ms=1000,
+            batch_size=2,
+            clock=self.clock
+        )
+
+    def test_timeout_fires_when_due(self):
+        self.timer.add_timeout('service-1', 15)
+
+        # One second early: nothing fires
+        self.clock.now = 15 * 60 - 1
+        self.assertEqual(self.timer.advance(), 0)
+        self.assertTrue(self.timer.pending('service-1'))
+
+        self.clock.now = 15 * 60
+        self.assertEqual(self.timer.advance(), 1)
+        self.assertEqual(self.batches, [['service-1']])
+        self.assertEqual(len(self.timer), 0)
+
+    def test_long_timeouts_cascade(self):
+        # Lands in the third wheel and cascades down twice before firing
+        self.timer.add_timeout('service-1', 24 * 60)
+
+        self.clock.now = 24 * 3600 - 1
+        self.timer.advance()
+        self.assertEqual(self.batches, [])
+
+        self.clock.now = 24 * 3600
+        self.timer.advance()
+        self.assertEqual(self.batches, [['service-1']])
+
+    def test_cancel_and_rearm(self):
+        self.timer.add_timeout('service-1', 1)
+        self.timer.add_timeout('service-2', 1)
+
+        self.assertTrue(self.timer.cancel_timeout('service-1'))
+        self.assertFalse(self.timer.cancel_timeout('service-1'))
+
+        # Re-arming replaces the pending timeout
+        self.clock.now = 30
+        self.timer.add_timeout('service-2', 1)
+        self.clock.now = 60
+        self.timer.advance()
+        self.assertEqual(self.batches, [])
+
+        self.clock.now = 90
+        self.timer.advance()
+        self.assertEqual(self.batches, [['service-2']])
+
+    def test_expired_timeouts_are_dispatched_in_batches(self):
+        for i in range(5):
+            self.timer.add_timeout(f'service-{i}', 1)
+
+        self.clock.now = 60
+        self.assertEqual(self.timer.advance(), 5)
+        self.assertEqual([len(batch) for batch in self.batches], [2, 2, 1])
+
+
+class TestServicePagerTimeoutCancellation(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.service = MonitoredService('service-1')
+        self.service.status = 'unhealthy'
+
+        self.repository = MagicMock()
+        self.repository.get.return_value = self.service
+        self.timer = TimingWheelTimerService(tick_ms=1000, clock=self.clock)
+        self.pager = ServicePager(
+            timer_system=self.timer,
+            escalation_system=MagicMock(),
+            mail_system=MagicMock(),
+            sms_system=MagicMock(),
+            repository=self.repository
+        )
+        self.timer.on_expire = self.pager.handle_timeouts
+
+    def test_acknowledge_drops_pending_timeout(self):
+        self.timer.add_timeout(self.service.id, 15)
+        self.pager.handle_acknowledge(self.service.id)
+        self.assertFalse(self.timer.pending(self.service.id))
+
+        # The stale timeout never reaches the repository
+        self.repository.get.reset_mock()
+        self.clock.now = 15 * 60
+        self.assertEqual(self.timer.advance(), 0)
+        self.assertEqual(self.repository.get.call_count, 0)
+
+    def test_healthy_drops_pending_timeout(self):
+        self.timer.add_timeout(self.service.id, 15)
+        self.pager.handle_healthy(self.service.id)
+        self.assertFalse(self.timer.pending(self.service.id))
+
+
+if __name__ == "__main__":
+    unittest.main()